@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+bench_incremental.py -
+增量解析基准测试：对比完整解析与编辑单个step后增量解析的延迟，以及引擎 update_script()
+（增量解析加增量编译）的“编辑到就绪”延迟。
+"""
+
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script, step_name
+from parser import Parser
+from incremental_parser import IncrementalParser
+from dsl_engine import DSLEngine
+
+
+def _best_of(func, repeat, reset=None):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+        if reset:
+            reset()
+    return best
+
+
+def bench(steps, repeat=5):
+    """返回指定规模下完整解析与增量解析的耗时（秒）"""
+    text = generate_script(steps)
+    full = _best_of(lambda: Parser().parse(text), max(1, repeat // 2))
+
+    parser = IncrementalParser()
+    parser.parse(text)
+    # 在脚本中部修改一条回复（行数不变）以及插入一行（后续step行号需要平移）
+    anchor = text.index(f"step {step_name(steps // 2)}")
+    reply_at = text.index('reply "', anchor) + len('reply "')
+    edited = text[:reply_at] + "编辑" + text[reply_at:]
+    line_at = text.index('\n', anchor) + 1
+    inserted = text[:line_at] + '    reply "新增一行"\n' + text[line_at:]
+
+    # 每次计时一次编辑，随后（不计时）恢复原文本
+    revert = lambda: parser.update(text)
+    inplace = _best_of(lambda: parser.update(edited), repeat, revert)
+    shifted = _best_of(lambda: parser.update(inserted), repeat, revert)
+
+    engine = DSLEngine(script_content=text)
+    ready = _best_of(lambda: engine.update_script(edited), repeat, lambda: engine.update_script(text))
+    engine.close()
+    return {'steps': steps, 'full_parse': full, 'edit_same_lines': inplace, 'edit_new_line': shifted,
+            'engine_edit': ready}
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    print(f"{'steps':>8} {'完整解析(ms)':>14} {'增量-同行(ms)':>14} {'增量-插行(ms)':>14} {'编辑到就绪(ms)':>14}")
+    for steps in sizes:
+        r = bench(steps)
+        print(f"{r['steps']:>8} {r['full_parse'] * 1e3:>14.2f} "
+              f"{r['edit_same_lines'] * 1e3:>14.3f} {r['edit_new_line'] * 1e3:>14.3f} "
+              f"{r['engine_edit'] * 1e3:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+bench_lexer.py -
+词法分析器基准测试：在大规模合成脚本上比较PLY后端与快速后端的 tokens/秒。
+"""
+
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script
+from lexer import Lexer
+
+
+def bench(backend, data, repeat=3):
+    """返回 (token数, 最佳耗时秒)"""
+    lexer = Lexer(backend)
+    best, count = float('inf'), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in lexer.iter_tokens(data))
+        best = min(best, time.perf_counter() - start)
+    return count, best
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = generate_script(steps)
+    print(f"脚本: {steps} steps, {len(data) / 1024:.0f} KB")
+    results = {}
+    for backend in ('ply', 'fast'):
+        count, elapsed = bench(backend, data)
+        results[backend] = count / elapsed
+        print(f"{backend:>5}: {count} tokens, {elapsed * 1e3:.1f} ms, {count / elapsed:,.0f} tokens/s")
+    print(f"加速比: {results['fast'] / results['ply']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+bench_llm_client.py -
+LLM客户端单次请求开销基准测试：在零注入延迟的本地替身服务器上，
+比较 openai SDK 后端与内置轻量HTTP后端（http_llm.py）的请求延迟，差值即客户端自身的开销。
+另外给出两种后端的导入耗时。
+
+用法:
+    python benchmarks/bench_llm_client.py [--requests N] [--warmup N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+src_dir = os.path.join(project_root, 'src')
+sys.path.insert(0, src_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_utterances, step_name
+from harness import summarize
+from llm_client import LLMClient, LLM_BACKENDS
+from stub_llm_server import StubLLMServer
+
+IMPORTS = {'openai': 'import openai', 'http': 'import http_llm'}
+
+
+def import_time(backend):
+    """在新进程中测量导入后端依赖的耗时（秒）"""
+    code = (f"import sys, time; sys.path.insert(0, {src_dir!r}); start = time.perf_counter(); "
+            f"{IMPORTS[backend]}; print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def request_latency(server, backend, requests, warmup):
+    """逐个发送意图识别请求，返回每次请求的耗时列表"""
+    env = {'DSL_AGENT_BASE_URL': server.base_url, 'DSL_AGENT_LLM_BACKEND': backend}
+    with patch.dict('os.environ', env):
+        client = LLMClient(api_key='benchmark-key')
+    intents = [step_name(i) for i in range(5)]
+    utterances = generate_utterances(requests + warmup, seed=0)
+    samples = []
+    for i, text in enumerate(utterances):
+        start = time.perf_counter()
+        intent = client.recognize_intent(text, intents, [])
+        elapsed = time.perf_counter() - start
+        assert intent in intents, intent
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='LLM客户端单次请求开销基准测试')
+    parser.add_argument('--requests', type=int, default=2000, help='每种后端的请求数')
+    parser.add_argument('--warmup', type=int, default=50, help='预热请求数（建立连接等，不计入结果）')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with StubLLMServer(mode='hash') as server:
+        for backend in LLM_BACKENDS:
+            results[backend] = summarize(request_latency(server, backend, args.requests, args.warmup))
+
+    print(f"单次请求延迟（本地替身服务器，零注入延迟，{args.requests} 次）:")
+    print(f"  {'后端':<8}{'导入(ms)':>10}{'p50(us)':>10}{'p95(us)':>10}{'p99(us)':>10}{'均值(us)':>10}")
+    for backend, stats in results.items():
+        print(f"  {backend:<8}{import_time(backend) * 1e3:>10.1f}{stats['median'] * 1e6:>10.0f}"
+              f"{stats['p95'] * 1e6:>10.0f}{stats['p99'] * 1e6:>10.0f}{stats['mean'] * 1e6:>10.0f}")
+    saved = results['openai']['median'] - results['http']['median']
+    print(f"http 后端每次请求节省: {saved * 1e6:.0f} us（中位数，"
+          f"{results['openai']['median'] / results['http']['median']:.2f}x）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
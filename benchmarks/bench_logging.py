@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+bench_logging.py -
+调试日志开销基准测试：
+1. 单条调试消息在调试关闭时的开销：原来的 f-string + if 判断 vs 日志层的延迟格式化；
+2. 调试关闭时 process() / recognize_intent() 热路径上调试消息的格式化次数（应为0）与耗时。
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DSL_AGENT_API_KEY', 'benchmark-key')
+
+from agent_log import get_logger
+from generators import step_name
+from suite import StubCompletions
+from dsl_engine import DSLEngine
+
+
+class FormatCounter(str):
+    """统计被格式化次数的字符串参数"""
+    count = 0
+
+    def __format__(self, spec):
+        FormatCounter.count += 1
+        return str.__format__(self, spec)
+
+
+def _legacy_debug(debug, msg):
+    if debug:
+        print(f"[DEBUG] {msg}")
+
+
+def main():
+    number = 500_000
+    step, text = 'step_000001', '我要退货，订单号12345678，' * 8
+    intents = [step_name(i) for i in range(5)]
+    log = get_logger('bench')
+    baseline = timeit.timeit(lambda: None, number=number)
+    cases = [
+        ('f-string + if', lambda: _legacy_debug(False, f"处理步骤: {step}, 输入: {text}")),
+        ('延迟格式化', lambda: log.debug("处理步骤: {}, 输入: {}", step, text)),
+        ('f-string（列表）', lambda: _legacy_debug(False, f"可用意图: {intents}")),
+        ('延迟格式化（列表）', lambda: log.debug("可用意图: {}", intents)),
+    ]
+    print("单条调试消息（调试关闭，已扣除空调用开销）:")
+    for name, func in cases:
+        elapsed = timeit.timeit(func, number=number) - baseline
+        print(f"{name:>16}: {elapsed / number * 1e9:7.1f} ns/次")
+
+    steps = 200
+    # 脚本中的回复不引用 $user_input，格式化计数只反映调试消息
+    script = ''.join(f'step {step_name(i)}\n    reply "您好"\n    log "进入"\n\n' for i in range(steps))
+    engine = DSLEngine(script_content=script)
+    engine.script_file = os.path.join(tempfile.gettempdir(), 'bench_logging.dsl')
+    engine.llm_client.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    names = [step_name(i) for i in range(steps)]
+    user_input = FormatCounter('我要退货')
+
+    def run_process():
+        for name in names:
+            engine.process(name, user_input)
+
+    def run_classify():
+        for name in names:
+            engine.llm_client.recognize_intent(user_input, [name, names[0]], [])
+
+    FormatCounter.count = 0
+    elapsed = min(timeit.repeat(run_process, number=1, repeat=5))
+    process_formats = FormatCounter.count
+    FormatCounter.count = 0
+    classify_elapsed = min(timeit.repeat(run_classify, number=1, repeat=5))
+    # 每次意图识别构造提示词时格式化一次用户输入，属于请求本身
+    classify_formats = FormatCounter.count - 5 * steps
+
+    print("调试关闭时的热路径:")
+    print(f"{'process()':>16}: {elapsed / steps * 1e6:7.2f} µs/step  调试消息格式化 {process_formats} 次")
+    print(f"{'recognize_intent':>16}: {classify_elapsed / steps * 1e6:7.2f} µs/次   调试消息格式化 {classify_formats} 次")
+    assert process_formats == 0 and classify_formats == 0, "调试关闭时仍在格式化调试消息"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+bench_memory.py -
+编译期字符串驻留的内存报告：统计语法树在编译前后平均每个step占用的字节数，
+以及同一进程加载多份脚本时的占用。
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script
+from descent_parser import DescentParser
+from compiler import InternPool, compile_script
+
+
+def deep_size(obj, seen):
+    """递归统计对象占用的字节数，同一对象只计一次"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += deep_size(item, seen)
+    return size
+
+
+def report(steps, scripts, wait_variants):
+    text = generate_script(steps, wait_variants=wait_variants)
+    parser = DescentParser()
+
+    trees = [parser.parse(text) for _ in range(scripts)]
+    seen = set()
+    before = sum(deep_size(tree, seen) for tree in trees)
+
+    pool = InternPool()
+    for tree in trees:
+        compile_script(tree, pool)
+    seen = set()
+    after = sum(deep_size(tree, seen) for tree in trees)
+
+    total_steps = steps * scripts
+    return before / total_steps, after / total_steps
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'脚本数':>6} {'wait列表种类':>12} {'编译前(B/step)':>16} {'编译后(B/step)':>16} {'节省':>7}")
+    for scripts in (1, 10):
+        for variants in (8, 0):
+            before, after = report(steps, scripts, variants)
+            label = str(variants) if variants else '随机'
+            print(f"{scripts:>6} {label:>12} {before:>16.0f} {after:>16.0f} {1 - after / before:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
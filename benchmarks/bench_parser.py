@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+bench_parser.py -
+解析器基准测试：比较PLY后端（PLY/快速词法分析器）与递归下降后端的解析吞吐量，
+并单独给出语法分析阶段（输入为已完成词法分析的token列表）的耗时。
+"""
+
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script
+from lexer import Lexer
+from parser import Parser
+from descent_parser import DescentParser
+
+BACKENDS = {
+    'ply': lambda: Parser(),
+    'ply+fast-lexer': lambda: Parser(lexer_backend='fast'),
+    'descent': lambda: DescentParser(),
+}
+
+
+def _best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    assert result is not None
+    return best
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = 5
+    data = generate_script(steps)
+    size_mb = len(data.encode('utf-8')) / 1e6
+    print(f"脚本: {steps} steps, {size_mb:.2f} MB")
+
+    print("端到端（词法+语法分析）:")
+    baseline = None
+    for name, factory in BACKENDS.items():
+        parser = factory()
+        elapsed = _best_of(lambda: parser.parse(data), repeat)
+        baseline = baseline or elapsed
+        print(f"{name:>15}: {elapsed * 1e3:8.1f} ms  {steps / elapsed:10,.0f} steps/s  "
+              f"{size_mb / elapsed:6.2f} MB/s  {baseline / elapsed:5.1f}x")
+
+    print("仅语法分析阶段:")
+    tokens = list(Lexer('fast').iter_tokens(data))
+    ply_time = _best_of(lambda: Parser().parse_tokens(tokens), repeat)
+    descent = DescentParser()
+    descent_time = _best_of(lambda: descent.parse_tokens(tokens, data), repeat)
+    print(f"{'ply':>15}: {ply_time * 1e3:8.1f} ms")
+    print(f"{'descent':>15}: {descent_time * 1e3:8.1f} ms  {ply_time / descent_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
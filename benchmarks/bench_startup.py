@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py -
+启动耗时基准测试：
+1. 按 `python -X importtime` 的输出列出导入 dsl_engine 时累计耗时最多的模块；
+2. 在新进程中测量首条回复时间（解释器启动 → 构造引擎 → 第一个step的回复），
+   分别给出无缓存（首次加载脚本）和命中语法树缓存两种情况，并与目标值比较。
+
+用法:
+    python benchmarks/bench_startup.py [--steps N] [--repeat N] [--target-ms MS]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+src_dir = os.path.join(project_root, 'src')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script
+
+# 子进程：构造引擎并输出第一个step的回复，同时报告重量级依赖是否已被导入
+FIRST_REPLY = '''
+import sys
+sys.path.insert(0, {src!r})
+from dsl_engine import DSLEngine
+engine = DSLEngine(script_file={script!r})
+reply = engine.process(engine._get_first_step(), '')
+print('openai' in sys.modules, 'ply.yacc' in sys.modules, len(reply) > 0)
+'''
+
+
+def import_report(top):
+    """运行 -X importtime，返回 [(累计微秒, 模块名)]，按累计耗时降序"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {src_dir!r}); import dsl_engine"],
+        capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def first_reply(script, env):
+    """在新进程中加载脚本并得到第一条回复，返回 (耗时秒, 是否导入openai, 是否导入ply.yacc)"""
+    code = FIRST_REPLY.format(src=src_dir, script=script)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    elapsed = time.perf_counter() - start
+    openai_loaded, ply_loaded, replied = result.stdout.split()[-3:]
+    assert replied == 'True', result.stdout
+    return elapsed, openai_loaded == 'True', ply_loaded == 'True'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--steps', type=int, default=1000, help='合成脚本的step数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每种情况的重复次数')
+    parser.add_argument('--top', type=int, default=12, help='列出的导入模块数')
+    parser.add_argument('--target-ms', type=float, default=250.0, help='命中缓存时首条回复时间的目标（毫秒）')
+    args = parser.parse_args(argv)
+
+    print("导入 dsl_engine 累计耗时最多的模块:")
+    for cumulative_us, name in import_report(args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    baseline = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        baseline.append(time.perf_counter() - start)
+    print(f"\n空解释器启动: {statistics.median(baseline) * 1e3:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        script = os.path.join(workdir, 'bench.dsl')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(generate_script(steps=args.steps, wait_width=0))
+        env = dict(os.environ, DSL_AGENT_CACHE_DIR=os.path.join(workdir, 'cache'),
+                   DSL_AGENT_API_KEY=os.environ.get('DSL_AGENT_API_KEY', 'benchmark-key'))
+
+        cold = []
+        for _ in range(args.repeat):
+            shutil.rmtree(env['DSL_AGENT_CACHE_DIR'], ignore_errors=True)
+            cold.append(first_reply(script, env))
+        warm = [first_reply(script, env) for _ in range(args.repeat)]
+
+    print(f"首条回复时间（{args.steps} steps，含解释器启动，中位数）:")
+    for label, samples in (('无缓存', cold), ('命中缓存', warm)):
+        median = statistics.median(sample[0] for sample in samples)
+        _, openai_loaded, ply_loaded = samples[-1]
+        print(f"  {label:<6}: {median * 1e3:8.1f} ms  导入openai: {openai_loaded}  导入ply.yacc: {ply_loaded}")
+    warm_ms = statistics.median(sample[0] for sample in warm) * 1e3
+    status = '✅ 达标' if warm_ms <= args.target_ms else '❌ 未达标'
+    print(f"目标: 命中缓存时 ≤ {args.target_ms:.0f} ms  {status}")
+    return 0 if warm_ms <= args.target_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+bench_streaming.py -
+流式解析基准测试：对比整文件读入解析与流式逐step解析的耗时和峰值内存。
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import generate_script
+from parser import Parser
+from stream_parser import StreamParser
+
+
+def _measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench(steps):
+    """返回整文件解析与流式解析（逐个消费step，不保留）的耗时与峰值内存"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'large.dsl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_script(steps))
+        size = os.path.getsize(path)
+
+        def whole():
+            with open(path, encoding='utf-8') as f:
+                Parser().parse(f.read())
+
+        def streamed():
+            for _ in StreamParser().iter_steps(path):
+                pass
+
+        whole_time, whole_peak = _measure(whole)
+        stream_time, stream_peak = _measure(streamed)
+    return {'steps': steps, 'bytes': size,
+            'whole_time': whole_time, 'whole_peak': whole_peak,
+            'stream_time': stream_time, 'stream_peak': stream_peak}
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    print(f"{'steps':>8} {'文件(KB)':>10} {'整文件(s)':>10} {'峰值(KB)':>10} {'流式(s)':>10} {'峰值(KB)':>10}")
+    for steps in sizes:
+        r = bench(steps)
+        print(f"{r['steps']:>8} {r['bytes'] / 1024:>10.0f} {r['whole_time']:>10.2f} "
+              f"{r['whole_peak'] / 1024:>10.0f} {r['stream_time']:>10.2f} {r['stream_peak'] / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
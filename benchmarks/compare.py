@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+compare.py -
+对比两次基准测试结果（run_benchmarks.py 输出的JSON）。
+按每个用例的 better 方向判断快慢，变差超过阈值时以非零状态退出，可用于CI。
+
+用法:
+    python benchmarks/compare.py base.json head.json [--threshold 0.1]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import load
+
+
+def compare(base, head, threshold):
+    """返回 (表格行列表, 变差的用例列表)；speedup > 1 表示 head 更好"""
+    rows = []
+    regressions = []
+    for name, new in head['results'].items():
+        old = base['results'].get(name)
+        if old is None or not old['value'] or not new['value']:
+            rows.append((name, None, new['value'], new['unit'], None))
+            continue
+        if new.get('better', 'higher') == 'higher':
+            speedup = new['value'] / old['value']
+        else:
+            speedup = old['value'] / new['value']
+        rows.append((name, old['value'], new['value'], new['unit'], speedup))
+        if speedup < 1 - threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比两次基准测试结果')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为变差的相对幅度')
+    args = parser.parse_args(argv)
+
+    base = load(args.base)
+    head = load(args.head)
+    print(f"base: {base['meta'].get('commit')}  head: {head['meta'].get('commit')}")
+    if base['meta'].get('params') != head['meta'].get('params'):
+        print("⚠️  两次运行的参数不同，结果可能不可比")
+
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"{'用例':<20}{'base':>14}{'head':>14}  {'单位':<10}{'加速比':>8}")
+    for name, old, new, unit, speedup in rows:
+        old_text = f"{old:,.4g}" if old is not None else '-'
+        ratio = f"{speedup:.2f}x" if speedup is not None else '新增'
+        print(f"{name:<20}{old_text:>14}{new:>14,.4g}  {unit:<10}{ratio:>8}")
+
+    if regressions:
+        print(f"❌ 性能变差: {', '.join(regressions)}")
+        return 1
+    print("✅ 没有超过阈值的性能变差")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
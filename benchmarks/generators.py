@@ -0,0 +1,136 @@
+"""
+generators.py -
+基准测试用的合成DSL脚本生成器，脚本规模可配置，固定随机种子保证可复现。
+"""
+
+import random
+
+REPLY_TEXTS = [
+    "您好！欢迎光临！",
+    "请问有什么可以帮您？",
+    "了解您的需求",
+    "请提供需要处理的订单号",
+    "客服将在24小时内联系您处理后续事宜",
+    "感谢您的反馈，我们已经记录",
+]
+
+
+def step_name(index):
+    """第 index 个step的名称"""
+    return f"step_{index:06d}"
+
+
+def generate_step(index, steps, rng, statements=4, wait_width=5, wait_lists=None):
+    """生成单个step的源码；wait_lists 给定时从中选取意图列表（模拟真实脚本中大量重复的 wait）"""
+    lines = [f"step {step_name(index)}"]
+    for i in range(statements):
+        text = rng.choice(REPLY_TEXTS)
+        if i % 3 == 2:
+            lines.append(f'    log "{text}：" + $user_input')
+        elif i % 3 == 1:
+            lines.append(f'    reply "{text}" + $user_input + "。"')
+        else:
+            lines.append(f'    reply "{text}"')
+    if wait_lists:
+        targets = rng.choice(wait_lists)
+    else:
+        targets = [step_name(rng.randrange(steps)) for _ in range(wait_width)]
+    # wait_width 为0时生成不含 wait 的step，便于不阻塞地测量 process()
+    if targets:
+        lines.append("    wait " + " ".join(f'"{t}"' for t in targets))
+    return "\n".join(lines) + "\n\n"
+
+
+def generate_script(steps=100, statements=4, wait_width=5, seed=0, wait_variants=0):
+    """
+    生成包含 steps 个step的脚本文本。
+    wait_variants > 0 时所有 wait 只从这么多种意图列表中选取，否则每个 wait 随机生成。
+    """
+    rng = random.Random(seed)
+    wait_lists = [
+        [step_name(rng.randrange(steps)) for _ in range(wait_width)]
+        for _ in range(wait_variants)
+    ]
+    parts = ["# 合成基准测试脚本\n\n"]
+    for index in range(steps):
+        parts.append(generate_step(index, steps, rng, statements, wait_width, wait_lists))
+    return "".join(parts)
+
+
+UTTERANCE_TEMPLATES = [
+    "你好",
+    "我要退货",
+    "订单{n}怎么还没到",
+    "我要投诉你们的服务",
+    "转人工客服",
+    "谢谢",
+    "帮我查一下订单号{n}",
+]
+
+
+def generate_utterances(count=1000, seed=0):
+    """生成合成的用户输入语料"""
+    rng = random.Random(seed)
+    return [rng.choice(UTTERANCE_TEMPLATES).format(n=rng.randrange(10 ** 7, 10 ** 8)) for _ in range(count)]
+
+
+# 常见短句：(简体, 繁体)
+COMMON_PHRASES = [
+    ("我要退货", "我要退貨"),
+    ("转人工", "轉人工"),
+    ("谢谢", "謝謝"),
+    ("订单到哪了", "訂單到哪了"),
+    ("怎么退款", "怎麼退款"),
+    ("我要投诉", "我要投訴"),
+    ("VIP会员", "VIP會員"),
+    ("发票怎么开", "發票怎麼開"),
+    ("修改地址", "修改地址"),
+    ("取消订单", "取消訂單"),
+]
+_ENDINGS = ["", "", "", "！", "!", "？", "?", "。", "~", "～", "...", "！！", "😊"]
+
+
+def generate_variants(count=10000, seed=0):
+    """
+    生成常见短句的不同写法（结尾标点、多余空格、全角字母、繁体字），短句的出现频率服从 Zipf 分布，
+    用于比较意图缓存按原始输入和按规范化输入的命中率
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(COMMON_PHRASES))]
+    texts = []
+    for simplified, traditional in rng.choices(COMMON_PHRASES, weights, k=count):
+        text = traditional if rng.random() < 0.1 else simplified
+        if rng.random() < 0.2:
+            cut = rng.randrange(1, len(text))
+            text = text[:cut] + " " + text[cut:]
+        if rng.random() < 0.1:
+            text = text.replace("VIP", "ＶＩＰ")
+        if rng.random() < 0.1:
+            text = " " + text + " "
+        texts.append(text + rng.choice(_ENDINGS))
+    return texts
+
+
+# 按意图分组的同义说法，用于评估近似意图缓存的命中率与准确率
+PARAPHRASES = {
+    "return_request": ["我要退货", "我想退货", "能退货吗", "帮我退个货", "这个可以退吗", "申请退货",
+                       "我要退掉这件衣服", "怎么退货", "退货怎么弄", "我想把这个退了"],
+    "refund": ["我要退款", "钱什么时候退给我", "退款到账了吗", "怎么还没退款", "申请退款",
+               "我想退钱", "退款进度", "退款怎么还没到", "帮我查下退款", "能退款吗"],
+    "ask_human_agent": ["转人工", "我要人工客服", "找人工", "人工服务", "转接人工客服",
+                        "让真人来回答", "我要跟客服说话", "有没有人工", "帮我转人工", "人工客服在吗"],
+    "complaint": ["我要投诉", "投诉你们", "服务太差了我要投诉", "我要举报", "你们的服务太差了",
+                  "我对服务不满意", "投诉快递员", "我要给差评", "太差劲了", "我要投诉商家"],
+    "track_order": ["我的快递到哪了", "查一下物流", "订单到哪了", "什么时候发货", "物流怎么不动了",
+                    "快递还没到", "帮我查快递", "我的包裹在哪", "发货了吗", "查物流信息"],
+    "thankyou": ["谢谢", "谢谢你", "好的谢谢", "非常感谢", "多谢", "感谢", "辛苦了", "谢啦", "好的感谢", "太感谢了"],
+}
+
+
+def generate_paraphrases(count=2000, seed=0):
+    """生成带意图标签的用户输入 [(输入, 意图)]：同义说法按 Zipf 分布出现，并加上结尾标点"""
+    rng = random.Random(seed)
+    pool = [(text, intent) for intent, texts in PARAPHRASES.items() for text in texts]
+    rng.shuffle(pool)
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(pool))]
+    return [(text + rng.choice(_ENDINGS), intent) for text, intent in rng.choices(pool, weights, k=count)]
@@ -0,0 +1,131 @@
+"""
+harness.py -
+基准测试框架：计时、统计、用例注册与JSON结果格式。
+
+结果文件格式（可在不同提交之间用 compare.py 对比）：
+{
+  "meta": {"commit": ..., "python": ..., "platform": ..., "timestamp": ..., "params": {...}},
+  "results": {
+    "<用例名>": {"value": 数值, "unit": "单位", "better": "higher|lower", "stats": {...}, ...}
+  }
+}
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+# 注册的基准测试用例：名称 -> 函数(params) -> 结果字典
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册基准测试用例的装饰器"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, repeat=5, number=1):
+    """
+    重复执行 func 并返回每次调用耗时的统计（秒）。
+    每轮调用 number 次取平均；计时期间关闭垃圾回收以减少抖动。
+    """
+    samples = []
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return summarize(samples)
+
+
+def summarize(samples):
+    """计算耗时样本的统计信息"""
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1],
+    }
+
+
+def percentile(ordered, pct):
+    """已排序样本的百分位数（最近秩法）"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def rate(count, stats, unit):
+    """把耗时统计转换为吞吐量结果（以中位数计算）"""
+    return {'value': count / stats['median'], 'unit': unit, 'better': 'higher', 'stats': stats}
+
+
+def latency(stats, unit='s'):
+    """把耗时统计转换为延迟结果（以中位数计算）"""
+    return {'value': stats['median'], 'unit': unit, 'better': 'lower', 'stats': stats}
+
+
+def git_commit():
+    """当前提交的哈希，不在git仓库中时返回None"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, params):
+    """运行选中的用例，返回结果文档"""
+    results = {}
+    for name in names:
+        print(f"⏱️  {name} ...", flush=True)
+        results[name] = BENCHMARKS[name](params)
+        result = results[name]
+        print(f"    {result['value']:,.4g} {result['unit']}")
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': params,
+        },
+        'results': results,
+    }
+
+
+def save(document, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+load_test.py -
+负载生成器：用脚本和用户输入语料驱动大量并发对话会话，报告吞吐量、
+单轮延迟（拆分为意图识别与脚本执行）的 p50/p95/p99 以及内存随时间的增长。
+
+意图识别有两种方式：
+  inproc  进程内桩LLM，只测量引擎本身的开销；
+  http    启动本地替身LLM服务器，LLMClient 走真实的网络路径（可注入延迟/错误/限流）。
+
+用法:
+    python benchmarks/load_test.py --sessions 2000 --concurrency 64 --turns 10
+    python benchmarks/load_test.py --mode http --latency lognormal:0.2:0.5 --corpus utterances.txt
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DSL_AGENT_API_KEY', 'benchmark-key')
+
+from generators import generate_script, generate_utterances
+from harness import save, summarize
+from suite import StubCompletions
+from dsl_engine import DSLEngine
+from stub_llm_server import StubLLMServer
+
+
+def _rss_bytes():
+    """当前进程的常驻内存（Linux 读取 /proc，其他平台退回峰值RSS）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemorySampler:
+    """后台线程定期采样内存，得到 (已运行秒数, 字节数, 已完成轮数) 序列"""
+
+    def __init__(self, interval, counter):
+        self.interval = interval
+        self.counter = counter
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        start = time.perf_counter()
+        while True:
+            self.samples.append((time.perf_counter() - start, _rss_bytes(), self.counter()))
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def load_corpus(path, count, seed):
+    """读取语料文件（每行一条用户输入），未指定时生成合成语料"""
+    if not path:
+        return generate_utterances(count, seed)
+    with open(path, encoding='utf-8') as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    if not corpus:
+        raise ValueError(f"语料文件为空: {path}")
+    return corpus
+
+
+def run_load(engine, corpus, sessions, concurrency, turns):
+    """并发驱动 sessions 个会话，每个会话最多 turns 轮，返回各轮耗时样本"""
+    lock = threading.Lock()
+    samples = {'turn': [], 'classify': [], 'execute': [], 'first_reply': [],
+               'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}}
+    errors = []
+    completed = [0]
+
+    def drive(index):
+        turn_samples = []
+        usage = {}
+        try:
+            session = engine.new_session()
+            session.begin()
+            for turn in range(turns):
+                if not session.waiting:
+                    break
+                text = corpus[(index * turns + turn) % len(corpus)]
+                start = time.perf_counter()
+                session.feed(text)
+                elapsed = time.perf_counter() - start
+                timings = session.last_timings
+                turn_samples.append((elapsed, timings['classify'], timings['execute'], timings['first_reply']))
+            usage = session.token_usage()
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        with lock:
+            for elapsed, classify, execute, first_reply in turn_samples:
+                samples['turn'].append(elapsed)
+                samples['classify'].append(classify)
+                samples['execute'].append(execute)
+                if first_reply:
+                    samples['first_reply'].append(first_reply)
+            completed[0] += len(turn_samples)
+            for key, total in samples['usage'].items():
+                samples['usage'][key] = total + usage.get(key, 0)
+
+    with MemorySampler(0.5, lambda: completed[0]) as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(drive, range(sessions)))
+        wall = time.perf_counter() - start
+    return samples, errors, wall, sampler.samples
+
+
+def report(samples, errors, wall, memory):
+    turns = len(samples['turn'])
+    print(f"\n📊 完成 {turns} 轮，耗时 {wall:.2f}s，吞吐量 {turns / wall:,.1f} 轮/秒")
+    if errors:
+        print(f"❌ 出错会话: {len(errors)}，示例: {errors[0]}")
+    result = {'turns': turns, 'wall': wall, 'turns_per_sec': turns / wall, 'errors': len(errors)}
+    if turns:
+        print(f"{'阶段':<12}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+        for name in ('turn', 'classify', 'execute', 'first_reply'):
+            if not samples[name]:
+                continue
+            stats = summarize(samples[name])
+            result[name] = stats
+            print(f"{name:<12}{stats['median'] * 1e3:>10.3f}{stats['p95'] * 1e3:>10.3f}"
+                  f"{stats['p99'] * 1e3:>10.3f}{stats['max'] * 1e3:>10.3f}")
+    usage = samples['usage']
+    if turns and usage['prompt_tokens']:
+        result['usage'] = usage
+        print(f"🔤 token: 提示词 {usage['prompt_tokens'] / turns:,.1f}/轮，"
+              f"补全 {usage['completion_tokens'] / turns:,.1f}/轮，"
+              f"前缀缓存命中 {usage['cached_tokens'] / usage['prompt_tokens']:.1%}")
+    if memory:
+        first, last = memory[0], memory[-1]
+        growth = last[1] - first[1]
+        per_turn = growth / last[2] if last[2] else 0.0
+        print(f"💾 内存: {first[1] / 2 ** 20:.1f}MB → {last[1] / 2 ** 20:.1f}MB "
+              f"(增长 {growth / 2 ** 20:+.1f}MB，约 {per_turn:,.0f} 字节/轮)")
+        result['memory'] = [{'t': t, 'rss': rss, 'turns': n} for t, rss, n in memory]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='DSL Agent 负载生成器')
+    parser.add_argument('--script', help='DSL脚本文件，未指定时生成合成脚本')
+    parser.add_argument('--steps', type=int, default=200, help='合成脚本的step数量')
+    parser.add_argument('--corpus', help='用户输入语料文件，每行一条')
+    parser.add_argument('--sessions', type=int, default=1000, help='会话总数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发会话数（线程数）')
+    parser.add_argument('--turns', type=int, default=10, help='每个会话的最大轮数')
+    parser.add_argument('--mode', choices=('inproc', 'http'), default='inproc', help='意图识别方式')
+    parser.add_argument('--latency', help='http 模式下替身LLM的延迟分布，如 fixed:0.05')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='http 模式下替身LLM的错误率')
+    parser.add_argument('--rate-limit', type=float, help='http 模式下替身LLM每秒允许的请求数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = f.read()
+    else:
+        script = generate_script(steps=args.steps, seed=args.seed)
+    corpus = load_corpus(args.corpus, max(1000, args.turns * 10), args.seed)
+
+    server = None
+    env = {}
+    if args.mode == 'http':
+        server = StubLLMServer(mode='hash', latency=args.latency, error_rate=args.error_rate,
+                               rate_limit=args.rate_limit, seed=args.seed).start()
+        env['DSL_AGENT_BASE_URL'] = server.base_url
+    try:
+        with patch.dict('os.environ', env):
+            engine = DSLEngine(script_content=script)
+        # 日志写入临时文件，不污染工作目录
+        engine.script_file = os.path.join(tempfile.gettempdir(), f'dsl_load_{os.getpid()}.dsl')
+        if server is None:
+            engine.llm_client.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+
+        print(f"🚀 {args.sessions} 个会话，并发 {args.concurrency}，每个会话最多 {args.turns} 轮，"
+              f"意图识别: {args.mode}")
+        samples, errors, wall, memory = run_load(engine, corpus, args.sessions, args.concurrency, args.turns)
+    finally:
+        if server is not None:
+            server.stop()
+            print(f"替身LLM统计: {server.stats}")
+
+    result = report(samples, errors, wall, memory)
+    if args.output:
+        result['params'] = vars(args)
+        save(result, args.output)
+        print(f"✅ 结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py -
+运行基准测试套件并把结果写成JSON，便于用 compare.py 在不同提交之间对比。
+
+用法:
+    python benchmarks/run_benchmarks.py [--steps N] [--repeat N] [--only 前缀] [--output 文件]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import suite  # noqa: F401  注册所有用例
+from harness import BENCHMARKS, run, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='DSL Agent 基准测试套件')
+    parser.add_argument('--steps', type=int, default=1000, help='合成脚本的step数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例的重复次数')
+    parser.add_argument('--turns', type=int, default=2000, help='端到端测试的对话轮数')
+    parser.add_argument('--log-lines', type=int, default=2000, help='日志测试写入的行数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--only', action='append', default=[], help='只运行名称以此开头的用例，可重复')
+    parser.add_argument('--output', default=None, help='结果JSON文件路径')
+    parser.add_argument('--list', action='store_true', help='列出所有用例')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    names = [name for name in BENCHMARKS
+             if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    if not names:
+        print(f"❌ 没有匹配的用例: {', '.join(args.only)}")
+        return 1
+
+    params = {
+        'steps': args.steps,
+        'repeat': args.repeat,
+        'turns': args.turns,
+        'log_lines': args.log_lines,
+        'seed': args.seed,
+    }
+    document = run(names, params)
+    if args.output:
+        save(document, args.output)
+        print(f"✅ 结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
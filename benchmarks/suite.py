@@ -0,0 +1,413 @@
+"""
+suite.py -
+基准测试用例：词法分析、语法分析、引擎构造、process() 吞吐量、模板渲染、
+日志写入、事件日志读取与统计、输入规范化与意图缓存命中率、近似意图缓存的命中率与查找吞吐量，
+以及针对本地桩LLM的端到端单轮延迟。
+所有用例都使用 generators.py 生成的合成脚本，参数见 params。
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 基准测试不访问真实API；没有配置密钥时避免客户端初始化失败的提示干扰输出
+os.environ.setdefault('DSL_AGENT_API_KEY', 'benchmark-key')
+
+from generators import (PARAPHRASES, generate_paraphrases, generate_script, generate_utterances, generate_variants,
+                        step_name)
+from harness import benchmark, latency, measure, rate, summarize
+from lexer import Lexer
+from parser import Parser
+from descent_parser import DescentParser
+from dsl_engine import DSLEngine
+from stub_llm_server import StubLLMServer
+from dispatch import KeywordMatcher, PatternDispatcher
+from extractors import TYPED_EXTRACTORS
+from event_log import EventLog, read_events
+from analytics import analyze
+from intent_cache import IntentCache
+from normalizer import Normalizer
+from semantic_cache import DEFAULT_THRESHOLD, SemanticCache, evaluate
+from metrics import METRICS
+
+
+class StubCompletions:
+    """
+    进程内桩LLM：模拟 OpenAI 兼容客户端的 chat.completions.create，
+    按提示词中的用户输入散列到可用意图之一返回，不产生网络开销。
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    @staticmethod
+    def _field(prompt, label):
+        start = prompt.index(label) + len(label)
+        return prompt[start:prompt.index('\n', start)]
+
+    def create(self, model=None, messages=None, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        intents = self._field(prompt, '可用意图：').split(', ')
+        text = self._field(prompt, '用户输入：')
+        intent = intents[zlib.crc32(text.encode('utf-8')) % len(intents)]
+        message = SimpleNamespace(content=intent)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _script(params, **overrides):
+    options = {'steps': params['steps'], 'seed': params['seed']}
+    options.update(overrides)
+    return generate_script(**options)
+
+
+@contextmanager
+def _engine(script, stub_llm=False):
+    """构造不含 wait 的基准引擎，日志写入临时目录，可选接入桩LLM；退出时关闭引擎并删除临时目录"""
+    with tempfile.TemporaryDirectory(prefix='dsl_bench_') as directory:
+        engine = DSLEngine(script_content=script)
+        engine.script_file = os.path.join(directory, 'bench.dsl')
+        if stub_llm:
+            engine.llm_client.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+        try:
+            yield engine
+        finally:
+            engine.close()
+
+
+def _token_count(script):
+    return sum(1 for _ in Lexer().iter_tokens(script))
+
+
+@benchmark('lexer.ply')
+def bench_lexer_ply(params):
+    script = _script(params)
+    lexer = Lexer(backend='ply')
+    count = _token_count(script)
+    stats = measure(lambda: lexer.tokenize(script), params['repeat'])
+    return rate(count, stats, 'tokens/s')
+
+
+@benchmark('lexer.fast')
+def bench_lexer_fast(params):
+    script = _script(params)
+    lexer = Lexer(backend='fast')
+    count = _token_count(script)
+    stats = measure(lambda: lexer.tokenize(script), params['repeat'])
+    return rate(count, stats, 'tokens/s')
+
+
+@benchmark('parser.ply')
+def bench_parser_ply(params):
+    script = _script(params)
+    parser = Parser()
+    stats = measure(lambda: parser.parse(script), params['repeat'])
+    return rate(len(script.encode('utf-8')) / 1024, stats, 'KiB/s')
+
+
+@benchmark('parser.descent')
+def bench_parser_descent(params):
+    script = _script(params)
+    parser = DescentParser()
+    stats = measure(lambda: parser.parse(script), params['repeat'])
+    return rate(len(script.encode('utf-8')) / 1024, stats, 'KiB/s')
+
+
+@benchmark('dispatch.match')
+def bench_dispatch_match(params):
+    """
+    确定性路由：每个 wait 的 when 规则编译成的分派器（精确/前缀/正则各若干条）上的查找吞吐量，
+    输入一半命中规则、一半落到LLM。
+    """
+    rng = random.Random(params['seed'])
+    rules = [('exact', [str(i), f'选项{i}'], step_name(i)) for i in range(100)]
+    rules += [('prefix', [f'订单{i:02d}', f'单号{i:02d}'], step_name(i)) for i in range(50)]
+    rules += [('regex', [f'^{i}[0-9]{{7}}$', f'投诉.*{i}号'], step_name(i)) for i in range(20)]
+    dispatcher = PatternDispatcher(rules)
+    inputs = [str(rng.randrange(200)) for _ in range(250)]
+    inputs += [f'订单{rng.randrange(80):02d}-{rng.randrange(1000)}' for _ in range(250)]
+    inputs += [f'{rng.randrange(30)}{rng.randrange(10 ** 7):07d}' for _ in range(250)]
+    inputs += generate_utterances(250, params['seed'])
+
+    def run():
+        for text in inputs:
+            dispatcher.match(text)
+
+    stats = measure(run, params['repeat'])
+    return rate(len(inputs), stats, 'lookups/s')
+
+
+@benchmark('keywords.scan')
+def bench_keywords_scan(params):
+    """
+    关键词预筛选：50 个意图、共 5000 个关键词编译成的 Aho-Corasick 自动机上，
+    对一般长度的用户输入做一次完整扫描的吞吐量，耗时与关键词数量无关。
+    """
+    rng = random.Random(params['seed'])
+    chars = '退货款订单号人工投诉查询物流发票地址修改取消会员积分优惠券'
+    rules = [(step_name(i), [''.join(rng.choice(chars) for _ in range(rng.randint(2, 4))) for _ in range(100)])
+             for i in range(50)]
+    matcher = KeywordMatcher(rules)
+    inputs = generate_utterances(1000, params['seed'])
+
+    def run():
+        for text in inputs:
+            matcher.match(text)
+
+    stats = measure(run, params['repeat'])
+    return rate(sum(len(text) for text in inputs) / 1024, stats, 'Kchars/s')
+
+
+@benchmark('normalize.inputs')
+def bench_normalize_inputs(params):
+    """输入规范化（NFKC、忽略大小写、删除标点空白、繁简转换）的吞吐量，中文与英文输入各半"""
+    normalize = Normalizer(fold_traditional=True)
+    inputs = generate_variants(1000, params['seed']) + generate_utterances(500, params['seed'])
+    inputs += ['Where is my order #%d?' % i for i in range(500)]
+
+    def run():
+        for text in inputs:
+            normalize(text)
+
+    stats = measure(run, params['repeat'])
+    return rate(len(inputs), stats, 'inputs/s')
+
+
+@benchmark('cache.hit_rate')
+def bench_cache_hit_rate(params):
+    """
+    意图缓存命中率：从空缓存开始回放 1000 条常见短句的不同写法，每条输入先查缓存、未命中时写入。
+    主值为按规范化输入作键的命中率，baseline 为按原始输入（去掉首尾空白）作键的命中率
+    """
+    inputs = generate_variants(1000, params['seed'])
+
+    def replay(key):
+        cache = IntentCache(size=1000)
+        hits = 0
+        for text in inputs:
+            text = key(text)
+            if cache.get('welcome:4', text, ('refund',)) is None:
+                cache.put('welcome:4', text, 'refund')
+            else:
+                hits += 1
+        return hits / len(inputs)
+
+    return {'value': replay(Normalizer(fold_traditional=True)), 'unit': 'hit rate', 'better': 'higher',
+            'baseline': replay(str.strip)}
+
+
+
+@benchmark('semantic.hit_rate')
+def bench_semantic_hit_rate(params):
+    """
+    近似意图缓存：回放 2000 条带意图标签的同义说法，精确缓存未命中的输入中由近似缓存（默认阈值）回答的比例。
+    accuracy 为命中时意图正确的比例，llm_calls 为两层缓存都未命中的次数，baseline 为只有精确缓存时的次数
+    """
+    normalize = Normalizer(fold_traditional=True)
+    samples = [('welcome:4', normalize(text), intent) for text, intent in generate_paraphrases(2000, params['seed'])]
+    result, = evaluate(samples, [DEFAULT_THRESHOLD])
+    return {'value': result['hit_rate'], 'unit': 'hit rate', 'better': 'higher', 'accuracy': result['accuracy'],
+            'llm_calls': result['llm_calls'], 'baseline': result['llm_calls'] + result['hits']}
+
+
+@benchmark('semantic.lookup')
+def bench_semantic_lookup(params):
+    """近似意图缓存查找（含向量计算）的吞吐量，缓存已写满 4096 条"""
+    rng = random.Random(params['seed'])
+    intents = tuple(PARAPHRASES)
+    cache = SemanticCache(size=4096)
+    for i, text in enumerate(generate_utterances(4096, params['seed'])):
+        cache.put(intents, f'{text}{i}', rng.choice(intents))
+    inputs = generate_utterances(1000, params['seed'] + 1)
+    stats = measure(lambda: [cache.get(intents, text) for text in inputs], params['repeat'])
+    return rate(len(inputs), stats, 'lookups/s')
+
+
+def _extract_inputs(params):
+    """每10条用户输入中有1条带手机号"""
+    rng = random.Random(params['seed'])
+    texts = generate_utterances(2000, params['seed'])
+    return [f'{text}，电话{13000000000 + rng.randrange(10 ** 9)}' if i % 10 == 0 else text
+            for i, text in enumerate(texts)]
+
+
+@benchmark('extract.single')
+def bench_extract_single(params):
+    """槽位提取：内置 phone 提取器逐条处理用户输入的吞吐量"""
+    extractor = TYPED_EXTRACTORS['phone']
+    inputs = _extract_inputs(params)
+
+    def run():
+        for text in inputs:
+            extractor.extract(text)
+
+    stats = measure(run, params['repeat'])
+    return rate(len(inputs), stats, 'texts/s')
+
+
+@benchmark('extract.batch')
+def bench_extract_batch(params):
+    """槽位提取：同一批输入连接后一次扫描（extract_batch）的吞吐量，与 extract.single 对比"""
+    extractor = TYPED_EXTRACTORS['phone']
+    inputs = _extract_inputs(params)
+    stats = measure(lambda: extractor.extract_batch(inputs), params['repeat'])
+    return rate(len(inputs), stats, 'texts/s')
+
+
+@benchmark('engine.construct')
+def bench_engine_construct(params):
+    script = _script(params)
+    stats = measure(lambda: DSLEngine(script_content=script), params['repeat'])
+    return latency(stats)
+
+
+@benchmark('engine.process')
+def bench_engine_process(params):
+    """不含 wait 的 step 上的 process() 吞吐量（wait 会阻塞等待输入）"""
+    names = [step_name(i) for i in range(params['steps'])]
+    inputs = generate_utterances(len(names), params['seed'])
+    pairs = list(zip(names, inputs))
+    with _engine(_script(params, wait_width=0)) as engine:
+        def run():
+            for name, text in pairs:
+                engine.process(name, text)
+
+        stats = measure(run, params['repeat'])
+    return rate(len(pairs), stats, 'turns/s')
+
+
+@benchmark('engine.process.metrics')
+def bench_engine_process_metrics(params):
+    """开启运行时指标后的 process() 吞吐量，与 engine.process 对比得到插桩开销"""
+    METRICS.reset()
+    METRICS.enable()
+    try:
+        return bench_engine_process(params)
+    finally:
+        METRICS.disable()
+        METRICS.reset()
+
+
+@benchmark('engine.render')
+def bench_engine_render(params):
+    """模板渲染：对所有 reply/log 表达式求值"""
+    with _engine(_script(params, wait_width=0)) as engine:
+        engine.variables['user_input'] = '我要退货'
+        expressions = [statement['value']
+                       for step in engine.ast['children']
+                       for statement in step['children']
+                       if statement['type'] in ('Reply', 'Log')]
+
+        def run():
+            for expression in expressions:
+                engine._evaluate_expression(expression)
+
+        stats = measure(run, params['repeat'])
+    return rate(len(expressions), stats, 'renders/s')
+
+
+@benchmark('engine.log')
+def bench_engine_log(params):
+    """log 语句在请求路径上的开销：记录编码进事件日志的缓冲区，文件由后台线程写入"""
+    lines = generate_utterances(params['log_lines'], params['seed'])
+    with _engine(_script(params, steps=1, wait_width=0)) as engine:
+        def run():
+            for line in lines:
+                engine._write_log(line, 'bench', 1, 'session')
+
+        stats = measure(run, params['repeat'])
+    return rate(len(lines), stats, 'lines/s')
+
+
+@contextmanager
+def _turn_events(params, count):
+    """生成含 count 条 turn 记录的压缩事件日志临时目录，退出时删除"""
+    rng = random.Random(params['seed'])
+    with tempfile.TemporaryDirectory(prefix='dsl_bench_events_') as directory:
+        log = EventLog(directory, compress=True)
+        utterances = generate_utterances(1000, params['seed'])
+        sources = ('llm', 'llm', 'rule', 'keyword', 'fallback')
+        for i in range(count):
+            log.append('turn', f'{rng.randrange(10 ** 6):032x}', step_name(rng.randrange(50)), 4,
+                       utterances[i % len(utterances)], step_name(rng.randrange(50)), rng.choice(sources),
+                       rng.uniform(0.05, 0.5), 0.01)
+        log.close()
+        yield directory
+
+
+@benchmark('events.scan')
+def bench_events_scan(params):
+    """事件日志读取：顺序解码压缩段文件中 turn 记录的吞吐量"""
+    count = 100000
+    with _turn_events(params, count) as directory:
+        stats = measure(lambda: sum(1 for _ in read_events(directory)), params['repeat'])
+    return rate(count, stats, 'records/s')
+
+
+@benchmark('analytics.turns')
+def bench_analytics_turns(params):
+    """事件日志统计：跳转矩阵、意图分布、耗时分位数与预热列表的吞吐量（有 numpy 时按块向量化解码与聚合）"""
+    count = 100000
+    with _turn_events(params, count) as directory:
+        stats = measure(lambda: analyze(directory), params['repeat'])
+    return rate(count, stats, 'turns/s')
+
+
+@benchmark('e2e.turn')
+def bench_e2e_turn(params):
+    """
+    端到端单轮延迟：经 LLMClient（接入进程内桩LLM）识别意图，再执行目标 step。
+    结果以中位数为主值，并给出 p50/p95/p99。
+    """
+    with _engine(_script(params, wait_width=0), stub_llm=True) as engine:
+        return _turn_latency(engine, params)
+
+
+def _turn_latency(engine, params):
+    """逐轮识别意图并执行目标 step，返回含 p50/p95/p99 的延迟结果"""
+    steps = params['steps']
+    rng = random.Random(params['seed'])
+    turns = params['turns']
+    utterances = generate_utterances(turns, params['seed'])
+    candidates = [[step_name(rng.randrange(steps)) for _ in range(5)] for _ in range(turns)]
+
+    samples = []
+    for text, intents in zip(utterances, candidates):
+        start = time.perf_counter()
+        intent = engine.llm_client.recognize_intent(text, intents, [])
+        assert intent in intents
+        engine.process(intent, text)
+        samples.append(time.perf_counter() - start)
+
+    stats = summarize(samples)
+    result = latency(stats)
+    result['p50'] = stats['median']
+    result['p95'] = stats['p95']
+    result['p99'] = stats['p99']
+    return result
+
+
+@benchmark('e2e.turn.http')
+def bench_e2e_turn_http(params):
+    """端到端单轮延迟：LLMClient 经本机HTTP访问替身LLM服务器（零注入延迟，测量客户端与网络开销）"""
+    with StubLLMServer(mode='hash', seed=params['seed']) as server:
+        with patch.dict('os.environ', {'DSL_AGENT_BASE_URL': server.base_url}), \
+                _engine(_script(params, wait_width=0)) as engine:
+            return _turn_latency(engine, dict(params, turns=min(params['turns'], 500)))
+
+
+@benchmark('e2e.turn.http.lite')
+def bench_e2e_turn_http_lite(params):
+    """同 e2e.turn.http，但 LLMClient 使用内置轻量HTTP后端（长连接、预序列化请求）"""
+    with StubLLMServer(mode='hash', seed=params['seed']) as server:
+        env = {'DSL_AGENT_BASE_URL': server.base_url, 'DSL_AGENT_LLM_BACKEND': 'http'}
+        with patch.dict('os.environ', env), _engine(_script(params, wait_width=0)) as engine:
+            return _turn_latency(engine, dict(params, turns=min(params['turns'], 500)))
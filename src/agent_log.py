@@ -0,0 +1,99 @@
+"""
+agent_log.py -
+轻量的分级日志层，替代引擎和LLM客户端中 `if self.debug: print(f"...")` 式的调试输出。
+
+消息使用 str.format 占位符，参数原样传入，只有级别开启时才格式化：
+
+    log = get_logger('engine', debug)
+    log.debug("处理步骤: {}, 输入: {}", step_name, user_input)
+    log.debug("构造的提示词: {prompt:.200}...", prompt=prompt)   # 截断也推迟到格式化时
+
+级别关闭时一次调用只做一次整数比较，不产生任何字符串。计算代价高的参数用 Lazy 包装。
+环境变量：
+  DSL_AGENT_LOG_LEVEL   默认级别（DEBUG/INFO/WARNING/ERROR，默认 WARNING；debug=True 的实例为 DEBUG）
+  DSL_AGENT_LOG_FORMAT  text（默认，与原来的 "[DEBUG] 消息" 输出一致）或 json（每行一个JSON对象）
+"""
+
+import json
+import os
+import sys
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+_LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+def _env_level():
+    name = os.environ.get('DSL_AGENT_LOG_LEVEL', 'WARNING').upper()
+    return _LEVELS.get(name, WARNING)
+
+
+class Lazy:
+    """延迟求值的日志参数：只有消息真正输出时才调用 func(*args)"""
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    def __format__(self, spec):
+        return format(self.func(*self.args), spec)
+
+
+class AgentLogger:
+    """按级别过滤的日志记录器；格式化与输出只在级别开启时发生"""
+
+    __slots__ = ('name', 'level', 'structured', 'stream')
+
+    def __init__(self, name, level=None, structured=None, stream=None):
+        self.name = name
+        self.level = _env_level() if level is None else level
+        if structured is None:
+            structured = os.environ.get('DSL_AGENT_LOG_FORMAT', 'text').lower() == 'json'
+        self.structured = structured
+        self.stream = stream
+
+    def enabled_for(self, level):
+        return level >= self.level
+
+    def debug(self, msg, *args, **fields):
+        if self.level <= DEBUG:
+            self._emit(DEBUG, msg, args, fields)
+
+    def info(self, msg, *args, **fields):
+        if self.level <= INFO:
+            self._emit(INFO, msg, args, fields)
+
+    def warning(self, msg, *args, **fields):
+        if self.level <= WARNING:
+            self._emit(WARNING, msg, args, fields)
+
+    def error(self, msg, *args, **fields):
+        if self.level <= ERROR:
+            self._emit(ERROR, msg, args, fields)
+
+    def _emit(self, level, msg, args, fields):
+        text = msg.format(*args, **fields) if args or fields else msg
+        stream = self.stream or sys.stdout
+        if self.structured:
+            record = {'ts': round(time.time(), 6), 'level': LEVEL_NAMES[level],
+                      'logger': self.name, 'msg': text}
+            if fields:
+                record['fields'] = {k: v if isinstance(v, (int, float, bool, type(None))) else str(v)
+                                    for k, v in fields.items()}
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            stream.write(f"[{LEVEL_NAMES[level]}] {text}\n")
+
+
+def get_logger(name, debug=False):
+    """创建日志记录器；debug=True 时输出调试信息，否则使用环境变量配置的级别"""
+    return AgentLogger(name, DEBUG if debug else None)
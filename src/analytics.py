@@ -0,0 +1,514 @@
+"""
+analytics.py -
+对话事件日志（event_log.py）的离线统计，输入为一个或多个事件日志目录：
+  - step 跳转矩阵：wait 所在的step -> 跳转到的step 的次数；
+  - 每个 wait 位置（step:行号）的意图分布和 unknown 率（LLM没有给出有效意图、回退到默认意图的比例）；
+  - 路由来源分布，意图识别与脚本执行耗时的均值和分位数；
+  - 意图先验：每个 wait 位置各意图的频率，DSLEngine.load_priors() 读取后在无法识别意图时代替第一个候选；
+  - 缓存预热列表：经LLM识别或命中意图缓存、出现次数最多的 (wait 位置, 规范化的用户输入) 及其多数意图
+    （intent_cache.IntentCache.warm 读取），写法不同的输入按 normalizer 规范化后合并计数。
+
+只解码 turn 记录，字符串字段按字节编码为整数；耗时用固定的对数分桶统计分位数。安装了 numpy 时按块向量化：
+逐条记录只读取头部的字符串长度以确定偏移（event_log.record_offsets），攒够 DECODE_RECORDS 条记录后拼接
+各数据块一起解码：定长头用结构化 dtype 一次取出，字符串字段先用 np.unique 去重再编码，会话ID的散列和 HyperLogLog 更新也按数组计算；
+每 CHUNK_TURNS 轮用 np.unique/bincount/searchsorted 聚合一次。没有安装 numpy 时使用纯Python实现，结果相同。
+
+内存占用：step、wait 位置和路由来源的数量由脚本决定；预热列表的候选 (wait 位置, 原始输入) 每次聚合后
+只保留出现次数最多的 PAIR_LIMIT 个，低频输入的计数在聚合时丢弃（长尾输入本来也进不了预热列表）；
+会话数用 HyperLogLog 估计（相对误差约 1.6%）。因此内存占用只取决于 CHUNK_TURNS、DECODE_RECORDS 和 PAIR_LIMIT，与日志总量无关。
+
+    python analytics.py <事件日志目录>... [--json 统计.json] [--priors 先验.json] [--warmup 预热.jsonl] [--top N]
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import math
+import sys
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from event_log import KIND_CODES, iter_blocks, iter_fields, record_offsets, segment_files, site_key
+from metrics import Histogram
+from normalizer import normalize as default_normalize
+
+# 耗时分桶（秒）：10微秒到约100秒，相邻分桶相差5%
+LATENCY_BUCKETS = tuple(1e-5 * 1.05 ** i for i in range(331))
+# 每聚合一次的轮数
+CHUNK_TURNS = 1 << 20
+DEFAULT_TOP = 1000
+# 每次聚合后保留的预热候选 (wait 位置, 原始输入) 数
+PAIR_LIMIT = 1 << 16
+# HyperLogLog 的寄存器数为 2**HLL_BITS
+HLL_BITS = 12
+# 向量化解码时攒够这么多条记录（多个数据块拼接）再一起解码
+DECODE_RECORDS = 1 << 14
+# 去重时按定宽字节矩阵比较的最大字符串长度，更长的字段逐条编码
+_MAX_WIDTH = 256
+_MASK64 = (1 << 64) - 1
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+_MIX1 = 0xff51afd7ed558ccd
+_MIX2 = 0xc4ceb9fe1a85ec53
+# event_log._RECORD 的 numpy 结构（小端、紧凑排列）
+_HEADER = None if np is None else np.dtype([
+    ('timestamp', '<f8'), ('classify', '<f4'), ('execute', '<f4'), ('kind', 'u1'), ('lineno', '<u4'),
+    ('session', 'u1'), ('step', '<u2'), ('text', '<u4'), ('intent', '<u2'), ('source', 'u1')])
+_FALLBACK = b'fallback'
+# 进入预热列表的路由来源：命中缓存的轮次也计入，常见输入不会因为一直命中缓存而掉出列表；
+# 命中近似缓存（semantic）的意图来自另一个相近的输入，不计入
+_CLASSIFIED = (b'llm', b'cache')
+# 组合键：高位为 step/wait 位置/(位置, 输入) 的编码，低位为意图或来源的编码
+_SHIFT = 32
+_ANSWER_SHIFT = 20
+
+
+def _count_keys(keys, vectorized):
+    """统计 int64 键数组中各键出现的次数，产出 (键, 次数)"""
+    if vectorized:
+        values, counts = np.unique(np.frombuffer(keys, dtype=np.int64), return_counts=True)
+        return zip(values.tolist(), counts.tolist())
+    return Counter(keys).items()
+
+
+def _histogram(counts, total):
+    hist = Histogram(LATENCY_BUCKETS)
+    hist.counts = list(counts)
+    hist.count = sum(counts)
+    hist.sum = total
+    return hist
+
+
+def _latency(hist):
+    if not hist.count:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    return {'count': hist.count, 'mean': hist.sum / hist.count,
+            'p50': hist.quantile(0.5), 'p95': hist.quantile(0.95), 'p99': hist.quantile(0.99)}
+
+
+def _hash64(value):
+    """字节串的64位散列：FNV-1a 加 MurmurHash3 的 fmix64 混合，与 _hash64_rows 的结果相同"""
+    h = _FNV_OFFSET
+    for byte in value:
+        h = ((h ^ byte) * _FNV_PRIME) & _MASK64
+    h ^= h >> 33
+    h = (h * _MIX1) & _MASK64
+    h ^= h >> 33
+    h = (h * _MIX2) & _MASK64
+    return h ^ (h >> 33)
+
+
+def _hash64_rows(matrix, lengths):
+    """_hash64 的向量化版本：matrix 每行为一个字节串（按 lengths 截取）"""
+    h = np.full(len(lengths), _FNV_OFFSET, dtype=np.uint64)
+    prime = np.uint64(_FNV_PRIME)
+    for column in range(matrix.shape[1]):
+        mixed = (h ^ matrix[:, column]) * prime
+        h = np.where(lengths > column, mixed, h)
+    shift = np.uint64(33)
+    h ^= h >> shift
+    h *= np.uint64(_MIX1)
+    h ^= h >> shift
+    h *= np.uint64(_MIX2)
+    return h ^ (h >> shift)
+
+
+def _rows(buf, starts, lengths, width):
+    """把 buf 中的字符串字段（起点, 长度）取成 uint8 矩阵，每行补零到 width"""
+    padded = np.concatenate((buf, np.zeros(width, dtype=np.uint8)))
+    matrix = np.lib.stride_tricks.sliding_window_view(padded, width)[starts]
+    matrix[np.arange(width) >= lengths[:, None]] = 0
+    return matrix
+
+
+def _first_order(keys):
+    """去重：返回 (按首次出现顺序的各不同值第一次出现的行号, 每行对应的序号)"""
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+
+def _unique_bytes(data, buf, starts, lengths):
+    """字符串字段去重：返回 (按首次出现顺序的不同字节串, 每行对应的序号)"""
+    count = len(starts)
+    width = int(lengths.max()) if count else 0
+    if width > _MAX_WIDTH:
+        index = {}
+        codes = np.fromiter((index.setdefault(data[start:start + length], len(index))
+                             for start, length in zip(starts.tolist(), lengths.tolist())), np.int64, count)
+        return list(index), codes
+    # 末尾附上长度，只差末尾零字节的字符串不会被当成同一个
+    matrix = np.concatenate((_rows(buf, starts, lengths, width),
+                             lengths.astype('<u2').view(np.uint8).reshape(count, 2)), axis=1)
+    first, codes = _first_order(np.ascontiguousarray(matrix).view(f'V{width + 2}').ravel())
+    return [data[start:start + length] for start, length in zip(starts[first].tolist(), lengths[first].tolist())], codes
+
+
+def _encode(table, values):
+    """按顺序把字节串编入 table（字节串 -> 编码），返回各值的编码数组"""
+    return np.array([table.setdefault(value, len(table)) for value in values], dtype=np.int64)
+
+
+class _DistinctCounter:
+    """HyperLogLog：估计不同字节串的个数，固定占用 2**bits 字节"""
+
+    def __init__(self, bits=HLL_BITS):
+        self.bits = bits
+        self.registers = bytearray(1 << bits)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h & ((1 << self.bits) - 1)
+        rank = 65 - self.bits - (h >> self.bits).bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_hashes(self, hashes):
+        """批量加入 _hash64_rows 的结果"""
+        index = (hashes & np.uint64((1 << self.bits) - 1)).astype(np.intp)
+        # 剩余位不超过52位，转换为 float64 是精确的，frexp 的指数即 bit_length
+        rest = (hashes >> np.uint64(self.bits)).astype(np.float64)
+        rank = (65 - self.bits - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(np.frombuffer(self.registers, dtype=np.uint8), index, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小基数时用线性计数
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class TurnStats:
+    """逐块累积 turn 记录的统计；add_block() 之后由 result() 生成报告"""
+
+    def __init__(self, vectorized=None, normalize=None, pair_limit=PAIR_LIMIT):
+        self.vectorized = np is not None if vectorized is None else vectorized
+        if self.vectorized and np is None:
+            raise RuntimeError("向量化统计需要 numpy")
+        self.normalize = normalize or default_normalize
+        # 字节串 -> 编码，编码即插入顺序
+        self.steps = {}
+        self.sites = {}
+        self.sources = {}
+        # (位置编码, 原始输入) -> 编码；聚合时淘汰低频的条目，编码不复用
+        self.pairs = {}
+        self.pair_limit = pair_limit
+        self._next_pair = 0
+        self.sessions = _DistinctCounter()
+        self.turns = 0
+        self.transitions = Counter()
+        self.site_intents = Counter()
+        self.site_sources = Counter()
+        self.answers = Counter()
+        self.classify = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.execute = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.classify_sum = 0.0
+        self.execute_sum = 0.0
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self._transition_keys = array('q')
+        self._intent_keys = array('q')
+        self._source_keys = array('q')
+        self._answer_keys = array('q')
+        self._classify = array('d')
+        self._execute = array('d')
+        # 本块中已计入 sessions 的会话ID
+        self._chunk_sessions = set()
+        # 尚未解码的数据块（向量化时）
+        self._pending = []
+        self._pending_count = 0
+
+    def add_block(self, data, count):
+        """累积一个数据块中的 turn 记录"""
+        if self.vectorized:
+            self._pending.append(data)
+            self._pending_count += count
+            if self._pending_count < DECODE_RECORDS:
+                return
+            self._decode_pending()
+        else:
+            self._add_block_records(data, count)
+        if len(self._classify) >= CHUNK_TURNS:
+            self.flush()
+
+    def _decode_pending(self):
+        # 记录在块内连续存放，拼接后仍是合法的记录序列
+        data, count = b''.join(self._pending), self._pending_count
+        self._pending = []
+        self._pending_count = 0
+        self._add_block_arrays(data, count)
+
+    def _add_block_arrays(self, data, count):
+        """add_block 的 numpy 实现：编码的分配顺序与逐条实现相同（各表按首次出现的顺序）"""
+        if not count:
+            return
+        buf = np.frombuffer(data, dtype=np.uint8)
+        offsets = np.frombuffer(record_offsets(data, count), dtype=np.int64)
+        headers = buf[offsets[:, None] + np.arange(_HEADER.itemsize)].view(_HEADER).ravel()
+        turns = headers['kind'] == KIND_CODES['turn']
+        if not turns.all():
+            headers, offsets = headers[turns], offsets[turns]
+        if not len(headers):
+            return
+        session_len = headers['session'].astype(np.int64)
+        step_len = headers['step'].astype(np.int64)
+        text_len = headers['text'].astype(np.int64)
+        intent_len = headers['intent'].astype(np.int64)
+        source_len = headers['source'].astype(np.int64)
+        session_start = offsets + _HEADER.itemsize
+        step_start = session_start + session_len
+        text_start = step_start + step_len
+        intent_start = text_start + text_len
+        source_start = intent_start + intent_len
+
+        # step 和跳转目标共用编码表，交错排列以保持逐条实现的首次出现顺序
+        names, codes = _unique_bytes(data, buf, np.column_stack((step_start, intent_start)).ravel(),
+                                     np.column_stack((step_len, intent_len)).ravel())
+        codes = _encode(self.steps, names)[codes].reshape(-1, 2)
+        step_codes, targets = codes[:, 0], codes[:, 1]
+        names, codes = _unique_bytes(data, buf, source_start, source_len)
+        source_codes = _encode(self.sources, names)[codes]
+
+        lineno = headers['lineno'].astype(np.int64)
+        first, codes = _first_order(step_codes << _SHIFT | lineno)
+        step_names = list(self.steps)
+        site_codes = _encode(self.sites, [(step_names[step], line)
+                                          for step, line in zip(step_codes[first].tolist(),
+                                                                lineno[first].tolist())])[codes]
+
+        sessions = _rows(buf, session_start, session_len, int(session_len.max()))
+        self.sessions.add_hashes(_hash64_rows(sessions, session_len))
+
+        self._transition_keys.frombytes((step_codes << _SHIFT | targets).tobytes())
+        self._source_keys.frombytes((site_codes << _SHIFT | source_codes).tobytes())
+        fallback = self.sources.get(_FALLBACK, -1)
+        self._intent_keys.frombytes((site_codes << _SHIFT | targets)[source_codes != fallback].tobytes())
+        classified = np.isin(source_codes, [self.sources[name] for name in _CLASSIFIED if name in self.sources])
+        if classified.any():
+            texts, text_codes = _unique_bytes(data, buf, text_start[classified], text_len[classified])
+            pair_sites = site_codes[classified]
+            first, codes = _first_order(pair_sites << _SHIFT | text_codes)
+            pairs = self.pairs
+            pair_codes = []
+            for site, text in zip(pair_sites[first].tolist(), text_codes[first].tolist()):
+                key = (site, texts[text])
+                pair = pairs.get(key)
+                if pair is None:
+                    pair = pairs[key] = self._next_pair
+                    self._next_pair += 1
+                pair_codes.append(pair)
+            answers = np.array(pair_codes, dtype=np.int64)[codes] << _ANSWER_SHIFT | targets[classified]
+            self._answer_keys.frombytes(answers.tobytes())
+        self._classify.frombytes(headers['classify'].astype(np.float64).tobytes())
+        execute = headers['execute'].astype(np.float64)
+        self._execute.frombytes(execute[execute > 0].tobytes())
+
+    def _add_block_records(self, data, count):
+        steps, sites, sources, pairs = self.steps, self.sites, self.sources, self.pairs
+        sessions, chunk_sessions = self.sessions, self._chunk_sessions
+        transition_keys, intent_keys = self._transition_keys, self._intent_keys
+        source_keys, answer_keys = self._source_keys, self._answer_keys
+        classify_values, execute_values = self._classify, self._execute
+        for _, classify, execute, _, lineno, session, step, text, intent, source in iter_fields(data, count, 'turn'):
+            step_code = steps.setdefault(step, len(steps))
+            target = steps.setdefault(intent, len(steps))
+            site = sites.setdefault((step, lineno), len(sites))
+            source_code = sources.setdefault(source, len(sources))
+            if session not in chunk_sessions:
+                chunk_sessions.add(session)
+                sessions.add(session)
+            transition_keys.append(step_code << _SHIFT | target)
+            source_keys.append(site << _SHIFT | source_code)
+            if source != _FALLBACK:
+                intent_keys.append(site << _SHIFT | target)
+            if source in _CLASSIFIED:
+                pair = pairs.get((site, text))
+                if pair is None:
+                    pair = pairs[site, text] = self._next_pair
+                    self._next_pair += 1
+                answer_keys.append(pair << _ANSWER_SHIFT | target)
+            classify_values.append(classify)
+            if execute > 0:
+                execute_values.append(execute)
+
+    def flush(self):
+        """聚合当前块的数据"""
+        vectorized = self.vectorized
+        if self._pending:
+            self._decode_pending()
+        for counter, keys in ((self.transitions, self._transition_keys), (self.site_intents, self._intent_keys),
+                              (self.site_sources, self._source_keys), (self.answers, self._answer_keys)):
+            for key, count in _count_keys(keys, vectorized):
+                counter[key] += count
+        self.turns += len(self._classify)
+        self.classify_sum += sum(self._classify)
+        self.execute_sum += sum(self._execute)
+        self._bucket(self.classify, self._classify)
+        self._bucket(self.execute, self._execute)
+        self._new_chunk()
+        self._prune_pairs()
+
+    def _prune_pairs(self):
+        """只保留出现次数最多的 pair_limit 个预热候选；次数相同时保留先出现的"""
+        if len(self.pairs) <= self.pair_limit:
+            return
+        totals = Counter()
+        for key, count in self.answers.items():
+            totals[key >> _ANSWER_SHIFT] += count
+        keep = {code for code, _ in heapq.nlargest(self.pair_limit, totals.items(),
+                                                   key=lambda item: (item[1], -item[0]))}
+        self.pairs = {pair: code for pair, code in self.pairs.items() if code in keep}
+        self.answers = Counter({key: count for key, count in self.answers.items()
+                                if key >> _ANSWER_SHIFT in keep})
+
+    def _bucket(self, counts, values):
+        if self.vectorized:
+            index = np.searchsorted(np.asarray(LATENCY_BUCKETS), np.frombuffer(values, dtype=np.float64), 'left')
+            for i, n in enumerate(np.bincount(index, minlength=len(counts)).tolist()):
+                counts[i] += n
+        else:
+            for value in values:
+                counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+
+    def result(self, top=DEFAULT_TOP):
+        """统计报告（可序列化为JSON）、意图先验和缓存预热列表"""
+        self.flush()
+        mask = (1 << _SHIFT) - 1
+        steps = [name.decode('utf-8', 'replace') for name in self.steps]
+        sources = [name.decode('utf-8', 'replace') for name in self.sources]
+        sites = [site_key(step.decode('utf-8', 'replace'), lineno) for step, lineno in self.sites]
+        fallback = self.sources.get(_FALLBACK)
+
+        transitions = {}
+        for key, count in self.transitions.most_common():
+            transitions.setdefault(steps[key >> _SHIFT], {})[steps[key & mask]] = count
+
+        site_stats = {}
+        for site in sites:
+            site_stats[site] = {'turns': 0, 'unknown_rate': 0.0, 'intents': {}}
+        source_totals = Counter()
+        for key, count in self.site_sources.items():
+            site_stats[sites[key >> _SHIFT]]['turns'] += count
+            source_totals[sources[key & mask]] += count
+        if fallback is not None:
+            for site_code, site in enumerate(sites):
+                unknown = self.site_sources.get(site_code << _SHIFT | fallback, 0)
+                site_stats[site]['unknown_rate'] = unknown / site_stats[site]['turns']
+        for key, count in self.site_intents.most_common():
+            site_stats[sites[key >> _SHIFT]]['intents'][steps[key & mask]] = count
+
+        priors = {}
+        for site, stats in site_stats.items():
+            resolved = sum(stats['intents'].values())
+            if resolved:
+                priors[site] = {intent: count / resolved for intent, count in stats['intents'].items()}
+
+        report = {
+            'turns': self.turns,
+            'sessions': self.sessions.estimate(),
+            'sources': dict(source_totals.most_common()),
+            'unknown_rate': source_totals.get('fallback', 0) / self.turns if self.turns else 0.0,
+            'latency': {'classify': _latency(_histogram(self.classify, self.classify_sum)),
+                        'execute': _latency(_histogram(self.execute, self.execute_sum))},
+            'transitions': transitions,
+            'sites': site_stats,
+        }
+        return report, priors, self._warmup(steps, sites, top)
+
+    def _warmup(self, steps, sites, top):
+        """出现次数最多的 (wait 位置, 规范化的输入)，每个取多数意图；share 为多数意图所占比例"""
+        normalize = self.normalize
+        # 每个不同的原始输入只规范化一次，规范化结果相同的合并计数
+        groups = {code: (site, normalize(text.decode('utf-8', 'replace'))) for (site, text), code in self.pairs.items()}
+        answer_mask = (1 << _ANSWER_SHIFT) - 1
+        votes = Counter()
+        for key, count in self.answers.items():
+            votes[groups[key >> _ANSWER_SHIFT], key & answer_mask] += count
+        totals = Counter()
+        best = {}
+        # 次数相同时取编码小的（先出现的），与计数的遍历顺序无关
+        for (group, intent), count in votes.items():
+            totals[group] += count
+            current = best.get(group)
+            if current is None or count > current[0] or (count == current[0] and intent < current[1]):
+                best[group] = (count, intent)
+        entries = []
+        for group, total in sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:top]:
+            count, intent = best[group]
+            site, text = group
+            entries.append({'site': sites[site], 'input': text, 'intent': steps[intent],
+                            'count': total, 'share': count / total})
+        return entries
+
+
+def analyze(paths, top=DEFAULT_TOP, vectorized=None, normalize=None):
+    """统计事件日志目录或段文件，返回 (报告, 意图先验, 缓存预热列表)；normalize 为预热列表的输入规范化函数"""
+    stats = TurnStats(vectorized, normalize, max(PAIR_LIMIT, top))
+    for path in segment_files(paths):
+        for count, data in iter_blocks(path):
+            stats.add_block(data, count)
+    return stats.result(top)
+
+
+def format_report(report, limit=10):
+    """报告的文本形式"""
+    lines = [f"轮数: {report['turns']}  会话数(估计): {report['sessions']}  unknown率: {report['unknown_rate']:.2%}"]
+    lines.append("路由来源: " + ', '.join(f"{source} {count}" for source, count in report['sources'].items()))
+    for name, label in (('classify', '意图识别'), ('execute', '脚本执行')):
+        lat = report['latency'][name]
+        lines.append(f"{label}耗时: 均值 {lat['mean'] * 1000:.1f}ms  p50 {lat['p50'] * 1000:.1f}ms  "
+                     f"p95 {lat['p95'] * 1000:.1f}ms  p99 {lat['p99'] * 1000:.1f}ms")
+    lines.append("")
+    lines.append("step 跳转（次数最多的）:")
+    pairs = sorted(((count, source, target) for source, targets in report['transitions'].items()
+                    for target, count in targets.items()), reverse=True)
+    for count, source, target in pairs[:limit]:
+        lines.append(f"  {source} -> {target}: {count}")
+    lines.append("")
+    lines.append("wait 位置:")
+    sites = sorted(report['sites'].items(), key=lambda item: -item[1]['turns'])
+    for site, stats in sites[:limit]:
+        intents = ', '.join(f"{intent} {count}" for intent, count in list(stats['intents'].items())[:5])
+        lines.append(f"  {site}: {stats['turns']} 轮, unknown {stats['unknown_rate']:.2%}  [{intents}]")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对话事件日志统计')
+    parser.add_argument('paths', nargs='+', help='事件日志目录或段文件')
+    parser.add_argument('--json', help='把完整报告写入该JSON文件')
+    parser.add_argument('--priors', help='把意图先验写入该JSON文件（DSLEngine.load_priors 读取）')
+    parser.add_argument('--warmup', help='把缓存预热列表写入该文件（每行一个JSON对象）')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='预热列表的条数')
+    parser.add_argument('--no-numpy', action='store_true', help='不使用 numpy（对比或排查用）')
+    args = parser.parse_args(argv)
+
+    report, priors, warmup = analyze(args.paths, args.top, False if args.no_numpy else None)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.priors:
+        with open(args.priors, 'w', encoding='utf-8') as f:
+            json.dump(priors, f, ensure_ascii=False, indent=2)
+    if args.warmup:
+        with open(args.warmup, 'w', encoding='utf-8') as f:
+            for entry in warmup:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
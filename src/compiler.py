@@ -0,0 +1,367 @@
+"""
+compiler.py -
+脚本编译模块：在解析得到的语法树上做一次加载期处理，生成引擎运行时使用的编译结果。
+- 驻留所有字面量、step名称和标识符字符串，同一进程内的多个脚本共享同一份字符串；
+- 把 wait 的意图列表转换为共享的不可变元组，重复的意图列表只保留一份（每个编译结果一个驻留池，
+  元组按引用次数计数，增量编译删除区块时释放不再使用的元组）；
+- 建立 step 名称索引，处理步骤时不再线性查找；
+- 为每个 if/match 语句和带 when 规则的 wait 编译模式分派器（dispatch.PatternDispatcher），
+  确定性的分支选择与路由在运行时只需一次查找；
+- 收集各 step 声明的关键词（step 名称即意图名），为候选意图带有关键词的 wait 编译
+  关键词匹配器（dispatch.KeywordMatcher），意图列表相同的 wait 共享同一个自动机；
+  给定输入规范化函数时关键词先规范化，与规范化后的输入匹配；
+- 为每个 extract 语句取得（内置类型）或编译（regex）槽位提取器（extractors.Extractor）；
+- 分析语句列表中变量的读写，确定每个带目标变量的 call 语句的汇合点：调用开始后不等待结果，
+  执行到第一条读写目标变量的语句之前（没有时为语句列表结束时）才取得结果，
+  互不依赖的调用因此在线程池中并发执行。
+
+脚本编辑后（incremental_parser.IncrementalParser），CompiledScript.update() 只删除被替换的 step 区块的
+运行时结构并编译新的区块，编辑到就绪的耗时与脚本大小无关。
+"""
+
+import re
+import sys
+from collections import Counter
+from dispatch import KeywordMatcher, PatternDispatcher
+from extractors import get_extractor
+
+
+class InternPool:
+    """字符串与意图元组的驻留池；元组记录引用次数，release() 到0时从池中删除"""
+
+    def __init__(self):
+        # 元组 -> [共享元组, 引用次数]
+        self._tuples = {}
+
+    def string(self, value):
+        return sys.intern(value) if type(value) is str else value
+
+    def strings(self, values):
+        """把字符串序列转换为驻留后的共享元组"""
+        items = tuple(self.string(v) for v in values)
+        entry = self._tuples.get(items)
+        if entry is None:
+            entry = self._tuples[items] = [items, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, values):
+        """释放一次 strings() 返回的元组"""
+        entry = self._tuples.get(values)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._tuples[values]
+
+    def __len__(self):
+        return len(self._tuples)
+
+    def clear(self):
+        self._tuples.clear()
+
+
+# value 为字符串列表的节点：wait 的意图列表、分支和路由规则的模式列表
+_PATTERN_NODES = ('Wait', 'Case', 'When')
+
+
+class CompiledScript:
+    """编译后的脚本：驻留后的语法树与 step 索引"""
+
+    def __init__(self, ast, steps, dispatchers=None, keyword_matchers=None, extractors=None, joins=None,
+                 pool=None, builder=None):
+        self.ast = ast
+        self.steps = steps
+        # id(语句节点) -> PatternDispatcher；节点属于 ast，生命周期与本对象相同
+        self.dispatchers = dispatchers or {}
+        # id(wait 语句) -> KeywordMatcher
+        self.keyword_matchers = keyword_matchers or {}
+        # id(extract 语句) -> Extractor
+        self.extractors = extractors or {}
+        # id(语句节点或语句列表) -> 执行该语句之前或该列表执行完时需要取得结果的 call 语句元组
+        self.joins = joins or {}
+        # 增量编译使用的驻留池和编译器（其中的表与上面的表是同一组对象）
+        self.pool = pool
+        self._builder = builder
+        self._name_counts = Counter(section['value'] for section in _step_sections(ast))
+
+    @property
+    def step_names(self):
+        """按声明顺序排列的 step 名称（含重名的 step）"""
+        return tuple(section['value'] for section in _step_sections(self.ast))
+
+    def update(self, removed, added):
+        """
+        增量编译：removed/added 为编辑后被替换和新增的 step 区块（语法树已经原地更新）。
+        删除 removed 的运行时结构、释放驻留的元组，只编译 added。step 声明的关键词发生变化时
+        其他 step 中 wait 的关键词匹配器都可能受影响，返回 False，调用方应完整重新编译
+        """
+        builder = self._builder
+        if builder is None:
+            return False
+        tables = (self.dispatchers, self.keyword_matchers, self.extractors, self.joins)
+        for section in removed:
+            builder.forget(section.get('children', ()), tables)
+            _release_node(section, self.pool)
+        for section in added:
+            _intern_node(section, self.pool)
+        if not self._update_index(removed, added):
+            self._reindex()
+        names = {section.get('value') for section in removed} | {section.get('value') for section in added}
+        for name in names:
+            if self._declared_keywords(name) != builder.keywords.get(name):
+                return False
+        for section in added:
+            builder.statements(section.get('children', ()))
+        return True
+
+    def _update_index(self, removed, added):
+        """按替换的区块更新 step 索引；遇到重名 step 无法确定先后时返回 False"""
+        steps, counts = self.steps, self._name_counts
+        vacated = set()
+        for section in removed:
+            name = section.get('value')
+            counts[name] -= 1
+            if steps.get(name) is section:
+                del steps[name]
+                vacated.add(name)
+        consistent = True
+        for section in added:
+            name = section.get('value')
+            if not name or section.get('type') != 'Step':
+                continue
+            if name in vacated:
+                # 新区块与被替换的区块位置相同，仍然在其他同名 step 之前
+                steps[name] = section
+                vacated.discard(name)
+            elif counts[name]:
+                consistent = False
+            else:
+                steps[name] = section
+            counts[name] += 1
+        # 以第一个为准的 step 被删除且还有同名 step 时，需要找到下一个
+        return consistent and not any(counts[name] for name in vacated)
+
+    def _declared_keywords(self, name):
+        """与 compile_script 一致：同名 step 中第一个声明了关键词的 step 的关键词"""
+        if self._name_counts[name] <= 1:
+            step = self.steps.get(name)
+            return step.get('keywords') if step else None
+        return next((section['keywords'] for section in _step_sections(self.ast)
+                     if section['value'] == name and section.get('keywords')), None)
+
+    def _reindex(self):
+        self.steps.clear()
+        for section in _step_sections(self.ast):
+            self.steps.setdefault(section['value'], section)
+
+    def get_step(self, step_name):
+        return self.steps.get(step_name)
+
+    def dispatcher(self, statement):
+        """if/match 或带 when 规则的 wait 语句的分派器，其他语句返回None"""
+        return self.dispatchers.get(id(statement))
+
+    def keyword_matcher(self, statement):
+        """候选意图声明了关键词的 wait 语句的关键词匹配器，其他语句返回None"""
+        return self.keyword_matchers.get(id(statement))
+
+    def extractor(self, statement):
+        """extract 语句的槽位提取器，其他语句返回None"""
+        return self.extractors.get(id(statement))
+
+    def joins_before(self, node):
+        """node 为语句时返回执行它之前需要取得结果的 call 语句，为语句列表时返回列表执行完时需要取得的"""
+        return self.joins.get(id(node), ())
+
+
+def _step_sections(ast):
+    return [s for s in (ast or {}).get('children', ())
+            if isinstance(s, dict) and s.get('type') == 'Step' and s.get('value')]
+
+
+def _intern_node(node, pool):
+    """原地驻留节点及其子节点中的字符串"""
+    value = node.get('value')
+    node_type = node.get('type')
+    if node_type in _PATTERN_NODES and isinstance(value, (list, tuple)):
+        node['value'] = pool.strings(value)
+    elif isinstance(value, dict):
+        _intern_node(value, pool)
+    elif isinstance(value, str):
+        node['value'] = pool.string(value)
+    if 'target' in node:
+        node['target'] = pool.string(node['target'])
+    if 'keywords' in node:
+        node['keywords'] = pool.strings(node['keywords'])
+    if 'patterns' in node:
+        node['patterns'] = pool.strings(node['patterns'])
+    for child in node.get('children', ()):
+        if isinstance(child, dict):
+            _intern_node(child, pool)
+
+
+def _release_node(node, pool):
+    """释放 _intern_node 为节点及其子节点驻留的元组"""
+    value = node.get('value')
+    if node.get('type') in _PATTERN_NODES and isinstance(value, tuple):
+        pool.release(value)
+    elif isinstance(value, dict):
+        _release_node(value, pool)
+    if 'keywords' in node:
+        pool.release(node['keywords'])
+    if 'patterns' in node:
+        pool.release(node['patterns'])
+    for child in node.get('children', ()):
+        if isinstance(child, dict):
+            _release_node(child, pool)
+
+
+def _expression_reads(node, reads):
+    if not isinstance(node, dict):
+        return
+    if node.get('type') == 'Variable':
+        reads.add(node.get('value', '')[1:])
+    for child in node.get('children', ()):
+        _expression_reads(child, reads)
+
+
+def _collect_variables(statement, reads, writes):
+    """收集语句（含嵌套分支中的语句）读取和写入的变量名"""
+    node_type = statement.get('type')
+    if node_type == 'Extract':
+        writes.add(statement['value']['value'][1:])
+    elif node_type == 'Call':
+        if statement.get('target'):
+            writes.add(statement['target'])
+        for arg in statement.get('children', ()):
+            _expression_reads(arg, reads)
+    elif node_type == 'If' or node_type == 'Match':
+        _expression_reads(statement.get('value'), reads)
+        for case in statement.get('children', ()):
+            for child in case.get('children', ()):
+                _collect_variables(child, reads, writes)
+    else:
+        _expression_reads(statement.get('value'), reads)
+
+
+class _Builder:
+    """编译语句列表（含嵌套分支）时生成的运行时结构，按语句节点的 id 索引"""
+
+    def __init__(self, keywords, normalize=None):
+        # {意图: 关键词元组}
+        self.keywords = keywords
+        self.normalize = normalize
+        self.dispatchers = {}
+        self.matchers = {}
+        self.extractors = {}
+        self.joins = {}
+        # 意图列表相同的 wait 共享关键词匹配器：关键词规则 -> [匹配器, 引用次数]
+        self._matcher_cache = {}
+        # id(匹配器) -> 关键词规则
+        self._matcher_rules = {}
+
+    def statements(self, statements):
+        for statement in statements:
+            try:
+                self.statement(statement)
+            except re.error as e:
+                raise ValueError(f"第{statement.get('lineno', '?')}行的正则表达式无效: {e}") from None
+            for case in statement.get('children', ()) if statement.get('type') in ('If', 'Match') else ():
+                self.statements(case.get('children', []))
+        self._schedule(statements)
+
+    def forget(self, statements, tables):
+        """从各表中删除语句列表（含嵌套分支）的条目，释放不再使用的关键词匹配器"""
+        for table in tables:
+            table.pop(id(statements), None)
+        for statement in statements:
+            matcher = self.matchers.get(id(statement))
+            if matcher is not None:
+                rules = self._matcher_rules[id(matcher)]
+                entry = self._matcher_cache[rules]
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._matcher_cache[rules], self._matcher_rules[id(matcher)]
+            for table in tables:
+                table.pop(id(statement), None)
+            for case in statement.get('children', ()) if statement.get('type') in ('If', 'Match') else ():
+                self.forget(case.get('children', []), tables)
+
+    def _schedule(self, statements):
+        """确定语句列表中带目标变量的 call 语句的汇合点"""
+        running = {}
+        for statement in statements:
+            is_call = statement.get('type') == 'Call' and statement.get('target')
+            if running:
+                reads, writes = set(), set()
+                _collect_variables(statement, reads, writes)
+                due = tuple(running.pop(name) for name in list(running) if name in reads or name in writes)
+                if due:
+                    self.joins[id(statement)] = due
+            if is_call:
+                running[statement['target']] = statement
+        if running:
+            self.joins[id(statements)] = tuple(running.values())
+
+    def statement(self, statement):
+        """if/match 和带 when 规则的 wait 编译分派器，wait 编译关键词匹配器，extract 取得提取器"""
+        node_type = statement.get('type')
+        if node_type == 'If' or node_type == 'Match':
+            cases = statement.get('children', [])
+            rules = [(case['kind'], case['value'], i) for i, case in enumerate(cases) if case['kind'] != 'else']
+            default = next((i for i, case in enumerate(cases) if case['kind'] == 'else'), None)
+            self.dispatchers[id(statement)] = PatternDispatcher(rules, default)
+        elif node_type == 'Wait':
+            if statement.get('children'):
+                rules = [(guard['kind'], guard['value'], guard['target']) for guard in statement['children']]
+                self.dispatchers[id(statement)] = PatternDispatcher(rules)
+            matcher = self._keyword_matcher(statement.get('value', ()))
+            if matcher is not None:
+                self.matchers[id(statement)] = matcher
+        elif node_type == 'Extract':
+            slot = statement['value']['value'][1:]
+            try:
+                self.extractors[id(statement)] = get_extractor(statement['kind'], statement.get('patterns'), slot)
+            except ValueError as e:
+                raise ValueError(f"第{statement.get('lineno', '?')}行: {e}") from None
+
+    def _keyword_matcher(self, intents):
+        """wait 候选意图的关键词匹配器，没有候选意图声明关键词时返回None"""
+        keywords = self.keywords
+        rules = tuple((intent, keywords[intent]) for intent in intents if intent in keywords)
+        if not rules:
+            return None
+        if self.normalize is not None:
+            rules = tuple((intent, tuple(self.normalize(keyword) for keyword in words)) for intent, words in rules)
+        entry = self._matcher_cache.get(rules)
+        if entry is None:
+            entry = self._matcher_cache[rules] = [KeywordMatcher(rules), 0]
+            self._matcher_rules[id(entry[0])] = rules
+        entry[1] += 1
+        return entry[0]
+
+
+def compile_script(ast, pool=None, normalize=None):
+    """
+    编译语法树（原地驻留），返回 CompiledScript；pool 默认为新的驻留池（多个脚本可以传入同一个池共享元组），
+    normalize 为关键词的规范化函数（与输入的规范化相同）
+    """
+    if pool is None:
+        pool = InternPool()
+    steps = {}
+    keywords = {}
+    sections = [s for s in (ast or {}).get('children', ()) if isinstance(s, dict)]
+    for section in sections:
+        _intern_node(section, pool)
+        if section.get('type') == 'Step' and section.get('value'):
+            name = section['value']
+            # 与原先的线性查找一致：同名 step 以第一个为准
+            steps.setdefault(name, section)
+            if section.get('keywords') and name not in keywords:
+                keywords[name] = section['keywords']
+    # wait 可能引用后面才声明关键词的 step，关键词收集完后再编译
+    builder = _Builder(keywords, normalize)
+    for section in sections:
+        builder.statements(section.get('children', ()))
+    return CompiledScript(ast, steps, builder.dispatchers, builder.matchers, builder.extractors, builder.joins,
+                          pool, builder)
@@ -0,0 +1,139 @@
+"""
+context_window.py -
+意图识别的多轮对话上下文。每个会话持有一个 ConversationContext，
+保存最近几轮（用户输入、识别的意图、机器人回复），总量限制在 token 预算以内，
+超出预算时把最早的若干轮折叠成一行意图路径摘要。
+
+构造的消息分三段，前两段在轮与轮之间只追加不改写，服务端的前缀缓存可以命中：
+  1. 固定的系统提示词（所有会话相同）；
+  2. 对话历史（摘要 + 最近几轮，新一轮追加在末尾）；
+  3. 本轮的可用意图和用户输入。
+折叠时一次压缩到预算的一半，之后若干轮历史又只追加，避免每轮都改写前缀。
+
+环境变量 DSL_AGENT_CONTEXT_TOKENS 设置历史的 token 预算（默认 300）。
+"""
+
+import os
+
+SYSTEM_PROMPT = (
+    "你是对话机器人的意图分类器。根据对话历史和用户最新的输入，"
+    "从给出的可用意图中选出最匹配的一个，只返回意图名称，不要返回其他内容。"
+)
+DEFAULT_BUDGET = 300
+# 每轮历史中机器人回复保留的最大字符数
+MAX_REPLY_CHARS = 80
+# 摘要中保留的意图路径长度
+SUMMARY_INTENTS = 8
+
+
+def estimate_tokens(text):
+    """粗略估计 token 数：非ASCII字符（中文等）每字约1个，ASCII约4个字符1个"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ch < '\x80')
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
+
+
+def _budget_from_env():
+    try:
+        return int(os.environ.get('DSL_AGENT_CONTEXT_TOKENS', DEFAULT_BUDGET))
+    except ValueError:
+        return DEFAULT_BUDGET
+
+
+class ConversationContext:
+    """单个会话的意图识别上下文：token 预算内的对话历史与 token 用量统计"""
+
+    def __init__(self, budget=None):
+        self.budget = _budget_from_env() if budget is None else budget
+        # 最近的轮次：[(渲染后的文本, token数, 意图)]
+        self.turns = []
+        self.history_tokens = 0
+        self.folded = 0
+        self.intent_path = []
+        self.summary = ''
+        self._history = None
+        self.usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                      'cached_tokens': 0, 'estimated_requests': 0}
+
+    def add_turn(self, user_input, intent, reply):
+        """记录一轮对话；user_input 为None时只记录机器人回复（如开场白）"""
+        reply = (reply or '').replace('\n', ' ')
+        if len(reply) > MAX_REPLY_CHARS:
+            reply = reply[:MAX_REPLY_CHARS] + '…'
+        lines = []
+        if user_input is not None:
+            lines.append(f"用户：{user_input}")
+        if intent:
+            lines.append(f"意图：{intent}")
+        if reply:
+            lines.append(f"回复：{reply}")
+        if not lines:
+            return
+        text = '\n'.join(lines)
+        tokens = estimate_tokens(text)
+        self.turns.append((text, tokens, intent))
+        self.history_tokens += tokens
+        self._history = None
+        if self.history_tokens + estimate_tokens(self.summary) > self.budget:
+            self._fold()
+
+    def _fold(self):
+        """把最早的轮次折叠进摘要，直到历史不超过预算的一半（至少保留最近一轮）"""
+        target = self.budget // 2
+        while len(self.turns) > 1 and self.history_tokens + estimate_tokens(self.summary) > target:
+            _, tokens, intent = self.turns.pop(0)
+            self.history_tokens -= tokens
+            self.folded += 1
+            if intent and (not self.intent_path or self.intent_path[-1] != intent):
+                self.intent_path.append(intent)
+            del self.intent_path[:-SUMMARY_INTENTS]
+            self._summarize()
+        # 预算很小时缩短意图路径，保证摘要加历史不超过预算
+        while len(self.intent_path) > 1 and self.history_tokens + estimate_tokens(self.summary) > self.budget:
+            del self.intent_path[0]
+            self._summarize()
+
+    def _summarize(self):
+        self.summary = f"（此前{self.folded}轮对话的意图路径：{' → '.join(self.intent_path) or '无'}）"
+
+    def history(self):
+        """渲染后的对话历史文本，没有历史时为空字符串"""
+        if self._history is None:
+            parts = [self.summary] if self.summary else []
+            parts.extend(text for text, _, _ in self.turns)
+            self._history = '\n'.join(parts)
+        return self._history
+
+    def messages(self, user_input, intents):
+        """构造本轮意图识别的消息列表"""
+        messages = [{'role': 'system', 'content': SYSTEM_PROMPT}]
+        history = self.history()
+        if history:
+            messages.append({'role': 'user', 'content': f"对话历史：\n{history}"})
+        messages.append({'role': 'user', 'content': (
+            f"可用意图：{', '.join(intents)}\n"
+            f"用户输入：{user_input}\n"
+            f"请直接返回最匹配的意图名称"
+        )})
+        return messages
+
+    def record_usage(self, usage, messages, completion=''):
+        """累计一次请求的 token 用量；服务端没有返回 usage 时按估计值计入"""
+        stats = self.usage
+        stats['requests'] += 1
+        if usage is None:
+            stats['estimated_requests'] += 1
+            stats['prompt_tokens'] += sum(estimate_tokens(m['content']) for m in messages)
+            stats['completion_tokens'] += estimate_tokens(completion)
+            return
+        stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        stats['completion_tokens'] += usage.get('completion_tokens', 0)
+        stats['cached_tokens'] += usage.get('cached_tokens', 0)
+
+    def token_usage(self):
+        """token 用量汇总，含总量与前缀缓存命中比例"""
+        stats = dict(self.usage)
+        stats['total_tokens'] = stats['prompt_tokens'] + stats['completion_tokens']
+        stats['cache_ratio'] = stats['cached_tokens'] / stats['prompt_tokens'] if stats['prompt_tokens'] else 0.0
+        return stats
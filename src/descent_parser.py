@@ -0,0 +1,407 @@
+"""
+descent_parser.py -
+手写递归下降解析器，作为PLY解析器的替代后端。
+产生与 Parser 完全相同的字典格式语法树；一次解析收集全部语法错误（含行号、列号），
+出错后跳到下一个 step 关键字继续解析，一个笔误不会让整个脚本失效。
+"""
+
+from agent_log import get_logger
+from lexer import Lexer
+from metrics import METRICS
+
+# 可以开始一条语句的token类型
+_STATEMENT_TYPES = ('REPLY', 'LOG', 'WAIT', 'EXTRACT', 'CALL', 'IF', 'MATCH')
+# if/match 内部语句块的结束token
+_BLOCK_END_TYPES = ('ELSE', 'END', 'CASE')
+# 可以作为表达式操作数的token类型
+_OPERAND_TYPES = ('STRING', 'VARIABLE', 'ID')
+
+
+class DescentParser:
+    """
+    递归下降解析器。
+
+    文法（与 parser.py 中的PLY文法一致）：
+        script     : step_section+
+        step       : STEP ID (KEYWORDS STRING+)? statement+
+        statement  : REPLY expression | LOG expression | WAIT STRING+ guard* | extract | call | if | match
+        extract    : EXTRACT VARIABLE (ID | REGEX STRING+)
+        call       : CALL (ID ASSIGN)? ID LPAREN (expression (COMMA expression)*)? RPAREN
+        guard      : WHEN pattern GOTO ID
+        pattern    : (PREFIX | REGEX)? STRING+
+        if         : IF VARIABLE (EQ | PREFIX | REGEX) STRING+ statement+ (ELSE statement+)? END
+        match      : MATCH VARIABLE (CASE pattern statement+)+ (ELSE statement+)? END
+        expression : simple (PLUS expression)?        # 右结合，与PLY移进优先一致
+        simple     : STRING | VARIABLE | ID
+    """
+
+    def __init__(self, debug=False, lexer_backend='fast'):
+        self.debug = debug
+        self.log = get_logger('parser', debug)
+        self.lexer = Lexer(backend=lexer_backend)
+        self.tokens = self.lexer.tokens
+        self.ast = None
+        self.errors = []
+        self.error_count = 0
+
+    def parse(self, data, lineno=1, recover=False):
+        """
+        解析DSL脚本并返回字典格式的语法树。
+
+        有语法错误时默认返回None（与PLY后端一致）；recover=True 时返回只包含
+        正确 step 的语法树。错误详情见 self.errors。
+        """
+        with METRICS.span('lex', backend=self.lexer.backend):
+            tokens = list(self.lexer.iter_tokens(data, lineno))
+        with METRICS.span('parse', backend='descent'):
+            return self.parse_tokens(tokens, data, recover)
+
+    def parse_tokens(self, tokens, data='', recover=False):
+        """解析已完成词法分析的token列表；data 为源码文本，用于计算错误列号"""
+        self._data = data
+        self._tokens = tokens
+        self._pos = 0
+        self.errors = []
+
+        steps = []
+        while self._pos < len(self._tokens):
+            step = self._parse_step()
+            if step is None:
+                self._synchronize()
+            else:
+                steps.append(step)
+        if not steps and not self.errors:
+            self._error(None)
+
+        self.error_count = len(self.errors)
+        for error in self.errors:
+            self.log.debug(error['message'])
+        if not steps or (self.errors and not recover):
+            self.ast = None
+        else:
+            self.ast = {'type': 'Script', 'lineno': 1, 'children': steps}
+        return self.ast
+
+    def _error(self, tok):
+        """记录一条语法错误；tok 为None表示意外的文件结束"""
+        if tok is None:
+            last = self._tokens[-1] if self._tokens else None
+            self.errors.append({
+                'message': "语法错误: 意外的文件结束",
+                'lineno': last.lineno if last else 1,
+                'column': None,
+                'token': None,
+                'type': None,
+            })
+            return
+        column = tok.lexpos - self._data.rfind('\n', 0, tok.lexpos)
+        self.errors.append({
+            'message': f"语法错误 at line {tok.lineno}, column {column}: token '{tok.value}' (类型: {tok.type})",
+            'lineno': tok.lineno,
+            'column': column,
+            'token': tok.value,
+            'type': tok.type,
+        })
+
+    def _synchronize(self):
+        """错误恢复：跳过token直到下一个 step 关键字（出错位置本身是 step 时从它重新开始）"""
+        tokens = self._tokens
+        pos = self._pos
+        while pos < len(tokens) and tokens[pos].type != 'STEP':
+            pos += 1
+        self._pos = pos
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None
+
+    def _parse_step(self):
+        # 热路径：使用局部变量和下标访问，避免逐token的方法调用
+        tokens = self._tokens
+        count = len(tokens)
+        pos = self._pos
+        step_tok = tokens[pos]
+        if step_tok.type != 'STEP':
+            self._error(step_tok)
+            return None
+        pos += 1
+        name_tok = tokens[pos] if pos < count else None
+        if name_tok is None or name_tok.type != 'ID':
+            self._pos = pos
+            self._error(name_tok)
+            return None
+        pos += 1
+        keywords = None
+        if pos < count and tokens[pos].type == 'KEYWORDS':
+            keywords, pos = self._parse_strings(pos + 1)
+            if keywords is None:
+                return None
+
+        statements, pos = self._parse_statements(pos, nested=False)
+        if statements is None:
+            return None
+        self._pos = pos
+        if not statements:
+            self._error(self._peek())
+            return None
+        step = {'type': 'Step', 'value': name_tok.value, 'lineno': step_tok.lineno, 'children': statements}
+        if keywords is not None:
+            step['keywords'] = keywords
+        return step
+
+    def _parse_statements(self, pos, nested):
+        """
+        解析语句序列，返回 (语句列表, 新位置)；出错时语句列表为None。
+        顶层在 STEP 或文件结束处停止；if/match 内部在 ELSE/END/CASE 处停止。
+        """
+        tokens = self._tokens
+        count = len(tokens)
+        statements = []
+        while pos < count:
+            tok = tokens[pos]
+            kind = tok.type
+            if nested and kind in _BLOCK_END_TYPES:
+                break
+            if kind == 'STEP' and not nested:
+                break
+            if kind not in _STATEMENT_TYPES:
+                self._pos = pos
+                self._error(tok)
+                return None, pos
+            pos += 1
+            if kind == 'WAIT':
+                intents, pos = self._parse_strings(pos)
+                if intents is None:
+                    return None, pos
+                node = {'type': 'Wait', 'value': intents, 'lineno': tok.lineno}
+                if pos < count and tokens[pos].type == 'WHEN':
+                    guards, pos = self._parse_guards(pos)
+                    if guards is None:
+                        return None, pos
+                    node['children'] = guards
+                statements.append(node)
+                continue
+            if kind == 'CALL':
+                node, pos = self._parse_call(tok, pos)
+                if node is None:
+                    return None, pos
+                statements.append(node)
+                continue
+            if kind == 'EXTRACT':
+                node, pos = self._parse_extract(tok, pos)
+                if node is None:
+                    return None, pos
+                statements.append(node)
+                continue
+            if kind == 'IF' or kind == 'MATCH':
+                node, pos = self._parse_branch(tok, pos)
+                if node is None:
+                    return None, pos
+                statements.append(node)
+                continue
+            expression, pos = self._parse_expression(pos)
+            if expression is None:
+                return None, pos
+            statements.append({'type': 'Reply' if kind == 'REPLY' else 'Log',
+                               'value': expression, 'lineno': tok.lineno})
+        if nested and pos >= count:
+            self._pos = pos
+            self._error(None)
+            return None, pos
+        return statements, pos
+
+    def _expect(self, pos, kind):
+        """当前位置的token必须是 kind，返回该token；否则记录错误并返回None"""
+        tok = self._tokens[pos] if pos < len(self._tokens) else None
+        if tok is None or tok.type != kind:
+            self._pos = pos
+            self._error(tok)
+            return None
+        return tok
+
+    def _parse_strings(self, pos):
+        """解析一个或多个 STRING，返回 (字符串列表, 新位置)"""
+        tokens = self._tokens
+        count = len(tokens)
+        values = []
+        while pos < count and tokens[pos].type == 'STRING':
+            values.append(tokens[pos].value)
+            pos += 1
+        if not values:
+            self._pos = pos
+            self._error(self._peek())
+            return None, pos
+        return values, pos
+
+    def _parse_pattern(self, pos):
+        """[prefix|regex] STRING+，返回 ((类型, 模式列表), 新位置)"""
+        tokens = self._tokens
+        kind = 'exact'
+        if pos < len(tokens) and tokens[pos].type in ('PREFIX', 'REGEX'):
+            kind = tokens[pos].value
+            pos += 1
+        patterns, pos = self._parse_strings(pos)
+        if patterns is None:
+            return None, pos
+        return (kind, patterns), pos
+
+    def _parse_extract(self, extract_tok, pos):
+        """EXTRACT 之后：VARIABLE (ID | REGEX STRING+)"""
+        var_tok = self._expect(pos, 'VARIABLE')
+        if var_tok is None:
+            return None, pos
+        node = {'type': 'Extract', 'value': {'type': 'Variable', 'value': var_tok.value, 'lineno': var_tok.lineno},
+                'lineno': extract_tok.lineno}
+        pos += 1
+        tok = self._tokens[pos] if pos < len(self._tokens) else None
+        if tok is not None and tok.type == 'REGEX':
+            patterns, pos = self._parse_strings(pos + 1)
+            if patterns is None:
+                return None, pos
+            node['kind'] = 'regex'
+            node['patterns'] = patterns
+            return node, pos
+        if self._expect(pos, 'ID') is None:
+            return None, pos
+        node['kind'] = tok.value
+        return node, pos + 1
+
+    def _parse_call(self, call_tok, pos):
+        """CALL 之后：(ID ASSIGN)? ID LPAREN 参数列表 RPAREN"""
+        tokens = self._tokens
+        count = len(tokens)
+        target = None
+        if pos + 1 < count and tokens[pos + 1].type == 'ASSIGN':
+            target = self._expect(pos, 'ID')
+            if target is None:
+                return None, pos
+            pos += 2
+        name_tok = self._expect(pos, 'ID')
+        if name_tok is None or self._expect(pos + 1, 'LPAREN') is None:
+            return None, pos
+        pos += 2
+        arguments = []
+        if pos < count and tokens[pos].type != 'RPAREN':
+            while True:
+                expression, pos = self._parse_expression(pos)
+                if expression is None:
+                    return None, pos
+                arguments.append(expression)
+                if pos < count and tokens[pos].type == 'COMMA':
+                    pos += 1
+                    continue
+                break
+        if self._expect(pos, 'RPAREN') is None:
+            return None, pos
+        node = {'type': 'Call', 'value': name_tok.value, 'lineno': call_tok.lineno, 'children': arguments}
+        if target is not None:
+            node['target'] = target.value
+        return node, pos + 1
+
+    def _parse_guards(self, pos):
+        """wait 之后的路由规则：(WHEN pattern GOTO ID)+"""
+        tokens = self._tokens
+        guards = []
+        while pos < len(tokens) and tokens[pos].type == 'WHEN':
+            when_tok = tokens[pos]
+            pattern, pos = self._parse_pattern(pos + 1)
+            if pattern is None or self._expect(pos, 'GOTO') is None:
+                return None, pos
+            target = self._expect(pos + 1, 'ID')
+            if target is None:
+                return None, pos + 1
+            pos += 2
+            guards.append({'type': 'When', 'kind': pattern[0], 'value': pattern[1],
+                           'target': target.value, 'lineno': when_tok.lineno})
+        return guards, pos
+
+    def _parse_branch(self, tok, pos):
+        """解析 if/match 语句（tok 为 IF 或 MATCH，pos 指向其后的变量），返回 (节点, 新位置)"""
+        subject = self._expect(pos, 'VARIABLE')
+        if subject is None:
+            return None, pos
+        pos += 1
+        cases = []
+        if tok.type == 'IF':
+            cond = self._tokens[pos] if pos < len(self._tokens) else None
+            if cond is None or cond.type not in ('EQ', 'PREFIX', 'REGEX'):
+                self._pos = pos
+                self._error(cond)
+                return None, pos
+            patterns, pos = self._parse_strings(pos + 1)
+            if patterns is None:
+                return None, pos
+            body, pos = self._parse_statements(pos, nested=True)
+            if not body:
+                return self._empty_block(body, pos)
+            cases.append({'type': 'Case', 'kind': 'exact' if cond.type == 'EQ' else cond.value,
+                          'value': patterns, 'lineno': tok.lineno, 'children': body})
+        else:
+            while pos < len(self._tokens) and self._tokens[pos].type == 'CASE':
+                case_tok = self._tokens[pos]
+                pattern, pos = self._parse_pattern(pos + 1)
+                if pattern is None:
+                    return None, pos
+                body, pos = self._parse_statements(pos, nested=True)
+                if not body:
+                    return self._empty_block(body, pos)
+                cases.append({'type': 'Case', 'kind': pattern[0], 'value': pattern[1],
+                              'lineno': case_tok.lineno, 'children': body})
+            if not cases:
+                self._pos = pos
+                self._error(self._peek())
+                return None, pos
+        else_tok = self._tokens[pos] if pos < len(self._tokens) else None
+        if else_tok is not None and else_tok.type == 'ELSE':
+            body, pos = self._parse_statements(pos + 1, nested=True)
+            if not body:
+                return self._empty_block(body, pos)
+            cases.append({'type': 'Case', 'kind': 'else', 'lineno': else_tok.lineno, 'children': body})
+        if self._expect(pos, 'END') is None:
+            return None, pos
+        node_type = 'If' if tok.type == 'IF' else 'Match'
+        subject_node = {'type': 'Variable', 'value': subject.value, 'lineno': subject.lineno}
+        return {'type': node_type, 'value': subject_node, 'lineno': tok.lineno, 'children': cases}, pos + 1
+
+    def _empty_block(self, body, pos):
+        """分支语句块为空（body 为 []）时报告当前位置的错误；body 为None时错误已记录"""
+        if body is not None:
+            self._pos = pos
+            self._error(self._peek())
+        return None, pos
+
+    def _parse_expression(self, pos):
+        """解析 simple (PLUS simple)*，按右结合构造 Arithmetic 节点；返回 (节点, 新位置)"""
+        tokens = self._tokens
+        count = len(tokens)
+        operands = []
+        operators = []
+        while True:
+            tok = tokens[pos] if pos < count else None
+            if tok is None or tok.type not in _OPERAND_TYPES:
+                self._pos = pos
+                self._error(tok)
+                return None, pos
+            pos += 1
+            # 与PLY后端保持一致：以 $ 开头的值（包括字符串字面量）都视为变量
+            value = tok.value
+            if value.startswith('$'):
+                node_type = 'Variable'
+            elif tok.type == 'STRING':
+                node_type = 'String'
+            else:
+                node_type = 'Identifier'
+            operands.append({'type': node_type, 'value': value, 'lineno': tok.lineno})
+            if pos < count and tokens[pos].type == 'PLUS':
+                operators.append(tokens[pos])
+                pos += 1
+            else:
+                break
+
+        node = operands.pop()
+        while operators:
+            op = operators.pop()
+            node = {'type': 'Arithmetic', 'value': op.value, 'lineno': op.lineno,
+                    'children': [operands.pop(), node]}
+        return node, pos
@@ -0,0 +1,216 @@
+"""
+dispatch.py -
+确定性模式匹配分派器。if/match 语句的分支和 wait 的 when 路由规则在加载时编译为一个
+PatternDispatcher，运行时一次查找就能确定结果，不需要调用LLM：
+  - exact  精确匹配：字典查找；
+  - prefix 前缀匹配：字符前缀树，一次遍历找出所有命中的前缀；
+  - regex  正则匹配（re.search 语义）：所有正则合并为一个按规则顺序排列的分支正则，
+           无法合并的正则（含命名分组、反向引用、条件分组或行内全局标志）逐个匹配。
+多条规则同时命中时，先声明的规则优先。
+
+KeywordMatcher 把各意图的关键词编译为一个 Aho-Corasick 自动机，一次扫描找出输入中出现的
+所有关键词，耗时与输入长度成正比，与关键词数量无关。
+"""
+
+import re
+from collections import deque
+
+PATTERN_KINDS = ('exact', 'prefix', 'regex')
+# 前缀树节点中保存"在此结束的前缀的最小规则序号"的键（其余键都是单个字符）
+_END = None
+# 合并后会改变含义或无法编译的正则写法
+_UNCOMBINABLE = re.compile(r'\(\?P[<=]|\(\?\(|\\[1-9]|\(\?[aiLmsux]+\)')
+
+
+class PatternDispatcher:
+    """
+    按声明顺序排列的规则 [(类型, 模式列表, 结果)] 编译而成的分派器。
+    match(text) 返回第一条命中规则的结果，都不命中时返回 default。
+    正则无效时构造函数抛出 re.error。
+    """
+
+    __slots__ = ('results', 'default', 'exact', 'trie', 'first_prefix', 'regex', 'group_rules',
+                 'fallback', 'first_regex')
+
+    def __init__(self, rules, default=None):
+        self.results = []
+        self.default = default
+        self.exact = {}
+        self.trie = None
+        self.first_prefix = None
+        self.regex = None
+        self.group_rules = {}
+        self.fallback = []
+        self.first_regex = None
+        combined = []
+        for index, (kind, patterns, result) in enumerate(rules):
+            self.results.append(result)
+            if kind == 'exact':
+                for pattern in patterns:
+                    self.exact.setdefault(pattern, index)
+            elif kind == 'prefix':
+                if self.trie is None:
+                    self.trie = {}
+                    self.first_prefix = index
+                for pattern in patterns:
+                    self._insert(pattern, index)
+            elif kind == 'regex':
+                if self.first_regex is None:
+                    self.first_regex = index
+                for pattern in patterns:
+                    compiled = re.compile(pattern)
+                    if _UNCOMBINABLE.search(pattern):
+                        self.fallback.append((index, compiled))
+                    else:
+                        combined.append((index, pattern, compiled.groups))
+            else:
+                raise ValueError(f"未知的匹配类型: {kind}")
+        if combined:
+            self._combine(combined)
+
+    def _insert(self, pattern, index):
+        node = self.trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+        if node.get(_END) is None:
+            node[_END] = index
+
+    def _combine(self, combined):
+        """合并为 ^(?:((?=[\\s\\S]*?(?:p0)))|((?=[\\s\\S]*?(?:p1)))|...)：按顺序尝试，命中的外层分组即规则"""
+        parts = []
+        group = 1
+        for index, pattern, groups in combined:
+            parts.append(f"((?=[\\s\\S]*?(?:{pattern})))")
+            self.group_rules[group] = index
+            group += 1 + groups
+        try:
+            self.regex = re.compile('^(?:' + '|'.join(parts) + ')')
+        except re.error:
+            # 合并后无法编译（例如分组数超出限制）时退回逐个匹配
+            self.regex = None
+            self.group_rules = {}
+            self.fallback.extend((index, re.compile(pattern)) for index, pattern, _ in combined)
+        self.fallback.sort(key=lambda item: item[0])
+
+    def match_index(self, text):
+        """返回第一条命中规则的序号，都不命中时返回None"""
+        best = self.exact.get(text)
+        if self.trie is not None and (best is None or best > self.first_prefix):
+            node = self.trie
+            for ch in text:
+                hit = node.get(_END)
+                if hit is not None and (best is None or hit < best):
+                    best = hit
+                node = node.get(ch)
+                if node is None:
+                    break
+            else:
+                hit = node.get(_END)
+                if hit is not None and (best is None or hit < best):
+                    best = hit
+        if self.first_regex is not None and (best is None or best > self.first_regex):
+            if self.regex is not None:
+                m = self.regex.match(text)
+                if m is not None:
+                    hit = self.group_rules[m.lastindex]
+                    if best is None or hit < best:
+                        best = hit
+            for index, compiled in self.fallback:
+                if best is not None and index >= best:
+                    break
+                if compiled.search(text):
+                    best = index
+                    break
+        return best
+
+    def match(self, text):
+        index = self.match_index(text)
+        return self.default if index is None else self.results[index]
+
+
+class KeywordMatcher:
+    """
+    多意图关键词匹配器（Aho-Corasick 自动机），rules 为按声明顺序排列的 [(结果, 关键词列表)]。
+    关键词和输入都先转换为小写；同一位置结束的多个关键词都计入命中。
+    """
+
+    __slots__ = ('results', 'goto', 'fail', 'output')
+
+    def __init__(self, rules):
+        self.results = []
+        # 状态 0 为根；goto[s] 为状态 s 的转移表，output[s] 为在 s 结束的每个关键词所属的规则序号
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for index, (result, keywords) in enumerate(rules):
+            self.results.append(result)
+            for keyword in keywords:
+                if keyword:
+                    self._insert(keyword.lower(), index)
+        self._link()
+
+    def _insert(self, keyword, index):
+        goto = self.goto
+        state = 0
+        for ch in keyword:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = nxt
+        if index not in self.output[state]:
+            self.output[state] += (index,)
+
+    def _link(self):
+        """按层次遍历建立失败指针，并把失败链上的输出合并到每个状态"""
+        goto, fail, output = self.goto, self.fail, self.output
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # 失败链上的关键词是本状态关键词的真后缀，互不相同，逐个计入
+                output[nxt] += output[fail[nxt]]
+
+    def __len__(self):
+        return len(self.goto) - 1
+
+    def scan(self, text):
+        """返回 {规则序号: 命中次数}"""
+        goto, fail, output = self.goto, self.fail, self.output
+        hits = {}
+        state = 0
+        for ch in text.lower():
+            edges = goto[state]
+            while ch not in edges and state:
+                state = fail[state]
+                edges = goto[state]
+            state = edges.get(ch, 0)
+            if output[state]:
+                for index in output[state]:
+                    hits[index] = hits.get(index, 0) + 1
+        return hits
+
+    def match(self, text):
+        """只有一条规则的关键词命中时返回其结果（可以跳过LLM），没有命中或有歧义时返回None"""
+        hits = self.scan(text)
+        if len(hits) != 1:
+            return None
+        for index in hits:
+            return self.results[index]
+
+    def best(self, text):
+        """命中次数最多的规则的结果，次数相同时先声明的优先；没有命中时返回None"""
+        hits = self.scan(text)
+        if not hits:
+            return None
+        index = min(hits, key=lambda i: (-hits[i], i))
+        return self.results[index]
@@ -3,17 +3,34 @@ dsl_engine.py -
 基于语法分析器的解释执行引擎
 """
 
-import datetime
+import json
 import os
+import time
+import uuid
 from typing import Dict, Any, List, Optional
 from llm_client import LLMClient
+from compiler import CompiledScript, compile_script
+from functions import CALL_ERROR, CallError, FunctionRegistry
+from event_log import EventLog, site_key
+from intent_cache import IntentCache
+from normalizer import Normalizer
+from agent_log import get_logger
+from metrics import METRICS
+from profiler import PROFILER
 
 class DSLEngine:
-    def __init__(self, script_file: str = None, script_content: str = None, debug: bool = False):
+    def __init__(self, script_file: str = None, script_content: str = None, debug: bool = False,
+                 streaming: bool = False, parser_backend: str = None):
         """
         初始化DSL引擎
+
+        streaming 为 True 时按块流式读取脚本文件，逐个step解析，不在内存中保留整个脚本文本
+        parser_backend 选择解析器后端（'ply' 或 'descent'），默认读取环境变量 DSL_AGENT_PARSER
         """
         self.debug = debug
+        self.log = get_logger('engine', debug)
+        self.streaming = streaming
+        self.parser_backend = parser_backend
         self.ast = None
         self.variables = {
             'user_input': '',
@@ -21,8 +38,37 @@ class DSLEngine:
         }
         self.current_step = None
         self.input_history = []
+        self.program = None
+        self._incremental_parser = None
+        # 加载时的脚本文本，第一次 update_script() 时用来初始化增量解析器（流式加载时为None）
+        self._script_text = None
         
         self.llm_client = LLMClient(debug=debug)
+        # 用户输入的规范化，每轮一次，供关键词匹配、意图缓存和LLM失败时的关键词回退使用
+        self.normalizer = Normalizer()
+        # 意图缓存，所有会话共享；DSL_AGENT_INTENT_WARMUP 指定预热来源时在后台载入，不推迟启动
+        self.intent_cache = IntentCache(normalize=self.normalizer)
+        self.llm_client.intent_cache = self.intent_cache
+        warmup = os.environ.get('DSL_AGENT_INTENT_WARMUP')
+        if warmup and self.intent_cache.enabled:
+            self.intent_cache.warm_async(warmup)
+        # call 语句调用的外部函数，所有会话共享注册表和线程池
+        self.functions = FunctionRegistry()
+        # 副作用调度：call 开始后不等待结果，在编译期确定的汇合点才取得；log 在本轮的回复之后写入。
+        # DSL_AGENT_DEFER_EFFECTS=false 时按语句顺序逐条执行
+        self.defer_effects = os.environ.get('DSL_AGENT_DEFER_EFFECTS', 'true').lower() != 'false'
+        # 阻塞式 process 对话的会话ID（new_session 创建的会话各有自己的ID）；事件日志在第一次写入时创建
+        self.session_id = uuid.uuid4().hex
+        self._events = None
+        # 意图先验 {wait 位置: {意图: 频率}}（analytics.py --priors 生成），无法识别意图时使用；
+        # DSL_AGENT_INTENT_PRIORS 指定先验文件时在启动时载入
+        self.priors = {}
+        priors = os.environ.get('DSL_AGENT_INTENT_PRIORS')
+        if priors:
+            try:
+                self.load_priors(priors)
+            except (OSError, ValueError) as e:
+                self.log.error("载入意图先验失败: {}", e)
 
         # 加载脚本
         if script_file:
@@ -32,10 +78,9 @@ class DSLEngine:
         else:
             raise ValueError("必须提供script_file或script_content参数")
 
-    def _debug(self, msg: str):
-        """调试信息输出"""
-        if self.debug:
-            print(f"[DEBUG] {msg}")
+    def _debug(self, msg: str, *args, **fields):
+        """调试信息输出；带参数时 msg 为 str.format 模板，只在调试级别开启时格式化"""
+        self.log.debug(msg, *args, **fields)
 
     def _load_script_from_file(self, script_file: str):
         """从文件加载脚本"""
@@ -46,12 +91,41 @@ class DSLEngine:
             self.script_file = script_file
         
         try:
-            with open(self.script_file, 'r', encoding='utf-8') as f:
-                script_content = f.read()
-            self._parse_script(script_content)
+            if self.streaming:
+                self._parse_script_stream(self.script_file)
+                return
+            with open(self.script_file, 'rb') as f:
+                raw = f.read()
         except FileNotFoundError:
             raise Exception(f"脚本文件不存在: {self.script_file}")
 
+        # 解析结果按内容缓存，再次加载同一脚本时不需要导入和运行解析器
+        import script_cache
+        key = None
+        if script_cache.cache_enabled():
+            backend = self.parser_backend or os.environ.get('DSL_AGENT_PARSER', 'ply')
+            key = script_cache.cache_key(raw, backend)
+        # 与文本模式读取一致：统一换行符
+        script_content = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        if key is not None:
+            ast = script_cache.load(self.script_file, key)
+            if ast:
+                self.ast = ast
+                try:
+                    self._get_program()
+                except Exception as e:
+                    # 缓存文件被截断或改动过：忽略，重新解析
+                    self.log.debug("缓存的脚本语法树无法编译，重新解析: {}", e)
+                    self.ast = None
+                    self.program = None
+                else:
+                    self._script_text = script_content
+                    self.log.debug("从缓存加载脚本语法树")
+                    return
+        self._parse_script(script_content)
+        if key is not None:
+            script_cache.store(self.script_file, key, self.ast)
+
     def _load_script_from_content(self, script_content: str):
         """从内容加载脚本"""
         self.script_file = None
@@ -60,22 +134,72 @@ class DSLEngine:
     def _parse_script(self, script_content: str):
         """解析脚本内容"""
         try:
-            from parser import Parser
-            parser = Parser(debug=self.debug)
+            from parser import create_parser
+            parser = create_parser(self.parser_backend, debug=self.debug)
             self.ast = parser.parse(script_content)
             
             if not self.ast:
+                errors = getattr(parser, 'errors', None)
+                if isinstance(errors, list) and errors:
+                    raise Exception("; ".join(error['message'] for error in errors))
                 raise Exception("脚本解析失败")
             
-            self._debug("脚本解析成功")
+            self._script_text = script_content
+            self._get_program()
+            self.log.debug("脚本解析成功")
             
         except Exception as e:
             raise Exception(f"脚本解析失败: {e}")
 
-    def _evaluate_expression(self, node: Dict) -> Any:
-        """评估表达式节点"""
+    def _parse_script_stream(self, script_file: str):
+        """流式解析脚本文件：逐个step解析后交给引擎"""
+        from stream_parser import StreamParser
+        parser = StreamParser(debug=self.debug)
+        self.ast = parser.parse(script_file)
+        if not self.ast:
+            raise Exception("脚本解析失败")
+        self._get_program()
+        self.log.debug("脚本流式解析成功")
+
+    def update_script(self, script_content: str):
+        """脚本被编辑后增量重新解析：只重新分析发生变化的step，并拼接回当前语法树"""
+        from incremental_parser import IncrementalParser
+        if self._incremental_parser is None:
+            self._incremental_parser = IncrementalParser(debug=self.debug)
+            # 用加载时的语法树初始化，第一次编辑也只重新分析变化的step
+            if self._script_text is not None:
+                self._incremental_parser.seed(self._script_text, self.ast)
+                self._script_text = None
+        ast = self._incremental_parser.update(script_content)
+        if not ast:
+            # 保留上一次可用的语法树，编辑器中的中间状态不影响正在运行的流程
+            raise Exception("脚本解析失败")
+        # 增量解析原地更新语法树，只编译替换的step；语法树是新对象或 step 的关键词变化时完整编译
+        parser = self._incremental_parser
+        try:
+            if ast is not self.ast or self.program is None or \
+                    not self.program.update(parser.removed, parser.added):
+                self.ast = ast
+                self.program = None
+                self._get_program()
+        except Exception:
+            # 编译失败（如无效的正则表达式）时编译结果可能只更新了一部分，下次使用时完整编译
+            self.program = None
+            raise
+        self.log.debug("脚本增量解析成功，重新分析区块数: {}", parser.last_reparsed)
+
+    def _get_program(self) -> CompiledScript:
+        """获取编译后的脚本；语法树被替换后重新编译"""
+        if self.program is None or self.program.ast is not self.ast:
+            self.program = compile_script(self.ast, normalize=self.normalizer)
+        return self.program
+
+    def _evaluate_expression(self, node: Dict, variables: Dict[str, Any] = None) -> Any:
+        """评估表达式节点；variables 默认为引擎自身的变量（会话传入各自的变量）"""
         if not isinstance(node, dict):
             return str(node)
+        if variables is None:
+            variables = self.variables
 
         node_type = node.get('type', '')
         
@@ -83,19 +207,19 @@ class DSLEngine:
             return node.get('value', '')
         elif node_type == 'Variable':
             var_name = node.get('value', '')[1:]  # 去掉$前缀
-            return self.variables.get(var_name, '')
+            return variables.get(var_name, '')
         elif node_type == 'Arithmetic':
-            return self._evaluate_arithmetic(node)
+            return self._evaluate_arithmetic(node, variables)
         else:
             return ''
 
-    def _evaluate_arithmetic(self, node: Dict) -> Any:
+    def _evaluate_arithmetic(self, node: Dict, variables: Dict[str, Any] = None) -> Any:
         """评估算术表达式"""
         if not node.get('children') or len(node['children']) != 2:
             return ""
         
-        left = self._evaluate_expression(node['children'][0])
-        right = self._evaluate_expression(node['children'][1])
+        left = self._evaluate_expression(node['children'][0], variables)
+        right = self._evaluate_expression(node['children'][1], variables)
         operator = node.get('value', '+')
         
         if operator == '+':
@@ -106,12 +230,7 @@ class DSLEngine:
         """执行单个语句"""
         responses = []
         node_type = statement.get('type', '')
-        
-        # 更新用户输入变量
-        self.variables['user_input'] = user_input
-        if user_input:
-            self.input_history.append(user_input)
-            self.variables['input_history'] = self.input_history
+        self._bind_input(user_input)
         
         if node_type == 'Reply':
             expression = statement.get('value')
@@ -123,26 +242,54 @@ class DSLEngine:
             expression = statement.get('value')
             if expression:
                 log_text = self._evaluate_expression(expression)
-                self._write_log(log_text)
+                self._write_log(log_text, self.current_step, statement.get('lineno', 0))
                 
         elif node_type == 'Wait':
-            responses.extend(self._execute_wait_statement(statement, user_input))
+            responses.extend(self._execute_wait_statement(statement, user_input, self.current_step))
+
+        elif node_type == 'Extract':
+            self._extract(statement)
+
+        elif node_type == 'Call':
+            name, args = self._call_arguments(statement)
+            self._bind_call(statement, self._invoke(name, args))
                 
         return responses
 
-    def _write_log(self, log_text: str):
-        """写入日志文件"""
-        log_file_path = "dsl_engine.log" if not self.script_file else self.script_file + '.log'
-        
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {log_text}\n"
-        
-        try:
-            with open(log_file_path, 'a', encoding='utf-8') as log_file:
-                log_file.write(log_entry)
-            self._debug(f"日志写入成功: {log_text}")
-        except Exception as e:
-            print(f"❌ 写入日志文件失败: {e}")
+    def _bind_input(self, user_input: str):
+        """更新用户输入变量"""
+        self.variables['user_input'] = user_input
+        if user_input:
+            self.input_history.append(user_input)
+            self.variables['input_history'] = self.input_history
+
+    @property
+    def events(self) -> EventLog:
+        """事件日志（event_log.EventLog），替代原先的 .log 文本文件。
+        目录为环境变量 DSL_AGENT_EVENT_DIR，默认为脚本文件旁的 <脚本>.events（内联脚本为当前目录的 dsl_engine.events）"""
+        if self._events is None:
+            directory = os.environ.get('DSL_AGENT_EVENT_DIR') or (
+                self.script_file + '.events' if self.script_file else 'dsl_engine.events')
+            self._events = EventLog(directory)
+        return self._events
+
+    def _write_log(self, log_text: str, step: str = None, lineno: int = 0, session_id: str = None):
+        """log 语句：写入事件日志（只编码到内存缓冲区，文件由后台线程写入）"""
+        with METRICS.span('log_write'):
+            self.events.append('log', session_id or self.session_id, step or self.current_step, lineno, str(log_text))
+        self.log.debug("日志写入成功: {}", log_text)
+
+    def _record_turn(self, session_id: str, step: str, wait_statement: Dict, user_input: str, next_step: str,
+                     source: str, classify: float, execute: float = 0.0):
+        """记录一轮对话的事件：等待输入的 wait、用户输入、跳转的 step、路由来源和耗时"""
+        self.events.append('turn', session_id, step, wait_statement.get('lineno', 0), user_input, next_step,
+                           source, classify, execute)
+
+    def close(self):
+        """写完事件日志并关闭函数调用的线程池"""
+        if self._events is not None:
+            self._events.close()
+        self.functions.shutdown()
     
     def _wait_for_user_input(self, prompt: str = "请输入: ") -> str:
         """等待用户输入"""
@@ -154,11 +301,12 @@ class DSLEngine:
             user_input, 
             self.get_steps()
         )
-        self._debug(f"识别到的意图: {intent}")
+        self.log.debug("识别到的意图: {}", intent)
         return intent
     
-    def _execute_wait_statement(self, wait_statement: Dict, current_user_input: str) -> List[str]:
-        """执行 wait 语句（阻塞等待用户输入）"""
+    def _execute_wait_statement(self, wait_statement: Dict, current_user_input: str,
+                                step_name: str = None) -> List[str]:
+        """执行 wait 语句（阻塞等待用户输入）；step_name 为 wait 所在的step，记录在 turn 事件中"""
         responses = []
         
         # 获取意图列表
@@ -179,16 +327,29 @@ class DSLEngine:
                 if not user_input:
                     continue
                 
-                # 使用LLM识别用户输入属于哪个意图
-                matched_intent = self._recognize_intent_from_list(user_input, intents, responses)
+                # 先尝试 when 规则和关键词的确定性路由，不命中时使用LLM识别用户输入属于哪个意图
+                start = time.perf_counter()
+                text = self.normalizer(user_input)
+                source = 'rule'
+                matched_intent = self._route_by_rules(wait_statement, user_input)
+                if matched_intent is None:
+                    source = 'keyword'
+                    matched_intent = self._route_by_keywords(wait_statement, text)
+                if matched_intent is None:
+                    matched_intent, source = self._classify(step_name or self.current_step, wait_statement,
+                                                            user_input, text, responses)
                 
                 # 决定跳转到哪个步骤
                 if matched_intent and matched_intent in self.get_steps():
                     next_step = matched_intent
                 else:
-                    # 如果没有匹配的意图，使用第一个意图作为默认
-                    next_step = intents[0]
-                self._debug(f"跳转到步骤: {next_step}")
+                    # 如果没有匹配的意图，使用该 wait 位置最常见的意图（没有先验时为第一个意图）作为默认
+                    next_step = self._fallback_intent(step_name or self.current_step, wait_statement)
+                    source = 'fallback'
+                self.log.debug("跳转到步骤: {}", next_step)
+                # 跳转的step可能再次阻塞等待输入，执行耗时不计入 turn 事件
+                self._record_turn(self.session_id, step_name or self.current_step, wait_statement, user_input,
+                                  next_step, source, time.perf_counter() - start)
                 
                 # 执行跳转到下一步
                 response = self.process(next_step, user_input)
@@ -209,15 +370,30 @@ class DSLEngine:
         
         return responses
     
-    def _recognize_intent_from_list(self, user_input: str, intents: List[str], responses: List[str]) -> str:
-        """从意图列表中识别用户输入属于哪个意图"""
-        if not intents:
-            return ""
-        
-        # 使用LLM进行意图识别
-        matched_intent = self.llm_client.recognize_intent(user_input, intents, responses)
-        self._debug(f"用户输入: '{user_input}' 匹配到的意图: {matched_intent}")
-        return matched_intent
+    def _classify(self, step_name: str, wait_statement: Dict, user_input: str, text: str, responses: List[str],
+                  context=None):
+        """
+        规则和关键词都没有命中时识别 wait 的意图，返回 (意图, 路由来源)；text 为规范化的输入。
+        先按 wait 位置查意图缓存（cache），再查近似缓存（semantic），都未命中时调用LLM（llm）
+        """
+        intents = wait_statement.get('value', [])
+        site = site_key(step_name, wait_statement.get('lineno', 0))
+        intent = self.intent_cache.get(site, text, intents)
+        if intent is not None:
+            METRICS.inc('route_total', source='cache')
+            self.log.debug("意图缓存命中: '{}' -> {}", user_input, intent)
+            return intent, 'cache'
+        intent = self.intent_cache.similar(text, intents)
+        if intent is not None:
+            METRICS.inc('route_total', source='semantic')
+            self.log.debug("近似意图缓存命中: '{}' -> {}", user_input, intent)
+            return intent, 'semantic'
+        METRICS.inc('route_total', source='llm')
+        intent = self.llm_client.recognize_intent(user_input, intents, responses, context=context,
+                                                  keywords=self._get_program().keyword_matcher(wait_statement),
+                                                  site=site, normalized=text)
+        self.log.debug("用户输入: '{}' 匹配到的意图: {}", user_input, intent)
+        return intent, 'llm'
 
     def get_steps(self) -> List[str]:
         """获取所有可用的步骤名称"""
@@ -243,15 +419,18 @@ class DSLEngine:
 
     def process(self, step_name: str, user_input: str = '') -> str:
         """处理步骤并生成回复"""
-        self._debug(f"处理步骤: {step_name}, 输入: {user_input}")
+        self.log.debug("处理步骤: {}, 输入: {}", step_name, user_input)
         
         # 查找匹配的步骤
+        # 热路径上直接检查开关，指标关闭时不创建计时区间
+        timed = METRICS.enabled
+        if timed:
+            start = time.perf_counter()
         target_step = None
         if self.ast and 'children' in self.ast:
-            for section in self.ast['children']:
-                if section['type'] == 'Step' and section.get('value') == step_name:
-                    target_step = section
-                    break
+            target_step = self._get_program().get_step(step_name)
+        if timed:
+            METRICS.observe('dispatch', time.perf_counter() - start)
         
         if not target_step:
             available_steps = self.get_steps()
@@ -261,10 +440,39 @@ class DSLEngine:
         self.current_step = step_name
         
         # 执行步骤中的语句
-        responses = []
         statements = target_step.get('children', [])
+        profiling = PROFILER.enabled
+        if profiling:
+            PROFILER.push(step_name)
+        try:
+            responses = self._execute_step(step_name, statements, user_input, timed, profiling)
+        finally:
+            if profiling:
+                PROFILER.pop()
         
-        for statement in statements:
+        return '\n'.join(responses) if responses else ""
+
+    def _execute_step(self, step_name: str, statements: List[Dict], user_input: str,
+                      timed: bool = False, profiling: bool = False) -> List[str]:
+        """
+        依次执行 step 中的语句，if/match 选中的分支就地展开；wait 语句阻塞等待输入，不计入指标和剖析。
+        defer_effects 开启时 call 在汇合点才取得结果、log 在 wait 之前或 step 结束时写入（见 _settle_effects）
+        """
+        responses = []
+        program = self._get_program()
+        defer = self.defer_effects
+        # 进行中的调用：id(call 语句) -> (语句, PendingCall)；延后写入的日志
+        running = {}
+        logs = []
+        pending = [(statements, iter(statements))]
+        while pending:
+            block, remaining = pending[-1]
+            statement = next(remaining, None)
+            if statement is None:
+                pending.pop()
+                if running:
+                    self._join_calls(program.joins_before(block), running)
+                continue
             node_type = statement.get('type', '')
             
             if node_type == 'Wait':
@@ -272,15 +480,190 @@ class DSLEngine:
                 if responses:
                     print(f"🤖: {'\n'.join(responses)}")
                     responses = []  # 清空已输出的回复
+                self._settle_effects(running, logs)
                 
                 # 执行wait语句（会阻塞等待用户输入）
-                wait_responses = self._execute_wait_statement(statement, user_input)
+                wait_responses = self._execute_wait_statement(statement, user_input, step_name)
                 responses.extend(wait_responses)
             else:
                 # 其他语句正常执行
-                responses.extend(self._execute_statement(statement, user_input))
-        
-        return '\n'.join(responses) if responses else ""
+                if running:
+                    self._join_calls(program.joins_before(statement), running)
+                if timed:
+                    start = time.perf_counter()
+                if profiling:
+                    sample = PROFILER.begin(step_name, statement)
+                if node_type == 'If' or node_type == 'Match':
+                    # 与 _execute_statement 一致：条件中的 $user_input 为本step的输入
+                    self.variables['user_input'] = user_input
+                    branch = self._select_case(statement)
+                    if branch:
+                        pending.append((branch, iter(branch)))
+                elif defer and node_type == 'Log':
+                    self._bind_input(user_input)
+                    if statement.get('value'):
+                        logs.append((self._evaluate_expression(statement['value']), step_name,
+                                     statement.get('lineno', 0)))
+                elif defer and node_type == 'Call':
+                    self._bind_input(user_input)
+                    name, args = self._call_arguments(statement)
+                    running[id(statement)] = (statement, self.functions.start(name, args))
+                else:
+                    responses.extend(self._execute_statement(statement, user_input))
+                if profiling:
+                    PROFILER.end(sample, step_name, statement)
+                if timed:
+                    METRICS.observe('statement', time.perf_counter() - start, type=node_type)
+        self._settle_effects(running, logs)
+        return responses
+
+    def _join_calls(self, calls, running: Dict, variables: Dict[str, Any] = None):
+        """取得 calls 中仍在进行的调用的结果并赋给目标变量"""
+        for statement in calls:
+            entry = running.pop(id(statement), None)
+            if entry is not None:
+                self._bind_call(statement, self._join_call(entry[1]), variables)
+
+    def _settle_effects(self, running: Dict, logs: List):
+        """写入延后的日志（文本, step, 行号），再取得所有进行中的调用结果；日志写入与线程池中的调用同时进行"""
+        for text, step, lineno in logs:
+            self._write_log(text, step, lineno)
+        logs.clear()
+        for statement, handle in list(running.values()):
+            self._bind_call(statement, self._join_call(handle))
+        running.clear()
+
+    def _select_case(self, statement: Dict, variables: Dict[str, Any] = None) -> Optional[List[Dict]]:
+        """if/match：按变量的值选择分支，返回分支的语句列表；没有命中且没有 else 时返回None"""
+        dispatcher = self._get_program().dispatcher(statement)
+        if dispatcher is None:
+            return None
+        index = dispatcher.match(str(self._evaluate_expression(statement.get('value'), variables)))
+        if index is None:
+            return None
+        return statement['children'][index].get('children', [])
+
+    def _extract(self, statement: Dict, variables: Dict[str, Any] = None) -> str:
+        """extract：从 $user_input 提取槽位值绑定到变量，本地提取器没有结果时调用LLM，都失败时为空字符串"""
+        if variables is None:
+            variables = self.variables
+        value, extractor, text = self._extract_local(statement, variables)
+        if value is None and extractor is not None and text:
+            value = self._extract_llm(statement, extractor, text)
+        return self._bind_slot(statement, value, variables)
+
+    def _extract_local(self, statement: Dict, variables: Dict[str, Any]):
+        """用本地提取器提取，返回 (值或None, 提取器, 输入文本)；没有提取器时提取器为None"""
+        extractor = self._get_program().extractor(statement)
+        text = str(variables.get('user_input', ''))
+        if extractor is None:
+            return None, None, text
+        value = extractor.extract(text)
+        METRICS.inc('extract_total', extractor=extractor.name, slot=statement['value']['value'][1:],
+                    result='hit' if value else 'miss')
+        return value, extractor, text
+
+    def _extract_llm(self, statement: Dict, extractor, text: str) -> Optional[str]:
+        """本地提取没有结果时调用LLM提取（网络请求，会话的异步接口在线程池中执行）"""
+        value = self.llm_client.extract_slot(text, extractor)
+        METRICS.inc('extract_total', extractor='llm', slot=statement['value']['value'][1:],
+                    result='hit' if value else 'miss')
+        return value
+
+    def _bind_slot(self, statement: Dict, value: Optional[str], variables: Dict[str, Any]) -> str:
+        slot = statement['value']['value'][1:]
+        value = value or ''
+        variables[slot] = value
+        self.log.debug("提取槽位 {} = '{}'", slot, value)
+        return value
+
+    def load_priors(self, path: str):
+        """读取 analytics.py --priors 生成的意图先验"""
+        with open(path, encoding='utf-8') as f:
+            self.priors = json.load(f)
+
+    def _fallback_intent(self, step_name: str, wait_statement: Dict) -> str:
+        """无法识别意图时跳转的候选：先验中该 wait 位置频率最高的候选，没有先验时为第一个候选"""
+        intents = wait_statement.get('value', [])
+        prior = self.priors.get(site_key(step_name, wait_statement.get('lineno', 0))) if self.priors else None
+        if prior:
+            best = max(intents, key=lambda intent: prior.get(intent, 0.0))
+            if prior.get(best):
+                return best
+        return intents[0]
+
+    def register_function(self, name: str, func, timeout: float = None, ttl: float = None,
+                          max_concurrency: int = None):
+        """注册 call 语句可以调用的函数，参数见 functions.FunctionRegistry.register"""
+        self.functions.register(name, func, timeout, ttl, max_concurrency)
+
+    def _call_arguments(self, statement: Dict, variables: Dict[str, Any] = None):
+        """call：返回 (函数名, 求值后的参数元组)"""
+        return statement['value'], tuple(self._evaluate_expression(arg, variables)
+                                         for arg in statement.get('children', ()))
+
+    def _invoke(self, name: str, args) -> str:
+        """同步调用函数，结果转换为字符串；失败（未注册、超时、异常）时返回 CALL_ERROR"""
+        return self._join_call(self.functions.start(name, args))
+
+    def _join_call(self, pending) -> str:
+        """等待 functions.start() 开始的调用，结果的转换与 _invoke 相同"""
+        try:
+            value = self.functions.wait(pending)
+        except CallError as e:
+            self.log.error("{}", e)
+            return CALL_ERROR
+        return '' if value is None else str(value)
+
+    async def _ainvoke(self, name: str, args) -> str:
+        """_invoke 的异步版本"""
+        try:
+            value = await self.functions.acall(name, args)
+        except CallError as e:
+            self.log.error("{}", e)
+            return CALL_ERROR
+        return '' if value is None else str(value)
+
+    def _bind_call(self, statement: Dict, value: str, variables: Dict[str, Any] = None):
+        """把调用结果赋给 call 语句的目标变量（没有目标变量时丢弃）"""
+        target = statement.get('target')
+        if target:
+            (self.variables if variables is None else variables)[target] = value
+
+    def _route_by_rules(self, wait_statement: Dict, user_input: str) -> Optional[str]:
+        """wait 的确定性路由：输入命中 when 规则且目标step存在时返回目标step，否则返回None（交给LLM识别）"""
+        program = self._get_program()
+        dispatcher = program.dispatcher(wait_statement)
+        if dispatcher is None:
+            return None
+        target = dispatcher.match(user_input)
+        if target is None:
+            return None
+        if program.get_step(target) is None:
+            self.log.debug("路由规则的目标步骤不存在: {}", target)
+            return None
+        METRICS.inc('route_total', source='rule')
+        return target
+
+    def _route_by_keywords(self, wait_statement: Dict, text: str) -> Optional[str]:
+        """
+        关键词预筛选：规范化的输入 text 只命中一个候选意图的关键词且该step存在时返回它，
+        没有命中或有歧义时返回None
+        """
+        program = self._get_program()
+        matcher = program.keyword_matcher(wait_statement)
+        if matcher is None:
+            return None
+        target = matcher.match(text)
+        if target is None or program.get_step(target) is None:
+            return None
+        METRICS.inc('route_total', source='keyword')
+        return target
+
+    def new_session(self):
+        """创建非阻塞的对话会话：多个会话共享本引擎编译后的脚本和LLM客户端，各自保存变量和进度"""
+        from session import DialogSession
+        return DialogSession(self)
 
     def get_variables(self) -> Dict[str, Any]:
         """获取当前变量状态"""
@@ -0,0 +1,81 @@
+
+# dsl_parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'ASSIGN CALL CASE COMMA ELSE END EQ EXTRACT GOTO ID IF KEYWORDS LOG LPAREN MATCH PLUS PREFIX REGEX REPLY RPAREN STEP STRING VARIABLE WAIT WHENscript : sectionssections : section sections\n                    | sectionsection : step_sectionstep_section : STEP ID statements\n                        | STEP ID KEYWORDS string_list statementsstatements : statement statements\n                     | statementstatement : reply_statement\n                    | log_statement\n                    | wait_statement\n                    | extract_statement\n                    | call_statement\n                    | if_statement\n                    | match_statementreply_statement : REPLY expressionlog_statement : LOG expressionwait_statement : WAIT string_list\n                          | WAIT string_list guard_listextract_statement : EXTRACT VARIABLE ID\n                             | EXTRACT VARIABLE REGEX string_listcall_statement : CALL ID ASSIGN ID LPAREN arguments RPAREN\n                          | CALL ID LPAREN arguments RPARENarguments : argument_list\n                     | argument_list : argument_list COMMA expression\n                         | expressionguard_list : guard_list guard\n                      | guardguard : WHEN pattern GOTO IDpattern : string_list\n                   | PREFIX string_list\n                   | REGEX string_listif_statement : IF VARIABLE condition statements END\n                        | IF VARIABLE condition statements ELSE statements ENDcondition : EQ string_list\n                     | PREFIX string_list\n                     | REGEX string_listmatch_statement : MATCH VARIABLE case_list END\n                           | MATCH VARIABLE case_list ELSE statements ENDcase_list : case_list case\n                     | casecase : CASE pattern statementsstring_list : string_list STRING\n                    | STRINGexpression : arithmetic_expression\n                      | simple_expressionarithmetic_expression : expression PLUS expressionsimple_expression : STRING\n                            | VARIABLE\n                            | ID'
+    
+_lr_action_items = {'STEP':([0,3,4,8,10,11,12,13,14,15,16,17,26,27,28,29,30,31,32,33,34,35,40,41,43,44,46,57,58,63,72,80,82,86,90,91,92,],[5,5,-4,-5,-8,-9,-10,-11,-12,-13,-14,-15,-45,-7,-16,-46,-47,-49,-50,-51,-17,-18,-6,-44,-19,-29,-20,-48,-28,-21,-39,-23,-34,-30,-40,-22,-35,]),'$end':([1,2,3,4,6,8,10,11,12,13,14,15,16,17,26,27,28,29,30,31,32,33,34,35,40,41,43,44,46,57,58,63,72,80,82,86,90,91,92,],[0,-1,-3,-4,-2,-5,-8,-9,-10,-11,-12,-13,-14,-15,-45,-7,-16,-46,-47,-49,-50,-51,-17,-18,-6,-44,-19,-29,-20,-48,-28,-21,-39,-23,-34,-30,-40,-22,-35,]),'ID':([5,18,19,22,36,42,48,49,76,79,81,],[7,33,33,37,46,33,64,33,86,33,33,]),'KEYWORDS':([7,],[9,]),'REPLY':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[18,18,-9,-10,-11,-12,-13,-14,-15,18,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,18,-48,-28,-31,-21,-36,-37,-38,-39,18,18,-32,-33,-23,-34,18,-30,-40,-22,-35,]),'LOG':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[19,19,-9,-10,-11,-12,-13,-14,-15,19,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,19,-48,-28,-31,-21,-36,-37,-38,-39,19,19,-32,-33,-23,-34,19,-30,-40,-22,-35,]),'WAIT':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[20,20,-9,-10,-11,-12,-13,-14,-15,20,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,20,-48,-28,-31,-21,-36,-37,-38,-39,20,20,-32,-33,-23,-34,20,-30,-40,-22,-35,]),'EXTRACT':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[21,21,-9,-10,-11,-12,-13,-14,-15,21,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,21,-48,-28,-31,-21,-36,-37,-38,-39,21,21,-32,-33,-23,-34,21,-30,-40,-22,-35,]),'CALL':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[22,22,-9,-10,-11,-12,-13,-14,-15,22,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,22,-48,-28,-31,-21,-36,-37,-38,-39,22,22,-32,-33,-23,-34,22,-30,-40,-22,-35,]),'IF':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[23,23,-9,-10,-11,-12,-13,-14,-15,23,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,23,-48,-28,-31,-21,-36,-37,-38,-39,23,23,-32,-33,-23,-34,23,-30,-40,-22,-35,]),'MATCH':([7,10,11,12,13,14,15,16,17,25,26,28,29,30,31,32,33,34,35,41,43,44,46,50,57,58,60,63,69,70,71,72,73,75,77,78,80,82,83,86,90,91,92,],[24,24,-9,-10,-11,-12,-13,-14,-15,24,-45,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,24,-48,-28,-31,-21,-36,-37,-38,-39,24,24,-32,-33,-23,-34,24,-30,-40,-22,-35,]),'STRING':([9,18,19,20,25,26,35,41,42,45,47,49,51,52,53,56,60,61,62,63,69,70,71,77,78,79,81,],[26,31,31,26,41,-45,41,-44,31,26,26,31,26,26,26,26,41,26,26,41,41,41,41,41,41,31,31,]),'END':([10,11,12,13,14,15,16,17,26,27,28,29,30,31,32,33,34,35,41,43,44,46,54,55,57,58,63,68,72,74,80,82,84,85,86,89,90,91,92,],[-8,-9,-10,-11,-12,-13,-14,-15,-45,-7,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,72,-42,-48,-28,-21,82,-39,-41,-23,-34,90,-43,-30,92,-40,-22,-35,]),'ELSE':([10,11,12,13,14,15,16,17,26,27,28,29,30,31,32,33,34,35,41,43,44,46,54,55,57,58,63,68,72,74,80,82,85,86,90,91,92,],[-8,-9,-10,-11,-12,-13,-14,-15,-45,-7,-16,-46,-47,-49,-50,-51,-17,-18,-44,-19,-29,-20,73,-42,-48,-28,-21,83,-39,-41,-23,-34,-43,-30,-40,-22,-35,]),'CASE':([10,11,12,13,14,15,16,17,26,27,28,29,30,31,32,33,34,35,39,41,43,44,46,54,55,57,58,63,72,74,80,82,85,86,90,91,92,],[-8,-9,-10,-11,-12,-13,-14,-15,-45,-7,-16,-46,-47,-49,-50,-51,-17,-18,56,-44,-19,-29,-20,56,-42,-48,-28,-21,-39,-41,-23,-34,-43,-30,-40,-22,-35,]),'VARIABLE':([18,19,21,23,24,42,49,79,81,],[32,32,36,38,39,32,32,32,32,]),'WHEN':([26,35,41,43,44,58,86,],[-45,45,-44,45,-29,-28,-30,]),'GOTO':([26,41,59,60,77,78,],[-45,-44,76,-31,-32,-33,]),'PLUS':([28,29,30,31,32,33,34,57,67,88,],[42,-46,-47,-49,-50,-51,42,42,42,42,]),'COMMA':([29,30,31,32,33,57,66,67,88,],[-46,-47,-49,-50,-51,-48,81,-27,-26,]),'RPAREN':([29,30,31,32,33,49,57,65,66,67,79,87,88,],[-46,-47,-49,-50,-51,-25,-48,80,-24,-27,-25,91,-26,]),'REGEX':([36,38,45,56,],[47,53,62,62,]),'ASSIGN':([37,],[48,]),'LPAREN':([37,64,],[49,79,]),'EQ':([38,],[51,]),'PREFIX':([38,45,56,],[52,61,61,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'script':([0,],[1,]),'sections':([0,3,],[2,6,]),'section':([0,3,],[3,3,]),'step_section':([0,3,],[4,4,]),'statements':([7,10,25,50,73,75,83,],[8,27,40,68,84,85,89,]),'statement':([7,10,25,50,73,75,83,],[10,10,10,10,10,10,10,]),'reply_statement':([7,10,25,50,73,75,83,],[11,11,11,11,11,11,11,]),'log_statement':([7,10,25,50,73,75,83,],[12,12,12,12,12,12,12,]),'wait_statement':([7,10,25,50,73,75,83,],[13,13,13,13,13,13,13,]),'extract_statement':([7,10,25,50,73,75,83,],[14,14,14,14,14,14,14,]),'call_statement':([7,10,25,50,73,75,83,],[15,15,15,15,15,15,15,]),'if_statement':([7,10,25,50,73,75,83,],[16,16,16,16,16,16,16,]),'match_statement':([7,10,25,50,73,75,83,],[17,17,17,17,17,17,17,]),'string_list':([9,20,45,47,51,52,53,56,61,62,],[25,35,60,63,69,70,71,60,77,78,]),'expression':([18,19,42,49,79,81,],[28,34,57,67,67,88,]),'arithmetic_expression':([18,19,42,49,79,81,],[29,29,29,29,29,29,]),'simple_expression':([18,19,42,49,79,81,],[30,30,30,30,30,30,]),'guard_list':([35,],[43,]),'guard':([35,43,],[44,58,]),'condition':([38,],[50,]),'case_list':([39,],[54,]),'case':([39,54,],[55,74,]),'pattern':([45,56,],[59,75,]),'arguments':([49,79,],[65,87,]),'argument_list':([49,79,],[66,66,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> script","S'",1,None,None,None),
+  ('script -> sections','script',1,'p_script','parser.py',60),
+  ('sections -> section sections','sections',2,'p_sections','parser.py',65),
+  ('sections -> section','sections',1,'p_sections','parser.py',66),
+  ('section -> step_section','section',1,'p_section','parser.py',73),
+  ('step_section -> STEP ID statements','step_section',3,'p_step_section','parser.py',78),
+  ('step_section -> STEP ID KEYWORDS string_list statements','step_section',5,'p_step_section','parser.py',79),
+  ('statements -> statement statements','statements',2,'p_statements','parser.py',89),
+  ('statements -> statement','statements',1,'p_statements','parser.py',90),
+  ('statement -> reply_statement','statement',1,'p_statement','parser.py',97),
+  ('statement -> log_statement','statement',1,'p_statement','parser.py',98),
+  ('statement -> wait_statement','statement',1,'p_statement','parser.py',99),
+  ('statement -> extract_statement','statement',1,'p_statement','parser.py',100),
+  ('statement -> call_statement','statement',1,'p_statement','parser.py',101),
+  ('statement -> if_statement','statement',1,'p_statement','parser.py',102),
+  ('statement -> match_statement','statement',1,'p_statement','parser.py',103),
+  ('reply_statement -> REPLY expression','reply_statement',2,'p_reply_statement','parser.py',108),
+  ('log_statement -> LOG expression','log_statement',2,'p_log_statement','parser.py',112),
+  ('wait_statement -> WAIT string_list','wait_statement',2,'p_wait_statement','parser.py',116),
+  ('wait_statement -> WAIT string_list guard_list','wait_statement',3,'p_wait_statement','parser.py',117),
+  ('extract_statement -> EXTRACT VARIABLE ID','extract_statement',3,'p_extract_statement','parser.py',122),
+  ('extract_statement -> EXTRACT VARIABLE REGEX string_list','extract_statement',4,'p_extract_statement','parser.py',123),
+  ('call_statement -> CALL ID ASSIGN ID LPAREN arguments RPAREN','call_statement',7,'p_call_statement','parser.py',134),
+  ('call_statement -> CALL ID LPAREN arguments RPAREN','call_statement',5,'p_call_statement','parser.py',135),
+  ('arguments -> argument_list','arguments',1,'p_arguments','parser.py',143),
+  ('arguments -> <empty>','arguments',0,'p_arguments','parser.py',144),
+  ('argument_list -> argument_list COMMA expression','argument_list',3,'p_argument_list','parser.py',148),
+  ('argument_list -> expression','argument_list',1,'p_argument_list','parser.py',149),
+  ('guard_list -> guard_list guard','guard_list',2,'p_guard_list','parser.py',157),
+  ('guard_list -> guard','guard_list',1,'p_guard_list','parser.py',158),
+  ('guard -> WHEN pattern GOTO ID','guard',4,'p_guard','parser.py',165),
+  ('pattern -> string_list','pattern',1,'p_pattern','parser.py',170),
+  ('pattern -> PREFIX string_list','pattern',2,'p_pattern','parser.py',171),
+  ('pattern -> REGEX string_list','pattern',2,'p_pattern','parser.py',172),
+  ('if_statement -> IF VARIABLE condition statements END','if_statement',5,'p_if_statement','parser.py',180),
+  ('if_statement -> IF VARIABLE condition statements ELSE statements END','if_statement',7,'p_if_statement','parser.py',181),
+  ('condition -> EQ string_list','condition',2,'p_condition','parser.py',190),
+  ('condition -> PREFIX string_list','condition',2,'p_condition','parser.py',191),
+  ('condition -> REGEX string_list','condition',2,'p_condition','parser.py',192),
+  ('match_statement -> MATCH VARIABLE case_list END','match_statement',4,'p_match_statement','parser.py',197),
+  ('match_statement -> MATCH VARIABLE case_list ELSE statements END','match_statement',6,'p_match_statement','parser.py',198),
+  ('case_list -> case_list case','case_list',2,'p_case_list','parser.py',206),
+  ('case_list -> case','case_list',1,'p_case_list','parser.py',207),
+  ('case -> CASE pattern statements','case',3,'p_case','parser.py',214),
+  ('string_list -> string_list STRING','string_list',2,'p_string_list','parser.py',219),
+  ('string_list -> STRING','string_list',1,'p_string_list','parser.py',220),
+  ('expression -> arithmetic_expression','expression',1,'p_expression','parser.py',228),
+  ('expression -> simple_expression','expression',1,'p_expression','parser.py',229),
+  ('arithmetic_expression -> expression PLUS expression','arithmetic_expression',3,'p_arithmetic_expression','parser.py',233),
+  ('simple_expression -> STRING','simple_expression',1,'p_simple_expression','parser.py',237),
+  ('simple_expression -> VARIABLE','simple_expression',1,'p_simple_expression','parser.py',238),
+  ('simple_expression -> ID','simple_expression',1,'p_simple_expression','parser.py',239),
+]
@@ -0,0 +1,357 @@
+"""
+event_log.py -
+对话事件日志，替代原先每个脚本一个的 .log 文本文件。所有会话的事件追加写入同一目录下的段文件，
+每条记录带会话ID、step、语句行号和时间戳：
+  - log：log 语句的内容（text）；
+  - turn：一轮对话。step/lineno 为等待输入的 wait 语句，text 为用户输入，intent 为跳转的 step，
+    source 为路由来源（rule/keyword/cache/semantic/llm/fallback），classify/execute 为意图识别与脚本执行的耗时（秒）。
+
+文件格式（小端）：段文件以 MAGIC 开头，之后是若干数据块。块头 _BLOCK 为（编码, 记录数, 数据长度, CRC32），
+编码 0 为原样、1 为 zlib 压缩。块内的记录依次排列，每条记录是定长头 _RECORD 加上各字符串的 UTF-8 字节。
+进程崩溃时最后一个块可能不完整，读取时忽略。
+
+写入：append() 只在内存缓冲区中编码记录；缓冲区满 block_bytes 或每隔 flush_interval 秒，
+由后台线程压缩并写入文件，请求路径上没有文件IO。段文件超过 segment_bytes 时换新文件，
+每个进程从新的段文件开始写，多个进程可以写同一个目录。打开新的段文件后，目录中的段文件超过
+max_segments 个时从序号最小的（最早的）开始删除已经关闭的段文件：本写入器写完的段，以及超过 IDLE_SECONDS
+没有修改的段（其他进程留下的）；其他写入器正在写的段不会被删除。万一当前段被删除，写入器换新的段文件继续写。
+
+环境变量：DSL_AGENT_EVENT_DIR 指定目录，DSL_AGENT_EVENT_COMPRESS=true 开启压缩，
+DSL_AGENT_EVENT_SEGMENT_MB 设置段文件大小（默认 64），DSL_AGENT_EVENT_MAX_SEGMENTS 设置保留的段文件数（默认 256，0 为不限）。
+
+命令行：python event_log.py <目录或段文件>... 按文本格式输出事件。
+"""
+
+import atexit
+import datetime
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import namedtuple
+from agent_log import get_logger
+
+MAGIC = b'DSLEVT1\n'
+SEGMENT_SUFFIX = '.evl'
+# 编码, 记录数, 数据长度, CRC32
+_BLOCK = struct.Struct('<BIII')
+# 时间戳, 识别耗时, 执行耗时, 类型, 行号, 以及会话ID/step/text/intent/source 的字节长度
+_RECORD = struct.Struct('<dffBIBHIHB')
+# _RECORD 末尾的字符串长度部分
+_LENGTHS = struct.Struct('<BHIHB')
+RAW, ZLIB = 0, 1
+
+KINDS = ('log', 'turn')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+DEFAULT_SEGMENT_MB = 64
+DEFAULT_MAX_SEGMENTS = 256
+# 其他写入器的段文件超过这么久没有修改才视为已关闭，可以删除
+IDLE_SECONDS = 3600
+BLOCK_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
+Event = namedtuple('Event', 'timestamp kind session step lineno text intent source classify execute')
+
+
+def _encode(kind, session, step, lineno, text, intent, source, classify, execute, timestamp):
+    session_b = session.encode('utf-8')[:0xFF]
+    step_b = step.encode('utf-8')[:0xFFFF]
+    text_b = text.encode('utf-8')
+    intent_b = intent.encode('utf-8')[:0xFFFF]
+    source_b = source.encode('utf-8')[:0xFF]
+    return b''.join((
+        _RECORD.pack(timestamp, classify, execute, KIND_CODES[kind], lineno, len(session_b), len(step_b),
+                     len(text_b), len(intent_b), len(source_b)),
+        session_b, step_b, text_b, intent_b, source_b))
+
+
+class EventLog:
+    """事件日志写入器，线程安全；后台线程在第一次 append 时启动，进程退出时写完缓冲区"""
+
+    def __init__(self, directory, segment_bytes=None, compress=None, flush_interval=FLUSH_INTERVAL,
+                 block_bytes=BLOCK_BYTES, max_segments=None):
+        self.directory = directory
+        if segment_bytes is None:
+            try:
+                segment_bytes = int(float(os.environ.get('DSL_AGENT_EVENT_SEGMENT_MB', DEFAULT_SEGMENT_MB)) * 2 ** 20)
+            except ValueError:
+                segment_bytes = DEFAULT_SEGMENT_MB * 2 ** 20
+        self.segment_bytes = segment_bytes
+        if max_segments is None:
+            try:
+                max_segments = int(os.environ.get('DSL_AGENT_EVENT_MAX_SEGMENTS', DEFAULT_MAX_SEGMENTS))
+            except ValueError:
+                max_segments = DEFAULT_MAX_SEGMENTS
+        self.max_segments = max_segments
+        if compress is None:
+            compress = os.environ.get('DSL_AGENT_EVENT_COMPRESS', 'false').lower() == 'true'
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.block_bytes = block_bytes
+        self.log = get_logger('events')
+        self._buffer = bytearray()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._file = None
+        self._segment_size = 0
+        # 本写入器创建的段序号（当前段之外都已关闭）
+        self._segments = set()
+
+    def append(self, kind, session='', step='', lineno=0, text='', intent='', source='',
+               classify=0.0, execute=0.0, timestamp=None):
+        """编码一条记录放入缓冲区"""
+        record = _encode(kind, session or '', step or '', lineno or 0, text, intent or '', source or '',
+                         classify, execute, time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._buffer += record
+            self._count += 1
+            if self._thread is None:
+                self._start()
+            if len(self._buffer) >= self.block_bytes:
+                self._hand_off()
+
+    def flush(self):
+        """把缓冲区交给后台线程，等待已提交的块全部写入文件"""
+        with self._lock:
+            self._hand_off()
+        self._queue.join()
+
+    def close(self):
+        """写完缓冲区并关闭当前段文件；之后再 append 会重新启动后台线程并写新的段文件"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._hand_off()
+            self._queue.put(None)
+        thread.join()
+        atexit.unregister(self.close)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='dsl-events', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _hand_off(self):
+        """调用方持有 _lock"""
+        if self._count:
+            self._queue.put((bytes(self._buffer), self._count))
+            self._buffer.clear()
+            self._count = 0
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._hand_off()
+                continue
+            try:
+                if item is None:
+                    self._close_segment()
+                    return
+                self._write_block(*item)
+            except OSError as e:
+                self.log.error("写入事件日志失败: {}", e)
+            finally:
+                self._queue.task_done()
+
+    def _write_block(self, data, count):
+        codec = RAW
+        if self.compress:
+            data = zlib.compress(data, 1)
+            codec = ZLIB
+        if (self._file is None or self._segment_size >= self.segment_bytes
+                or not os.fstat(self._file.fileno()).st_nlink):
+            self._open_segment()
+        block = _BLOCK.pack(codec, count, len(data), zlib.crc32(data)) + data
+        self._file.write(block)
+        self._segment_size += len(block)
+
+    def _open_segment(self):
+        self._close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        index = max((_segment_index(name) for name in os.listdir(self.directory)), default=0) + 1
+        while True:
+            path = os.path.join(self.directory, f"events-{index:06d}{SEGMENT_SUFFIX}")
+            try:
+                # 不带缓冲：每个块一次 write，其他进程读到的总是完整的块
+                self._file = open(path, 'xb', buffering=0)
+                break
+            except FileExistsError:
+                index += 1
+        self._file.write(MAGIC)
+        self._segment_size = len(MAGIC)
+        self._segments.add(index)
+        self._prune(index)
+
+    def _prune(self, current):
+        """段文件超过 max_segments 个时，从最早的开始删除已经关闭的段文件"""
+        if self.max_segments <= 0:
+            return
+        indexes = sorted(index for index in map(_segment_index, os.listdir(self.directory)) if index)
+        excess = len(indexes) - self.max_segments
+        idle_before = time.time() - IDLE_SECONDS
+        for index in indexes:
+            if excess <= 0:
+                break
+            if index == current:
+                continue
+            path = os.path.join(self.directory, f"events-{index:06d}{SEGMENT_SUFFIX}")
+            try:
+                if index in self._segments or os.stat(path).st_mtime < idle_before:
+                    os.remove(path)
+                    excess -= 1
+            except OSError:
+                pass
+            self._segments.discard(index)
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _segment_index(name):
+    if not (name.startswith('events-') and name.endswith(SEGMENT_SUFFIX)):
+        return 0
+    try:
+        return int(name[len('events-'):-len(SEGMENT_SUFFIX)])
+    except ValueError:
+        return 0
+
+
+def segment_files(paths):
+    """展开目录（按段序号排序）和段文件路径"""
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted((name for name in os.listdir(path) if _segment_index(name)), key=_segment_index)
+            files.extend(os.path.join(path, name) for name in names)
+        else:
+            files.append(path)
+    return files
+
+
+def iter_blocks(path):
+    """逐个产出段文件中数据块解压后的 (记录数, 数据)，遇到不完整或校验失败的块时停止；每次只读入一个块"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是事件日志段文件: {path}")
+        while True:
+            header = f.read(_BLOCK.size)
+            if len(header) < _BLOCK.size:
+                return
+            codec, count, length, crc = _BLOCK.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != crc:
+                return
+            yield count, zlib.decompress(data) if codec == ZLIB else data
+
+
+def iter_fields(data, count, kind=None):
+    """
+    逐条产出块内记录未解码的字段：(时间戳, 识别耗时, 执行耗时, 类型编码, 行号, 会话ID, step, text, intent, source)，
+    字符串字段为 bytes；kind 只保留该类型。供需要自己编码字符串的批量统计使用（见 analytics.py）
+    """
+    unpack = _RECORD.unpack_from
+    size = _RECORD.size
+    wanted = None if kind is None else KIND_CODES[kind]
+    offset = 0
+    for _ in range(count):
+        (timestamp, classify, execute, code, lineno,
+         session_len, step_len, text_len, intent_len, source_len) = unpack(data, offset)
+        start = offset + size
+        offset = start + session_len + step_len + text_len + intent_len + source_len
+        if wanted is not None and code != wanted:
+            continue
+        a = start + session_len
+        b = a + step_len
+        c = b + text_len
+        d = c + intent_len
+        yield (timestamp, classify, execute, code, lineno, data[start:a], data[a:b], data[b:c], data[c:d],
+               data[d:offset])
+
+
+def record_offsets(data, count):
+    """块内各条记录的起始偏移（array('q')），供按定长头批量解码的统计使用；只读取各记录头中的字符串长度"""
+    unpack = _LENGTHS.unpack_from
+    size = _RECORD.size
+    skip = size - _LENGTHS.size
+    offsets = array('q', bytes(8 * count))
+    offset = 0
+    for i in range(count):
+        offsets[i] = offset
+        a, b, c, d, e = unpack(data, offset + skip)
+        offset += size + a + b + c + d + e
+    return offsets
+
+
+def site_key(step, lineno):
+    """wait 位置的标识：step名称:行号"""
+    return f"{step}:{lineno}"
+
+
+def _decode_block(data, count, wanted):
+    unpack = _RECORD.unpack_from
+    size = _RECORD.size
+    offset = 0
+    for _ in range(count):
+        (timestamp, classify, execute, kind, lineno,
+         session_len, step_len, text_len, intent_len, source_len) = unpack(data, offset)
+        offset += size
+        if wanted is not None and kind not in wanted:
+            offset += session_len + step_len + text_len + intent_len + source_len
+            continue
+        start = offset
+        a = start + session_len
+        b = a + step_len
+        c = b + text_len
+        d = c + intent_len
+        offset = d + source_len
+        yield Event(timestamp, KINDS[kind], data[start:a].decode('utf-8', 'replace'),
+                    data[a:b].decode('utf-8', 'replace'), lineno, data[b:c].decode('utf-8', 'replace'),
+                    data[c:d].decode('utf-8', 'replace'), data[d:offset].decode('utf-8', 'replace'),
+                    classify, execute)
+
+
+def read_events(paths, kinds=None):
+    """按写入顺序产出目录或段文件中的事件；kinds 只保留指定类型，其他记录不解码字符串"""
+    wanted = None if kinds is None else {KIND_CODES[kind] for kind in kinds}
+    for path in segment_files(paths):
+        for count, data in iter_blocks(path):
+            yield from _decode_block(data, count, wanted)
+
+
+def format_event(event):
+    """事件的文本形式，log 事件与原先 .log 文件的行格式一致"""
+    timestamp = datetime.datetime.fromtimestamp(event.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    where = f"{event.session[:8]} {event.step}:{event.lineno}"
+    if event.kind == 'log':
+        return f"[{timestamp}] {event.text}  ({where})"
+    return (f"[{timestamp}] turn {where} {event.text!r} -> {event.intent} ({event.source}, "
+            f"识别 {event.classify * 1000:.1f}ms, 执行 {event.execute * 1000:.1f}ms)")
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print("用法: python event_log.py <目录或段文件>...", file=sys.stderr)
+        return 2
+    for event in read_events(args):
+        print(format_event(event))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
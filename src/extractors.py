@@ -0,0 +1,180 @@
+"""
+extractors.py -
+槽位提取器：extract 语句从用户输入中提取订单号、手机号、日期等值并绑定到变量。
+提取器在脚本加载时编译，运行时在本地用正则完成，不需要调用LLM：
+  - 内置类型提取器（TYPED_EXTRACTORS）：number、phone、date、order_id、email，
+    extract $phone phone；
+  - 正则提取器：extract $code regex "模式"...，按声明顺序尝试，
+    取第一个参与匹配的捕获分组，没有分组时取整个匹配。
+extract_batch() 把一批文本用分隔符连接后对每个模式只扫描一次，用于批量处理历史对话。
+"""
+
+import re
+from bisect import bisect_right
+
+# 批量扫描时连接文本的分隔符：不是单词字符也不是数字，边界断言在分隔符处的行为与文本首尾相同
+_SEPARATOR = '\x00'
+# 含行首/行尾锚点或环视的正则在连接后的文本上可能看到相邻的文本，只能逐条匹配
+_UNBATCHABLE = re.compile(r'[\^$]|\\[AZ]|\(\?<?[=!]')
+
+
+def _first_group(m):
+    """第一个参与匹配的捕获分组，没有分组时为整个匹配"""
+    for group in m.groups():
+        if group is not None:
+            return group
+    return m.group()
+
+
+def _digit_bounded(m):
+    """匹配两侧不能紧挨数字；代替开头的否定后顾断言，让正则保留首字符快速扫描"""
+    text, start, end = m.string, m.start(), m.end()
+    return (start == 0 or not text[start - 1].isdigit()) and (end == len(text) or not text[end].isdigit())
+
+
+def _phone(m):
+    return m.group() if _digit_bounded(m) else None
+
+
+def _full_date(m):
+    if not _digit_bounded(m):
+        return None
+    year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    if 1 <= month <= 12 and 1 <= day <= 31:
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    return None
+
+
+def _month_day(m):
+    if m.start() and m.string[m.start() - 1].isdigit():
+        return None
+    month, day = int(m.group(1)), int(m.group(2))
+    if 1 <= month <= 12 and 1 <= day <= 31:
+        return f"{month:02d}-{day:02d}"
+    return None
+
+
+_ORDER_ID = re.compile(r'[A-Za-z]{0,4}\d{6,20}')
+
+
+def _order_id(m):
+    """字母数字串整体符合订单号格式（至多4个字母前缀加6~20位数字）"""
+    value = m.group()
+    return value if _ORDER_ID.fullmatch(value) else None
+
+
+class Extractor:
+    """
+    按顺序尝试的 [(正则, 规范化函数, 可否批量)] 列表。
+    规范化函数把匹配对象转换为提取结果，返回None或空字符串时继续查找下一个匹配。
+    """
+
+    __slots__ = ('name', 'description', 'rules')
+
+    def __init__(self, name, rules, description=None):
+        self.name = name
+        self.description = description or name
+        self.rules = rules
+
+    @classmethod
+    def from_patterns(cls, patterns, description=None):
+        """extract ... regex "模式"... 的提取器；正则无效时抛出 re.error"""
+        rules = [(re.compile(p), _first_group, not _UNBATCHABLE.search(p)) for p in patterns]
+        return cls('regex', rules, description)
+
+    def extract(self, text):
+        """提取第一个值，没有时返回None"""
+        for rule in self.rules:
+            value = self._extract_one(rule, text)
+            if value:
+                return value
+        return None
+
+    def extract_batch(self, texts):
+        """批量提取，结果与逐条调用 extract 相同"""
+        results = [None] * len(texts)
+        pending = list(range(len(texts)))
+        for rule in self.rules:
+            if not pending:
+                break
+            regex, normalize, batchable = rule
+            if batchable and len(pending) > 1:
+                found, redo = self._scan_joined(regex, normalize, [texts[i] for i in pending])
+                for k in redo:
+                    found[k] = self._extract_one(rule, texts[pending[k]])
+            else:
+                found = {k: self._extract_one(rule, texts[i]) for k, i in enumerate(pending)}
+            for k, value in found.items():
+                if value:
+                    results[pending[k]] = value
+            pending = [i for i in pending if results[i] is None]
+        return results
+
+    @staticmethod
+    def _extract_one(rule, text):
+        regex, normalize, _ = rule
+        for m in regex.finditer(text):
+            value = normalize(m)
+            if value:
+                return value
+        return None
+
+    @staticmethod
+    def _scan_joined(regex, normalize, chunk):
+        """
+        在连接后的文本上扫描一遍，返回 ({序号: 值}, 需要逐条重做的序号集合)。
+        跨越分隔符的匹配可能吞掉后面文本中的匹配，涉及的文本都逐条重做。
+        """
+        starts = []
+        offset = 0
+        for text in chunk:
+            starts.append(offset)
+            offset += len(text) + 1
+        joined = _SEPARATOR.join(chunk)
+        found = {}
+        redo = set()
+        for m in regex.finditer(joined):
+            k = bisect_right(starts, m.start()) - 1
+            if m.end() > starts[k] + len(chunk[k]):
+                last = bisect_right(starts, m.end() - 1) - 1
+                redo.update(range(k + 1, last + 1))
+                if k not in found:
+                    redo.add(k)
+                continue
+            if k in found or k in redo:
+                continue
+            value = normalize(m)
+            if value:
+                found[k] = value
+        for k in redo:
+            found.pop(k, None)
+        return found, redo
+
+
+def _typed(name, description, rules):
+    return Extractor(name, [(re.compile(p), normalize or _first_group, True) for p, normalize in rules],
+                     description)
+
+
+# 内置提取器的正则都以字面量或字符集开头（边界在规范化函数中检查），
+# 正则引擎可以快速跳过不可能匹配的位置，批量扫描连接后的长文本时收益明显
+TYPED_EXTRACTORS = {
+    'number': _typed('number', '数字', [(r'-?\d+(?:\.\d+)?', None)]),
+    'phone': _typed('phone', '手机号', [(r'1[3-9]\d{9}', _phone)]),
+    'date': _typed('date', '日期', [
+        (r'(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})', _full_date),
+        (r'(\d{1,2})月(\d{1,2})[日号]', _month_day),
+    ]),
+    'order_id': _typed('order_id', '订单号', [(r'[0-9A-Za-z]+', _order_id)]),
+    'email': _typed('email', '邮箱地址', [(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+', None)]),
+}
+
+
+def get_extractor(kind, patterns=None, description=None):
+    """按 extract 语句的类型取提取器；未知类型抛出 ValueError，正则无效时抛出 re.error"""
+    if kind == 'regex':
+        return Extractor.from_patterns(patterns or (), description)
+    extractor = TYPED_EXTRACTORS.get(kind)
+    if extractor is None:
+        raise ValueError(f"未知的提取器: {kind}，可选: regex, {', '.join(TYPED_EXTRACTORS)}")
+    return extractor
@@ -0,0 +1,317 @@
+"""
+functions.py -
+call 语句调用的外部函数注册表。脚本通过 call 调用宿主程序注册的 Python 函数（查询订单、创建工单等）：
+
+    engine.register_function('get_order_status', get_order_status, timeout=2.0, ttl=60, max_concurrency=4)
+    # 脚本中：call status = get_order_status($order_id)
+
+  - 同步函数在有界线程池中执行，会话按超时时间等待结果；异步会话（astream_*）中 await 结果，
+    不阻塞事件循环；async def 定义的函数在异步会话中直接在事件循环上执行；
+  - timeout：每次调用的超时（秒），超时后不再等待，函数本身会继续执行到返回；
+  - ttl：按参数缓存结果的秒数，缓存期内相同参数的调用直接返回；
+  - max_concurrency：同一函数同时执行的调用数上限，等待空位的时间计入超时；
+    没有空位的同步调用在该函数的等待队列中排队，不占用线程池，开始调用（start）也不阻塞会话；
+    调用结束释放空位时直接提交队列中最早的调用，排队超过超时时间的调用报 busy。
+
+环境变量 DSL_AGENT_CALL_WORKERS 设置线程池大小（默认 8），DSL_AGENT_CALL_TIMEOUT 设置默认超时（默认 5 秒）。
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from metrics import METRICS
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 5.0
+# 每个函数最多缓存的参数组合数，超出时淘汰最早写入的
+CACHE_SIZE = 1024
+# 异步调用等待并发空位的轮询间隔（秒）
+ACQUIRE_POLL_INTERVAL = 0.005
+# 调用失败时赋给目标变量的值，脚本中用 if $result == "error" 判断
+CALL_ERROR = 'error'
+
+
+class CallError(Exception):
+    """函数调用失败：未注册、超时、等待并发空位超时或函数抛出异常"""
+
+    def __init__(self, name, reason, message):
+        super().__init__(f"调用函数 {name} 失败（{reason}）: {message}")
+        self.name = name
+        self.reason = reason
+
+
+def _env_number(name, default, kind):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class _Busy(Exception):
+    """排队的调用在截止时间前没有取得并发空位"""
+
+
+def _run_coroutine(func, args):
+    """在线程池中执行 async def 函数（同步调用路径）"""
+    return asyncio.run(func(*args))
+
+
+def _transfer(source, target):
+    """把线程池 future 的结果转给排队调用的 future"""
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class RegisteredFunction:
+    """注册的函数及其调用策略和结果缓存"""
+
+    __slots__ = ('name', 'func', 'timeout', 'ttl', 'semaphore', 'waiting', 'is_async', 'cache', 'lock')
+
+    def __init__(self, name, func, timeout, ttl=None, max_concurrency=None):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.ttl = ttl
+        self.semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        # 等待并发空位的 PendingCall，按开始顺序；与空位的交接都在 lock 内进行
+        self.waiting = deque()
+        self.is_async = inspect.iscoroutinefunction(func)
+        # 参数元组 -> (过期时间, 结果)
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def cached(self, args):
+        """返回 (是否命中, 结果)"""
+        if not self.ttl:
+            return False, None
+        try:
+            entry = self.cache.get(args)
+        except TypeError:
+            return False, None
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def store(self, args, value):
+        if not self.ttl:
+            return
+        with self.lock:
+            try:
+                self.cache[args] = (time.monotonic() + self.ttl, value)
+            except TypeError:
+                return
+            if len(self.cache) > CACHE_SIZE:
+                del self.cache[next(iter(self.cache))]
+
+
+class PendingCall:
+    """FunctionRegistry.start 开始的调用：进行中（future）、命中缓存（value）或已经失败（error）"""
+
+    __slots__ = ('fn', 'args', 'future', 'value', 'error', 'start', 'deadline', 'started')
+
+    def __init__(self, fn, args, future=None, value=None, error=None, start=0.0, deadline=0.0):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.value = value
+        self.error = error
+        self.start = start
+        self.deadline = deadline
+        # 受并发数限制的调用取得空位、提交到线程池后为True
+        self.started = False
+
+
+class FunctionRegistry:
+    """函数注册表与执行调用的线程池（第一次调用同步函数时才创建），线程安全"""
+
+    def __init__(self, max_workers=None, timeout=None):
+        self.max_workers = max_workers or _env_number('DSL_AGENT_CALL_WORKERS', DEFAULT_WORKERS, int)
+        self.timeout = _env_number('DSL_AGENT_CALL_TIMEOUT', DEFAULT_TIMEOUT, float) if timeout is None else timeout
+        self.functions = {}
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def register(self, name, func, timeout=None, ttl=None, max_concurrency=None):
+        """注册（或替换）函数，替换时清空原来的缓存"""
+        if not callable(func):
+            raise TypeError(f"函数 {name} 不可调用")
+        self.functions[name] = RegisteredFunction(name, func, self.timeout if timeout is None else timeout,
+                                                  ttl, max_concurrency)
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='dsl-call')
+        return self._executor
+
+    def shutdown(self, wait=False):
+        """关闭线程池；正在执行的函数不会被中断"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _lookup(self, name, args):
+        """返回 (函数, 是否命中缓存, 缓存的结果)"""
+        fn = self.functions.get(name)
+        if fn is None:
+            METRICS.inc('call_total', function=name, result='unregistered')
+            raise CallError(name, 'unregistered', "函数未注册")
+        hit, value = fn.cached(args)
+        if hit:
+            METRICS.inc('call_total', function=name, result='cache')
+        return fn, hit, value
+
+    def _execute(self, fn, args):
+        if fn.is_async:
+            return self.executor.submit(_run_coroutine, fn.func, args)
+        return self.executor.submit(fn.func, *args)
+
+    def _submit(self, fn, args):
+        """提交到线程池；函数有并发数限制时调用方已取得空位，函数执行结束后释放"""
+        try:
+            future = self._execute(fn, args)
+        except BaseException:
+            if fn.semaphore is not None:
+                self._release(fn)
+            raise
+        if fn.semaphore is not None:
+            future.add_done_callback(lambda _: self._release(fn))
+        return future
+
+    def _release(self, fn):
+        """释放并发空位：有排队的调用时把空位直接交给最早的一个并提交到线程池"""
+        while True:
+            with fn.lock:
+                pending = None
+                while fn.waiting:
+                    candidate = fn.waiting.popleft()
+                    # 等待方超时后已取消的调用跳过
+                    if candidate.future.set_running_or_notify_cancel():
+                        pending = candidate
+                        break
+                if pending is None:
+                    fn.semaphore.release()
+                    return
+            if pending.deadline <= time.monotonic():
+                pending.future.set_exception(_Busy())
+                continue
+            try:
+                future = self._execute(fn, pending.args)
+            except Exception as e:
+                pending.future.set_exception(e)
+                continue
+            pending.started = True
+            future.add_done_callback(lambda done: _transfer(done, pending.future))
+            future.add_done_callback(lambda _: self._release(fn))
+            return
+
+    def _finish(self, fn, args, value, start):
+        fn.store(args, value)
+        METRICS.inc('call_total', function=fn.name, result='ok')
+        METRICS.observe('call', time.perf_counter() - start, function=fn.name)
+        return value
+
+    def _fail(self, fn, reason, message):
+        METRICS.inc('call_total', function=fn.name, result=reason)
+        return CallError(fn.name, reason, message)
+
+    def _busy(self, fn):
+        return self._fail(fn, 'busy', f"{fn.timeout}秒内没有空闲的并发名额")
+
+    def start(self, name, args=()):
+        """开始一次同步调用，不等待结果：提交到线程池后返回 PendingCall，结果由 wait() 取得"""
+        args = tuple(args)
+        try:
+            fn, hit, value = self._lookup(name, args)
+        except CallError as e:
+            return PendingCall(None, args, error=e)
+        if hit:
+            return PendingCall(fn, args, value=value)
+        pending = PendingCall(fn, args, start=time.perf_counter(), deadline=time.monotonic() + fn.timeout)
+        if fn.semaphore is not None:
+            with fn.lock:
+                queued = not fn.semaphore.acquire(blocking=False)
+                if queued:
+                    # 没有空位：排队，由释放空位的调用提交，不占用线程池
+                    waiting = fn.waiting
+                    while waiting and waiting[0].future.cancelled():
+                        waiting.popleft()
+                    pending.future = Future()
+                    waiting.append(pending)
+            if queued:
+                return pending
+            pending.started = True
+        try:
+            pending.future = self._submit(fn, args)
+        except Exception as e:
+            pending.error = self._fail(fn, 'error', repr(e))
+        return pending
+
+    def wait(self, pending):
+        """等待 start() 开始的调用，超时时间从开始调用时算起；返回函数的结果，失败时抛出 CallError"""
+        if pending.error is not None:
+            raise pending.error
+        future = pending.future
+        if future is None:
+            return pending.value
+        fn = pending.fn
+        try:
+            value = future.result(timeout=max(0.0, pending.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            if fn.semaphore is None or pending.started:
+                raise self._fail(fn, 'timeout', f"超过{fn.timeout}秒") from None
+            raise self._busy(fn) from None
+        except _Busy:
+            raise self._busy(fn) from None
+        except Exception as e:
+            raise self._fail(fn, 'error', repr(e)) from e
+        return self._finish(fn, pending.args, value, pending.start)
+
+    def call(self, name, args=()):
+        """同步调用，返回函数的结果；失败时抛出 CallError"""
+        return self.wait(self.start(name, args))
+
+    async def acall(self, name, args=()):
+        """异步调用：同步函数在线程池中执行并 await 结果，async def 函数直接在当前事件循环上执行"""
+        args = tuple(args)
+        fn, hit, value = self._lookup(name, args)
+        if hit:
+            return value
+        start = time.perf_counter()
+        deadline = time.monotonic() + fn.timeout
+        semaphore = fn.semaphore
+        # 轮询等待并发空位：任务被取消时不会留下一个稍后才取得名额、却无人释放的等待线程
+        while semaphore is not None and not semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise self._busy(fn)
+            await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            if fn.is_async:
+                try:
+                    value = await asyncio.wait_for(fn.func(*args), remaining)
+                finally:
+                    if semaphore is not None:
+                        self._release(fn)
+            else:
+                value = await asyncio.wait_for(asyncio.wrap_future(self._submit(fn, args)), remaining)
+        except asyncio.TimeoutError:
+            raise self._fail(fn, 'timeout', f"超过{fn.timeout}秒") from None
+        except Exception as e:
+            raise self._fail(fn, 'error', repr(e)) from e
+        return self._finish(fn, args, value, start)
@@ -0,0 +1,169 @@
+"""
+http_llm.py -
+最小化的 OpenAI 兼容 /chat/completions 客户端，可替代 openai SDK 作为 LLMClient 的后端
+（DSL_AGENT_LLM_BACKEND=http）。
+
+只实现意图识别用到的一种请求：
+  - 每个线程一条 HTTP/1.1 长连接，服务端断开后自动重连并重发一次；
+  - 请求体按模板预先序列化，每次只拼接JSON转义后的消息列表；
+  - 响应只取 choices[0].message.content，优先直接定位该字段，结构不符时再完整解析JSON；
+    token 用量（usage）只在调用 last_usage() 时才解析。
+"""
+
+import http.client
+import json
+import threading
+from json.decoder import scanstring
+from urllib.parse import urlsplit
+
+_DECODER = json.JSONDecoder()
+
+_PLACEHOLDER = '\x00messages\x00'
+# 复用的长连接已被服务端关闭时出现的异常，可以安全地重连重发
+_STALE_CONNECTION = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                     http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class LLMHTTPError(Exception):
+    """服务端返回非200状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def extract_content(body):
+    """从 chat.completion 响应文本中取 choices[0].message.content"""
+    choices = body.find('"choices"')
+    pos = body.find('"content"', choices) if choices >= 0 else -1
+    if pos >= 0:
+        pos += 9
+        length = len(body)
+        while pos < length and body[pos] in ' \t\r\n:':
+            pos += 1
+        if pos < length and body[pos] == '"':
+            return scanstring(body, pos + 1)[0]
+    # content 为 null、数组等情况走完整解析
+    data = json.loads(body)
+    return data['choices'][0]['message']['content'] or ''
+
+
+def extract_usage(body):
+    """从响应文本中取 token 用量：{'prompt_tokens', 'completion_tokens', 'cached_tokens'}，没有时返回None"""
+    pos = body.rfind('"usage"')
+    start = body.find('{', pos) if pos >= 0 else -1
+    if start < 0:
+        return None
+    try:
+        usage, _ = _DECODER.raw_decode(body, start)
+    except ValueError:
+        return None
+    details = usage.get('prompt_tokens_details') or {}
+    return {'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'cached_tokens': details.get('cached_tokens') or 0}
+
+
+class HTTPChatClient:
+    """持有长连接和预序列化请求模板的聊天补全客户端，线程安全（每个线程独立连接）"""
+
+    def __init__(self, base_url, api_key, model, temperature=0.1, max_tokens=10, timeout=30.0):
+        url = urlsplit(base_url)
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f"不支持的地址: {base_url}")
+        self.https = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path.rstrip('/') + '/chat/completions'
+        self.timeout = timeout
+        host_header = url.netloc.rpartition('@')[2]
+        self.headers = {
+            'Host': host_header,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Connection': 'keep-alive',
+        }
+        if api_key:
+            self.headers['Authorization'] = f"Bearer {api_key}"
+        self._head, self._tail = self._template(model, temperature, max_tokens)
+        self._local = threading.local()
+
+    @staticmethod
+    def _template(model, temperature, max_tokens):
+        """把除消息列表以外的请求体序列化一次，返回消息列表前后的两段字节"""
+        payload = {
+            'model': model,
+            'messages': _PLACEHOLDER,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': False,
+        }
+        text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        head, tail = text.split(json.dumps(_PLACEHOLDER))
+        return head.encode('utf-8'), tail.encode('utf-8')
+
+    def _connect(self):
+        if self.https:
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _discard(self, conn):
+        """请求失败后关闭连接，下一次请求重新建立"""
+        conn.close()
+        self._local.conn = None
+
+    def complete(self, messages):
+        """发送消息列表（或单条用户消息的文本），返回模型回复的文本"""
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        body = (self._head + json.dumps(messages, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                + self._tail)
+        conn = getattr(self._local, 'conn', None)
+        reused = conn is not None
+        if conn is None:
+            conn = self._connect()
+        try:
+            status, data = self._roundtrip(conn, body)
+        except _STALE_CONNECTION:
+            self._discard(conn)
+            if not reused:
+                raise
+            conn = self._connect()
+            try:
+                status, data = self._roundtrip(conn, body)
+            except Exception:
+                self._discard(conn)
+                raise
+        except Exception:
+            self._discard(conn)
+            raise
+        text = data.decode('utf-8')
+        if status != 200:
+            self._local.body = None
+            raise LLMHTTPError(status, text[:200])
+        self._local.body = text
+        return extract_content(text)
+
+    def last_usage(self):
+        """当前线程上一次成功请求的 token 用量"""
+        body = getattr(self._local, 'body', None)
+        return extract_usage(body) if body else None
+
+    def _roundtrip(self, conn, body):
+        conn.request('POST', self.path, body, self.headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.will_close:
+            conn.close()
+            self._local.conn = None
+        return response.status, data
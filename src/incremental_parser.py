@@ -0,0 +1,261 @@
+"""
+incremental_parser.py -
+增量解析模块。脚本是扁平的 step 区块序列，编辑后只对文本发生变化的区块重新做
+词法/语法分析，并把结果拼接回上一次的语法树，保存到就绪的延迟与脚本大小无关。
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from parser import Parser
+
+_NEWLINE = re.compile('\n')
+_STEP_LINE = re.compile(r'[ \t]*step\b')
+
+
+def _shift_lines(node, delta):
+    """把语法树节点（含子节点）的行号整体平移 delta 行"""
+    if isinstance(node, dict):
+        if 'lineno' in node:
+            node['lineno'] += delta
+        value = node.get('value')
+        if isinstance(value, dict):
+            _shift_lines(value, delta)
+        for child in node.get('children', ()):
+            _shift_lines(child, delta)
+
+
+def _common_prefix(a, b):
+    """二分查找两段文本的公共前缀长度，比较都在C层完成"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if b.startswith(a[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    """二分查找两段文本的公共后缀长度（不超过 limit）"""
+    lo, hi = 0, limit
+    len_a, len_b = len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if b.endswith(a[len_a - mid:len_a - lo], 0, len_b - lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _is_old_start(starts, offset, last):
+    """offset 是否恰好是某个位于变化区域之后的旧区块起点"""
+    index = bisect_left(starts, offset)
+    return last < index < len(starts) and starts[index] == offset
+
+
+class IncrementalParser:
+    """
+    增量解析器。
+
+    源码被切分为若干区块：第0块是第一个 step 之前的前导文本（通常只有注释和空白），
+    其后每个 step 关键字开始一个新区块，直到下一个 step 关键字为止。
+    每次 update() 只重新分析发生变化的区块，其余区块的语法树节点原样复用。
+    任一区块存在语法错误时返回None（不做PLY式的错误恢复），修正后再次 update() 即可恢复。
+    """
+
+    def __init__(self, debug=False):
+        self.parser = Parser(debug=debug)
+        self.text = None
+        self._script = None
+        # 各区块的并行数组：起始偏移、起始行号、语法树节点、是否有语法错误
+        self._starts = []
+        self._linenos = []
+        self._nodes = []
+        self._failed = []
+        self._failed_count = 0
+        # 最近一次更新重新分析的区块数（便于测试和基准测试观察）
+        self.last_reparsed = 0
+        # 最近一次成功的更新相对上一次成功的更新被替换和新增的 step 节点（供增量编译使用）；
+        # 中间有语法错误的更新时累计到下一次成功为止。完整解析（parse() 或没有初始化时的 update()）
+        # 返回新的语法树对象，此时调用方应完整编译
+        self.removed = []
+        self.added = []
+        self._removed = {}
+        self._added = {}
+
+    def parse(self, data):
+        """完整解析脚本（丢弃之前的增量状态）"""
+        self.text = None
+        return self.update(data)
+
+    def seed(self, text, ast):
+        """
+        用已经解析好的语法树（任一解析器后端或语法树缓存的结果）初始化增量状态，之后的 update() 只重新分析变化的区块。
+        各区块的起点由 step 节点的行号定位，不做词法/语法分析；ast 被原地更新。
+        区块与文本对不上时返回 False，下一次 update() 完整解析
+        """
+        sections = (ast or {}).get('children', ())
+        line_starts = [0]
+        line_starts += [m.end() for m in _NEWLINE.finditer(text)]
+        starts, linenos = [0], [1]
+        for section in sections:
+            is_step = isinstance(section, dict) and section.get('type') == 'Step'
+            lineno = section.get('lineno', 0) if is_step else 0
+            match = _STEP_LINE.match(text, line_starts[lineno - 1]) if 0 < lineno <= len(line_starts) else None
+            start = match.end() - len('step') if match else -1
+            # 区块必须按文本顺序排列（第一个 step 可以与前导区块同在偏移0处）
+            if start < 0 or len(starts) > 1 and start <= starts[-1]:
+                self.text = None
+                return False
+            starts.append(start)
+            linenos.append(lineno)
+        self._starts, self._linenos = starts, linenos
+        self._nodes = [None] + list(sections)
+        self._failed = [False] * len(starts)
+        self._failed_count = 0
+        self._script = ast
+        self._removed, self._added = {}, {}
+        self.text = text
+        self.last_reparsed = 0
+        return True
+
+    def apply_edit(self, start, end, replacement):
+        """把 [start, end) 范围内的文本替换为 replacement 后增量重新解析"""
+        return self.update(self.text[:start] + replacement + self.text[end:])
+
+    def update(self, new_text):
+        """用编辑后的完整脚本文本增量更新语法树，返回新的语法树（有语法错误时为None）"""
+        old_text = self.text
+        if old_text is None:
+            self._reset()
+            first, last = 0, -1
+        elif new_text == old_text:
+            self.last_reparsed = 0
+            return self._result()
+        else:
+            first, last = self._changed_range(old_text, new_text)
+
+        delta = len(new_text) - (len(old_text) if old_text is not None else 0)
+        # 从第一个变化区块的前一个区块开始重新分析，避免编辑恰好落在区块边界上
+        first = max(first - 1, 0)
+        if first < len(self._starts):
+            pos, lineno = self._starts[first], self._linenos[first]
+        else:
+            pos, lineno = 0, 1
+        region_end = (self._segment_end(last, old_text) + delta) if last >= first else pos
+
+        groups, resync = self._relex(new_text, pos, lineno, first == 0, region_end, delta, last)
+        self._splice(first, resync, groups, delta)
+        self.text = new_text
+        return self._result()
+
+    def _reset(self):
+        self._starts, self._linenos = [], []
+        self._nodes, self._failed = [], []
+        self._failed_count = 0
+        self._script = {'type': 'Script', 'lineno': 1, 'children': []}
+        self._removed, self._added = {}, {}
+
+    def _segment_end(self, index, text):
+        if index + 1 < len(self._starts):
+            return self._starts[index + 1]
+        return len(text)
+
+    def _changed_range(self, old_text, new_text):
+        """比较新旧文本，返回发生变化的旧区块下标范围 [first, last]"""
+        prefix = _common_prefix(old_text, new_text)
+        suffix = _common_suffix(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+        changed_end = len(old_text) - suffix
+        first = bisect_right(self._starts, prefix) - 1
+        last = bisect_right(self._starts, max(changed_end - 1, prefix)) - 1
+        return first, last
+
+    def _relex(self, text, pos, lineno, with_preamble, region_end, delta, last):
+        """
+        从 pos 开始重新做词法分析，按 STEP 切分为区块。
+        越过变化区域后，一旦遇到落在旧区块起点上的 STEP，说明词法状态已经重新同步，
+        返回 (区块列表, 同步到的旧区块下标)；分析到文件末尾时同步下标为 None。
+        """
+        lexer = self.parser.lexer.lexer
+        lexer.input(text)
+        lexer.lexpos = pos
+        lexer.lineno = lineno
+
+        starts = self._starts
+        groups = [(pos, lineno, [])] if with_preamble else []
+        while True:
+            tok = lexer.token()
+            if tok is None:
+                return groups, None
+            if tok.type == 'STEP':
+                if tok.lexpos >= region_end and _is_old_start(starts, tok.lexpos - delta, last):
+                    return groups, (bisect_left(starts, tok.lexpos - delta), tok.lineno)
+                groups.append((tok.lexpos, tok.lineno, [tok]))
+            elif groups:
+                groups[-1][2].append(tok)
+            else:
+                # 起点处不是 step 关键字（不应发生），退化为前导区块处理
+                groups.append((pos, lineno, [tok]))
+
+    def _splice(self, first, resync, groups, delta):
+        """用新区块替换旧区块 [first, resync)，并平移其后区块的偏移与行号"""
+        if resync is None:
+            stop, line_delta = len(self._starts), 0
+        else:
+            stop, new_lineno = resync
+            line_delta = new_lineno - self._linenos[stop]
+
+        starts, linenos, nodes, failed = [], [], [], []
+        for index, (start, lineno, tokens) in enumerate(groups):
+            node, bad = self._parse_group(tokens, is_preamble=(first == 0 and index == 0))
+            starts.append(start)
+            linenos.append(lineno)
+            nodes.append(node)
+            failed.append(bad)
+
+        self._failed_count += sum(failed) - sum(self._failed[first:stop])
+        for node in self._nodes[first:stop]:
+            if node is not None and self._added.pop(id(node), None) is None:
+                self._removed[id(node)] = node
+        for node in nodes:
+            if node is not None:
+                self._added[id(node)] = node
+
+        if delta:
+            self._starts[stop:] = [s + delta for s in self._starts[stop:]]
+        if line_delta:
+            self._linenos[stop:] = [n + line_delta for n in self._linenos[stop:]]
+            for node in self._nodes[stop:]:
+                _shift_lines(node, line_delta)
+
+        self._starts[first:stop] = starts
+        self._linenos[first:stop] = linenos
+        self._nodes[first:stop] = nodes
+        self._failed[first:stop] = failed
+        self.last_reparsed = len(groups)
+
+    def _parse_group(self, tokens, is_preamble):
+        """解析一个区块的token，返回 (Step节点, 是否出错)"""
+        if is_preamble:
+            # 前导区块只能包含注释和空白，出现任何token都是语法错误
+            if tokens:
+                self.parser.parse_tokens(tokens)
+            return None, bool(tokens)
+        result = self.parser.parse_tokens(tokens)
+        if not result or self.parser.error_count or len(result.get('children', [])) != 1:
+            return None, True
+        return result['children'][0], False
+
+    def _result(self):
+        """没有语法错误时把各区块节点写回语法树（原地更新，保持语法树对象不变）"""
+        if self._failed_count or len(self._nodes) < 2:
+            self.removed, self.added = [], []
+            return None
+        # 只复制节点引用，不重新构造节点；出错时不改动上一次可用的语法树
+        self._script['children'][:] = self._nodes[1:]
+        self.removed, self.added = list(self._removed.values()), list(self._added.values())
+        self._removed.clear()
+        self._added.clear()
+        return self._script
@@ -0,0 +1,179 @@
+"""
+intent_cache.py -
+意图缓存：wait 处规则和关键词都没有命中时，先按 (wait 位置, 规范化的用户输入) 查缓存，
+命中时不调用LLM；LLM给出有效意图后写入缓存。缓存有容量上限，超出时淘汰最久没有使用的。
+输入由调用方每轮规范化一次（normalizer.Normalizer）后传入，缓存本身不做处理。
+
+部署后缓存是空的，预热从历史对话中载入最常见的 (wait 位置, 输入) -> 意图，来源可以是：
+  - analytics.py --warmup 导出的预热列表（每行一个JSON：site、input、intent、count、share）；
+  - save() 导出的缓存快照（格式相同）；
+  - 事件日志目录（调用 analytics.analyze 现场统计）。
+warm_async() 在后台线程中载入，不推迟引擎启动；预热的条目不覆盖已经由LLM写入的条目。
+
+DSL_AGENT_SEMANTIC_CACHE=true 时启用第二层近似缓存（semantic_cache.SemanticCache）：精确缓存未命中时
+由 similar() 查找与输入相近、候选意图相同的条目。近似缓存只保存LLM写入的条目，预热条目不带候选意图集合，不载入。
+
+环境变量：DSL_AGENT_INTENT_CACHE_SIZE 设置容量（默认 10000，0 关闭缓存），
+DSL_AGENT_INTENT_WARMUP 指定预热来源，DSL_AGENT_INTENT_WARMUP_TOP 设置预热条数（默认 1000）。
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from agent_log import get_logger
+from metrics import METRICS
+from normalizer import normalize as default_normalize
+from semantic_cache import SemanticCache
+
+DEFAULT_SIZE = 10000
+DEFAULT_WARMUP_TOP = 1000
+# 多数意图所占比例低于该值的预热条目有歧义，不载入
+MIN_SHARE = 0.5
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class IntentCache:
+    """
+    线程安全的 LRU 意图缓存；normalize 为规范化预热条目输入的函数，应与调用方规范化输入的方式相同，
+    semantic 为近似缓存（None 时按环境变量决定是否创建）
+    """
+
+    def __init__(self, size=None, normalize=None, semantic=None):
+        self.size = _env_int('DSL_AGENT_INTENT_CACHE_SIZE', DEFAULT_SIZE) if size is None else size
+        self.normalize = normalize or default_normalize
+        if semantic is None and self.enabled and \
+                os.environ.get('DSL_AGENT_SEMANTIC_CACHE', 'false').lower() == 'true':
+            semantic = SemanticCache()
+        self.semantic = semantic if semantic is not None and semantic.enabled else None
+        self.log = get_logger('cache')
+        # (wait 位置, 规范化输入) -> [意图, 命中次数]，按最近使用排列
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._warm_thread = None
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, site, text, intents):
+        """按规范化的输入查缓存，返回意图或None；缓存的意图不在本次候选中时（脚本已修改）视为未命中并删除"""
+        if not self.enabled:
+            return None
+        key = (site, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] in intents:
+                    entry[1] += 1
+                    self._entries.move_to_end(key)
+                    METRICS.inc('intent_cache_total', result='hit')
+                    return entry[0]
+                del self._entries[key]
+        METRICS.inc('intent_cache_total', result='miss')
+        return None
+
+    def similar(self, text, intents):
+        """精确缓存未命中后查近似缓存：返回候选意图相同、与规范化的输入足够相近的条目的意图，没有时返回None"""
+        if self.semantic is None:
+            return None
+        intent, _ = self.semantic.get(tuple(intents), text)
+        return intent
+
+    def put(self, site, text, intent, intents=None):
+        """写入LLM对规范化的输入识别的意图；给出本次候选意图 intents 时同时写入近似缓存"""
+        if not self.enabled:
+            return
+        if intents and self.semantic is not None:
+            self.semantic.put(tuple(intents), text, intent)
+        key = (site, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [intent, 0]
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            else:
+                entry[0] = intent
+                self._entries.move_to_end(key)
+
+    def warm(self, source, top=None, min_share=MIN_SHARE):
+        """从预热列表、缓存快照或事件日志目录载入最常见的条目，返回载入的条数"""
+        if not self.enabled:
+            return 0
+        if top is None:
+            top = _env_int('DSL_AGENT_INTENT_WARMUP_TOP', DEFAULT_WARMUP_TOP)
+        # 读取、统计和规范化在锁外完成，预热期间查缓存不受影响
+        normalize = self.normalize
+        pairs = [((entry['site'], normalize(entry['input'])), entry['intent'])
+                 for entry in _warmup_entries(source, top, normalize) if entry.get('share', 1.0) >= min_share]
+        loaded = 0
+        with self._lock:
+            entries = self._entries
+            # 按出现次数从多到少放到最久未使用的一端：次数多的排在后面，先淘汰次数少的
+            for key, intent in pairs:
+                if len(entries) >= self.size:
+                    break
+                if key in entries:
+                    continue
+                entries[key] = [intent, 0]
+                entries.move_to_end(key, last=False)
+                loaded += 1
+        METRICS.inc('intent_cache_warm_total', loaded)
+        self.log.info("意图缓存预热载入 {} 条", loaded)
+        return loaded
+
+    def warm_async(self, source, top=None, min_share=MIN_SHARE):
+        """在后台线程中预热，返回线程；载入失败时只记录错误"""
+        def run():
+            try:
+                self.warm(source, top, min_share)
+            except (OSError, ValueError, KeyError) as e:
+                self.log.error("意图缓存预热失败: {}", e)
+
+        self._warm_thread = threading.Thread(target=run, name='dsl-cache-warmup', daemon=True)
+        self._warm_thread.start()
+        return self._warm_thread
+
+    def wait_warm(self, timeout=None):
+        """等待后台预热结束，返回是否已经结束"""
+        thread = self._warm_thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def save(self, path):
+        """把缓存导出为快照（与预热列表格式相同，按命中次数从多到少），返回写出的条数"""
+        with self._lock:
+            items = [(site, text, intent, hits) for (site, text), (intent, hits) in self._entries.items()]
+        items.sort(key=lambda item: -item[3])
+        with open(path, 'w', encoding='utf-8') as f:
+            for site, text, intent, hits in items:
+                f.write(json.dumps({'site': site, 'input': text, 'intent': intent, 'count': hits},
+                                   ensure_ascii=False) + '\n')
+        return len(items)
+
+
+def _warmup_entries(source, top, normalize):
+    """按出现次数从多到少产出预热条目"""
+    if os.path.isdir(source):
+        from analytics import analyze
+        _, _, warmup = analyze(source, top, normalize=normalize)
+        yield from warmup
+        return
+    with open(source, encoding='utf-8') as f:
+        for count, line in enumerate(f):
+            if count >= top:
+                break
+            if line.strip():
+                yield json.loads(line)
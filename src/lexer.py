@@ -1,25 +1,141 @@
 '''
 lexer.py -
 DSL词法分析器模块，使用PLY实现词法分析，将DSL脚本分解为标记流。
+另提供一个基于单个正则（命名分组）的手写快速词法分析器，产生相同的标记流。
 '''
 
+import os
+import re
 import ply.lex as lex
+from metrics import METRICS
+
+# 词法分析器后端：'ply'（默认）或 'fast'，可通过环境变量 DSL_AGENT_LEXER 选择
+LEXER_BACKENDS = ('ply', 'fast')
+
+
+class FastToken:
+    """快速词法分析器产生的标记，属性与 ply.lex.LexToken 相同"""
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __str__(self):
+        return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+    __repr__ = __str__
+
+
+class FastLexer:
+    """
+    手写快速词法分析器。
+
+    所有规则合并为一个带命名分组的正则，按位置顺序扫描；提供与PLY词法分析器对象相同的
+    input()/token()/lineno/lexpos 接口，可以直接交给 yacc 使用。
+    非法字符不打印，而是记录到 errors 列表（行号、列号、字符）后跳过，与PLY的标记流一致。
+    """
+
+    # 空白作为每个匹配的前缀一并吃掉；字符串使用展开循环写法，匹配的语言与PLY规则相同
+    _master = re.compile(r'''[ \t]*(?:
+        (?P<ID>[a-zA-Z_][a-zA-Z_0-9]*)
+      | (?P<STRING>"[^"\\]*(?:\\.[^"\\]*)*")
+      | (?P<NEWLINE>\n+)
+      | (?P<VARIABLE>\$[a-zA-Z_][a-zA-Z0-9_]*)
+      | (?P<PLUS>\+)
+      | (?P<EQ>==)
+      | (?P<ASSIGN>=)
+      | (?P<LPAREN>\()
+      | (?P<RPAREN>\))
+      | (?P<COMMA>,)
+      | (?P<COMMENT>\#[^\n]*)
+      | (?P<END>\Z)
+      | (?P<ERROR>.)
+    )''', re.VERBOSE)
+
+    def __init__(self, reserved):
+        self.reserved = reserved
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self.errors = []
+        self._scanner = None
+        self._resume = 0
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        self.errors = []
+        self._scanner = None
+
+    def token(self):
+        # 外部修改了 lexpos（例如增量解析从某个区块开始）时从新位置重新扫描
+        if self._scanner is None or self.lexpos != self._resume:
+            self._scanner = self._scan(self.lexpos)
+        return next(self._scanner, None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        tok = self.token()
+        if tok is None:
+            raise StopIteration
+        return tok
+
+    def _scan(self, pos):
+        data = self.lexdata
+        reserved = self.reserved
+        for m in self._master.finditer(data, pos):
+            kind = m.lastgroup
+            if kind == 'ID':
+                value = m.group(kind)
+                kind = reserved.get(value, 'ID')
+            elif kind == 'STRING':
+                value = m.group(kind)[1:-1]
+            elif kind == 'NEWLINE':
+                self.lineno += m.end() - m.start(kind)
+                continue
+            elif kind == 'COMMENT' or kind == 'END':
+                continue
+            elif kind == 'ERROR':
+                start = m.start(kind)
+                column = start - data.rfind('\n', 0, start)
+                self.errors.append({'char': m.group(kind), 'lineno': self.lineno, 'column': column})
+                continue
+            else:
+                value = m.group(kind)
+            tok = FastToken()
+            tok.type = kind
+            tok.value = value
+            tok.lineno = self.lineno
+            tok.lexpos = m.start(m.lastgroup)
+            tok.lexer = self
+            if kind == 'STRING' and '\n' in value:
+                # 多行字符串的行号为起始行，之后的token计入其中的换行
+                self.lineno += value.count('\n')
+            self.lexpos = self._resume = m.end()
+            yield tok
+        self.lexpos = self._resume = len(data)
+
 
 class Lexer:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or os.environ.get('DSL_AGENT_LEXER', 'ply')
+        if self.backend not in LEXER_BACKENDS:
+            raise ValueError(f"未知的词法分析器后端: {self.backend}")
         self.lexer = None
         self.build()
     
     # 定义token名称
     tokens = (
         # 区块关键字
-        'STEP',
+        'STEP', 'KEYWORDS',
         
         # 动作关键字
-        'REPLY', 'LOG', 'WAIT',
+        'REPLY', 'LOG', 'WAIT', 'EXTRACT', 'CALL',
+
+        # 条件与路由关键字
+        'IF', 'ELSE', 'END', 'MATCH', 'CASE', 'WHEN', 'GOTO', 'PREFIX', 'REGEX',
         
         # 运算符和分隔符
-        'PLUS',
+        'PLUS', 'EQ', 'ASSIGN', 'LPAREN', 'RPAREN', 'COMMA',
         
         # 字面量
         'STRING', 'VARIABLE',
@@ -31,13 +147,30 @@ class Lexer:
     # 保留关键字映射
     reserved = {
         'step': 'STEP',
+        'keywords': 'KEYWORDS',
         'reply': 'REPLY', 
         'log': 'LOG',
         'wait': 'WAIT',
+        'extract': 'EXTRACT',
+        'call': 'CALL',
+        'if': 'IF',
+        'else': 'ELSE',
+        'end': 'END',
+        'match': 'MATCH',
+        'case': 'CASE',
+        'when': 'WHEN',
+        'goto': 'GOTO',
+        'prefix': 'PREFIX',
+        'regex': 'REGEX',
     }
     
     # 所有token的正则表达式规则
     t_PLUS = r'\+'
+    t_EQ = r'=='
+    t_ASSIGN = r'='
+    t_LPAREN = r'\('
+    t_RPAREN = r'\)'
+    t_COMMA = r','
     
     # 处理标识符（包括关键字）
     def t_ID(self, t):
@@ -50,6 +183,7 @@ class Lexer:
     def t_STRING(self, t):
         r'\"([^\"\\]|\\.)*\"'
         t.value = t.value[1:-1]  # 去掉引号
+        t.lexer.lineno += t.value.count('\n')  # 多行字符串
         return t
     
     # 变量
@@ -76,14 +210,31 @@ class Lexer:
         t.lexer.skip(1)
     
     def build(self, **kwargs):
-        self.lexer = lex.lex(module=self, **kwargs)
+        if self.backend == 'fast':
+            self.lexer = FastLexer(self.reserved)
+        else:
+            self.lexer = lex.lex(module=self, **kwargs)
     
-    def tokenize(self, data):
+    def iter_tokens(self, data, lineno=1):
+        """逐个产生token，不在内存中保留完整的token列表"""
         self.lexer.input(data)
-        tokens = []
+        self.lexer.lineno = lineno
+        if self.backend == 'fast':
+            yield from self.lexer._scan(0)
+            return
         while True:
             tok = self.lexer.token()
             if not tok:
                 break
-            tokens.append(tok)
+            yield tok
+
+    def tokenize(self, data):
+        with METRICS.span('lex', backend=self.backend):
+            self.lexer.input(data)
+            tokens = []
+            while True:
+                tok = self.lexer.token()
+                if not tok:
+                    break
+                tokens.append(tok)
         return tokens
\ No newline at end of file
@@ -5,7 +5,23 @@ LLM意图识别模块
 """
 
 import os
-from openai import OpenAI
+import threading
+from agent_log import Lazy, get_logger
+from metrics import METRICS
+
+# openai SDK 导入耗时数百毫秒，推迟到第一次意图识别时再导入（见 _openai_class）
+OpenAI = None
+
+LLM_BACKENDS = ('openai', 'http')
+
+
+def _openai_class():
+    global OpenAI
+    if OpenAI is None:
+        from openai import OpenAI as openai_class
+        OpenAI = openai_class
+    return OpenAI
+
 
 class LLMClient:
     def __init__(self, api_key=None, debug=False):
@@ -15,51 +31,88 @@ class LLMClient:
         - `debug` controls whether debug prints are emitted.
         """
         self.debug = debug
+        self.log = get_logger('llm', debug)
 
         # Resolve API key: explicit -> env
         resolved_key = api_key or os.environ.get('DSL_AGENT_API_KEY')
 
         # Model and base URL can be configured via environment variables
         self.model = os.environ.get('DSL_AGENT_MODEL', 'doubao-seed-1-6-251015')
-        base_url = os.environ.get('DSL_AGENT_BASE_URL', 'https://ark.cn-beijing.volces.com/api/v3')
+        self.base_url = os.environ.get('DSL_AGENT_BASE_URL', 'https://ark.cn-beijing.volces.com/api/v3')
+        # 请求后端：openai（默认，使用SDK）或 http（内置的轻量客户端，见 http_llm.py）
+        self.backend = os.environ.get('DSL_AGENT_LLM_BACKEND', 'openai')
+        if self.backend not in LLM_BACKENDS:
+            raise ValueError(f"未知的LLM后端: {self.backend}，可选: {', '.join(LLM_BACKENDS)}")
 
         self.api_key = resolved_key
-        self.client = None
+        self._client = None
+        self._client_ready = False
+        self._client_lock = threading.Lock()
         self.latest_intent = "unknown"
-
-        # Initialize OpenAI-compatible client if enabled and API key is provided
-        if self.debug:
-            masked = self._mask_key(self.api_key)
-            print(f"[DEBUG] 初始化LLM客户端，使用API: {masked}")
+        # 意图缓存（intent_cache.IntentCache），由引擎设置；LLM给出有效意图时写入
+        self.intent_cache = None
+
+    @property
+    def client(self):
+        """LLM客户端（openai 后端为SDK客户端，http 后端为 HTTPChatClient），第一次使用时才创建；创建失败时为None"""
+        if not self._client_ready:
+            # 多个会话线程可能同时第一次使用客户端，创建完成前其他线程等待
+            with self._client_lock:
+                if not self._client_ready:
+                    self._client = self._create_client()
+                    self._client_ready = True
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+        self._client_ready = True
+
+    def _create_client(self):
+        self.log.debug("初始化LLM客户端（{}后端），使用API: {}", self.backend, Lazy(self._mask_key, self.api_key))
         try:
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=base_url
-            )
-            if self.debug:
-                print("[DEBUG] LLM客户端初始化完成")
+            if self.backend == 'http':
+                from http_llm import HTTPChatClient
+                client = HTTPChatClient(self.base_url, self.api_key, self.model)
+            else:
+                client = _openai_class()(
+                    api_key=self.api_key,
+                    base_url=self.base_url
+                )
+            self.log.debug("LLM客户端初始化完成")
+            return client
         except Exception as e:
-            print(f"[ERROR] 初始化LLM客户端失败: {e}. ")
-            self.client = None
-
-    def recognize_intent(self, user_input, available_intents, latest_responses):
-        """识别用户输入的意图"""
-        if self.debug:
-            print(f"[DEBUG] 开始意图识别")
-            print(f"[DEBUG] 用户输入: '{user_input}'")
-            print(f"[DEBUG] 可用意图: {available_intents}")
-            print(f"[DEBUG] 上一个响应: {latest_responses}")
-
-        result = self._llm_recognize_intent(user_input, available_intents, latest_responses)
+            self.log.error("初始化LLM客户端失败: {}. ", e)
+            return None
 
-        if self.debug:
-            print(f"[DEBUG] 意图识别完成: {result}")
+    def recognize_intent(self, user_input, available_intents, latest_responses, context=None, keywords=None,
+                         site=None, normalized=None):
+        """
+        识别用户输入的意图；传入 context（ConversationContext）时使用该会话的对话历史构造提示词。
+        keywords 为关键词匹配器（dispatch.KeywordMatcher），API调用失败时用它回退识别。
+        site 为 wait 位置（step:行号），LLM给出有效意图时按它写入意图缓存（回退识别的结果不写入）。
+        normalized 为本轮规范化的输入（normalizer.Normalizer），用作缓存键和关键词回退的输入，没有时使用原始输入
+        """
+        log = self.log
+        log.debug("开始意图识别")
+        log.debug("用户输入: '{}'", user_input)
+        log.debug("可用意图: {}", available_intents)
+        log.debug("上一个响应: {}", latest_responses)
+
+        with METRICS.span('classify') as span:
+            result = self._llm_recognize_intent(user_input, available_intents, latest_responses, context, keywords,
+                                                site, user_input if normalized is None else normalized)
+            span.set(result='fallback' if result == 'unknown' else 'ok')
+
+        log.debug("意图识别完成: {}", result)
         return result
 
-    def _llm_recognize_intent(self, user_input, available_intents, latest_responses):
+    def _llm_recognize_intent(self, user_input, available_intents, latest_responses, context=None, keywords=None,
+                              site=None, normalized=None):
         """使用豆包 LLM API进行意图识别"""
         try:
-            prompt = f"""
+            if context is None:
+                prompt = f"""
 请从以下意图列表中分类用户输入，只返回意图名称，不要返回其他内容。
 
 可用意图：{', '.join(available_intents)}
@@ -69,43 +122,84 @@ class LLMClient:
 
 请直接返回最匹配的意图名称
 """
-
-            if self.debug:
-                print(f"[DEBUG] 构造的提示词: {prompt[:200]}...")  # 只显示前200字符避免过长
-                print("[DEBUG] 调用LLM API...")
-            response = self.client.chat.completions.create(
-                model="doubao-seed-1-6-251015",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=10,
-                stream=False
-            )
-
-            intent = response.choices[0].message.content.strip()
-            if self.debug:
-                print(f"[DEBUG] LLM原始响应: '{intent}'")
+                messages = [{"role": "user", "content": prompt}]
+            else:
+                messages = context.messages(user_input, available_intents)
+
+            log = self.log
+            log.debug("构造的提示词: {:.200}...", messages[-1]["content"])  # 只显示前200字符避免过长
+            log.debug("调用LLM API...")
+            content, usage = self._complete(messages)
+            intent = content.strip()
+            log.debug("LLM原始响应: '{}'", intent)
+            if context is not None:
+                context.record_usage(usage, messages, content)
+                if usage is not None:
+                    METRICS.inc('llm_tokens_total', usage.get('prompt_tokens', 0), kind='prompt')
+                    METRICS.inc('llm_tokens_total', usage.get('cached_tokens', 0), kind='cached')
 
             # 验证返回的意图是否在可用列表中
             if intent in available_intents:
-                if self.debug:
-                    print(f"[DEBUG] 意图验证通过: '{intent}' 在可用意图列表中")
-                self.latest_intent = intent
+                log.debug("意图验证通过: '{}' 在可用意图列表中", intent)
+                if context is None:
+                    self.latest_intent = intent
+                if site is not None and self.intent_cache is not None:
+                    self.intent_cache.put(site, normalized, intent, available_intents)
                 return intent
             else:
-                if self.debug:
-                    print(f"[DEBUG] 意图验证失败: '{intent}' 不在可用意图列表中，返回'unknown'")
+                log.debug("意图验证失败: '{}' 不在可用意图列表中，返回'unknown'", intent)
+                METRICS.inc('intent_fallback_total', reason='invalid_intent')
                 return 'unknown'
 
         except Exception as e:
-            print(f"[ERROR] LLM API调用失败: {e}")
-            if self.debug:
-                print("[DEBUG] 切换到备用关键词匹配方案")
-            return 'unknown'
+            self.log.error("LLM API调用失败: {}", e)
+            METRICS.inc('intent_fallback_total', reason='api_error')
+            if keywords is None:
+                return 'unknown'
+            self.log.debug("切换到备用关键词匹配方案")
+            intent = keywords.best(user_input if normalized is None else normalized)
+            if intent not in available_intents:
+                METRICS.inc('keyword_fallback_total', result='miss')
+                return 'unknown'
+            METRICS.inc('keyword_fallback_total', result='hit')
+            self.log.debug("关键词匹配到意图: {}", intent)
+            return intent
+
+    def extract_slot(self, user_input, extractor):
+        """
+        本地提取器没有结果时调用LLM提取槽位值（extractors.Extractor 描述要提取的内容）。
+        模型的回复再交给本地提取器校验和规范化，通不过校验或调用失败时返回None
+        """
+        messages = [{'role': 'user', 'content': (
+            f"从用户输入中提取{extractor.description}，只返回提取到的值，不要返回其他内容；没有时返回“无”。\n"
+            f"用户输入：{user_input}"
+        )}]
+        with METRICS.span('extract_llm') as span:
+            try:
+                content, _ = self._complete(messages)
+            except Exception as e:
+                self.log.error("LLM槽位提取失败: {}", e)
+                span.set(result='error')
+                return None
+            value = extractor.extract(content.strip()) if content else None
+            span.set(result='hit' if value else 'miss')
+        self.log.debug("LLM槽位提取 {}: '{}' -> {}", extractor.name, content, value)
+        return value
+
+    def _complete(self, messages):
+        """发送消息列表，返回 (模型回复的文本, token用量字典或None)"""
+        if self.backend == 'http':
+            client = self.client
+            content = client.complete(messages)
+            return content, client.last_usage()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=10,
+            stream=False
+        )
+        return response.choices[0].message.content, _usage_fields(getattr(response, 'usage', None))
 
     def _mask_key(self, key: str) -> str:
         """Mask an API key for logs, showing only first 4 and last 4 chars when possible."""
@@ -113,4 +207,14 @@ class LLMClient:
             return "(no-key)"
         if len(key) <= 8:
             return "*" * (len(key) - 2) + key[-2:]
-        return key[:4] + "..." + key[-4:]
\ No newline at end of file
+        return key[:4] + "..." + key[-4:]
+
+def _usage_fields(usage):
+    """把SDK响应中的 usage 对象转换为字典，字段缺失或类型不符时返回None"""
+    prompt_tokens = getattr(usage, 'prompt_tokens', None)
+    completion_tokens = getattr(usage, 'completion_tokens', None)
+    if not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+        return None
+    cached_tokens = getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', None)
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens if isinstance(cached_tokens, int) else 0}
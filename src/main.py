@@ -7,6 +7,8 @@ main.py - 简单DSL客服机器人 - 主程序
 import os
 import argparse
 from dsl_engine import DSLEngine
+from metrics import METRICS, JsonDumper, MetricsServer
+from profiler import DEFAULT_SAMPLE_INTERVAL, PROFILER, install_signal_toggle
 
 def parse_arguments():
     """解析命令行参数"""
@@ -14,6 +16,20 @@ def parse_arguments():
     parser.add_argument('script', help='DSL脚本文件路径')
     parser.add_argument('-d', '--debug', action='store_true',
                        help='启用调试模式')
+    parser.add_argument('--metrics-port', type=int,
+                       help='在该端口提供Prometheus格式的 /metrics')
+    parser.add_argument('--metrics-file',
+                       help='定期把指标快照写入该JSON文件')
+    parser.add_argument('--profile', metavar='PREFIX',
+                       help='开启剖析，退出时写出 PREFIX.collapsed（火焰图）和 PREFIX.txt（耗时表）')
+    parser.add_argument('--profile-signal', action='store_true',
+                       help='收到 SIGUSR2 时切换剖析开关（配合 --profile 指定输出前缀）')
+    parser.add_argument('--profile-sample', type=float, metavar='MS', nargs='?', const=DEFAULT_SAMPLE_INTERVAL * 1000,
+                       help='剖析时同时按该间隔（毫秒，默认 5）采样调用栈，写出 PREFIX.sampled.collapsed')
+    parser.add_argument('--profile-alloc', action='store_true',
+                       help='剖析时统计每条语句的内存分配（只在语句之间没有并发时记入）')
+    parser.add_argument('--priors', metavar='FILE',
+                       help='载入 analytics.py --priors 生成的意图先验，无法识别意图时跳转到最常见的意图')
     return parser.parse_args()
 
 def main():
@@ -36,8 +52,32 @@ def main():
         if not os.path.exists(script_path):
             raise FileNotFoundError(f"脚本文件未找到: {script_path}")
     
-    dsl_engine = DSLEngine(script_path, debug=debug_flag)
-    dsl_engine.start()
+    dumper = None
+    if args.metrics_port is not None or args.metrics_file:
+        METRICS.enable()
+    if args.metrics_port is not None:
+        server = MetricsServer(port=args.metrics_port).start()
+        print(f"📊 指标地址: {server.url}")
+    if args.metrics_file:
+        dumper = JsonDumper(args.metrics_file).start()
+    profile_prefix = args.profile or 'dsl_profile'
+    sample_interval = args.profile_sample / 1000 if args.profile_sample else None
+    if args.profile_signal:
+        install_signal_toggle(profile_prefix, allocations=args.profile_alloc, sample_interval=sample_interval)
+    elif args.profile:
+        PROFILER.start(allocations=args.profile_alloc, sample_interval=sample_interval)
+
+    try:
+        dsl_engine = DSLEngine(script_path, debug=debug_flag)
+        if args.priors:
+            dsl_engine.load_priors(args.priors)
+        dsl_engine.start()
+    finally:
+        if dumper is not None:
+            dumper.stop()
+        if args.profile and PROFILER.enabled:
+            PROFILER.stop()
+            PROFILER.write(profile_prefix)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
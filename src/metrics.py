@@ -0,0 +1,359 @@
+"""
+metrics.py -
+运行时指标：计时区间（span）、直方图与计数器，导出为 Prometheus 文本格式或定期写出JSON。
+
+默认关闭，关闭时 span() 返回共享的空对象，observe()/inc() 直接返回；
+逐语句执行这类热路径直接检查 METRICS.enabled，关闭时不产生任何额外调用。
+通过环境变量 DSL_AGENT_METRICS=true 或 METRICS.enable() 开启：
+
+    with METRICS.span('parse', backend='ply'):
+        ...
+    METRICS.inc('intent_fallback_total', reason='api_error')
+    print(METRICS.render_prometheus())
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+# 默认直方图分桶（秒），覆盖微秒级的语句执行到秒级的LLM调用
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'dsl_agent_'
+
+
+class Histogram:
+    """固定分桶直方图；counts[i] 为落在 (buckets[i-1], buckets[i]] 的样本数，最后一个为 +Inf"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """按分桶上界估计分位数（落在 +Inf 桶时返回最大分桶上界）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.buckets[-1]
+
+
+class _NullSpan:
+    """指标关闭时使用的空计时区间"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """计时区间：退出时把耗时记入名为 <name>_seconds 的直方图；set() 可在区间内补充标签"""
+
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels.setdefault('error', exc_type.__name__)
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+class Metrics:
+    """指标注册表：按 (名称, 标签) 聚合直方图和计数器，线程安全"""
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def span(self, name, **labels):
+        """计时区间上下文管理器，耗时记入 <name>_seconds 直方图"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时（秒）"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        """计数器加 value"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, name, **labels):
+        """查询直方图，不存在时返回None"""
+        return self._histograms.get((name, _label_key(labels)))
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def snapshot(self):
+        """当前指标的JSON友好快照"""
+        with self._lock:
+            histograms = [
+                {'name': name + '_seconds', 'labels': dict(key), 'count': h.count, 'sum': h.sum,
+                 'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99),
+                 'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts))}
+                for (name, key), h in sorted(self._histograms.items())
+            ]
+            counters = [{'name': name, 'labels': dict(key), 'value': value}
+                        for (name, key), value in sorted(self._counters.items())]
+        return {'timestamp': time.time(), 'histograms': histograms, 'counters': counters}
+
+    def render_prometheus(self):
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        declared = set()
+        for (name, key), h in histograms:
+            metric = f"{PREFIX}{name}_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {h.count}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {h.sum!r}")
+            lines.append(f"{metric}_count{_format_labels(key)} {h.count}")
+        for (name, key), value in counters:
+            metric = PREFIX + name
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics(enabled=os.environ.get('DSL_AGENT_METRICS', 'false').lower() == 'true')
+
+
+_handler_class = None
+
+
+def _get_handler_class():
+    """按需创建请求处理类：http.server 导入较慢，不开启指标服务器时不导入"""
+    global _handler_class
+    if _handler_class is not None:
+        return _handler_class
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            metrics = self.server.metrics
+            if self.path.startswith('/profile'):
+                self._profile_report()
+                return
+            if self.path.startswith('/metrics.json'):
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json'
+            elif self.path.startswith('/metrics'):
+                body = metrics.render_prometheus().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4'
+            else:
+                self.send_error(404)
+                return
+            self._send(body, content_type)
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            """改变剖析状态的接口只接受 POST：/profile/start（?alloc 统计分配，?sample=毫秒 同时采样）、/profile/stop"""
+            from urllib.parse import parse_qs
+            from profiler import PROFILER, DEFAULT_SAMPLE_INTERVAL
+            path, _, query = self.path.partition('?')
+            path = path.rstrip('/')
+            options = parse_qs(query, keep_blank_values=True)
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            if path == '/profile/start':
+                interval = None
+                if 'sample' in options:
+                    try:
+                        interval = float(options['sample'][0]) / 1000 if options['sample'][0] else \
+                            DEFAULT_SAMPLE_INTERVAL
+                    except ValueError:
+                        self.send_error(400)
+                        return
+                PROFILER.reset()
+                PROFILER.start(allocations='alloc' in options, sample_interval=interval)
+                text = "profiling started\n"
+            elif path == '/profile/stop':
+                PROFILER.stop()
+                text = PROFILER.format_table() + '\n'
+            else:
+                self.send_error(404)
+                return
+            self._send(text.encode('utf-8'), 'text/plain; charset=utf-8')
+
+        def _profile_report(self):
+            """剖析结果：/profile（耗时表）、/profile/collapsed（折叠栈）、/profile/sampled（采样的折叠栈）"""
+            from profiler import PROFILER
+            path = self.path.partition('?')[0].rstrip('/')
+            if path == '/profile/collapsed':
+                text = PROFILER.collapsed()
+            elif path == '/profile/sampled':
+                text = PROFILER.sampled()
+            elif path == '/profile':
+                text = PROFILER.format_table() + '\n'
+            elif path in ('/profile/start', '/profile/stop'):
+                self.send_error(405)
+                return
+            else:
+                self.send_error(404)
+                return
+            self._send(text.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    _handler_class = MetricsHandler
+    return _handler_class
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics（Prometheus 文本）、/metrics.json 和 /profile 剖析开关"""
+
+    def __init__(self, host='127.0.0.1', port=0, metrics=None):
+        from http.server import ThreadingHTTPServer
+        self.httpd = ThreadingHTTPServer((host, port), _get_handler_class())
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = metrics or METRICS
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class JsonDumper:
+    """后台线程每隔 interval 秒把指标快照写入JSON文件（先写临时文件再替换）"""
+
+    def __init__(self, path, interval=10.0, metrics=None):
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics or METRICS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def dump(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.dump()
@@ -0,0 +1,109 @@
+"""
+normalizer.py -
+用户输入的规范化，每轮只做一次，结果供意图缓存的键、关键词匹配和LLM失败时的关键词回退共同使用，
+"退货"、"退货！"、" 我要 退货 "、"ＶＩＰ" 与 "vip" 这类只有写法不同的输入得到相同的结果：
+  - Unicode NFKC：全角字母数字和空格转为半角，兼容字符转为标准字符；
+  - 忽略大小写（casefold）；
+  - 删除标点、空白、控制字符和表情等符号（数学符号和货币符号保留）；
+  - 可选：常用繁体字转为简体字（内置常用字对照表，不依赖外部库）。
+规范化后为空（输入只有标点）时保留 NFKC 和忽略大小写的结果，只删除首尾空白。
+
+when 规则仍然匹配原始输入（正则和精确匹配的写法由脚本作者决定），$user_input 和事件日志也保留原始输入。
+
+环境变量 DSL_AGENT_FOLD_TRADITIONAL=true 开启繁简转换。
+"""
+
+import os
+import unicodedata
+
+# 删除的 Unicode 类别：标点、空白分隔符、控制和格式字符、其他符号（表情等）与修饰符号
+_DELETED_CATEGORIES = frozenset(('Pc', 'Pd', 'Ps', 'Pe', 'Pi', 'Pf', 'Po', 'Zs', 'Zl', 'Zp', 'Cc', 'Cf',
+                                 'So', 'Sk'))
+# 类别之外另行删除的字符：波浪号（全角"～"经 NFKC 后为数学符号"~"），以及表情后的变体选择符
+_DELETED_CHARS = frozenset('~' + ''.join(chr(code) for code in range(0xFE00, 0xFE10)))
+
+# 常用繁体字 -> 简体字，每项两个字符
+_TRADITIONAL_PAIRS = (
+    '個个 們们 來来 對对 時时 說说 會会 這这 國国 過过 後后 從从 動动 開开 關关 問问 題题 號号 單单 訂订 貨货 '
+    '買买 賣卖 價价 錢钱 費费 帳账 戶户 總总 額额 發发 運运 遞递 郵邮 還还 換换 與与 為为 麼么 沒没 嗎吗 謝谢 '
+    '請请 幫帮 聯联 繫系 話话 電电 機机 線线 網网 頁页 碼码 務务 員员 經经 讓让 給给 現现 實实 際际 間间 長长 '
+    '樣样 種种 應应 該该 預预 約约 點点 鐘钟 覺觉 舊旧 壞坏 錯错 誤误 償偿 賠赔 險险 證证 據据 確确 認认 讀读 '
+    '寫写 記记 錄录 審审 狀状 態态 處处 辦办 轉转 車车 輛辆 場场 區区 門门 級级 變变 質质 廠厂 產产 標标 準准 '
+    '條条 規规 則则 華华 東东 體体 驗验 極极 壓压 氣气 溫温 軟软 紅红 綠绿 藍蓝 黃黄 顏颜 寬宽 雙双 張张 隻只 '
+    '無无 緊紧 憑凭 詢询 諮咨 議议 論论 訴诉 師师 達达 幾几 啟启 報报 導导 專专 業业 廣广 優优 減减 紀纪 銷销 '
+    '庫库 裝装 損损 斷断 貼贴 簽签 領领 兌兑 積积 註注 冊册 綁绑 銀银 餘余 筆笔 歷历 週周 節节 遲迟 煩烦 聽听 '
+    '見见 視视 頻频 圖图 傳传 輸输 擇择 選选 項项 頭头 腦脑 設设 備备 蘋苹 於于 當当 裡里 裏里 邊边 麵面 雲云 '
+    '戲戏 歡欢 樂乐 愛爱 親亲 隨随 貴贵 補补 辭辞 寶宝 貝贝 購购 掃扫 觀观 飛飞 遊游 習习 慣惯 夠够 壽寿 鳥鸟 '
+    '魚鱼 龍龙 馬马 閉闭 聞闻 鬧闹 錶表 鏈链 鎖锁 鑰钥 熱热 燈灯 爐炉 紙纸 書书 層层 樓楼 屆届 屬属 岡冈 島岛 '
+    '聲声 藝艺 藥药 醫医 療疗 護护 衛卫 顧顾 戰战 爭争 權权 勢势 擔担 擊击 擴扩 擾扰 攝摄 敗败 數数 斂敛 斬斩 '
+    '殺杀 漢汉 滅灭 濟济 災灾 爲为 牆墙 猶犹 獨独 獲获 瑪玛 環环 畫画 異异 盡尽 監监 盤盘 眾众 礎础 禮礼 禍祸 '
+    '離离 稱称 穩稳 窮穷 竊窃 範范 築筑 簡简 糧粮 組组 細细 終终 絕绝 統统 絲丝 綜综 維维 緒绪 編编 練练 縣县 '
+    '縮缩 績绩 繼继 續续 罰罚 羅罗 聖圣 聰聪 職职 腳脚 興兴 舉举 艱艰 蘭兰 虛虚 蟲虫 術术 衝冲 製制 複复 襲袭 '
+    '覽览 觸触 計计 訊讯 討讨 訓训 託托 訪访 許许 評评 試试 詳详 誌志 語语 誠诚 課课 調调 談谈 諾诺 謀谋 講讲 '
+    '識识 譯译 讚赞 豐丰 負负 財财 責责 販贩 貧贫 貪贪 貿贸 資资 賓宾 賢贤 賺赚 賽赛 贈赠 趕赶 趙赵 跡迹 蹤踪 '
+    '軍军 較较 載载 輕轻 輩辈 輪轮 農农 逕径 進进 遠远 適适 遺遗 邏逻 鄉乡 鄰邻 釋释 針针 鈕钮 鋼钢 鍵键 鏡镜 '
+    '閃闪 閒闲 閱阅 闆板 陣阵 陰阴 陳陈 陽阳 隊队 階阶 隱隐 雜杂 雞鸡 難难 靈灵 靜静 響响 順顺 須须 頓顿 顆颗 '
+    '類类 顯显 風风 飯饭 飲饮 飾饰 館馆 驚惊 髮发 鬆松 鬥斗 鮮鲜 鳳凤 麥麦 黨党 齊齐 齒齿'
+)
+TRADITIONAL_TO_SIMPLIFIED = {pair[0]: pair[1] for pair in _TRADITIONAL_PAIRS.split()}
+
+
+def _deleted(char):
+    return char in _DELETED_CHARS or unicodedata.category(char) in _DELETED_CATEGORIES
+
+
+# ASCII 输入不需要 NFKC，直接删除标点和空白
+_ASCII_TABLE = {code: None for code in range(128) if _deleted(chr(code))}
+
+
+class _FoldTable(dict):
+    """str.translate 用的映射表：第一次遇到某个字符时按类别计算结果并记住，之后是一次字典查找"""
+
+    __slots__ = ('fold_traditional',)
+
+    def __init__(self, fold_traditional):
+        super().__init__()
+        self.fold_traditional = fold_traditional
+
+    def __missing__(self, code):
+        char = chr(code)
+        if _deleted(char):
+            value = None
+        elif self.fold_traditional and char in TRADITIONAL_TO_SIMPLIFIED:
+            value = TRADITIONAL_TO_SIMPLIFIED[char]
+        else:
+            value = code
+        self[code] = value
+        return value
+
+
+class Normalizer:
+    """用户输入规范化；fold_traditional 默认读取环境变量 DSL_AGENT_FOLD_TRADITIONAL。实例可以在线程间共享"""
+
+    __slots__ = ('fold_traditional', '_table')
+
+    def __init__(self, fold_traditional=None):
+        if fold_traditional is None:
+            fold_traditional = os.environ.get('DSL_AGENT_FOLD_TRADITIONAL', 'false').lower() == 'true'
+        self.fold_traditional = fold_traditional
+        self._table = _FoldTable(fold_traditional)
+
+    def __call__(self, text):
+        if text.isascii():
+            folded = text.lower()
+            result = folded.translate(_ASCII_TABLE)
+        else:
+            folded = unicodedata.normalize('NFKC', text).casefold()
+            result = folded.translate(self._table)
+        return result or folded.strip()
+
+
+_default = None
+
+
+def normalize(text):
+    """按环境变量配置的默认规范化（第一次调用时创建）"""
+    global _default
+    if _default is None:
+        _default = Normalizer()
+    return _default(text)
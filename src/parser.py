@@ -3,15 +3,46 @@ parser.py -
 DSL解析器模块，使用PLY实现词法分析和语法分析，将DSL脚本解析为字典格式的语法树。
 """
 
+import os
 import ply.yacc as yacc
 from lexer import Lexer
+from metrics import METRICS
+
+# 解析器后端：'ply'（默认）或 'descent'，可通过环境变量 DSL_AGENT_PARSER 选择
+PARSER_BACKENDS = ('ply', 'descent')
+
+# 预生成的LALR分析表模块（python parser.py 重新生成）。
+# PLY 会校验文法签名，文法修改后表过期时自动退回到现场构建，只是启动稍慢。
+TABMODULE = 'dsl_parsetab'
+
+
+def create_parser(backend=None, debug=False):
+    """按后端名称创建解析器，两种后端产生相同的语法树"""
+    backend = backend or os.environ.get('DSL_AGENT_PARSER', 'ply')
+    if backend == 'descent':
+        from descent_parser import DescentParser
+        return DescentParser(debug=debug)
+    if backend != 'ply':
+        raise ValueError(f"未知的解析器后端: {backend}")
+    return Parser(debug=debug)
+
+
+class _TokenFeed:
+    """把现成的token序列包装成yacc可用的词法分析器接口"""
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+
+    def token(self):
+        return next(self._tokens, None)
+
 
 class Parser:
-    def __init__(self, debug=False):
-        self.lexer = Lexer()
+    def __init__(self, debug=False, lexer_backend=None):
+        self.lexer = Lexer(backend=lexer_backend)
         self.tokens = self.lexer.tokens
-        self.parser = yacc.yacc(module=self, debug=debug, write_tables=False)
+        self.parser = yacc.yacc(module=self, debug=debug, write_tables=False, tabmodule=TABMODULE)
         self.ast = None
+        self.error_count = 0
     
     def create_node(self, node_type, children=None, value=None, lineno=None):
         """创建字典格式的语法树节点"""
@@ -44,8 +75,14 @@ class Parser:
     
     # Step 区块
     def p_step_section(self, p):
-        'step_section : STEP ID statements'  # 修改：使用ID而不是STRING
-        p[0] = self.create_node('Step', p[3], p[2], p.lineno(1))
+        '''step_section : STEP ID statements
+                        | STEP ID KEYWORDS string_list statements'''  # 修改：使用ID而不是STRING
+        if len(p) == 6:
+            # 紧跟 step 名称的关键词列表：本 step 作为意图的关键词，用于预筛选和LLM不可用时的回退
+            p[0] = self.create_node('Step', p[5], p[2], p.lineno(1))
+            p[0]['keywords'] = p[4]
+        else:
+            p[0] = self.create_node('Step', p[3], p[2], p.lineno(1))
     
     # 语句
     def p_statements(self, p):
@@ -59,7 +96,11 @@ class Parser:
     def p_statement(self, p):
         '''statement : reply_statement
                     | log_statement
-                    | wait_statement'''
+                    | wait_statement
+                    | extract_statement
+                    | call_statement
+                    | if_statement
+                    | match_statement'''
         p[0] = p[1]
     
     # 基本动作语句
@@ -72,8 +113,107 @@ class Parser:
         p[0] = self.create_node('Log', value=p[2], lineno=p.lineno(1))
 
     def p_wait_statement(self, p):
-        'wait_statement : WAIT string_list'
-        p[0] = self.create_node('Wait', value=p[2], lineno=p.lineno(1))
+        '''wait_statement : WAIT string_list
+                          | WAIT string_list guard_list'''
+        p[0] = self.create_node('Wait', p[3] if len(p) == 4 else None, p[2], p.lineno(1))
+
+    # 槽位提取：extract $变量 类型名 | extract $变量 regex "模式"...
+    def p_extract_statement(self, p):
+        '''extract_statement : EXTRACT VARIABLE ID
+                             | EXTRACT VARIABLE REGEX string_list'''
+        p[0] = self.create_node('Extract', value=self.create_node('Variable', value=p[2], lineno=p.lineno(2)),
+                                lineno=p.lineno(1))
+        if len(p) == 5:
+            p[0]['kind'] = 'regex'
+            p[0]['patterns'] = p[4]
+        else:
+            p[0]['kind'] = p[3]
+
+    # 外部函数调用：call [变量 =] 函数名(参数, ...)
+    def p_call_statement(self, p):
+        '''call_statement : CALL ID ASSIGN ID LPAREN arguments RPAREN
+                          | CALL ID LPAREN arguments RPAREN'''
+        if len(p) == 8:
+            p[0] = self.create_node('Call', p[6], p[4], p.lineno(1))
+            p[0]['target'] = p[2]
+        else:
+            p[0] = self.create_node('Call', p[4], p[2], p.lineno(1))
+
+    def p_arguments(self, p):
+        '''arguments : argument_list
+                     | '''
+        p[0] = p[1] if len(p) == 2 else []
+
+    def p_argument_list(self, p):
+        '''argument_list : argument_list COMMA expression
+                         | expression'''
+        if len(p) == 4:
+            p[0] = p[1] + [p[3]]
+        else:
+            p[0] = [p[1]]
+
+    # wait 的确定性路由规则：when [prefix|regex] "模式"... goto 目标step
+    def p_guard_list(self, p):
+        '''guard_list : guard_list guard
+                      | guard'''
+        if len(p) == 3:
+            p[0] = p[1] + [p[2]]
+        else:
+            p[0] = [p[1]]
+
+    def p_guard(self, p):
+        'guard : WHEN pattern GOTO ID'
+        kind, patterns = p[2]
+        p[0] = {'type': 'When', 'kind': kind, 'value': patterns, 'target': p[4], 'lineno': p.lineno(1)}
+
+    def p_pattern(self, p):
+        '''pattern : string_list
+                   | PREFIX string_list
+                   | REGEX string_list'''
+        if len(p) == 2:
+            p[0] = ('exact', p[1])
+        else:
+            p[0] = (p[1], p[2])
+
+    # 条件分支：if $变量 (==|prefix|regex) "模式"... 语句 [else 语句] end
+    def p_if_statement(self, p):
+        '''if_statement : IF VARIABLE condition statements END
+                        | IF VARIABLE condition statements ELSE statements END'''
+        kind, patterns = p[3]
+        cases = [{'type': 'Case', 'kind': kind, 'value': patterns, 'lineno': p.lineno(1), 'children': p[4]}]
+        if len(p) == 8:
+            cases.append({'type': 'Case', 'kind': 'else', 'lineno': p.lineno(5), 'children': p[6]})
+        p[0] = self.create_node('If', cases, self.create_node('Variable', value=p[2], lineno=p.lineno(2)),
+                                p.lineno(1))
+
+    def p_condition(self, p):
+        '''condition : EQ string_list
+                     | PREFIX string_list
+                     | REGEX string_list'''
+        p[0] = ('exact' if p[1] == '==' else p[1], p[2])
+
+    # 多分支匹配：match $变量 (case [prefix|regex] "模式"... 语句)+ [else 语句] end
+    def p_match_statement(self, p):
+        '''match_statement : MATCH VARIABLE case_list END
+                           | MATCH VARIABLE case_list ELSE statements END'''
+        cases = p[3]
+        if len(p) == 7:
+            cases = cases + [{'type': 'Case', 'kind': 'else', 'lineno': p.lineno(4), 'children': p[5]}]
+        p[0] = self.create_node('Match', cases, self.create_node('Variable', value=p[2], lineno=p.lineno(2)),
+                                p.lineno(1))
+
+    def p_case_list(self, p):
+        '''case_list : case_list case
+                     | case'''
+        if len(p) == 3:
+            p[0] = p[1] + [p[2]]
+        else:
+            p[0] = [p[1]]
+
+    def p_case(self, p):
+        'case : CASE pattern statements'
+        kind, patterns = p[2]
+        p[0] = {'type': 'Case', 'kind': kind, 'value': patterns, 'lineno': p.lineno(1), 'children': p[3]}
 
     def p_string_list(self, p):
         '''string_list : string_list STRING
@@ -105,18 +245,45 @@ class Parser:
             p[0] = self.create_node('Identifier', value=p[1], lineno=p.lineno(1))
     
     def p_error(self, p):
+        self.error_count += 1
         if p:
             print(f"语法错误 at line {p.lineno}: token '{p.value}' (类型: {p.type})")
         else:
             print("语法错误: 意外的文件结束")
     
-    def parse(self, data):
-        """解析DSL脚本并返回字典格式的语法树"""
+    def parse(self, data, lineno=1):
+        """解析DSL脚本并返回字典格式的语法树，lineno 为 data 首行的行号"""
+        self.error_count = 0
+        self.lexer.lexer.lineno = lineno
         try:
-            result = self.parser.parse(input=data, lexer=self.lexer.lexer, debug=False)
+            # PLY 按需调用词法分析器，词法分析的耗时包含在 parse 中
+            with METRICS.span('parse', backend='ply'):
+                result = self.parser.parse(input=data, lexer=self.lexer.lexer, debug=False)
             return result
         except Exception as e:
             print(f"解析错误: {e}")
             import traceback
             traceback.print_exc()
-            return None
\ No newline at end of file
+            return None
+
+    def parse_tokens(self, tokens):
+        """解析已完成词法分析的token序列（用于增量/流式解析）"""
+        self.error_count = 0
+        try:
+            return self.parser.parse(lexer=_TokenFeed(tokens), debug=False)
+        except Exception as e:
+            print(f"解析错误: {e}")
+            return None
+
+
+def write_tables(outputdir=None):
+    """重新生成预编译的分析表模块 dsl_parsetab.py"""
+    parser = Parser.__new__(Parser)
+    parser.lexer = Lexer()
+    parser.tokens = parser.lexer.tokens
+    yacc.yacc(module=parser, debug=False, write_tables=True, tabmodule=TABMODULE,
+              outputdir=outputdir or os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == '__main__':
+    write_tables()
@@ -0,0 +1,302 @@
+"""
+profiler.py -
+脚本级性能剖析：把墙钟时间、CPU时间和内存分配归属到每个 step 及语句行号，
+输出按 step 排序的耗时表和火焰图工具（flamegraph.pl、speedscope 等）可读的折叠栈文件。
+另提供采样剖析器，定期采集执行线程的Python调用栈，并在栈底标注当前所在的 step/语句；
+PROFILER.start(sample_interval=秒) 时随剖析一起开关，结果见 sampled() 和 <prefix>.sampled.collapsed。
+
+默认关闭，关闭时引擎只多一次属性检查。可在运行中开关：
+  - 代码中调用 PROFILER.start() / PROFILER.stop()；
+  - install_signal_toggle() 后向进程发送 SIGUSR2；
+  - 指标服务器（metrics.MetricsServer）的 POST /profile/start、POST /profile/stop，GET /profile 查看。
+
+内存分配用 tracemalloc 统计，它记录整个进程的分配：只有一条语句从开始到结束期间没有其他语句开始时
+（单线程执行，或并发会话恰好没有重叠）才记入分配字节，否则跳过该次统计并计入 skipped_allocations。
+函数调用线程池等不执行语句的线程的分配仍会计入，并发场景下分配数值只作参考。
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+# 采样剖析器的默认采样间隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 0.005
+STATEMENT_LABELS = {'Reply': 'reply', 'Log': 'log', 'Wait': 'wait', 'Extract': 'extract', 'Call': 'call',
+                    'If': 'if', 'Match': 'match'}
+
+
+def statement_label(statement):
+    """语句在报告和折叠栈中的名称，如 reply@L12"""
+    kind = STATEMENT_LABELS.get(statement.get('type'), str(statement.get('type')).lower())
+    return f"{kind}@L{statement.get('lineno', '?')}"
+
+
+class Profiler:
+    """按 (step, 语句) 聚合耗时的剖析器，线程安全"""
+
+    def __init__(self):
+        self.enabled = False
+        self.allocations = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 线程ID -> 正在执行的 (step, 语句名称)，供采样剖析器标注
+        self.current = {}
+        self.sampler = None
+        # 分配统计：每次 begin() 递增的序号和正在统计的语句数，用于判断语句之间是否重叠
+        self._alloc_epoch = 0
+        self._alloc_active = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (step, 语句名称) -> [次数, 墙钟秒, CPU秒, 分配字节]
+            self.stats = {}
+            # 折叠栈 -> 墙钟微秒
+            self.stacks = {}
+            # 与其他语句重叠、没有记入分配字节的次数
+            self.skipped_allocations = 0
+            self.started = time.time()
+        if self.sampler is not None:
+            self.sampler.reset()
+
+    def start(self, allocations=False, sample_interval=None):
+        """
+        开始剖析；allocations=True 时用 tracemalloc 统计每条语句的峰值分配（开销较大），
+        sample_interval（秒）不为None时同时启动采样剖析器
+        """
+        self.allocations = allocations
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if sample_interval and (self.sampler is None or not self.sampler.running):
+            self.sampler = SamplingProfiler(sample_interval, profiler=self).start()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        if self.allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.allocations = False
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def toggle(self, allocations=False, sample_interval=None):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start(allocations, sample_interval)
+        return self.enabled
+
+    def sampled(self):
+        """采样剖析器的折叠栈文本（没有采样时为空）"""
+        return self.sampler.collapsed() if self.sampler is not None else ''
+
+    # 引擎调用的钩子 -------------------------------------------------------
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def push(self, step_name):
+        """进入 step（process 递归时形成 step 调用栈）"""
+        self._stack().append(step_name)
+
+    def pop(self):
+        stack = self._stack()
+        if stack:
+            stack.pop()
+
+    def begin(self, step_name, statement):
+        """语句开始时的采样点"""
+        memory = epoch = None
+        if self.allocations and tracemalloc.is_tracing():
+            with self._lock:
+                self._alloc_epoch += 1
+                self._alloc_active += 1
+                epoch = self._alloc_epoch
+                # reset_peak 作用于整个进程，其他语句正在统计时不能重置
+                if self._alloc_active == 1:
+                    tracemalloc.reset_peak()
+                    memory = tracemalloc.get_traced_memory()[0]
+        self.current[threading.get_ident()] = (step_name, statement_label(statement))
+        return time.perf_counter(), time.thread_time(), memory, epoch
+
+    def end(self, sample, step_name, statement, stack=None):
+        """语句结束：把耗时记到 (step, 语句) 和折叠栈上；stack 为调用方的 step 栈（默认为线程内的栈）"""
+        wall = time.perf_counter() - sample[0]
+        cpu = time.thread_time() - sample[1]
+        allocated = 0
+        skipped = False
+        if sample[3] is not None:
+            with self._lock:
+                self._alloc_active -= 1
+                # 期间有其他语句开始（其他会话线程或嵌套语句）时峰值包含它们的分配
+                if sample[2] is not None and sample[3] == self._alloc_epoch and tracemalloc.is_tracing():
+                    allocated = max(0, tracemalloc.get_traced_memory()[1] - sample[2])
+                else:
+                    skipped = True
+        label = statement_label(statement)
+        self.current.pop(threading.get_ident(), None)
+        if stack is None:
+            stack = self._stack() or [step_name]
+        folded = ';'.join(stack) + ';' + label
+        with self._lock:
+            entry = self.stats.get((step_name, label))
+            if entry is None:
+                entry = self.stats[(step_name, label)] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+            entry[3] += allocated
+            self.skipped_allocations += skipped
+            self.stacks[folded] = self.stacks.get(folded, 0) + int(wall * 1e6)
+
+    # 报告 ------------------------------------------------------------------
+
+    def step_totals(self):
+        """按 step 汇总，按墙钟时间降序：[(step, 次数, 墙钟, CPU, 分配)]"""
+        totals = {}
+        with self._lock:
+            for (step, _), (count, wall, cpu, allocated) in self.stats.items():
+                entry = totals.setdefault(step, [0, 0.0, 0.0, 0])
+                entry[0] += count
+                entry[1] += wall
+                entry[2] += cpu
+                entry[3] += allocated
+        return sorted(((step, *values) for step, values in totals.items()),
+                      key=lambda row: row[2], reverse=True)
+
+    def format_table(self, limit=20):
+        """按 step 排序的耗时表，每个 step 下列出最耗时的语句"""
+        with self._lock:
+            by_step = {}
+            for (step, label), values in self.stats.items():
+                by_step.setdefault(step, []).append((label, *values))
+        lines = [f"{'step / 语句':<32}{'次数':>8}{'墙钟(ms)':>12}{'CPU(ms)':>12}{'分配(KB)':>12}"]
+        for step, count, wall, cpu, allocated in self.step_totals()[:limit]:
+            lines.append(f"{step:<32}{count:>8}{wall * 1e3:>12.3f}{cpu * 1e3:>12.3f}{allocated / 1024:>12.1f}")
+            for label, count, wall, cpu, allocated in sorted(by_step[step], key=lambda r: r[2], reverse=True):
+                lines.append(f"  {label:<30}{count:>8}{wall * 1e3:>12.3f}{cpu * 1e3:>12.3f}"
+                             f"{allocated / 1024:>12.1f}")
+        if self.skipped_allocations:
+            lines.append(f"（{self.skipped_allocations} 次语句与其他语句重叠，未计入分配）")
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """折叠栈格式文本：每行 '栈;帧 权重(微秒)'"""
+        with self._lock:
+            return ''.join(f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items()) if weight)
+
+    def write(self, prefix):
+        """
+        写出 <prefix>.collapsed（火焰图）和 <prefix>.txt（耗时表），开启过采样时还有
+        <prefix>.sampled.collapsed，返回文件路径
+        """
+        paths = [prefix + '.collapsed', prefix + '.txt']
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write(self.format_table(limit=sys.maxsize) + '\n')
+        sampled = self.sampled()
+        if sampled:
+            paths.append(prefix + '.sampled.collapsed')
+            with open(paths[2], 'w', encoding='utf-8') as f:
+                f.write(sampled)
+        return tuple(paths)
+
+
+PROFILER = Profiler()
+
+
+class SamplingProfiler:
+    """
+    采样剖析器：后台线程每隔 interval 秒采集目标线程的Python调用栈，累计为折叠栈；
+    Profiler 开启时，栈底加上该线程正在执行的 step/语句。
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, thread_ids=None, profiler=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.profiler = profiler or PROFILER
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        me = threading.get_ident()
+        frames = sys._current_frames()
+        for ident, frame in frames.items():
+            if ident == me or (self.thread_ids is not None and ident not in self.thread_ids):
+                continue
+            names = []
+            current = self.profiler.current.get(ident)
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if current is not None:
+                names.extend(reversed(current))
+            names.reverse()
+            stack = ';'.join(names)
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def reset(self):
+        self.stacks = {}
+        self.samples = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='dsl-sampler')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def install_signal_toggle(prefix, profiler=None, signum=None, allocations=False, sample_interval=None):
+    """
+    安装信号处理器：每收到一次信号（默认 SIGUSR2）切换剖析开关（allocations/sample_interval 同 Profiler.start），
+    关闭时把报告写到 <prefix>.collapsed / <prefix>.txt（及 <prefix>.sampled.collapsed）。
+    """
+    profiler = profiler or PROFILER
+    signum = signum or getattr(signal, 'SIGUSR2', None)
+    if signum is None:
+        raise RuntimeError("当前平台不支持 SIGUSR2，请通过指标服务器的 /profile 接口切换")
+
+    def handler(signo, frame):
+        if profiler.toggle(allocations, sample_interval):
+            profiler.reset()
+            print(f"🔬 剖析已开启 (pid {os.getpid()})")
+        else:
+            paths = profiler.write(prefix)
+            print(f"🔬 剖析已关闭，报告: {', '.join(paths)}")
+
+    signal.signal(signum, handler)
+    return signum
@@ -0,0 +1,91 @@
+"""
+script_cache.py -
+脚本语法树缓存。解析结果按脚本内容的散列序列化到脚本所在目录的 __pycache__ 中
+（或环境变量 DSL_AGENT_CACHE_DIR 指定的目录），再次加载同一脚本时跳过词法/语法分析，
+也不需要导入 PLY 和构建分析表。
+
+缓存键包含脚本内容、解析器后端、Python 版本以及解析相关模块的修改时间和大小，
+文法修改后旧缓存自动失效。设置 DSL_AGENT_SCRIPT_CACHE=false 关闭缓存。
+
+语法树只由 dict、list、字符串和数字组成，以 JSON 保存：缓存目录可能被其他用户写入，
+读取缓存文件不会执行其中的任何代码，内容不是语法树（或编译失败）时视为未命中。
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+CACHE_FORMAT = 2
+# 修改这些模块可能改变解析结果
+_GRAMMAR_MODULES = ('lexer.py', 'parser.py', 'descent_parser.py')
+
+
+def cache_enabled():
+    return os.environ.get('DSL_AGENT_SCRIPT_CACHE', 'true').lower() != 'false'
+
+
+def _grammar_signature():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parts = []
+    for name in _GRAMMAR_MODULES:
+        try:
+            st = os.stat(os.path.join(base_dir, name))
+            parts.append(f"{name}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append(f"{name}:-")
+    return ';'.join(parts)
+
+
+def cache_key(content, backend):
+    """脚本内容（bytes）与解析环境共同决定的缓存键"""
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_FORMAT}|{backend}|{sys.version_info[:2]}|{_grammar_signature()}|".encode('utf-8'))
+    digest.update(content)
+    return digest.hexdigest()[:32]
+
+
+def cache_path(script_file, key):
+    directory = os.environ.get('DSL_AGENT_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(script_file)), '__pycache__')
+    return os.path.join(directory, f"{os.path.basename(script_file)}.{key}.ast")
+
+
+def load(script_file, key):
+    """读取缓存的语法树，不存在或损坏时返回None"""
+    try:
+        with open(cache_path(script_file, key), encoding='utf-8') as f:
+            ast = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return ast if _is_script(ast) else None
+
+
+def _is_script(ast):
+    """检查语法树的 Script/Step 两层结构；更深层的损坏由加载方编译时发现"""
+    if not isinstance(ast, dict) or ast.get('type') != 'Script' or not isinstance(ast.get('children'), list):
+        return False
+    for step in ast['children']:
+        if not (isinstance(step, dict) and step.get('type') == 'Step' and isinstance(step.get('value'), str)
+                and isinstance(step.get('children'), list)
+                and all(isinstance(node, dict) for node in step['children'])):
+            return False
+    return True
+
+
+def store(script_file, key, ast):
+    """写入缓存（先写临时文件再替换）；目录不可写时静默跳过"""
+    path = cache_path(script_file, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(ast, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+    return True
@@ -0,0 +1,233 @@
+"""
+semantic_cache.py -
+近似意图缓存，意图缓存（intent_cache.py）之后的第二层：精确缓存没有命中时，把规范化的输入转换为字符 n-gram
+散列向量（本地计算，只用CPU），在最近写入的条目中找余弦相似度最高的一条，超过阈值时直接使用它的意图，
+"帮我查下物流" 因此可以命中 "帮我查一下物流" 的结果。
+
+  - 向量：输入的单字和相邻两字（含首尾边界）散列到 DIM 维，带符号累加后归一化；
+  - 条目：(向量, 候选意图集合, 意图)，只与候选意图集合相同的条目比较，保存在 numpy 矩阵中，
+    容量固定，写满后覆盖最早的条目（环形缓冲区），内存占用为 容量 x DIM x 4 字节；
+  - 一次查找是一次矩阵向量乘法。
+
+需要 numpy，没有安装时不启用。环境变量：DSL_AGENT_SEMANTIC_CACHE=true 开启（默认关闭），
+DSL_AGENT_SEMANTIC_THRESHOLD 设置相似度阈值（默认 0.7），DSL_AGENT_SEMANTIC_CACHE_SIZE 设置容量（默认 4096）。
+
+离线评估：按时间顺序回放事件日志中经LLM识别和命中精确缓存的轮次（以 wait 位置代替候选意图集合），
+对每个阈值统计第二层的命中率和命中时意图与LLM结果一致的比例：
+
+    python semantic_cache.py <事件日志目录或 JSONL 文件>... [--threshold 0.7 0.8 0.9] [--size N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import zlib
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from agent_log import get_logger
+from metrics import METRICS
+from normalizer import normalize as default_normalize
+
+DIM = 256
+DEFAULT_SIZE = 4096
+DEFAULT_THRESHOLD = 0.7
+# 写入与已有条目几乎相同的输入时更新该条目，不占用新的位置
+_DUPLICATE = 0.999
+_BOUNDARY = '\x02'
+# 离线评估回放的路由来源：命中近似缓存的轮次没有经过LLM确认，不作为正确意图
+_CLASSIFIED = ('llm', 'cache')
+
+
+def _env_number(name, default, kind):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=1 << 16)
+def _slot(gram):
+    """n-gram 的散列位置和符号"""
+    h = zlib.crc32(gram.encode('utf-8'))
+    return h & (DIM - 1), 1.0 if h & 0x80000000 else -1.0
+
+
+def text_vector(text):
+    """规范化输入的单位向量（float32），输入为空时返回None"""
+    if not text:
+        return None
+    padded = _BOUNDARY + text + _BOUNDARY
+    slots = [_slot(char) for char in text]
+    slots += [_slot(padded[i:i + 2]) for i in range(len(padded) - 1)]
+    vector = np.zeros(DIM, dtype=np.float32)
+    for index, sign in slots:
+        vector[index] += sign
+    norm = float(np.sqrt(vector @ vector))
+    if not norm:
+        return None
+    vector /= norm
+    return vector
+
+
+class SemanticCache:
+    """线程安全的近似意图缓存；没有安装 numpy 时 enabled 为 False，查找总是未命中"""
+
+    def __init__(self, size=None, threshold=None):
+        self.size = _env_number('DSL_AGENT_SEMANTIC_CACHE_SIZE', DEFAULT_SIZE, int) if size is None else size
+        self.threshold = (_env_number('DSL_AGENT_SEMANTIC_THRESHOLD', DEFAULT_THRESHOLD, float)
+                          if threshold is None else threshold)
+        self.log = get_logger('cache')
+        self._lock = threading.Lock()
+        # 候选意图集合 -> 编号
+        self._scopes = {}
+        self._intents = [None] * max(self.size, 0)
+        self._count = 0
+        self._next = 0
+        if np is None:
+            if self.size > 0:
+                self.log.error("近似意图缓存需要 numpy，未启用")
+            self.size = 0
+            return
+        self._vectors = np.zeros((self.size, DIM), dtype=np.float32)
+        self._scope_ids = np.full(self.size, -1, dtype=np.int32)
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def __len__(self):
+        return self._count
+
+    def _best(self, scope_id, vector):
+        """调用方持有 _lock；返回同一候选集合中相似度最高的 (位置, 相似度)，没有时为 (-1, -1.0)"""
+        count = self._count
+        if not count:
+            return -1, -1.0
+        scores = self._vectors[:count] @ vector
+        scores[self._scope_ids[:count] != scope_id] = -1.0
+        best = int(scores.argmax())
+        return best, float(scores[best])
+
+    def get(self, scope, text):
+        """
+        按规范化的输入 text 查找；scope 为候选意图集合（可散列，如意图元组）。
+        返回 (意图, 相似度)，没有超过阈值的条目时意图为None
+        """
+        if not self.enabled:
+            return None, 0.0
+        vector = text_vector(text)
+        with self._lock:
+            scope_id = self._scopes.get(scope)
+            if vector is None or scope_id is None:
+                best, score = -1, -1.0
+            else:
+                best, score = self._best(scope_id, vector)
+            if best >= 0 and score >= self.threshold:
+                METRICS.inc('semantic_cache_total', result='hit')
+                return self._intents[best], score
+        METRICS.inc('semantic_cache_total', result='miss')
+        return None, score
+
+    def put(self, scope, text, intent):
+        """写入LLM对规范化的输入识别的意图"""
+        if not self.enabled:
+            return
+        vector = text_vector(text)
+        if vector is None:
+            return
+        with self._lock:
+            scope_id = self._scopes.setdefault(scope, len(self._scopes))
+            best, score = self._best(scope_id, vector)
+            if score >= _DUPLICATE:
+                self._intents[best] = intent
+                return
+            slot = self._next
+            self._vectors[slot] = vector
+            self._scope_ids[slot] = scope_id
+            self._intents[slot] = intent
+            self._next = (slot + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+
+def _load_samples(paths, normalize):
+    """
+    按时间顺序产出 (wait 位置, 规范化输入, 意图)：事件日志目录或段文件中经LLM识别和命中精确缓存的轮次，
+    或 JSONL 文件（.jsonl）中每行的 site、input、intent
+    """
+    from event_log import read_events, site_key
+    for path in paths:
+        if not path.endswith('.jsonl'):
+            for event in read_events(path, kinds=['turn']):
+                if event.source in _CLASSIFIED:
+                    yield site_key(event.step, event.lineno), normalize(event.text), event.intent
+            continue
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry['site'], normalize(entry['input']), entry['intent']
+
+
+def evaluate(samples, thresholds, size=DEFAULT_SIZE):
+    """
+    按顺序回放 [(范围, 规范化输入, 正确意图)]：先查精确缓存，再查近似缓存，都没有命中时视为调用LLM并写入。
+    返回每个阈值的结果 {threshold, turns, exact, hits, hit_rate, accuracy, llm_calls}；
+    hit_rate 为近似缓存命中的轮次占精确缓存未命中轮次的比例，accuracy 为命中时意图正确的比例
+    """
+    samples = list(samples)
+    results = []
+    for threshold in thresholds:
+        cache = SemanticCache(size, threshold)
+        seen = {}
+        exact = hits = correct = 0
+        for scope, text, intent in samples:
+            if (scope, text) in seen:
+                exact += 1
+                continue
+            cached, _ = cache.get(scope, text)
+            if cached is not None:
+                hits += 1
+                correct += cached == intent
+                continue
+            seen[scope, text] = intent
+            cache.put(scope, text, intent)
+        misses = len(samples) - exact
+        results.append({'threshold': threshold, 'turns': len(samples), 'exact': exact, 'hits': hits,
+                        'hit_rate': hits / misses if misses else 0.0,
+                        'accuracy': correct / hits if hits else 1.0,
+                        'llm_calls': misses - hits})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='近似意图缓存的离线评估')
+    parser.add_argument('paths', nargs='+', help='事件日志目录、段文件或 JSONL（site、input、intent）')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[0.6, 0.65, 0.7, 0.75, 0.8], help='相似度阈值')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help='缓存容量')
+    parser.add_argument('--json', action='store_true', help='输出JSON')
+    args = parser.parse_args(argv)
+    if np is None:
+        print("近似意图缓存需要 numpy", file=sys.stderr)
+        return 2
+
+    results = evaluate(_load_samples(args.paths, default_normalize), args.threshold, args.size)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    print(f"轮数: {results[0]['turns'] if results else 0}  精确缓存命中: {results[0]['exact'] if results else 0}")
+    print("阈值    命中率    准确率    LLM调用")
+    for result in results:
+        print(f"{result['threshold']:<8.2f}{result['hit_rate']:<10.2%}{result['accuracy']:<10.2%}"
+              f"{result['llm_calls']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
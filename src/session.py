@@ -0,0 +1,396 @@
+"""
+session.py -
+非阻塞的对话会话。DSLEngine.process 在 wait 处调用 input() 阻塞并递归进入下一个step，
+无法同时驱动多个对话；会话把执行进度保存在显式的帧栈中，每轮由调用方传入用户输入：
+
+    session = engine.new_session()
+    reply = session.begin()          # 执行到第一个 wait
+    reply = session.feed("我要退货")  # 识别意图、跳转并执行到下一个 wait
+
+    for reply in session.stream_feed("我要退货"):   # 流式：每条 reply 产生后立即返回
+        send(reply)
+    async for reply in session.astream_feed("我要退货"):   # 异步版本，意图识别不阻塞事件循环
+        await send(reply)
+
+call 语句调用的外部函数由驱动执行的接口完成：同步接口在线程池中执行并等待结果（带超时），
+异步接口 await 结果，慢速的后端服务不会阻塞事件循环上的其他会话；extract 的LLM提取同样在线程池中执行。
+引擎开启 defer_effects（默认）时，call 开始后继续执行后面的语句，到编译期确定的汇合点才取得结果，
+互不依赖的调用并发执行；log 和没有目标变量的 call 在本轮的回复全部产出之后才完成。
+
+多个会话共享同一个引擎的编译结果和LLM客户端，各自保存变量、输入历史和当前步骤，
+以及意图识别用的对话上下文（context_window.ConversationContext）和 token 用量。
+log 语句和每一轮对话以会话ID写入引擎的事件日志（event_log.EventLog）。
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from context_window import ConversationContext
+from metrics import METRICS
+from profiler import PROFILER
+
+EXIT_WORDS = ('退出', 'quit', 'exit', 'bye')
+
+
+class _StartCall:
+    """_iter_run 遇到 call 语句时产出，驱动接口开始调用后把调用句柄 send 回去"""
+
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class _JoinCall:
+    """_iter_run 需要调用结果时产出，驱动接口等待调用完成后把结果 send 回去"""
+
+    __slots__ = ('handle',)
+
+    def __init__(self, handle):
+        self.handle = handle
+
+
+class _ExtractCall:
+    """_iter_run 的本地提取器没有结果时产出，驱动接口调用LLM提取后把值 send 回去"""
+
+    __slots__ = ('statement', 'extractor', 'text')
+
+    def __init__(self, statement, extractor, text):
+        self.statement = statement
+        self.extractor = extractor
+        self.text = text
+
+
+_REQUESTS = (_StartCall, _JoinCall, _ExtractCall)
+
+
+class DialogSession:
+    """单个对话的执行状态"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.session_id = uuid.uuid4().hex
+        self.input_history = []
+        self.variables = {
+            'user_input': '',
+            'input_history': self.input_history
+        }
+        self.current_step = None
+        self.pending_wait = None
+        # pending_wait 所在的step
+        self.wait_step = None
+        self.finished = False
+        self.turns = 0
+        self.context = ConversationContext()
+        # 最近一轮的耗时（秒）：意图识别、脚本执行，以及从收到输入到产出第一条回复
+        self.last_timings = {'classify': 0.0, 'execute': 0.0, 'first_reply': 0.0}
+        # 帧栈：[语句列表, 下一条语句下标, 该step的用户输入, step名称, 是否为 if/match 分支]
+        self._frames = []
+        # 本轮进行中的调用 {id(call 语句): (语句, 调用句柄)} 和延后写入的日志 (文本, step, 行号)，一轮结束前全部完成
+        self._running = {}
+        self._logs = []
+
+    def begin(self, step_name: str = None) -> str:
+        """从指定step（默认脚本中的第一个step）开始执行，直到遇到 wait 或流程结束"""
+        return '\n'.join(self.stream_begin(step_name))
+
+    def feed(self, user_input: str) -> str:
+        """提交一轮用户输入，返回本轮的回复文本"""
+        return '\n'.join(self.stream_feed(user_input))
+
+    # 流式接口：每条 reply 求值后立即产出，之后的语句（log 等）在调用方取下一条时才执行。
+    # 必须把一轮的回复迭代完，会话才会停在下一个 wait 上。
+
+    def stream_begin(self, step_name: str = None) -> Iterator[str]:
+        """begin 的生成器版本，逐条产出回复"""
+        yield from self._resolve_calls(self._begin_turn(step_name))
+
+    def stream_feed(self, user_input: str) -> Iterator[str]:
+        """feed 的生成器版本：识别意图后逐条产出回复"""
+        user_input = self._accept(user_input)
+        if not user_input:
+            return
+        if user_input.lower() in EXIT_WORDS:
+            yield self._exit()
+            return
+        start = time.perf_counter()
+        next_step, source = self._route(user_input)
+        turn = self._stream_turn(user_input, next_step, start, time.perf_counter(), source)
+        yield from self._resolve_calls(turn)
+
+    async def astream_begin(self, step_name: str = None) -> AsyncIterator[str]:
+        """begin 的异步迭代器版本"""
+        async for reply in self._aresolve_calls(self._begin_turn(step_name)):
+            yield reply
+
+    async def astream_feed(self, user_input: str) -> AsyncIterator[str]:
+        """feed 的异步迭代器版本：意图识别（网络请求）在线程池中执行，不阻塞事件循环"""
+        user_input = self._accept(user_input)
+        if not user_input:
+            return
+        if user_input.lower() in EXIT_WORDS:
+            yield self._exit()
+            return
+        start = time.perf_counter()
+        next_step, source = await asyncio.to_thread(self._route, user_input)
+        turn = self._stream_turn(user_input, next_step, start, time.perf_counter(), source)
+        async for reply in self._aresolve_calls(turn):
+            yield reply
+
+    def _resolve_calls(self, turn) -> Iterator[str]:
+        """同步驱动：在线程池中执行一轮中 call 语句的函数调用，直接调用LLM提取，只产出回复"""
+        engine = self.engine
+        value = None
+        while True:
+            try:
+                item = turn.send(value)
+            except StopIteration:
+                return
+            kind = type(item)
+            if kind is _StartCall:
+                value = engine.functions.start(item.name, item.args)
+            elif kind is _JoinCall:
+                value = engine._join_call(item.handle)
+            elif kind is _ExtractCall:
+                value = engine._extract_llm(item.statement, item.extractor, item.text)
+            else:
+                value = None
+                yield item
+
+    async def _aresolve_calls(self, turn) -> AsyncIterator[str]:
+        """异步驱动：调用作为事件循环上的任务执行，汇合时 await 结果，LLM提取在线程池中执行；每条回复之后让出事件循环"""
+        engine = self.engine
+        value = None
+        while True:
+            try:
+                item = turn.send(value)
+            except StopIteration:
+                return
+            kind = type(item)
+            if kind is _StartCall:
+                value = asyncio.ensure_future(engine._ainvoke(item.name, item.args))
+            elif kind is _JoinCall:
+                value = await item.handle
+            elif kind is _ExtractCall:
+                value = await asyncio.to_thread(engine._extract_llm, item.statement, item.extractor, item.text)
+            else:
+                value = None
+                yield item
+                await asyncio.sleep(0)
+
+    def _begin_turn(self, step_name: Optional[str]):
+        """begin 一轮的回复和函数调用，由驱动接口处理"""
+        if step_name is None:
+            step_name = self.engine._get_first_step()
+            if not step_name:
+                self.finished = True
+                yield "脚本中没有找到可用的步骤"
+                return
+        self._frames = []
+        self._running.clear()
+        self._logs.clear()
+        self.finished = False
+        self.pending_wait = None
+        yield from self._stream_turn(None, step_name, time.perf_counter(), None)
+
+    def _accept(self, user_input: str) -> str:
+        if self.pending_wait is None:
+            raise RuntimeError("会话没有等待中的输入")
+        return user_input.strip()
+
+    def _exit(self) -> str:
+        self.pending_wait = None
+        self.finished = True
+        return "感谢使用，再见！"
+
+    def _route(self, user_input: str):
+        """识别意图，返回 (要跳转的step, 路由来源)；无法识别时为默认意图（见 DSLEngine._fallback_intent），来源为 fallback"""
+        engine = self.engine
+        wait = self.pending_wait
+        # 每轮规范化一次，关键词匹配、意图缓存和LLM的关键词回退共用；when 规则匹配原始输入
+        text = engine.normalizer(user_input)
+        source = 'rule'
+        target = engine._route_by_rules(wait, user_input)
+        if target is None:
+            source = 'keyword'
+            target = engine._route_by_keywords(wait, text)
+        if target is not None:
+            engine.log.debug("会话按规则跳转到步骤: {}", target)
+            return target, source
+        matched_intent, source = engine._classify(self.wait_step, wait, user_input, text, [], context=self.context)
+        if matched_intent and engine._get_program().get_step(matched_intent) is not None:
+            return matched_intent, source
+        next_step = engine._fallback_intent(self.wait_step, wait)
+        engine.log.debug("会话无法识别意图，跳转到默认意图: {}", next_step)
+        return next_step, 'fallback'
+
+    def _stream_turn(self, user_input: Optional[str], step_name: str, start: float,
+                     classified: Optional[float], source: str = None) -> Iterator[str]:
+        """
+        执行一轮并逐条产出回复和待执行的函数调用（由 _resolve_calls/_aresolve_calls 处理）；
+        user_input 为None表示 begin。结束时记录耗时、对话上下文和 turn 事件
+        """
+        if user_input is not None:
+            wait, wait_step = self.pending_wait, self.wait_step
+            self.pending_wait = None
+            self.turns += 1
+            self.input_history.append(user_input)
+            # 已执行完的帧不会再产生回复，跳转前丢弃，长对话的帧栈不会无限增长
+            frames = self._frames
+            while frames and frames[-1][1] >= len(frames[-1][0]):
+                frames.pop()
+        execute_start = classified or start
+        first_reply = 0.0
+        replies = []
+        runner = self._iter_run(step_name, user_input or '')
+        value = None
+        while True:
+            try:
+                reply = runner.send(value)
+            except StopIteration:
+                break
+            if type(reply) in _REQUESTS:
+                value = yield reply
+                continue
+            value = None
+            if not replies:
+                first_reply = time.perf_counter() - start
+            replies.append(reply)
+            yield reply
+        self.last_timings = {'classify': execute_start - start,
+                             'execute': time.perf_counter() - execute_start,
+                             'first_reply': first_reply}
+        if user_input is not None:
+            METRICS.observe('turn_classify', self.last_timings['classify'])
+            METRICS.observe('turn_execute', self.last_timings['execute'])
+            if replies:
+                METRICS.observe('turn_first_reply', first_reply)
+            self.engine._record_turn(self.session_id, wait_step, wait, user_input, step_name, source,
+                                     self.last_timings['classify'], self.last_timings['execute'])
+        self.context.add_turn(user_input, step_name if user_input is not None else None, '\n'.join(replies))
+
+    def _iter_run(self, step_name: str, user_input: str) -> Iterator[str]:
+        """
+        压入目标step并执行帧栈，逐条产出回复，直到遇到 wait（保存为 pending_wait）或全部执行完。
+        call 语句产出 _StartCall 开始调用，到汇合点（或 defer_effects 关闭时立即）产出 _JoinCall，
+        调用方把函数结果 send 回来后绑定到目标变量；extract 需要LLM提取时产出 _ExtractCall
+        """
+        engine = self.engine
+        program = engine._get_program()
+        step = program.get_step(step_name)
+        if step is None:
+            yield f"未知步骤: {step_name}。可用步骤: {', '.join(engine.get_steps())}"
+        else:
+            self.current_step = step_name
+            self._frames.append([step.get('children', []), 0, user_input, step_name, False])
+
+        frames = self._frames
+        variables = self.variables
+        running = self._running
+        defer = engine.defer_effects
+        timed = METRICS.enabled
+        profiling = PROFILER.enabled
+        while frames:
+            frame = frames[-1]
+            statements, index, frame_input, frame_step, _ = frame
+            if index >= len(statements):
+                frames.pop()
+                if running:
+                    yield from self._join(program.joins_before(statements))
+                continue
+            frame[1] = index + 1
+            statement = statements[index]
+            node_type = statement.get('type', '')
+            variables['user_input'] = frame_input
+
+            if node_type == 'Wait':
+                if statement.get('value'):
+                    yield from self._settle()
+                    self.pending_wait = statement
+                    self.wait_step = frame_step
+                    return
+                continue
+            if running:
+                yield from self._join(program.joins_before(statement))
+
+            if timed:
+                start = time.perf_counter()
+            if profiling:
+                sample = PROFILER.begin(frame_step, statement)
+            reply = None
+            if node_type == 'Reply':
+                expression = statement.get('value')
+                if expression:
+                    reply = engine._evaluate_expression(expression, variables)
+            elif node_type == 'Log':
+                expression = statement.get('value')
+                if expression:
+                    text = engine._evaluate_expression(expression, variables)
+                    if defer:
+                        self._logs.append((text, frame_step, statement.get('lineno', 0)))
+                    else:
+                        engine._write_log(text, frame_step, statement.get('lineno', 0), self.session_id)
+            elif node_type == 'Extract':
+                value, extractor, text = engine._extract_local(statement, variables)
+                if value is None and extractor is not None and text:
+                    # LLM提取是网络请求，交给驱动接口执行（异步接口不阻塞事件循环）
+                    value = yield _ExtractCall(statement, extractor, text)
+                engine._bind_slot(statement, value, variables)
+            elif node_type == 'Call':
+                name, args = engine._call_arguments(statement, variables)
+                handle = yield _StartCall(name, args)
+                if defer:
+                    running[id(statement)] = (statement, handle)
+                else:
+                    engine._bind_call(statement, (yield _JoinCall(handle)), variables)
+            elif node_type == 'If' or node_type == 'Match':
+                # 选中的分支作为新帧压栈，执行完后回到本帧的下一条语句
+                branch = engine._select_case(statement, variables)
+                if branch:
+                    frames.append([branch, 0, frame_input, frame_step, True])
+            if profiling:
+                PROFILER.end(sample, frame_step, statement, [f[3] for f in frames if not f[4]])
+            if timed:
+                METRICS.observe('statement', time.perf_counter() - start, type=node_type)
+            if reply is not None:
+                yield reply
+
+        yield from self._settle()
+        self.finished = True
+
+    def _join(self, calls):
+        """取得 calls 中仍在进行的调用的结果并赋给目标变量"""
+        running = self._running
+        for statement in calls:
+            entry = running.pop(id(statement), None)
+            if entry is not None:
+                self.engine._bind_call(statement, (yield _JoinCall(entry[1])), self.variables)
+
+    def _settle(self):
+        """一轮结束前写入延后的日志，再取得所有进行中的调用结果"""
+        engine = self.engine
+        logs = self._logs
+        for text, step, lineno in logs:
+            engine._write_log(text, step, lineno, self.session_id)
+        logs.clear()
+        running = self._running
+        while running:
+            statement, handle = running.pop(next(iter(running)))
+            engine._bind_call(statement, (yield _JoinCall(handle)), self.variables)
+
+    @property
+    def waiting(self) -> bool:
+        return self.pending_wait is not None
+
+    def get_intents(self) -> Optional[List[str]]:
+        """当前 wait 的候选意图，没有等待输入时返回None"""
+        return list(self.pending_wait['value']) if self.pending_wait else None
+
+    def get_variables(self) -> Dict[str, Any]:
+        return self.variables.copy()
+
+    def token_usage(self) -> Dict[str, Any]:
+        """本会话意图识别的 token 用量"""
+        return self.context.token_usage()
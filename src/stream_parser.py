@@ -0,0 +1,154 @@
+"""
+stream_parser.py -
+流式解析模块。按块读取脚本文件（或内存映射缓冲区），在 step 关键字处切分，
+每次只对一个 step 做词法/语法分析并立即产出，峰值内存与最大的 step 成正比，
+而不是与整个文件成正比。
+"""
+
+import codecs
+import io
+import mmap
+import re
+from parser import Parser
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# 切分用的扫描规则，与词法分析器保持一致：字符串、注释、变量中的 step 不算区块边界
+_SCAN = re.compile(r'''
+    (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<comment>\#[^\n]*)
+  | (?P<variable>\$[a-zA-Z_][a-zA-Z0-9_]*)
+  | (?P<word>[a-zA-Z_][a-zA-Z_0-9]*)
+  | (?P<space>[ \t\n]+)
+  | (?P<other>[^"\#$a-zA-Z_ \t\n]+|.)
+''', re.VERBOSE)
+
+# 能单独构成token的运算符和分隔符（其余字符在词法分析器中都是非法字符）
+_TOKEN_CHARS = frozenset('+=(),')
+
+# 缓冲区末尾尚未闭合的字符串：需要继续读取才能判断
+_OPEN_STRING = re.compile(r'"(?:[^"\\]|\\.)*\\?\Z')
+
+
+def _iter_chunks(source, chunk_size):
+    """把文件路径、文件对象或内存映射缓冲区统一转换为文本块序列"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            if f.seek(0, io.SEEK_END) == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                yield from _iter_chunks(buf, chunk_size)
+        return
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield decoder.decode(view[offset:offset + chunk_size])
+        yield decoder.decode(b'', final=True)
+        return
+
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    yield decoder.decode(b'', final=True)
+
+
+def _normalize_newlines(chunks):
+    """与非流式加载一致，把 \\r\\n 和 \\r 统一为 \\n；块末尾的 \\r 留到下一块，被切开的 \\r\\n 仍是一个换行"""
+    carry = ''
+    for chunk in chunks:
+        if carry:
+            chunk = carry + chunk
+            carry = ''
+        if chunk.endswith('\r'):
+            chunk, carry = chunk[:-1], '\r'
+        if '\r' in chunk:
+            chunk = chunk.replace('\r\n', '\n').replace('\r', '\n')
+        yield chunk
+    if carry:
+        yield '\n'
+
+
+def iter_step_sources(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    按 step 切分脚本源码，逐个产出 (step源码, 起始行号)。
+
+    source 可以是文件路径、文本/二进制文件对象、bytes 或 mmap 对象，换行符统一为 \\n。
+    第一个 step 之前的前导文本只有包含注释和空白以外的内容时才会产出（交给解析器报错）。
+    """
+    buf = ''
+    seg_start = 0      # 当前区块在 buf 中的起点
+    seg_line = 1       # 当前区块的起始行号
+    seg_tokens = False  # 当前区块是否包含注释和空白以外的内容
+    pos = 0
+    chunks = _normalize_newlines(_iter_chunks(source, chunk_size))
+    eof = False
+
+    while True:
+        match = _SCAN.match(buf, pos) if pos < len(buf) else None
+        needs_more = (
+            match is None
+            or (match.end() == len(buf) and not eof)
+            or (buf[pos] == '"' and match.lastgroup != 'string' and not eof
+                and _OPEN_STRING.match(buf, pos))
+        )
+        if needs_more and not eof:
+            # 丢弃已经产出的部分，再读入下一块
+            buf = buf[seg_start:]
+            pos -= seg_start
+            seg_start = 0
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                buf += chunk
+            continue
+        if match is None:
+            break
+
+        kind = match.lastgroup
+        if kind == 'word' and match.group() == 'step':
+            start = match.start()
+            if start > seg_start:
+                text = buf[seg_start:start]
+                if seg_tokens:
+                    yield text, seg_line
+                seg_line += text.count('\n')
+            seg_start = start
+            seg_tokens = True
+        elif kind in ('string', 'variable', 'word') or (kind == 'other' and not _TOKEN_CHARS.isdisjoint(match.group())):
+            # 其余字符在词法分析器中都是非法字符，会被跳过而不产生token
+            seg_tokens = True
+        pos = match.end()
+
+    if seg_tokens:
+        yield buf[seg_start:], seg_line
+
+
+class StreamParser:
+    """流式解析器：逐个产出 Step 节点，不在内存中保留整个脚本文本或token列表"""
+
+    def __init__(self, debug=False):
+        self.parser = Parser(debug=debug)
+        self.error_count = 0
+
+    def iter_steps(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """逐个产出解析好的 Step 节点；解析失败的 step 计入 error_count 并跳过"""
+        self.error_count = 0
+        lexer = self.parser.lexer
+        for text, lineno in iter_step_sources(source, chunk_size):
+            result = self.parser.parse_tokens(lexer.iter_tokens(text, lineno))
+            if not result or self.parser.error_count or len(result['children']) != 1:
+                self.error_count += 1
+                continue
+            yield result['children'][0]
+
+    def parse(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """流式读取并组装完整语法树，有语法错误时返回None"""
+        children = list(self.iter_steps(source, chunk_size))
+        if self.error_count or not children:
+            return None
+        return {'type': 'Script', 'lineno': 1, 'children': children}
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+stub_llm_server.py -
+本地确定性LLM替身服务器，实现 OpenAI 兼容的 /chat/completions 接口。
+从 LLMClient 构造的提示词中解析可用意图和用户输入，按关键词规则或散列返回意图，
+可配置延迟分布、错误率和限流，并在 usage 中模拟服务端前缀缓存命中的 token 数，
+使负载测试和基准测试离线走真实的网络路径。
+
+用法:
+    python stub_llm_server.py --port 8900 --latency lognormal:0.2:0.5 --error-rate 0.01
+    DSL_AGENT_BASE_URL=http://127.0.0.1:8900/v1 python main.py script.dsl
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INTENTS_LABEL = '可用意图：'
+INPUT_LABEL = '用户输入：'
+MATCH_MODES = ('keyword', 'hash', 'first')
+# 模拟服务端前缀缓存：按固定长度的块记录见过的提示词前缀（token 数按字符计）
+PREFIX_BLOCK = 64
+PREFIX_CACHE_SIZE = 100000
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布描述，返回 rng -> 秒 的采样函数。
+    支持 fixed:S、uniform:A:B、normal:MU:SIGMA、lognormal:MEDIAN:SIGMA、exp:MEAN（单位秒）。
+    """
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, rest = spec.partition(':')
+    try:
+        args = [float(x) for x in rest.split(':')] if rest else []
+    except ValueError:
+        raise ValueError(f"无效的延迟参数: {spec}") from None
+    if kind == 'fixed' and len(args) == 1:
+        return lambda rng: args[0]
+    if kind == 'uniform' and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == 'normal' and len(args) == 2:
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == 'lognormal' and len(args) == 2 and args[0] > 0:
+        mu = math.log(args[0])
+        return lambda rng: rng.lognormvariate(mu, args[1])
+    if kind == 'exp' and len(args) == 1 and args[0] > 0:
+        return lambda rng: rng.expovariate(1 / args[0])
+    raise ValueError(f"无效的延迟分布: {spec}")
+
+
+def _field(prompt, label):
+    """取提示词中 label 所在行的内容，找不到时返回None"""
+    start = prompt.find(label)
+    if start < 0:
+        return None
+    start += len(label)
+    end = prompt.find('\n', start)
+    return prompt[start:end if end >= 0 else len(prompt)].strip()
+
+
+class TokenBucket:
+    """令牌桶限流：rate 为每秒补充的请求数，burst 为桶容量"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌；被限流时返回建议的等待秒数，否则返回0"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class StubLLM:
+    """
+    替身服务器的行为配置与状态（与HTTP层无关，便于直接测试）。
+
+    rules: {意图: [关键词, ...]}，keyword 模式下用户输入包含关键词即返回该意图
+           （只在提示词给出的可用意图中匹配），都不匹配时退回散列。
+    mode:  keyword | hash（按用户输入散列到可用意图）| first（总是第一个可用意图）
+    """
+
+    def __init__(self, rules=None, mode='keyword', latency=None, error_rate=0.0,
+                 rate_limit=None, burst=None, seed=0, model='stub-llm'):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"未知的匹配模式: {mode}，可选: {', '.join(MATCH_MODES)}")
+        self.rules = dict(rules or {})
+        self.mode = mode
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.model = model
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0}
+        self.prefixes = set()
+
+    def classify(self, prompt):
+        """根据提示词返回意图名称"""
+        intents = [i.strip() for i in (_field(prompt, INTENTS_LABEL) or '').split(',') if i.strip()]
+        text = _field(prompt, INPUT_LABEL) or prompt
+        if not intents:
+            return 'unknown'
+        if self.mode == 'first':
+            return intents[0]
+        if self.mode == 'keyword':
+            for intent in intents:
+                if any(keyword in text for keyword in self.rules.get(intent, ())):
+                    return intent
+        return intents[zlib.crc32(text.encode('utf-8')) % len(intents)]
+
+    def draw(self):
+        """为一次请求抽取 (延迟秒数, 是否注入错误)；共享随机数生成器，加锁保证可复现"""
+        with self.lock:
+            self.stats['requests'] += 1
+            delay = self.sample_latency(self.rng)
+            failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        return delay, failed
+
+    def cached_prefix(self, text):
+        """返回 text 中已缓存前缀的长度（整块计），并把它的所有整块前缀加入缓存"""
+        cached = 0
+        with self.lock:
+            if len(self.prefixes) > PREFIX_CACHE_SIZE:
+                self.prefixes.clear()
+            hit = True
+            for end in range(PREFIX_BLOCK, len(text) + 1, PREFIX_BLOCK):
+                key = hash(text[:end])
+                if hit and key in self.prefixes:
+                    cached = end
+                else:
+                    hit = False
+                    self.prefixes.add(key)
+        return cached
+
+    def completion(self, request):
+        """构造 chat.completion 响应体"""
+        messages = request.get('messages') or []
+        prompt = messages[-1].get('content', '') if messages else ''
+        intent = self.classify(prompt)
+        serialized = ''.join(f"{m.get('role', '')}\n{m.get('content', '')}\n" for m in messages)
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages)
+        cached_tokens = min(prompt_tokens, self.cached_prefix(serialized))
+        completion_tokens = len(intent)
+        return {
+            'id': f"chatcmpl-stub-{self.stats['requests']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model') or self.model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': intent},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'prompt_tokens_details': {'cached_tokens': cached_tokens},
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，不关闭Nagle算法时与延迟确认叠加会让每个请求多出约40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, kind, headers=None):
+        self._send(status, {'error': {'message': message, 'type': kind, 'code': status}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            stub = self.server.stub
+            self._send(200, {'object': 'list', 'data': [{'id': stub.model, 'object': 'model'}]})
+        else:
+            self._error(404, f"未知路径: {self.path}", 'not_found')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._error(404, f"未知路径: {self.path}", 'not_found')
+            return
+        try:
+            request = json.loads(raw or b'{}')
+        except ValueError:
+            self._error(400, "请求体不是合法的JSON", 'invalid_request_error')
+            return
+        if request.get('stream'):
+            self._error(400, "替身服务器不支持流式响应", 'invalid_request_error')
+            return
+
+        stub = self.server.stub
+        if stub.bucket is not None:
+            wait = stub.bucket.acquire()
+            if wait:
+                with stub.lock:
+                    stub.stats['rate_limited'] += 1
+                self._error(429, "请求过于频繁", 'rate_limit_exceeded',
+                            {'Retry-After': f"{wait:.3f}"})
+                return
+        delay, failed = stub.draw()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            self._error(500, "注入的服务端错误", 'server_error')
+            return
+        self._send(200, stub.completion(request))
+
+
+class StubLLMServer:
+    """在后台线程中运行的替身服务器；port=0 时自动分配端口"""
+
+    def __init__(self, host='127.0.0.1', port=0, verbose=False, **options):
+        self.stub = StubLLM(**options)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self.stub
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """可直接用作 DSL_AGENT_BASE_URL 的地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def stats(self):
+        return dict(self.stub.stats)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地OpenAI兼容LLM替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--mode', choices=MATCH_MODES, default='keyword', help='意图选择方式')
+    parser.add_argument('--rules', help='关键词规则JSON文件：{"意图": ["关键词", ...]}')
+    parser.add_argument('--latency', help='延迟分布，如 fixed:0.05、uniform:0.1:0.3、lognormal:0.2:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500错误的概率')
+    parser.add_argument('--rate-limit', type=float, help='每秒允许的请求数，超出返回429')
+    parser.add_argument('--burst', type=float, help='限流令牌桶容量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('-v', '--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args(argv)
+
+    rules = None
+    if args.rules:
+        with open(args.rules, encoding='utf-8') as f:
+            rules = json.load(f)
+
+    server = StubLLMServer(args.host, args.port, verbose=args.verbose, rules=rules, mode=args.mode,
+                           latency=args.latency, error_rate=args.error_rate,
+                           rate_limit=args.rate_limit, burst=args.burst, seed=args.seed)
+    print(f"🚀 替身LLM服务器已启动: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 统计: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""
+测试公共配置
+"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def event_dir(tmp_path, monkeypatch):
+    """事件日志写入每个测试的临时目录，不在工作目录留下 dsl_engine.events/"""
+    directory = tmp_path / 'events'
+    monkeypatch.setenv('DSL_AGENT_EVENT_DIR', str(directory))
+    return directory
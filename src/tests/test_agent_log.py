@@ -0,0 +1,103 @@
+"""
+日志层测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import io
+import json
+from unittest.mock import patch, MagicMock
+from agent_log import DEBUG, ERROR, WARNING, AgentLogger, Lazy, get_logger
+from dsl_engine import DSLEngine
+from llm_client import LLMClient
+
+
+class FormatCounter:
+    """记录被格式化次数的参数"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __format__(self, spec):
+        self.count += 1
+        return 'x'
+
+    __str__ = __repr__ = lambda self: self.__format__('')
+
+
+class TestAgentLogger:
+    def setup_method(self):
+        self.stream = io.StringIO()
+
+    def test_disabled_level_does_not_format(self):
+        """测试级别关闭时不格式化参数"""
+        log = AgentLogger('t', level=WARNING, stream=self.stream)
+        arg = FormatCounter()
+        log.debug("值: {}", arg)
+        log.debug("值: {v}", v=arg)
+        assert arg.count == 0
+        assert self.stream.getvalue() == ''
+
+    def test_text_format_matches_previous_output(self):
+        """测试文本格式与原来的 [DEBUG] 输出一致"""
+        log = AgentLogger('t', level=DEBUG, structured=False, stream=self.stream)
+        log.debug("处理步骤: {}, 输入: {}", 'greeting', '你好')
+        log.error("失败")
+        assert self.stream.getvalue() == "[DEBUG] 处理步骤: greeting, 输入: 你好\n[ERROR] 失败\n"
+
+    def test_message_without_args_is_not_formatted(self):
+        """测试不带参数的消息原样输出（可以包含花括号）"""
+        log = AgentLogger('t', level=DEBUG, structured=False, stream=self.stream)
+        log.debug("{不是占位符}")
+        assert self.stream.getvalue() == "[DEBUG] {不是占位符}\n"
+
+    def test_json_format(self):
+        """测试结构化输出"""
+        log = AgentLogger('engine', level=DEBUG, structured=True, stream=self.stream)
+        log.info("跳转到步骤: {step}", step='help')
+        record = json.loads(self.stream.getvalue())
+        assert record['level'] == 'INFO'
+        assert record['logger'] == 'engine'
+        assert record['msg'] == '跳转到步骤: help'
+        assert record['fields'] == {'step': 'help'}
+
+    def test_lazy_argument(self):
+        """测试 Lazy 参数只在输出时求值，并支持格式说明"""
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return 'abcdef'
+
+        AgentLogger('t', level=ERROR, stream=self.stream).debug("{}", Lazy(expensive))
+        assert calls == []
+        AgentLogger('t', level=DEBUG, structured=False, stream=self.stream).debug("{:.3}", Lazy(expensive))
+        assert calls == [1]
+        assert self.stream.getvalue() == "[DEBUG] abc\n"
+
+    def test_level_from_environment(self):
+        """测试默认级别读取环境变量，debug=True 时为 DEBUG"""
+        with patch.dict('os.environ', {'DSL_AGENT_LOG_LEVEL': 'error'}):
+            assert get_logger('t').level == ERROR
+            assert get_logger('t', debug=True).level == DEBUG
+
+
+class TestHotPathFormatting:
+    @patch('dsl_engine.LLMClient')
+    def test_engine_process_does_not_format_when_debug_off(self, mock_llm):
+        """测试调试关闭时 process 不格式化调试消息"""
+        engine = DSLEngine(script_content='step a\n    reply "hi"\n')
+        arg = FormatCounter()
+        engine.process('a', arg)
+        assert arg.count == 0
+
+    def test_llm_client_does_not_format_when_debug_off(self):
+        """测试调试关闭时意图识别不格式化调试消息"""
+        client = LLMClient(api_key='test_api_key')
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value.choices[0].message.content = 'a'
+        responses = FormatCounter()
+        assert client.recognize_intent('你好', ['a'], responses) == 'a'
+        # 提示词本身需要格式化一次，调试消息不再格式化
+        assert responses.count == 1
@@ -0,0 +1,142 @@
+"""
+事件日志统计测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import json
+import random
+import pytest
+from unittest.mock import patch
+import analytics
+from analytics import analyze, main
+from event_log import EventLog
+from dsl_engine import DSLEngine
+
+
+def _write_turns(directory, turns):
+    log = EventLog(str(directory), block_bytes=1024)
+    for session, step, lineno, text, intent, source, classify, execute in turns:
+        log.append('turn', session, step, lineno, text, intent, source, classify, execute)
+    log.append('log', 's1', 'refund', 9, '不是 turn 记录')
+    log.close()
+
+
+TURNS = [
+    ('s1', 'welcome', 4, '我要退货', 'refund', 'llm', 0.2, 0.01),
+    ('s1', 'refund', 9, '好的', 'done', 'rule', 0.0001, 0.001),
+    ('s2', 'welcome', 4, '我要退货', 'refund', 'llm', 0.3, 0.01),
+    ('s2', 'welcome', 4, '我要退货', 'human', 'llm', 0.25, 0.01),
+    ('s3', 'welcome', 4, '转人工', 'human', 'keyword', 0.0002, 0.002),
+    ('s3', 'welcome', 4, '随便', 'refund', 'fallback', 1.0, 0.01),
+]
+
+
+class TestAnalytics:
+    def test_report(self, tmp_path):
+        """测试跳转矩阵、wait 位置的意图分布、unknown 率和来源分布"""
+        _write_turns(tmp_path, TURNS)
+        report, priors, warmup = analyze(str(tmp_path))
+        assert report['turns'] == 6
+        assert report['sessions'] == 3
+        assert report['sources'] == {'llm': 3, 'rule': 1, 'keyword': 1, 'fallback': 1}
+        assert report['unknown_rate'] == pytest.approx(1 / 6)
+        assert report['transitions'] == {'welcome': {'refund': 3, 'human': 2}, 'refund': {'done': 1}}
+        site = report['sites']['welcome:4']
+        # 回退到默认意图的轮次只计入 unknown 率，不计入意图分布
+        assert site == {'turns': 5, 'unknown_rate': pytest.approx(0.2), 'intents': {'refund': 2, 'human': 2}}
+        assert priors['welcome:4'] == {'refund': 0.5, 'human': 0.5}
+        assert priors['refund:9'] == {'done': 1.0}
+        assert warmup == [{'site': 'welcome:4', 'input': '我要退货', 'intent': 'refund', 'count': 3,
+                           'share': pytest.approx(2 / 3)}]
+
+    def test_latency_quantiles(self, tmp_path):
+        """测试耗时分位数落在对数分桶的精度内，execute 为0的轮次（阻塞式 process）不计入执行耗时"""
+        rng = random.Random(3)
+        values = [rng.uniform(0.1, 0.5) for _ in range(1000)]
+        _write_turns(tmp_path, [('s', 'a', 1, 'x', 'b', 'llm', v, 0.0) for v in values])
+        report, _, _ = analyze(str(tmp_path))
+        classify = report['latency']['classify']
+        assert classify['mean'] == pytest.approx(sum(values) / len(values), rel=1e-4)
+        assert classify['p50'] == pytest.approx(sorted(values)[499], rel=0.05)
+        assert report['latency']['execute']['count'] == 0
+
+    @pytest.mark.skipif(analytics.np is None, reason='需要 numpy')
+    def test_vectorized_matches_pure_python(self, tmp_path):
+        """测试 numpy 实现与纯Python实现的结果相同，包括分多块聚合时"""
+        rng = random.Random(5)
+        steps = [f's{i}' for i in range(20)]
+        sources = ['llm', 'llm', 'rule', 'keyword', 'fallback']
+        turns = [(f'session{rng.randrange(50)}', rng.choice(steps), rng.randrange(1, 4), f'输入{rng.randrange(30)}',
+                  rng.choice(steps), rng.choice(sources), rng.random(), rng.random() / 10) for _ in range(3000)]
+        _write_turns(tmp_path, turns)
+        with patch.object(analytics, 'CHUNK_TURNS', 500), patch.object(analytics, 'DECODE_RECORDS', 300):
+            vectorized = analyze(str(tmp_path), top=20, vectorized=True)
+        pure = analyze(str(tmp_path), top=20, vectorized=False)
+        assert vectorized[0]['latency']['classify']['mean'] == pytest.approx(pure[0]['latency']['classify']['mean'])
+        for result in (vectorized, pure):
+            for name in ('classify', 'execute'):
+                result[0]['latency'][name].pop('mean')
+        assert vectorized == pure
+
+    def test_memory_is_bounded(self, tmp_path):
+        """测试聚合后只保留出现次数最多的预热候选，会话数为估计值"""
+        rng = random.Random(7)
+        turns = [(f'session{i}', 'welcome', 4, '我要退货' if i % 3 == 0 else f'长尾{i}', 'refund', 'llm', 0.1, 0.01)
+                 for i in range(6000)]
+        rng.shuffle(turns)
+        _write_turns(tmp_path, turns)
+        stats = analytics.TurnStats(vectorized=False, pair_limit=10)
+        with patch.object(analytics, 'CHUNK_TURNS', 500):
+            for path in analytics.segment_files(str(tmp_path)):
+                for count, data in analytics.iter_blocks(path):
+                    stats.add_block(data, count)
+            report, _, warmup = stats.result(top=1)
+        assert len(stats.pairs) <= 10
+        assert warmup[0]['input'] == '我要退货'
+        assert warmup[0]['count'] == 2000
+        assert report['turns'] == 6000
+        assert report['sessions'] == pytest.approx(6000, rel=0.05)
+
+    def test_command_line_outputs(self, tmp_path, capsys):
+        """测试命令行输出文本报告并写出报告、先验和预热列表文件"""
+        _write_turns(tmp_path / 'events', TURNS)
+        out = tmp_path / 'report.json'
+        priors = tmp_path / 'priors.json'
+        warmup = tmp_path / 'warmup.jsonl'
+        assert main([str(tmp_path / 'events'), '--json', str(out), '--priors', str(priors),
+                     '--warmup', str(warmup), '--no-numpy']) == 0
+        assert 'welcome -> refund: 3' in capsys.readouterr().out
+        assert json.loads(out.read_text(encoding='utf-8'))['turns'] == 6
+        assert json.loads(priors.read_text(encoding='utf-8'))['refund:9'] == {'done': 1.0}
+        lines = warmup.read_text(encoding='utf-8').splitlines()
+        assert json.loads(lines[0])['input'] == '我要退货'
+
+
+class TestPriors:
+    def test_fallback_uses_priors(self, tmp_path):
+        """测试加载先验后，无法识别的输入跳转到该 wait 位置最常见的意图"""
+        script = 'step menu\n  wait "refund" "human"\nstep refund\n  reply "退货"\nstep human\n  reply "人工"\n'
+        with patch('dsl_engine.LLMClient'):
+            engine = DSLEngine(script_content=script)
+        engine.llm_client.recognize_intent.return_value = 'unknown'
+        with patch.object(engine, '_record_turn'):
+            session = engine.new_session()
+            session.begin()
+            assert session.feed('随便') == '退货'
+            path = tmp_path / 'priors.json'
+            path.write_text(json.dumps({'menu:2': {'refund': 0.2, 'human': 0.8}}), encoding='utf-8')
+            engine.load_priors(str(path))
+            session = engine.new_session()
+            session.begin()
+            assert session.feed('随便') == '人工'
+
+    def test_priors_from_environment(self, tmp_path):
+        """测试 DSL_AGENT_INTENT_PRIORS 指定的先验在启动时载入，文件不存在时不影响启动"""
+        path = tmp_path / 'priors.json'
+        path.write_text(json.dumps({'menu:2': {'human': 1.0}}), encoding='utf-8')
+        with patch('dsl_engine.LLMClient'), patch.dict('os.environ', {'DSL_AGENT_INTENT_PRIORS': str(path)}):
+            assert DSLEngine(script_content='step menu\n  wait "refund" "human"\n').priors == {'menu:2': {'human': 1.0}}
+        with patch('dsl_engine.LLMClient'), patch.dict('os.environ', {'DSL_AGENT_INTENT_PRIORS': str(tmp_path / 'x')}):
+            assert DSLEngine(script_content='step menu\n  wait "refund" "human"\n').priors == {}
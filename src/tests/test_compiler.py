@@ -0,0 +1,261 @@
+"""
+脚本编译器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from parser import Parser
+from compiler import InternPool, compile_script
+
+
+SCRIPT = '''
+step greeting
+    reply "您好" + $user_input
+    wait "greeting" "help" "unknown"
+
+step help
+    reply "您好" + $user_input
+    wait "greeting" "help" "unknown"
+
+step greeting
+    reply "重复的step"
+'''
+
+
+class TestCompiler:
+    def setup_method(self):
+        self.pool = InternPool()
+        self.ast = Parser().parse(SCRIPT)
+        self.program = compile_script(self.ast, self.pool)
+
+    def test_step_index(self):
+        """测试step索引，同名step以第一个为准"""
+        assert self.program.step_names == ('greeting', 'help', 'greeting')
+        assert self.program.get_step('help')['value'] == 'help'
+        assert self.program.get_step('greeting') is self.ast['children'][0]
+        assert self.program.get_step('missing') is None
+
+    def test_wait_lists_are_shared_tuples(self):
+        """测试相同的意图列表被转换为同一个共享元组"""
+        first = self.ast['children'][0]['children'][1]['value']
+        second = self.ast['children'][1]['children'][1]['value']
+        assert first == ('greeting', 'help', 'unknown')
+        assert first is second
+        assert len(self.pool) == 1
+
+    def test_literals_are_interned(self):
+        """测试字符串字面量被驻留"""
+        first = self.ast['children'][0]['children'][0]['value']['children'][0]['value']
+        second = self.ast['children'][1]['children'][0]['value']['children'][0]['value']
+        assert first is second
+
+    def test_shared_across_scripts(self):
+        """测试同一个驻留池下多个脚本共享意图元组"""
+        other = Parser().parse(SCRIPT)
+        compile_script(other, self.pool)
+        assert other['children'][0]['children'][1]['value'] is self.ast['children'][0]['children'][1]['value']
+
+    def test_empty_ast(self):
+        """测试空语法树"""
+        program = compile_script({'type': 'Script', 'children': []}, self.pool)
+        assert program.step_names == ()
+        assert compile_script(None, self.pool).steps == {}
+
+    def test_dispatchers_for_branches_and_guards(self):
+        """测试为 if/match（含嵌套分支）和带 when 规则的 wait 编译分派器"""
+        ast = Parser().parse('''
+step menu
+    match $user_input
+        case "1" if $user_input prefix "1" reply "嵌套" end
+        else reply "其他"
+    end
+    wait "menu" "help"
+        when "帮助" goto help
+    wait "menu"
+
+step help
+    reply "帮助"
+''')
+        program = compile_script(ast, self.pool)
+        match, guarded, plain = ast['children'][0]['children']
+        nested = match['children'][0]['children'][0]
+        assert program.dispatcher(match).match('2') == 1
+        assert program.dispatcher(nested).match('1') == 0
+        assert program.dispatcher(guarded).match('帮助') == 'help'
+        assert program.dispatcher(plain) is None
+        assert guarded['children'][0]['value'] == ('帮助',)
+
+    def test_keyword_matchers(self):
+        """测试按 wait 的候选意图编译关键词匹配器，意图列表相同的 wait 共享同一个"""
+        ast = Parser().parse('''
+step menu
+    wait "refund" "human"
+    if $user_input == "x"
+        wait "refund" "human"
+    end
+    wait "menu"
+
+step refund keywords "退货" "退款"
+    reply "退货"
+
+step human keywords "人工"
+    reply "人工"
+''')
+        program = compile_script(ast, self.pool)
+        first, branch, plain = ast['children'][0]['children']
+        nested = branch['children'][0]['children'][0]
+        matcher = program.keyword_matcher(first)
+        assert matcher is not None
+        assert program.keyword_matcher(nested) is matcher
+        assert program.keyword_matcher(plain) is None
+        assert matcher.match('我要退款') == 'refund'
+        assert ast['children'][1]['keywords'] == ('退货', '退款')
+
+    def test_invalid_regex_reports_line(self):
+        """测试无效正则在编译时报告行号"""
+        ast = Parser().parse('step a\n  if $user_input regex "(" reply "x" end')
+        with pytest.raises(ValueError, match='第2行'):
+            compile_script(ast, self.pool)
+        ast = Parser().parse('step a\n  if $user_input == "x"\n    extract $v regex "[" end')
+        with pytest.raises(ValueError, match='^第3行的正则'):
+            compile_script(ast, self.pool)
+
+    def test_extractors(self):
+        """测试为 extract 语句取得提取器，未知类型在编译时报告行号"""
+        ast = Parser().parse('step a\n  extract $phone phone\n  extract $code regex "#(\\d+)"')
+        program = compile_script(ast, self.pool)
+        typed, regex = ast['children'][0]['children']
+        assert program.extractor(typed).name == 'phone'
+        assert program.extractor(regex).extract('单号#12') == '12'
+        assert program.extractor(ast['children'][0]) is None
+        ast = Parser().parse('step a\n  reply "x"\n  extract $v address')
+        with pytest.raises(ValueError, match='第3行: 未知的提取器'):
+            compile_script(ast, self.pool)
+
+    def test_call_join_points(self):
+        """测试带目标变量的 call 在第一条读写目标变量的语句之前汇合，没有时在语句列表结束时汇合"""
+        ast = Parser().parse('''
+step a
+    call x = f($user_input)
+    call y = g()
+    reply "处理中"
+    log "参数" + $user_input
+    if $y == "1"
+        call z = h($x)
+        reply "分支"
+    end
+    extract $x number
+    call notify()
+''')
+        program = compile_script(ast, self.pool)
+        statements = ast['children'][0]['children']
+        call_x, call_y, reply, log, branch, extract, notify = statements
+        assert program.joins_before(reply) == ()
+        assert program.joins_before(log) == ()
+        # if 的条件读取 $y，分支中读取 $x
+        assert program.joins_before(branch) == (call_x, call_y)
+        nested = branch['children'][0]['children']
+        assert program.joins_before(nested[1]) == ()
+        assert program.joins_before(nested) == (nested[0],)
+        assert program.joins_before(extract) == ()
+        assert program.joins_before(statements) == ()
+        ast = Parser().parse('step a\n  call x = f()\n  extract $x number\n  call x = g()')
+        program = compile_script(ast, self.pool)
+        first, extract, second = ast['children'][0]['children']
+        assert program.joins_before(extract) == (first,)
+        assert program.joins_before(ast['children'][0]['children']) == (second,)
+
+
+EDITABLE = '''
+step welcome
+    reply "您好"
+    wait "order" "human"
+        when prefix "人工" goto human
+
+step order keywords "订单" "物流"
+    call status = query($user_input)
+    match $status
+        case "已发货"
+            reply "已发货"
+        else
+            reply "处理中"
+    end
+    extract $phone phone
+    wait "welcome" "human"
+
+step human keywords "人工"
+    reply "正在转接"
+'''
+
+
+class TestIncrementalCompile:
+    def setup_method(self):
+        from incremental_parser import IncrementalParser
+        self.parser = IncrementalParser()
+        self.ast = self.parser.parse(EDITABLE)
+        self.program = compile_script(self.ast)
+
+    def _edit(self, text):
+        ast = self.parser.update(text)
+        assert ast is self.ast
+        return self.program.update(self.parser.removed, self.parser.added)
+
+    def _assert_matches_full_compile(self, text):
+        fresh = compile_script(Parser().parse(text))
+        for name in ('dispatchers', 'keyword_matchers', 'extractors', 'joins'):
+            assert len(getattr(self.program, name)) == len(getattr(fresh, name)), name
+        assert len(self.program.pool) == len(fresh.pool)
+        assert self.program.step_names == fresh.step_names
+        assert {name: step['lineno'] for name, step in self.program.steps.items()} == \
+            {name: step['lineno'] for name, step in fresh.steps.items()}
+
+    def test_edit_replaces_only_changed_steps(self):
+        """测试编辑 step 后只编译新区块，旧区块的运行时结构和不再使用的意图元组被删除"""
+        old_order = self.program.get_step('order')
+        old_wait = old_order['children'][-1]
+        text = EDITABLE.replace('wait "welcome" "human"', 'wait "welcome" "order"')
+        assert self._edit(text)
+        order = self.program.get_step('order')
+        assert order is not old_order
+        assert self.program.keyword_matcher(old_wait) is None
+        assert self.program.keyword_matcher(order['children'][-1]) is not None
+        assert ('welcome', 'human') not in self.program.pool._tuples
+        self._assert_matches_full_compile(text)
+
+    def test_insert_and_delete_steps(self):
+        """测试插入、删除和重命名 step 后与完整编译一致"""
+        text = EDITABLE.replace('step human', 'step extra\n    reply "新增"\n    wait "welcome"\n\nstep human')
+        assert self._edit(text)
+        self._assert_matches_full_compile(text)
+        text = text.replace('step extra', 'step renamed')
+        assert self._edit(text)
+        assert self.program.get_step('extra') is None
+        self._assert_matches_full_compile(text)
+        assert self._edit(EDITABLE)
+        self._assert_matches_full_compile(EDITABLE)
+
+    def test_duplicate_steps_keep_first(self):
+        """测试增加同名 step 后仍以第一个为准"""
+        text = EDITABLE.replace('step welcome', 'step human\n    reply "重复"\n\nstep welcome')
+        assert self._edit(text)
+        assert self.program.get_step('human') is self.ast['children'][0]
+        assert self._edit(EDITABLE)
+        assert self.program.get_step('human') is self.ast['children'][-1]
+
+    def test_keyword_change_requires_full_compile(self):
+        """测试 step 声明的关键词变化时返回 False"""
+        assert not self._edit(EDITABLE.replace('keywords "人工"', 'keywords "人工" "客服"'))
+
+
+class TestInternPool:
+    def test_release(self):
+        """测试元组按引用次数释放"""
+        pool = InternPool()
+        first = pool.strings(['a', 'b'])
+        assert pool.strings(('a', 'b')) is first
+        pool.release(first)
+        assert len(pool) == 1
+        pool.release(first)
+        assert len(pool) == 0
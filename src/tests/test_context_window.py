@@ -0,0 +1,108 @@
+"""
+对话上下文窗口测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from unittest.mock import patch
+from context_window import SYSTEM_PROMPT, ConversationContext, estimate_tokens
+from dsl_engine import DSLEngine
+from stub_llm_server import StubLLMServer
+
+SCRIPT = '''
+step welcome
+    reply "您好！请问有什么可以帮您？"
+    wait "refund" "human"
+
+step refund
+    reply "好的，正在为您办理退货"
+    wait "welcome" "human"
+
+step human
+    reply "正在转接人工"
+    wait "welcome" "refund"
+'''
+
+
+class TestConversationContext:
+    def test_estimate_tokens(self):
+        """测试中文按字、ASCII按约4字符估计token"""
+        assert estimate_tokens('') == 0
+        assert estimate_tokens('退货') == 2
+        assert estimate_tokens('abcdefgh') == 2
+
+    def test_messages_layout(self):
+        """测试消息由固定系统提示词、对话历史和本轮问题组成"""
+        context = ConversationContext(budget=200)
+        assert [m['role'] for m in context.messages('你好', ['a'])] == ['system', 'user']
+        context.add_turn(None, None, '欢迎光临')
+        context.add_turn('我要退货', 'refund', '好的')
+        messages = context.messages('转人工', ['refund', 'human'])
+        assert messages[0]['content'] == SYSTEM_PROMPT
+        assert messages[1]['content'].endswith('用户：我要退货\n意图：refund\n回复：好的')
+        assert '可用意图：refund, human\n用户输入：转人工' in messages[2]['content']
+
+    def test_history_prefix_is_append_only(self):
+        """测试未超出预算时，新一轮只追加在历史末尾，此前的提示词前缀不变"""
+        context = ConversationContext(budget=1000)
+        context.add_turn('第一轮', 'a', '回复一')
+        before = context.messages('x', ['a'])[:2]
+        context.add_turn('第二轮', 'b', '回复二')
+        after = context.messages('y', ['b'])[:2]
+        assert after[0] == before[0]
+        assert after[1]['content'].startswith(before[1]['content'])
+
+    def test_folds_into_summary_within_budget(self):
+        """测试超出预算时最早的轮次折叠为意图路径摘要"""
+        context = ConversationContext(budget=60)
+        for i in range(20):
+            context.add_turn(f'第{i}轮输入', 'refund' if i % 2 else 'human', '回复' * 5)
+            assert context.history_tokens + estimate_tokens(context.summary) <= 60
+        assert context.folded > 0
+        assert context.summary.startswith(f'（此前{context.folded}轮对话的意图路径：')
+        assert context.history().startswith(context.summary)
+        assert '第19轮输入' in context.history()
+
+    def test_long_reply_truncated(self):
+        """测试历史中的长回复被截断"""
+        context = ConversationContext(budget=1000)
+        context.add_turn('问', 'a', '很长' * 100)
+        assert len(context.history()) < 100
+
+    def test_record_usage(self):
+        """测试按服务端返回或估计值累计token用量"""
+        context = ConversationContext()
+        messages = context.messages('你好', ['a'])
+        context.record_usage({'prompt_tokens': 100, 'completion_tokens': 2, 'cached_tokens': 64}, messages)
+        context.record_usage(None, messages, 'a')
+        usage = context.token_usage()
+        assert usage['requests'] == 2
+        assert usage['estimated_requests'] == 1
+        assert usage['prompt_tokens'] > 100
+        assert usage['cached_tokens'] == 64
+        assert usage['total_tokens'] == usage['prompt_tokens'] + usage['completion_tokens']
+
+
+class TestSessionContext:
+    def test_sessions_track_usage_and_hit_prefix_cache(self):
+        """测试会话通过替身服务器识别意图，各自统计token用量，后续轮次命中前缀缓存"""
+        with StubLLMServer(mode='first') as server:
+            env = {'DSL_AGENT_BASE_URL': server.base_url, 'DSL_AGENT_LLM_BACKEND': 'http',
+                   'DSL_AGENT_API_KEY': 'test_api_key'}
+            with patch.dict('os.environ', env):
+                engine = DSLEngine(script_content=SCRIPT)
+            session, other = engine.new_session(), engine.new_session()
+            session.begin()
+            other.begin()
+            for text in ('我买的衣服太小了，想退货', '算了还是转人工吧', '我还是想退货'):
+                session.feed(text)
+            other.feed('退货')
+
+        usage = session.token_usage()
+        assert usage['requests'] == 3
+        assert usage['estimated_requests'] == 0
+        assert usage['cached_tokens'] > 0
+        assert other.token_usage()['requests'] == 1
+        assert '用户：我买的衣服太小了，想退货' in session.context.history()
+        assert '我买的衣服太小了' not in other.context.history()
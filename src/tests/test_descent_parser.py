@@ -0,0 +1,152 @@
+"""
+递归下降解析器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from unittest.mock import patch
+from parser import Parser, create_parser
+from descent_parser import DescentParser
+
+
+VALID_SCRIPTS = [
+    'step greeting reply "Hello"',
+    '''
+    # 注释
+    step greeting
+        reply "您好！" + $user_input + "。" + name
+        log "进入问候" + $user_input
+        wait "greeting" "help"
+
+    step help
+        reply "$not_a_string"
+        reply other
+        wait "greeting"
+    ''',
+    '''
+    step menu
+        if $user_input == "是" "好的"
+            reply "确认"
+            if $user_input prefix "是"
+                log "嵌套"
+            end
+        else
+            reply "取消"
+            wait "menu"
+        end
+        match $user_input
+            case "1" reply "一"
+            case prefix "订单" "单号" reply "订单" log "查询"
+            case regex "^[0-9]{8}$" reply "数字"
+            else reply "其他"
+        end
+        match $user_input case regex "x" reply "只有一个分支" end
+        wait "menu" "human"
+            when "1" "退货" goto menu
+            when prefix "人工" goto human
+            when regex "^\\d+$" goto menu
+
+    step human
+        reply "人工"
+    ''',
+    '''
+    step menu keywords "菜单" "主页"
+        wait "menu" "refund"
+    step refund
+        keywords "退货"
+        extract $order order_id
+        extract $code regex "#(\\d+)" "no\\.(\\d+)"
+        reply "退货" + $order
+    ''',
+    '''
+    step order
+        call status = get_order_status($order_id, "zh" + $lang)
+        call notify()
+        call ping(1)
+        reply status
+    ''',
+]
+
+
+class TestDescentParser:
+    def setup_method(self):
+        self.parser = DescentParser()
+
+    def test_same_ast_as_ply(self):
+        """测试与PLY后端产生相同的语法树"""
+        for script in VALID_SCRIPTS:
+            assert self.parser.parse(script) == Parser().parse(script)
+            assert self.parser.errors == []
+
+    def test_same_ast_on_generated_script(self):
+        """测试较大的生成脚本上语法树一致"""
+        parts = []
+        for i in range(50):
+            parts.append(f'step s{i}\n  reply "第{i}步" + $user_input + x\n  log "日志"\n  wait "s{i}" "s0"\n')
+        script = '\n'.join(parts)
+        assert self.parser.parse(script) == Parser().parse(script)
+
+    def test_branch_syntax_errors(self):
+        """测试未闭合或缺少条件的 if/match、不完整的 when 规则与PLY后端同样报错"""
+        for script in ('step a if $x == "1" reply "x"',
+                       'step a if $x reply "1" end',
+                       'step a if $x == "1" end',
+                       'step a match $x else reply "1" end',
+                       'step a wait "x" when "1" goto',
+                       'step a if $x == "1" reply "x" step b reply "y"'):
+            assert self.parser.parse(script) is None
+            assert self.parser.errors
+            assert Parser().parse(script) is None
+
+    def test_extract_syntax_errors(self):
+        """测试 extract 缺少变量或提取器类型"""
+        for script in ('step a extract phone', 'step a extract $x', 'step a extract $x regex reply "x"'):
+            assert self.parser.parse(script) is None, script
+            assert self.parser.error_count == 1
+
+    def test_call_syntax_errors(self):
+        """测试 call 缺少括号、参数列表不完整或缺少目标变量"""
+        for script in ('step a call f', 'step a call f($x', 'step a call f($x,)', 'step a call = f()',
+                       'step a call x = ()'):
+            assert self.parser.parse(script) is None, script
+            assert self.parser.error_count == 1
+            assert Parser().parse(script) is None
+
+    def test_empty_script(self):
+        """测试空脚本返回None并报告文件结束错误"""
+        assert self.parser.parse('') is None
+        assert self.parser.errors[0]['message'] == "语法错误: 意外的文件结束"
+
+    def test_collect_all_errors(self):
+        """测试一次解析收集所有错误，并带行号和列号"""
+        script = (
+            'step a\n'
+            '  reply\n'
+            'step b\n'
+            '  reply "ok"\n'
+            'step c\n'
+            '  wait foo\n'
+        )
+        assert self.parser.parse(script) is None
+        errors = self.parser.errors
+        assert len(errors) == 2
+        assert (errors[0]['lineno'], errors[0]['column'], errors[0]['type']) == (3, 1, 'STEP')
+        assert (errors[1]['lineno'], errors[1]['column'], errors[1]['token']) == (6, 8, 'foo')
+
+    def test_recover_at_next_step(self):
+        """测试错误恢复：跳到下一个step继续解析"""
+        script = 'reply "前导"\nstep a\n  reply "x" "y"\nstep b\n  reply "ok"\nstep step c reply "z"'
+        ast = self.parser.parse(script, recover=True)
+        assert [step['value'] for step in ast['children']] == ['b', 'c']
+        assert len(self.parser.errors) == 3
+
+    def test_create_parser(self):
+        """测试按名称或环境变量选择解析器后端"""
+        assert isinstance(create_parser('descent'), DescentParser)
+        assert isinstance(create_parser('ply'), Parser)
+        with patch.dict('os.environ', {'DSL_AGENT_PARSER': 'descent'}):
+            assert isinstance(create_parser(), DescentParser)
+        with pytest.raises(ValueError):
+            create_parser('unknown')
@@ -0,0 +1,128 @@
+"""
+模式分派器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import re
+import pytest
+from dispatch import KeywordMatcher, PatternDispatcher
+
+
+class TestPatternDispatcher:
+    def test_exact_prefix_regex(self):
+        """测试三种匹配类型"""
+        dispatcher = PatternDispatcher([
+            ('exact', ['1', '退货'], 'refund'),
+            ('prefix', ['订单', '单号'], 'order'),
+            ('regex', [r'^\d{8}$'], 'number'),
+        ], default='llm')
+        assert dispatcher.match('退货') == 'refund'
+        assert dispatcher.match('订单123') == 'order'
+        assert dispatcher.match('单号') == 'order'
+        assert dispatcher.match('12345678') == 'number'
+        assert dispatcher.match('123') == 'llm'
+        assert dispatcher.match('') == 'llm'
+
+    def test_first_declared_rule_wins(self):
+        """测试多条规则同时命中时先声明的优先，不论匹配类型"""
+        dispatcher = PatternDispatcher([
+            ('regex', ['退'], 'first'),
+            ('prefix', ['退'], 'second'),
+            ('exact', ['退货'], 'third'),
+        ])
+        assert dispatcher.match('退货') == 'first'
+        dispatcher = PatternDispatcher([
+            ('prefix', ['订单号'], 'long'),
+            ('prefix', ['订'], 'short'),
+            ('regex', ['订'], 'regex'),
+        ])
+        assert dispatcher.match('订单号1') == 'long'
+        assert dispatcher.match('订单') == 'short'
+
+    def test_regex_search_semantics(self):
+        """测试合并后的正则保持 re.search 语义和声明顺序"""
+        patterns = [r'投诉', r'^转', r'人工$', r'(\d+)-(\d+)', r'(?i:vip)']
+        dispatcher = PatternDispatcher([('regex', [p], i) for i, p in enumerate(patterns)])
+        assert dispatcher.regex is not None
+        for text in ('我要投诉', '转人工', '找人工', '单号12-34', '我是VIP', '你好', '人工转', '投诉转人工'):
+            expected = next((i for i, p in enumerate(patterns) if re.search(p, text)), None)
+            assert dispatcher.match(text) == expected, text
+
+    def test_uncombinable_regex_falls_back(self):
+        """测试含命名分组、反向引用或全局标志的正则逐个匹配，顺序不变"""
+        dispatcher = PatternDispatcher([
+            ('regex', [r'(?P<word>a)(?P=word)'], 'named'),
+            ('regex', [r'(\w)\1'], 'backref'),
+            ('regex', [r'(?i)abc'], 'flag'),
+            ('regex', [r'c'], 'plain'),
+        ])
+        assert [index for index, _ in dispatcher.fallback] == [0, 1, 2]
+        assert dispatcher.match('xaa') == 'named'
+        assert dispatcher.match('xbb') == 'backref'
+        assert dispatcher.match('ABC') == 'flag'
+        assert dispatcher.match('c') == 'plain'
+
+    def test_conditional_group_falls_back(self):
+        """测试条件分组 (?(1)...) 逐个匹配，合并后分组编号改变也不影响结果"""
+        patterns = [r'(x)y', r'^(a)?(?(1)b|c)$', r'(?P<n>d)?(?(n)e|f)$']
+        dispatcher = PatternDispatcher([('regex', [pattern], index) for index, pattern in enumerate(patterns)])
+        assert [index for index, _ in dispatcher.fallback] == [1, 2]
+        for text in ('ab', 'c', 'ac', 'b', 'de', 'f', 'xy', 'zzz'):
+            expected = next((i for i, p in enumerate(patterns) if re.search(p, text)), None)
+            assert dispatcher.match(text) == expected, text
+
+    def test_invalid_regex(self):
+        """测试无效正则在构造时报错"""
+        with pytest.raises(re.error):
+            PatternDispatcher([('regex', ['('], 'x')])
+        with pytest.raises(ValueError):
+            PatternDispatcher([('glob', ['*'], 'x')])
+
+
+class TestKeywordMatcher:
+    def setup_method(self):
+        self.matcher = KeywordMatcher([
+            ('refund', ['退货', '退款', 'Refund']),
+            ('order', ['订单', '单号', '货']),
+            ('human', ['人工', '投诉']),
+        ])
+
+    def test_scan_counts_overlapping_keywords(self):
+        """测试一次扫描找出所有（包括重叠和互为后缀的）关键词，忽略大小写"""
+        assert self.matcher.scan('我要退货') == {0: 1, 1: 1}
+        assert self.matcher.scan('REFUND退款') == {0: 2}
+        assert self.matcher.scan('订单单号') == {1: 2}
+        assert self.matcher.scan('你好') == {}
+
+    def test_match_requires_single_intent(self):
+        """测试只有一个意图命中时才作为预筛选结果"""
+        assert self.matcher.match('帮我转人工') == 'human'
+        assert self.matcher.match('退款') == 'refund'
+        assert self.matcher.match('退货') is None
+        assert self.matcher.match('') is None
+
+    def test_best_by_hits_then_declaration_order(self):
+        """测试回退时取命中次数最多的意图，次数相同时先声明的优先"""
+        assert self.matcher.best('退货') == 'refund'
+        assert self.matcher.best('退货的订单单号') == 'order'
+        assert self.matcher.best('随便说说') is None
+
+    def test_matches_naive_search(self):
+        """测试与逐个关键词查找的结果一致"""
+        import random
+        rng = random.Random(0)
+        alphabet = 'abcd'
+        rules = [(i, [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(5)])
+                 for i in range(20)]
+        matcher = KeywordMatcher(rules)
+        for _ in range(200):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            expected = {}
+            for i, keywords in rules:
+                for keyword in set(keywords):
+                    count = sum(1 for j in range(len(text)) if text.startswith(keyword, j))
+                    if count:
+                        expected[i] = expected.get(i, 0) + count
+            assert matcher.scan(text) == expected, text
@@ -186,4 +186,112 @@ class TestDSLEngine:
         # 测试获取变量状态
         variables = engine.get_variables()
         assert 'user_input' in variables
-        assert variables['user_input'] == 'user input'
\ No newline at end of file
+        assert variables['user_input'] == 'user input'
+
+    @patch('dsl_engine.LLMClient')
+    def test_update_script_incremental(self, mock_llm):
+        """测试脚本编辑后增量更新语法树"""
+        script = 'step greeting\n    reply "Hello"\n\nstep help\n    reply "Help"\n'
+        engine = DSLEngine(script_content=script, debug=False)
+
+        engine.update_script(script.replace('"Help"', '"Need help?"'))
+        assert engine.process('help') == 'Need help?'
+        assert engine.get_steps() == ['greeting', 'help']
+        # 增量解析器由加载时的语法树初始化，第一次编辑就不做完整解析
+        assert engine._incremental_parser.last_reparsed <= 2
+
+        # 编辑中间状态有语法错误时保留上一次可用的语法树
+        with pytest.raises(Exception):
+            engine.update_script('step greeting\n    reply\n')
+        assert engine.process('greeting') == 'Hello'
+
+    @patch('dsl_engine.LLMClient')
+    def test_streaming_load(self, mock_llm, tmp_path):
+        """测试流式加载脚本文件"""
+        script = 'step greeting\n    reply "Hello"\n\nstep help\n    reply "Help"\n'
+        script_file = tmp_path / 'script.dsl'
+        script_file.write_text(script, encoding='utf-8')
+
+        engine = DSLEngine(str(script_file), debug=False, streaming=True)
+        assert engine.get_steps() == ['greeting', 'help']
+        assert engine.process('help') == 'Help'
+
+    @patch('dsl_engine.LLMClient')
+    def test_streaming_load_crlf(self, mock_llm, tmp_path):
+        """测试 \\r\\n 换行的脚本流式加载与完整加载的语法树相同"""
+        script = 'step greeting\r\n    reply "第一行\r\n第二行"\r\n\r\nstep help\r\n    reply "Help"\r\n'
+        script_file = tmp_path / 'script.dsl'
+        script_file.write_bytes(script.encode('utf-8'))
+        with patch.dict('os.environ', {'DSL_AGENT_SCRIPT_CACHE': 'false'}):
+            streamed = DSLEngine(str(script_file), debug=False, streaming=True)
+            loaded = DSLEngine(str(script_file), debug=False)
+        assert streamed.ast == loaded.ast
+        assert streamed.process('greeting') == '第一行\n第二行'
+
+
+class TestScriptCache:
+    SCRIPT = 'step greeting\n    reply "您好"\n    wait "help"\n\nstep help\n    reply "帮助"\n'
+
+    @patch('dsl_engine.LLMClient')
+    def test_cached_ast_skips_parser(self, mock_llm, tmp_path):
+        """测试第二次加载同一脚本时直接使用缓存的语法树"""
+        script = tmp_path / 'bot.dsl'
+        script.write_text(self.SCRIPT, encoding='utf-8')
+        first = DSLEngine(script_file=str(script))
+        assert list((tmp_path / '__pycache__').iterdir())
+
+        with patch('parser.create_parser') as create_parser:
+            second = DSLEngine(script_file=str(script))
+        create_parser.assert_not_called()
+        assert second.ast == first.ast
+        assert second.process('help') == '帮助'
+
+    @patch('dsl_engine.LLMClient')
+    def test_edited_script_invalidates_cache(self, mock_llm, tmp_path):
+        """测试脚本内容变化后重新解析"""
+        script = tmp_path / 'bot.dsl'
+        script.write_text(self.SCRIPT, encoding='utf-8')
+        DSLEngine(script_file=str(script))
+        script.write_text(self.SCRIPT.replace('帮助', '新的帮助'), encoding='utf-8')
+        assert DSLEngine(script_file=str(script)).process('help') == '新的帮助'
+
+    @patch('dsl_engine.LLMClient')
+    def test_cache_can_be_disabled(self, mock_llm, tmp_path):
+        """测试 DSL_AGENT_SCRIPT_CACHE=false 时不写缓存"""
+        script = tmp_path / 'bot.dsl'
+        script.write_text(self.SCRIPT, encoding='utf-8')
+        with patch.dict('os.environ', {'DSL_AGENT_SCRIPT_CACHE': 'false'}):
+            DSLEngine(script_file=str(script))
+        assert not (tmp_path / '__pycache__').exists()
+
+    @patch('dsl_engine.LLMClient')
+    def test_cache_is_data_only(self, mock_llm, tmp_path):
+        """测试缓存以 JSON 保存，内容不是语法树时重新解析"""
+        import json
+        import pickle
+        script = tmp_path / 'bot.dsl'
+        script.write_text(self.SCRIPT, encoding='utf-8')
+        first = DSLEngine(script_file=str(script))
+        cached, = (tmp_path / '__pycache__').iterdir()
+        assert [step['value'] for step in json.loads(cached.read_text(encoding='utf-8'))['children']] == \
+            first.get_steps()
+
+        cached.write_bytes(pickle.dumps({'type': 'Script', 'children': []}))
+        assert DSLEngine(script_file=str(script)).process('help') == '帮助'
+        cached.write_text('[1, 2]', encoding='utf-8')
+        assert DSLEngine(script_file=str(script)).process('help') == '帮助'
+
+    @patch('dsl_engine.LLMClient')
+    def test_malformed_cached_nodes_are_ignored(self, mock_llm, tmp_path):
+        """测试缓存的语法树节点损坏、编译失败时忽略缓存并重新解析"""
+        import json
+        script = tmp_path / 'bot.dsl'
+        script.write_text(self.SCRIPT, encoding='utf-8')
+        DSLEngine(script_file=str(script))
+        cached, = (tmp_path / '__pycache__').iterdir()
+        for children in ([{'type': 'Step'}], [{'type': 'Step', 'value': 'help', 'children': [{'type': 'Wait', 'value': 3}]}],
+                         [None, 'step']):
+            cached.write_text(json.dumps({'type': 'Script', 'children': children}), encoding='utf-8')
+            engine = DSLEngine(script_file=str(script))
+            assert engine.get_steps() == ['greeting', 'help']
+            assert engine.process('help') == '帮助'
@@ -0,0 +1,223 @@
+"""
+事件日志测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import threading
+import time
+import pytest
+import event_log
+from unittest.mock import patch
+from event_log import Event, EventLog, format_event, main, read_events, segment_files
+from dsl_engine import DSLEngine
+
+
+class TestEventLog:
+    def setup_method(self):
+        self.logs = []
+
+    def teardown_method(self):
+        for log in self.logs:
+            log.close()
+
+    def _log(self, directory, **options):
+        log = EventLog(str(directory), **options)
+        self.logs.append(log)
+        return log
+
+    def test_round_trip(self, tmp_path):
+        """测试记录的各字段原样读回"""
+        log = self._log(tmp_path)
+        log.append('log', 's1', 'refund', 9, '用户申请退货', timestamp=1700000000.5)
+        log.append('turn', 's1', 'welcome', 4, '衣服太小', 'refund', 'llm', 0.25, 0.5)
+        log.flush()
+        first, second = read_events(str(tmp_path))
+        assert first.timestamp == 1700000000.5
+        assert (first.kind, first.session, first.step, first.lineno, first.text) == ('log', 's1', 'refund', 9,
+                                                                                  '用户申请退货')
+        assert (second.kind, second.text, second.intent, second.source) == ('turn', '衣服太小', 'refund', 'llm')
+        assert second.classify == pytest.approx(0.25)
+        assert second.execute == pytest.approx(0.5)
+
+    def test_kind_filter_and_compression(self, tmp_path):
+        """测试压缩的段文件与按类型过滤"""
+        log = self._log(tmp_path, compress=True, block_bytes=256)
+        for i in range(100):
+            log.append('turn' if i % 2 else 'log', 's', 'a', i, f'输入{i}')
+        log.flush()
+        turns = list(read_events(str(tmp_path), kinds=['turn']))
+        assert [e.lineno for e in turns] == list(range(1, 100, 2))
+        assert len(list(read_events(str(tmp_path)))) == 100
+
+    def test_segment_rotation(self, tmp_path):
+        """测试段文件超过大小后换新文件，读取时按段序号保持写入顺序"""
+        log = self._log(tmp_path, segment_bytes=1024, block_bytes=200)
+        for i in range(200):
+            log.append('log', 's', 'a', i, 'x' * 20)
+        log.flush()
+        assert len(segment_files(str(tmp_path))) > 1
+        assert [e.lineno for e in read_events(str(tmp_path))] == list(range(200))
+
+    def test_new_process_starts_new_segment(self, tmp_path):
+        """测试重新打开的写入器不追加到已有的段文件"""
+        log = self._log(tmp_path)
+        log.append('log', text='一')
+        log.close()
+        log = self._log(tmp_path)
+        log.append('log', text='二')
+        log.flush()
+        assert len(segment_files(str(tmp_path))) == 2
+        assert [e.text for e in read_events(str(tmp_path))] == ['一', '二']
+
+    def test_old_segments_are_removed(self, tmp_path):
+        """测试段文件超过 max_segments 个时删除本写入器写完的最早的段"""
+        log = self._log(tmp_path, segment_bytes=64, block_bytes=1, max_segments=2)
+        for i in range(5):
+            log.append('log', lineno=i, text='x' * 40)
+            log.flush()
+        assert [os.path.basename(path) for path in segment_files(str(tmp_path))] == [
+            'events-000004.evl', 'events-000005.evl']
+        assert [e.lineno for e in read_events(str(tmp_path))] == [3, 4]
+
+    def test_other_writers_segments_kept_until_idle(self, tmp_path):
+        """测试其他写入器的段文件最近修改过时不删除，超过 IDLE_SECONDS 没有修改时删除"""
+        for text in '一二':
+            log = self._log(tmp_path, max_segments=1)
+            log.append('log', text=text)
+            log.close()
+        assert len(segment_files(str(tmp_path))) == 2
+        old = time.time() - event_log.IDLE_SECONDS - 1
+        first = segment_files(str(tmp_path))[0]
+        os.utime(first, (old, old))
+        log = self._log(tmp_path, max_segments=2)
+        log.append('log', text='三')
+        log.close()
+        assert [e.text for e in read_events(str(tmp_path))] == ['二', '三']
+        with patch.dict('os.environ', {'DSL_AGENT_EVENT_MAX_SEGMENTS': '0'}):
+            assert self._log(tmp_path).max_segments == 0
+
+    def test_removed_segment_is_replaced(self, tmp_path):
+        """测试当前段被其他进程删除后，写入器换新的段文件，之后的事件不丢失"""
+        log = self._log(tmp_path)
+        log.append('log', text='一')
+        log.flush()
+        os.remove(segment_files(str(tmp_path))[0])
+        log.append('log', text='二')
+        log.flush()
+        assert [e.text for e in read_events(str(tmp_path))] == ['二']
+
+    def test_truncated_tail_is_ignored(self, tmp_path):
+        """测试最后一个块不完整时读到之前的完整块为止"""
+        log = self._log(tmp_path, block_bytes=1)
+        log.append('log', text='完整')
+        log.append('log', text='被截断')
+        log.close()
+        path = segment_files(str(tmp_path))[0]
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+        assert [e.text for e in read_events(path)] == ['完整']
+
+    def test_background_flush(self, tmp_path):
+        """测试没有显式 flush 时后台线程按间隔写入"""
+        log = self._log(tmp_path, flush_interval=0.01)
+        log.append('log', text='后台写入')
+        log._queue.join()
+        for _ in range(100):
+            if segment_files(str(tmp_path)) and list(read_events(str(tmp_path))):
+                break
+            threading.Event().wait(0.01)
+        assert [e.text for e in read_events(str(tmp_path))] == ['后台写入']
+
+    def test_concurrent_appends(self, tmp_path):
+        """测试多线程同时写入不丢失记录"""
+        log = self._log(tmp_path, block_bytes=512)
+
+        def worker(n):
+            for i in range(500):
+                log.append('log', f's{n}', 'a', i, 'x')
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        log.flush()
+        events = list(read_events(str(tmp_path)))
+        assert len(events) == 2000
+        assert [e.lineno for e in events if e.session == 's2'] == list(range(500))
+
+    def test_text_output(self, tmp_path, capsys):
+        """测试命令行按文本格式输出"""
+        log = self._log(tmp_path)
+        log.append('log', 'abcdef123456', 'refund', 9, '用户申请退货')
+        log.flush()
+        assert main([str(tmp_path)]) == 0
+        out = capsys.readouterr().out
+        assert '用户申请退货' in out and 'refund:9' in out
+        assert main([]) == 2
+        turn = Event(0.0, 'turn', 's', 'a', 1, '输入', 'b', 'llm', 0.1, 0.2)
+        assert format_event(turn).endswith("'输入' -> b (llm, 识别 100.0ms, 执行 200.0ms)")
+
+
+SCRIPT = '''
+step welcome
+    reply "您好"
+    wait "refund" "human"
+        when "人工" goto human
+
+step refund
+    log "用户申请退货：" + $user_input
+    reply "好的"
+
+step human
+    reply "正在转接"
+'''
+
+
+class TestEngineEvents:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=SCRIPT)
+        self.llm = self.engine.llm_client
+
+    def teardown_method(self):
+        self.engine.close()
+
+    def test_session_writes_log_and_turn_events(self, tmp_path):
+        """测试会话的 log 语句和每轮对话以会话ID写入事件日志"""
+        with patch.dict('os.environ', {'DSL_AGENT_EVENT_DIR': str(tmp_path)}):
+            session = self.engine.new_session()
+            session.begin()
+            self.llm.recognize_intent.return_value = 'refund'
+            session.feed('衣服太小')
+            other = self.engine.new_session()
+            other.begin()
+            other.feed('人工')
+            self.llm.recognize_intent.return_value = 'unknown'
+            third = self.engine.new_session()
+            third.begin()
+            third.feed('随便')
+        self.engine.events.flush()
+        events = list(read_events(str(tmp_path)))
+        log = events[0]
+        assert (log.kind, log.session, log.step, log.lineno, log.text) == (
+            'log', session.session_id, 'refund', 8, '用户申请退货：衣服太小')
+        turns = [e for e in events if e.kind == 'turn']
+        assert [(e.session, e.step, e.lineno, e.text, e.intent, e.source) for e in turns] == [
+            (session.session_id, 'welcome', 4, '衣服太小', 'refund', 'llm'),
+            (other.session_id, 'welcome', 4, '人工', 'human', 'rule'),
+            (third.session_id, 'welcome', 4, '随便', 'refund', 'fallback'),
+        ]
+        assert turns[0].execute > 0
+
+    def test_blocking_process_writes_turn_events(self, tmp_path):
+        """测试阻塞式 process 同样记录 turn 事件"""
+        with patch.dict('os.environ', {'DSL_AGENT_EVENT_DIR': str(tmp_path)}):
+            with patch('builtins.input', side_effect=['人工']), patch('builtins.print'):
+                self.engine.process('welcome')
+        self.engine.events.flush()
+        (turn,) = read_events(str(tmp_path), kinds=['turn'])
+        assert (turn.session, turn.step, turn.text, turn.intent, turn.source) == (
+            self.engine.session_id, 'welcome', '人工', 'human', 'rule')
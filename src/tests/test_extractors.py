@@ -0,0 +1,64 @@
+"""
+槽位提取器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import random
+import re
+import pytest
+from extractors import Extractor, TYPED_EXTRACTORS, get_extractor
+
+
+class TestTypedExtractors:
+    def test_phone_and_order_id(self):
+        """测试手机号与订单号：数字串两侧不能紧挨其他数字或字母"""
+        phone = TYPED_EXTRACTORS['phone']
+        assert phone.extract('我的手机是13812345678，谢谢') == '13812345678'
+        assert phone.extract('213812345678') is None
+        order = TYPED_EXTRACTORS['order_id']
+        assert order.extract('订单号 AB20240101 到了吗') == 'AB20240101'
+        assert order.extract('订单12345678') == '12345678'
+        assert order.extract('123') is None
+
+    def test_date_normalized(self):
+        """测试日期规范化，无效日期继续查找下一个"""
+        date = TYPED_EXTRACTORS['date']
+        assert date.extract('2024年1月5日送达') == '2024-01-05'
+        assert date.extract('2024-13-01 或 2024/12/25') == '2024-12-25'
+        assert date.extract('12月25号') == '12-25'
+        assert date.extract('明天') is None
+
+    def test_number_and_email(self):
+        assert TYPED_EXTRACTORS['number'].extract('来3位') == '3'
+        assert TYPED_EXTRACTORS['email'].extract('发到 a.b+c@example.com.cn 吧') == 'a.b+c@example.com.cn'
+
+    def test_get_extractor(self):
+        """测试按类型取提取器"""
+        assert get_extractor('phone') is TYPED_EXTRACTORS['phone']
+        with pytest.raises(ValueError):
+            get_extractor('address')
+        with pytest.raises(re.error):
+            get_extractor('regex', ['('])
+
+
+class TestRegexExtractor:
+    def test_first_group_and_pattern_order(self):
+        """测试取第一个参与匹配的分组，多个模式按声明顺序尝试"""
+        extractor = Extractor.from_patterns([r'编号(\d+)|号码(\d+)', r'\d+'], 'code')
+        assert extractor.extract('号码42，编号7') == '42'
+        assert extractor.extract('只有99') == '99'
+        assert extractor.extract('没有') is None
+        assert extractor.description == 'code'
+
+    def test_batch_matches_single(self):
+        """测试批量提取与逐条提取结果一致，包括会跨越文本边界的模式和带锚点的模式"""
+        rng = random.Random(0)
+        texts = [''.join(rng.choice('ab1 2') for _ in range(rng.randint(0, 8))) for _ in range(300)]
+        for patterns in ([r'\d+'], [r'a[^b]*1'], [r'[\s\S]{3}', r'b'], [r'^a\d', r'\d$'], [r'(?=a1)a']):
+            extractor = Extractor.from_patterns(patterns)
+            assert extractor.extract_batch(texts) == [extractor.extract(t) for t in texts], patterns
+        texts = ['下单13812345678', '2024年2月30日', '订单AB123456', '', '3月8日'] * 20
+        for extractor in TYPED_EXTRACTORS.values():
+            assert extractor.extract_batch(texts) == [extractor.extract(t) for t in texts], extractor.name
@@ -0,0 +1,237 @@
+"""
+外部函数注册表测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+import threading
+import time
+import pytest
+from functions import CallError, FunctionRegistry
+from metrics import METRICS
+
+
+class TestFunctionRegistry:
+    def setup_method(self):
+        self.registry = FunctionRegistry(max_workers=4, timeout=1.0)
+        self.calls = []
+
+    def teardown_method(self):
+        self.registry.shutdown()
+
+    def _record(self, *args):
+        self.calls.append(args)
+        return '-'.join(args)
+
+    def test_call_returns_result(self):
+        """测试同步调用在线程池中执行并返回结果"""
+        self.registry.register('join', lambda *args: (threading.current_thread().name, args))
+        thread, args = self.registry.call('join', ('a', 'b'))
+        assert thread.startswith('dsl-call')
+        assert args == ('a', 'b')
+
+    def test_unregistered_and_error(self):
+        """测试未注册的函数和函数抛出的异常都转换为 CallError"""
+        with pytest.raises(CallError) as e:
+            self.registry.call('missing')
+        assert e.value.reason == 'unregistered'
+        self.registry.register('boom', lambda: 1 / 0)
+        with pytest.raises(CallError) as e:
+            self.registry.call('boom')
+        assert e.value.reason == 'error'
+        with pytest.raises(TypeError):
+            self.registry.register('bad', 'not callable')
+
+    def test_timeout(self):
+        """测试超时后立即返回，不等待函数执行完"""
+        release = threading.Event()
+        self.registry.register('slow', lambda: release.wait(5), timeout=0.05)
+        start = time.perf_counter()
+        with pytest.raises(CallError) as e:
+            self.registry.call('slow')
+        release.set()
+        assert e.value.reason == 'timeout'
+        assert time.perf_counter() - start < 1.0
+
+    def test_ttl_cache(self):
+        """测试缓存期内相同参数直接返回，不同参数或过期后重新调用"""
+        self.registry.register('record', self._record, ttl=0.2)
+        assert self.registry.call('record', ('a',)) == 'a'
+        assert self.registry.call('record', ('a',)) == 'a'
+        assert self.registry.call('record', ('b',)) == 'b'
+        assert self.calls == [('a',), ('b',)]
+        time.sleep(0.25)
+        self.registry.call('record', ('a',))
+        assert len(self.calls) == 3
+
+    def test_failures_are_not_cached(self):
+        """测试失败的调用不写入缓存"""
+        results = iter([ValueError('x'), 'ok'])
+
+        def flaky():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.registry.register('flaky', flaky, ttl=60)
+        with pytest.raises(CallError):
+            self.registry.call('flaky')
+        assert self.registry.call('flaky') == 'ok'
+
+    def test_max_concurrency(self):
+        """测试同一函数的并发数上限：没有空位的调用等到超时后报 busy"""
+        release = threading.Event()
+        running = []
+
+        def slow():
+            running.append(1)
+            release.wait(5)
+            return 'done'
+
+        self.registry.register('slow', slow, timeout=0.1, max_concurrency=1)
+        with pytest.raises(CallError) as e:
+            self.registry.call('slow')
+        assert e.value.reason == 'timeout'
+        # 第一个调用超时后仍在执行，占着唯一的名额
+        with pytest.raises(CallError) as e:
+            self.registry.call('slow')
+        assert e.value.reason == 'busy'
+        release.set()
+        time.sleep(0.05)
+        assert self.registry.call('slow') == 'done'
+        assert len(running) == 2
+
+    def test_start_does_not_wait_for_slot(self):
+        """测试没有并发空位时 start() 立即返回，在线程池中等待空位"""
+        release = threading.Event()
+        self.registry.register('slow', lambda: release.wait(5) and 'done', timeout=1.0, max_concurrency=1)
+        first = self.registry.start('slow')
+        began = time.perf_counter()
+        second = self.registry.start('slow')
+        assert time.perf_counter() - began < 0.05
+        release.set()
+        assert self.registry.wait(first) == 'done'
+        assert self.registry.wait(second) == 'done'
+
+    def test_limited_calls_do_not_starve_pool(self):
+        """测试排队等待并发空位的调用不占用线程池，其他函数的调用照常执行"""
+        release = threading.Event()
+        order = []
+
+        def slow(i):
+            order.append(i)
+            release.wait(5)
+            return i
+
+        self.registry.register('slow', slow, timeout=2.0, max_concurrency=1)
+        self.registry.register('fast', lambda: 'fast', timeout=0.5)
+        pending = [self.registry.start('slow', (i,)) for i in range(8)]
+        assert self.registry.call('fast') == 'fast'
+        assert order == [0]
+        release.set()
+        assert [self.registry.wait(p) for p in pending] == list(range(8))
+        assert order == list(range(8))
+
+    def test_queued_call_fails_busy_after_deadline(self):
+        """测试排队超过超时时间的调用报 busy，之后的调用仍能取得空位"""
+        release = threading.Event()
+        self.registry.register('slow', lambda: release.wait(5) and 'done', timeout=0.1, max_concurrency=1)
+        first = self.registry.start('slow')
+        queued = self.registry.start('slow')
+        with pytest.raises(CallError) as e:
+            self.registry.wait(queued)
+        assert e.value.reason == 'busy'
+        with pytest.raises(CallError) as e:
+            self.registry.wait(first)
+        assert e.value.reason == 'timeout'
+        release.set()
+        time.sleep(0.05)
+        assert self.registry.call('slow') == 'done'
+
+    def test_zero_timeout_is_kept(self):
+        """测试注册时的 timeout=0 不会被默认超时替换"""
+        self.registry.register('instant', lambda: 'ok', timeout=0)
+        assert self.registry.functions['instant'].timeout == 0
+        assert FunctionRegistry(timeout=0).timeout == 0
+
+    def test_metrics(self):
+        """测试按函数和结果计数"""
+        METRICS.reset()
+        METRICS.enable()
+        try:
+            self.registry.register('record', self._record, ttl=60)
+            self.registry.call('record', ('a',))
+            self.registry.call('record', ('a',))
+            with pytest.raises(CallError):
+                self.registry.call('missing')
+            assert METRICS.counter('call_total', function='record', result='ok') == 1
+            assert METRICS.counter('call_total', function='record', result='cache') == 1
+            assert METRICS.counter('call_total', function='missing', result='unregistered') == 1
+            assert METRICS.histogram('call', function='record').count == 1
+        finally:
+            METRICS.disable()
+            METRICS.reset()
+
+
+class TestAsyncCall:
+    def setup_method(self):
+        self.registry = FunctionRegistry(max_workers=4, timeout=1.0)
+
+    def teardown_method(self):
+        self.registry.shutdown()
+
+    def test_sync_function_does_not_block_loop(self):
+        """测试异步调用同步函数时事件循环上的其他任务继续执行"""
+        self.registry.register('slow', lambda x: time.sleep(0.1) or x * 2)
+
+        async def run():
+            ticks = []
+
+            async def ticker():
+                for _ in range(5):
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            result, _ = await asyncio.gather(self.registry.acall('slow', (21,)), ticker())
+            return result, len(ticks)
+
+        assert asyncio.run(run()) == (42, 5)
+
+    def test_async_function_and_timeout(self):
+        """测试 async def 函数直接 await，超时后报 timeout"""
+        async def fetch(x):
+            await asyncio.sleep(0.01)
+            return x
+
+        async def hang():
+            await asyncio.sleep(5)
+
+        self.registry.register('fetch', fetch)
+        self.registry.register('hang', hang, timeout=0.05)
+
+        async def run():
+            value = await self.registry.acall('fetch', ('v',))
+            with pytest.raises(CallError) as e:
+                await self.registry.acall('hang')
+            return value, e.value.reason
+
+        assert asyncio.run(run()) == ('v', 'timeout')
+        # 同步路径上 async def 函数在工作线程中执行
+        assert self.registry.call('fetch', ('w',)) == 'w'
+
+    def test_concurrency_limit_in_async_mode(self):
+        """测试异步调用同样受并发数上限约束，超时的等待不占名额"""
+        self.registry.register('slow', lambda: time.sleep(0.1) or 'done', max_concurrency=1, timeout=0.05)
+
+        async def run():
+            return await asyncio.gather(self.registry.acall('slow'), self.registry.acall('slow'),
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert sorted(e.reason for e in results) == ['busy', 'timeout']
+        time.sleep(0.1)
+        self.registry.register('slow', lambda: 'done', max_concurrency=1)
+        assert self.registry.call('slow') == 'done'
@@ -0,0 +1,121 @@
+"""
+轻量HTTP LLM客户端测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import http.client
+import json
+import pytest
+from unittest.mock import patch
+from http_llm import HTTPChatClient, LLMHTTPError, extract_content
+from llm_client import LLMClient
+from stub_llm_server import StubLLMServer
+
+
+def build_prompt(text, intents):
+    return f"可用意图：{', '.join(intents)}\n用户输入：{text}\n"
+
+
+class TestExtractContent:
+    def test_fast_path(self):
+        """测试直接定位 content 字段，包括转义字符"""
+        body = json.dumps({'id': 'x', 'choices': [{'index': 0, 'message': {
+            'role': 'assistant', 'content': '退款 "refund"\n'}}]}, ensure_ascii=False)
+        assert extract_content(body) == '退款 "refund"\n'
+
+    def test_fallback_to_full_parse(self):
+        """测试 content 不是字符串时退回完整解析"""
+        body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': None}}]})
+        assert extract_content(body) == ''
+
+
+class TestHTTPChatClient:
+    def setup_method(self):
+        self.server = StubLLMServer(rules={'refund': ['退货']}).start()
+        self.client = HTTPChatClient(self.server.base_url, 'test_api_key', 'stub-model')
+
+    def teardown_method(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_template_is_valid_json(self):
+        """测试预序列化模板拼接提示词后是合法的请求体"""
+        messages = [{'role': 'system', 'content': '系统'}, {'role': 'user', 'content': '包含"引号"和\n换行'}]
+        body = self.client._head + json.dumps(messages, ensure_ascii=False).encode('utf-8') + self.client._tail
+        request = json.loads(body)
+        assert request['messages'] == messages
+        assert request['model'] == 'stub-model'
+        assert request['stream'] is False
+
+    def test_complete_reuses_connection(self):
+        """测试多次请求复用同一条长连接"""
+        prompt = build_prompt('我要退货，' * 20, ['greeting', 'refund'])
+        assert self.client.complete(prompt) == 'refund'
+        conn = self.client._local.conn
+        sock = conn.sock
+        assert self.client.complete(prompt) == 'refund'
+        assert self.client._local.conn is conn
+        assert conn.sock is sock
+        assert self.server.stats['requests'] == 2
+        usage = self.client.last_usage()
+        assert usage['prompt_tokens'] > 0
+        assert usage['cached_tokens'] > 0
+
+    def test_reconnects_stale_connection(self):
+        """测试复用的连接被服务端关闭时重连并重发"""
+        self.client.complete(build_prompt('x', ['a']))
+        original = self.client._roundtrip
+        calls = []
+
+        def flaky(conn, body):
+            calls.append(conn)
+            if len(calls) == 1:
+                raise http.client.RemoteDisconnected('closed')
+            return original(conn, body)
+
+        with patch.object(self.client, '_roundtrip', side_effect=flaky):
+            assert self.client.complete(build_prompt('x', ['a'])) == 'a'
+        assert len(calls) == 2
+        assert calls[0] is not calls[1]
+
+    def test_failed_reconnect_is_discarded(self):
+        """测试重连后的请求也失败时关闭新连接，下一次请求重新建立"""
+        self.client.complete(build_prompt('x', ['a']))
+        calls = []
+
+        def failing(conn, body):
+            calls.append(conn)
+            raise http.client.RemoteDisconnected('closed')
+
+        with patch.object(self.client, '_roundtrip', side_effect=failing):
+            with pytest.raises(http.client.RemoteDisconnected):
+                self.client.complete(build_prompt('x', ['a']))
+        assert len(calls) == 2
+        assert self.client._local.conn is None
+        assert calls[1].sock is None
+        assert self.client.complete(build_prompt('x', ['a'])) == 'a'
+
+    def test_error_status(self):
+        """测试非200响应抛出 LLMHTTPError"""
+        with StubLLMServer(error_rate=1.0) as server:
+            client = HTTPChatClient(server.base_url, None, 'm')
+            with pytest.raises(LLMHTTPError) as info:
+                client.complete('x')
+        assert info.value.status == 500
+
+    def test_llm_client_http_backend(self):
+        """测试 LLMClient 选择 http 后端时不导入openai SDK"""
+        env = {'DSL_AGENT_BASE_URL': self.server.base_url, 'DSL_AGENT_LLM_BACKEND': 'http'}
+        with patch.dict('os.environ', env), patch('llm_client.OpenAI') as mock_openai:
+            client = LLMClient(api_key='test_api_key')
+            assert client.recognize_intent('我要退货', ['greeting', 'refund'], []) == 'refund'
+            mock_openai.assert_not_called()
+        assert isinstance(client.client, HTTPChatClient)
+
+    def test_unknown_backend(self):
+        """测试未知后端名称"""
+        with patch.dict('os.environ', {'DSL_AGENT_LLM_BACKEND': 'grpc'}):
+            with pytest.raises(ValueError):
+                LLMClient(api_key='test_api_key')
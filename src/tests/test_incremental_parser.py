@@ -0,0 +1,127 @@
+"""
+增量解析器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import random
+from parser import Parser
+from incremental_parser import IncrementalParser
+from descent_parser import DescentParser
+
+
+def build_script(count):
+    """生成包含 count 个step的测试脚本"""
+    parts = ['# 测试脚本\n']
+    for i in range(count):
+        parts.append(
+            f'step s{i}\n'
+            f'    reply "第{i}步" + $user_input\n'
+            f'    log "进入第{i}步"\n'
+            f'    wait "s{(i + 1) % count}" "s0"\n\n'
+        )
+    return ''.join(parts)
+
+
+def full_parse(text):
+    """完整解析，有语法错误时返回None"""
+    parser = Parser(debug=False)
+    ast = parser.parse(text)
+    return None if parser.error_count else ast
+
+
+class TestIncrementalParser:
+    def setup_method(self):
+        self.text = build_script(10)
+        self.parser = IncrementalParser()
+        self.ast = self.parser.parse(self.text)
+
+    def test_initial_parse_matches_full_parse(self):
+        """测试首次解析结果与完整解析一致"""
+        assert self.ast == full_parse(self.text)
+        assert len(self.ast['children']) == 10
+
+    def test_edit_inside_step_reparses_few_steps(self):
+        """测试修改单个step只重新分析附近区块"""
+        new_text = self.text.replace('"第5步"', '"第五步"')
+        ast = self.parser.update(new_text)
+
+        assert ast == full_parse(new_text)
+        assert self.parser.last_reparsed <= 2
+        assert ast['children'][5]['children'][0]['value']['children'][0]['value'] == '第五步'
+
+    def test_unchanged_steps_are_reused(self):
+        """测试未变化的step节点被原样复用，语法树原地拼接"""
+        old_last = self.ast['children'][-1]
+        new_text = self.text.replace('"第2步"', '"第二步"')
+        ast = self.parser.update(new_text)
+
+        assert ast is self.ast
+        assert ast['children'][-1] is old_last
+
+    def test_inserted_lines_shift_line_numbers(self):
+        """测试插入新行后后续step的行号正确平移"""
+        new_text = self.text.replace('    log "进入第3步"\n', '    log "进入第3步"\n    reply "新增"\n')
+        ast = self.parser.update(new_text)
+
+        assert ast == full_parse(new_text)
+
+    def test_insert_and_delete_steps(self):
+        """测试插入和删除整个step"""
+        inserted = self.text.replace('step s4\n', 'step extra\n    reply "新步骤"\n\nstep s4\n')
+        ast = self.parser.update(inserted)
+        assert ast == full_parse(inserted)
+        assert len(ast['children']) == 11
+
+        deleted = inserted.replace('step extra\n    reply "新步骤"\n\n', '')
+        ast = self.parser.update(deleted)
+        assert ast == full_parse(deleted)
+        assert len(ast['children']) == 10
+
+    def test_seed_from_parsed_ast(self):
+        """测试用其他后端解析的语法树初始化后，第一次编辑只重新分析附近区块，语法树原地更新"""
+        ast = DescentParser().parse(self.text)
+        parser = IncrementalParser()
+        assert parser.seed(self.text, ast)
+        new_text = self.text.replace('    log "进入第8步"\n', '')
+        assert parser.update(new_text) is ast
+        assert ast == full_parse(new_text)
+        assert parser.last_reparsed <= 2
+
+    def test_seed_mismatch_falls_back_to_full_parse(self):
+        """测试语法树与文本对不上时不初始化，下一次更新完整解析"""
+        parser = IncrementalParser()
+        assert not parser.seed('\n' + self.text, full_parse(self.text))
+        assert parser.update(self.text) == full_parse(self.text)
+
+    def test_syntax_error_then_fix(self):
+        """测试中间状态有语法错误返回None，修正后恢复"""
+        broken = self.text.replace('    reply "第3步"', '    reply')
+        assert self.parser.update(broken) is None
+
+        ast = self.parser.update(self.text)
+        assert ast == full_parse(self.text)
+
+    def test_unterminated_string_spanning_steps(self):
+        """测试编辑引入跨越多个step的字符串时能重新同步"""
+        new_text = self.text.replace('"进入第2步"', '"进入第2步 ')
+        assert self.parser.update(new_text) == full_parse(new_text)
+        assert self.parser.update(self.text) == full_parse(self.text)
+
+    def test_apply_edit(self):
+        """测试按范围提交编辑"""
+        start = self.text.index('第7步')
+        ast = self.parser.apply_edit(start, start + 1, '编')
+        assert ast == full_parse(self.parser.text)
+
+    def test_random_edits_match_full_parse(self):
+        """测试随机编辑序列的增量结果始终与完整解析一致"""
+        rng = random.Random(42)
+        snippets = ['', 'x', '\n', ' + $a', '#', 'step ', '\nstep z\n    reply "q"\n', 'reply "k"\n']
+        text = self.text
+        for _ in range(200):
+            start = rng.randrange(len(text) + 1)
+            end = min(len(text), start + rng.randrange(20))
+            text = text[:start] + rng.choice(snippets) + text[end:]
+            assert self.parser.update(text) == full_parse(text)
@@ -0,0 +1,190 @@
+"""
+意图缓存测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import json
+from unittest.mock import MagicMock, patch
+from dispatch import KeywordMatcher
+from event_log import EventLog, read_events
+from intent_cache import IntentCache
+from llm_client import LLMClient
+from metrics import METRICS
+from normalizer import Normalizer
+from dsl_engine import DSLEngine
+
+
+def _write_warmup(path, entries):
+    path.write_text(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries), encoding='utf-8')
+
+
+class TestIntentCache:
+    def setup_method(self):
+        METRICS.reset()
+        METRICS.enable()
+
+    def teardown_method(self):
+        METRICS.disable()
+        METRICS.reset()
+
+    def test_hit_and_miss(self):
+        """测试按 wait 位置和规范化的输入命中，并统计命中与未命中次数"""
+        cache = IntentCache(size=10)
+        assert cache.get('welcome:4', '我要退货', ('refund', 'human')) is None
+        cache.put('welcome:4', '我要退货', 'refund')
+        assert cache.get('welcome:4', '我要退货', ('refund', 'human')) == 'refund'
+        assert cache.get('other:9', '我要退货', ('refund', 'human')) is None
+        assert METRICS.counter('intent_cache_total', result='hit') == 1
+        assert METRICS.counter('intent_cache_total', result='miss') == 2
+
+    def test_warm_entries_are_normalized(self, tmp_path):
+        """测试预热条目的输入按缓存的规范化函数处理"""
+        path = tmp_path / 'warmup.jsonl'
+        _write_warmup(path, [{'site': 'a:1', 'input': ' 我要 退貨！', 'intent': 'x', 'count': 1}])
+        cache = IntentCache(size=10, normalize=Normalizer(fold_traditional=True))
+        assert cache.warm(str(path)) == 1
+        assert cache.get('a:1', '我要退货', ('x',)) == 'x'
+
+    def test_stale_intent_is_dropped(self):
+        """测试缓存的意图不在本次候选中时视为未命中并删除"""
+        cache = IntentCache(size=10)
+        cache.put('welcome:4', '我要退货', 'refund')
+        assert cache.get('welcome:4', '我要退货', ('human',)) is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted(self):
+        """测试超出容量时淘汰最久没有使用的条目"""
+        cache = IntentCache(size=2)
+        cache.put('a:1', '一', 'x')
+        cache.put('a:1', '二', 'x')
+        cache.get('a:1', '一', ('x',))
+        cache.put('a:1', '三', 'x')
+        assert cache.get('a:1', '一', ('x',)) == 'x'
+        assert cache.get('a:1', '二', ('x',)) is None
+        assert cache.get('a:1', '三', ('x',)) == 'x'
+
+    def test_disabled(self):
+        """测试容量为0时不缓存"""
+        with patch.dict('os.environ', {'DSL_AGENT_INTENT_CACHE_SIZE': '0'}):
+            cache = IntentCache()
+        cache.put('a:1', '一', 'x')
+        assert cache.get('a:1', '一', ('x',)) is None
+        assert cache.warm('不存在的文件') == 0
+
+    def test_warm_from_list(self, tmp_path):
+        """测试从预热列表载入：跳过有歧义的条目，不覆盖已有条目，容量不足时保留次数多的"""
+        path = tmp_path / 'warmup.jsonl'
+        _write_warmup(path, [
+            {'site': 'a:1', 'input': '一', 'intent': 'x', 'count': 9, 'share': 1.0},
+            {'site': 'a:1', 'input': '二', 'intent': 'y', 'count': 8, 'share': 0.4},
+            {'site': 'a:1', 'input': '三', 'intent': 'y', 'count': 7, 'share': 0.9},
+            {'site': 'a:1', 'input': '四', 'intent': 'x', 'count': 6, 'share': 0.9},
+        ])
+        cache = IntentCache(size=3)
+        cache.put('a:1', '三', 'x')
+        assert cache.warm(str(path)) == 2
+        assert METRICS.counter('intent_cache_warm_total') == 2
+        assert cache.get('a:1', '一', ('x', 'y')) == 'x'
+        assert cache.get('a:1', '二', ('x', 'y')) is None
+        assert cache.get('a:1', '三', ('x', 'y')) == 'x'
+        # 新写入的条目先淘汰预热条目中次数少的
+        cache.put('a:1', '五', 'x')
+        assert cache.get('a:1', '四', ('x', 'y')) is None
+        assert cache.get('a:1', '一', ('x', 'y')) == 'x'
+
+    def test_warm_top(self, tmp_path):
+        """测试只载入前 top 条"""
+        path = tmp_path / 'warmup.jsonl'
+        _write_warmup(path, [{'site': 'a:1', 'input': str(i), 'intent': 'x', 'count': 10 - i} for i in range(10)])
+        cache = IntentCache(size=100)
+        assert cache.warm(str(path), top=3) == 3
+        with patch.dict('os.environ', {'DSL_AGENT_INTENT_WARMUP_TOP': '5'}):
+            assert IntentCache(size=100).warm(str(path)) == 5
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """测试导出的快照可以用于预热，命中次数多的排在前面"""
+        cache = IntentCache(size=10)
+        cache.put('a:1', '一', 'x')
+        cache.put('a:1', '二', 'y')
+        cache.get('a:1', '二', ('y',))
+        path = tmp_path / 'snapshot.jsonl'
+        assert cache.save(str(path)) == 2
+        assert json.loads(path.read_text(encoding='utf-8').splitlines()[0])['input'] == '二'
+        restored = IntentCache(size=10)
+        assert restored.warm(str(path)) == 2
+        assert restored.get('a:1', '一', ('x',)) == 'x'
+
+    def test_warm_from_event_log(self, tmp_path):
+        """测试直接从事件日志目录统计预热条目"""
+        log = EventLog(str(tmp_path))
+        for intent in ('refund', 'refund', 'human'):
+            log.append('turn', 's', 'welcome', 4, '我要退货', intent, 'llm', 0.2, 0.01)
+        log.append('turn', 's', 'welcome', 4, '转人工', 'human', 'cache', 0.0, 0.01)
+        log.close()
+        cache = IntentCache(size=10)
+        assert cache.warm(str(tmp_path)) == 2
+        assert cache.get('welcome:4', '我要退货', ('refund', 'human')) == 'refund'
+        assert cache.get('welcome:4', '转人工', ('refund', 'human')) == 'human'
+
+    def test_warm_async(self, tmp_path):
+        """测试后台预热，来源不存在时只记录错误"""
+        path = tmp_path / 'warmup.jsonl'
+        _write_warmup(path, [{'site': 'a:1', 'input': '一', 'intent': 'x', 'count': 1}])
+        cache = IntentCache(size=10)
+        cache.warm_async(str(path))
+        assert cache.wait_warm(5)
+        assert cache.get('a:1', '一', ('x',)) == 'x'
+        cache.log = MagicMock()
+        cache.warm_async(str(tmp_path / '不存在.jsonl'))
+        assert cache.wait_warm(5)
+        cache.log.error.assert_called_once()
+
+    def test_llm_client_stores_only_model_answers(self):
+        """测试LLM给出有效意图时写入缓存，关键词回退的结果不写入"""
+        client = LLMClient(api_key='test_api_key')
+        client.intent_cache = IntentCache(size=10)
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value.choices[0].message.content = 'help'
+        assert client.recognize_intent('怎么用', ['greeting', 'help'], [], site='a:1') == 'help'
+        assert client.intent_cache.get('a:1', '怎么用', ('help',)) == 'help'
+        client.client.chat.completions.create.side_effect = Exception('API Error')
+        keywords = KeywordMatcher([('greeting', ['你好'])])
+        assert client.recognize_intent('你好', ['greeting', 'help'], [], keywords=keywords, site='a:1') == 'greeting'
+        assert client.intent_cache.get('a:1', '你好', ('greeting',)) is None
+
+
+SCRIPT = '''
+step welcome
+    reply "您好"
+    wait "refund" "human"
+
+step refund
+    reply "好的"
+
+step human
+    reply "正在转接"
+'''
+
+
+class TestEngineWarmup:
+    def test_warmed_entries_skip_llm(self, tmp_path):
+        """测试设置预热来源后，预热过的输入不调用LLM，turn 事件的路由来源为 cache"""
+        path = tmp_path / 'warmup.jsonl'
+        _write_warmup(path, [{'site': 'welcome:4', 'input': '我要退货', 'intent': 'refund', 'count': 3}])
+        events = tmp_path / 'events'
+        with patch.dict('os.environ', {'DSL_AGENT_INTENT_WARMUP': str(path), 'DSL_AGENT_EVENT_DIR': str(events)}):
+            with patch('dsl_engine.LLMClient'):
+                engine = DSLEngine(script_content=SCRIPT)
+            assert engine.intent_cache.wait_warm(5)
+            session = engine.new_session()
+            session.begin()
+            assert session.feed('我要退货') == '好的'
+            engine.llm_client.recognize_intent.assert_not_called()
+            engine.llm_client.recognize_intent.return_value = 'human'
+            session = engine.new_session()
+            session.begin()
+            assert session.feed('人工服务') == '正在转接'
+        engine.close()
+        assert [e.source for e in read_events(str(events), kinds=['turn'])] == ['cache', 'llm']
@@ -5,7 +5,11 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import random
+import pytest
+from unittest.mock import patch
 from lexer import Lexer
+from parser import Parser
 
 class TestLexer:
     def setup_method(self):
@@ -69,4 +73,61 @@ class TestLexer:
         tokens = self.lexer.tokenize('step reply log wait')
         token_types = [t.type for t in tokens]
         # 所有都应该是关键字类型
-        assert token_types == ['STEP', 'REPLY', 'LOG', 'WAIT']
\ No newline at end of file
+        assert token_types == ['STEP', 'REPLY', 'LOG', 'WAIT']
+
+class TestFastLexer:
+    """快速词法分析器与PLY词法分析器的差分测试"""
+
+    SAMPLES = [
+        'step greeting',
+        'step a # 注释 step b\n  reply "x" + $user_input\n\n  wait "a" "b"',
+        'reply "转义\\"引号" + "多行\n字符串"',
+        'log 1step $ $9 @ "未闭合\n step b',
+        'step a\r\n  reply "crlf"\r\n',
+        'if $x == "1" else end match case when prefix regex goto = ===',
+        'call x = f($a, "b" + c)call g()',
+        '',
+    ]
+
+    def _stream(self, lexer, data):
+        return [(t.type, t.value, t.lineno, t.lexpos) for t in lexer.tokenize(data)]
+
+    def test_same_tokens_as_ply(self):
+        """测试样例输入下两种后端产生相同的标记流"""
+        for data in self.SAMPLES:
+            assert self._stream(Lexer('fast'), data) == self._stream(Lexer('ply'), data)
+
+    def test_same_tokens_on_scripts(self):
+        """测试仓库自带脚本上两种后端产生相同的标记流"""
+        base_dir = os.path.dirname(os.path.dirname(__file__))
+        for name in ('script.dsl', 'test.dsl'):
+            with open(os.path.join(base_dir, name), encoding='utf-8') as f:
+                data = f.read()
+            assert self._stream(Lexer('fast'), data) == self._stream(Lexer('ply'), data)
+
+    def test_random_input(self):
+        """测试随机字符组合下两种后端产生相同的标记流"""
+        rng = random.Random(7)
+        alphabet = 'step reply log wait ab_1 $x "\\ + # \n\t@中'
+        for _ in range(300):
+            data = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(40)))
+            assert self._stream(Lexer('fast'), data) == self._stream(Lexer('ply'), data)
+
+    def test_errors_are_recorded(self):
+        """测试非法字符被记录而不是打印"""
+        lexer = Lexer('fast')
+        tokens = lexer.tokenize('step a\n  @reply "x"')
+        assert [t.type for t in tokens] == ['STEP', 'ID', 'REPLY', 'STRING']
+        assert lexer.lexer.errors == [{'char': '@', 'lineno': 2, 'column': 3}]
+
+    def test_backend_from_environment(self):
+        """测试通过环境变量选择后端"""
+        with patch.dict('os.environ', {'DSL_AGENT_LEXER': 'fast'}):
+            assert Lexer().backend == 'fast'
+        with pytest.raises(ValueError):
+            Lexer('unknown')
+
+    def test_parser_with_fast_lexer(self):
+        """测试解析器使用快速词法分析器得到相同的语法树"""
+        script = 'step greeting\n  reply "Hello " + $name\n  wait "help" "thanks"'
+        assert Parser(lexer_backend='fast').parse(script) == Parser().parse(script)
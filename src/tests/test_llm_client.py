@@ -7,6 +7,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 import pytest
 from unittest.mock import patch, MagicMock
+from dispatch import KeywordMatcher
+from extractors import TYPED_EXTRACTORS
 from llm_client import LLMClient
 
 class TestLLMClient:
@@ -46,6 +48,15 @@ class TestLLMClient:
         
         assert intent == "greeting"
         mock_client.chat.completions.create.assert_called_once()
+
+    @patch('llm_client.OpenAI')
+    def test_openai_backend_uses_configured_model(self, mock_openai):
+        """测试openai后端使用 DSL_AGENT_MODEL 指定的模型"""
+        mock_openai.return_value.chat.completions.create.return_value.choices[0].message.content = "help"
+        with patch.dict('os.environ', {'DSL_AGENT_MODEL': 'custom-model'}):
+            client = LLMClient(api_key=self.api_key, debug=False)
+        assert client.recognize_intent("帮助", ["greeting", "help"], []) == "help"
+        assert mock_openai.return_value.chat.completions.create.call_args.kwargs['model'] == 'custom-model'
     
     @patch('llm_client.OpenAI')
     def test_recognize_intent_fallback(self, mock_openai):
@@ -60,7 +71,33 @@ class TestLLMClient:
         intent = client.recognize_intent("test", ["greeting", "help"], [])
         
         assert intent == "unknown"
+
+    def test_keyword_fallback_on_api_error(self):
+        """测试API调用失败时使用关键词匹配器回退"""
+        client = LLMClient(api_key=self.api_key, debug=False)
+        client.client = MagicMock()
+        client.client.chat.completions.create.side_effect = Exception("API Error")
+        keywords = KeywordMatcher([('greeting', ['你好']), ('help', ['帮助', '怎么'])])
+
+        assert client.recognize_intent("你好，怎么退货", ["greeting", "help"], [], keywords=keywords) == "greeting"
+        assert client.recognize_intent("帮助", ["greeting"], [], keywords=keywords) == "unknown"
+        assert client.recognize_intent("随便", ["greeting", "help"], [], keywords=keywords) == "unknown"
     
+    def test_extract_slot_validates_reply(self):
+        """测试LLM槽位提取的回复经本地提取器校验和规范化"""
+        client = LLMClient(api_key=self.api_key, debug=False)
+        client.client = MagicMock()
+        replies = ['2024年3月1日', '无']
+        client.client.chat.completions.create.side_effect = lambda **kwargs: MagicMock(
+            choices=[MagicMock(message=MagicMock(content=replies.pop(0)))], usage=None)
+        date = TYPED_EXTRACTORS['date']
+        assert client.extract_slot('二〇二四年三月一日', date) == '2024-03-01'
+        assert client.extract_slot('下周吧', date) is None
+        prompt = client.client.chat.completions.create.call_args.kwargs['messages'][0]['content']
+        assert '日期' in prompt and '下周吧' in prompt
+        client.client.chat.completions.create.side_effect = Exception("API Error")
+        assert client.extract_slot('下周吧', date) is None
+
     def test_mask_key(self):
         """测试API密钥掩码"""
         client = LLMClient(api_key="1234567890abcdef", debug=False)
@@ -72,4 +109,31 @@ class TestLLMClient:
         assert masked_short == "**34"
         
         masked_empty = client._mask_key("")
-        assert masked_empty == "(no-key)"
\ No newline at end of file
+        assert masked_empty == "(no-key)"
+    def test_openai_imported_lazily(self):
+        """测试创建客户端时不导入openai SDK，第一次使用时才创建"""
+        with patch('llm_client.OpenAI') as mock_openai:
+            client = LLMClient(api_key=self.api_key, debug=False)
+            mock_openai.assert_not_called()
+            assert client.client is mock_openai.return_value
+            mock_openai.assert_called_once()
+
+    def test_client_created_once_across_threads(self):
+        """测试多个线程同时第一次使用时只创建一个客户端，且都拿到创建好的客户端"""
+        import threading
+        import time
+
+        def slow_openai(**kwargs):
+            time.sleep(0.05)
+            return MagicMock()
+
+        with patch('llm_client.OpenAI', side_effect=slow_openai) as mock_openai:
+            client = LLMClient(api_key=self.api_key, debug=False)
+            seen = []
+            threads = [threading.Thread(target=lambda: seen.append(client.client)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        mock_openai.assert_called_once()
+        assert all(item is not None and item is seen[0] for item in seen)
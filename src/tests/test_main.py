@@ -25,4 +25,19 @@ class TestMain:
         with patch('sys.argv', ['main.py'] + test_args):
             args = parse_arguments()
             assert args.script == 'test_script.dsl'
-            assert args.debug == False
\ No newline at end of file
+            assert args.debug == False
+
+    def test_profile_arguments(self):
+        """测试剖析参数：--profile-sample 不带值时使用默认采样间隔"""
+        with patch('sys.argv', ['main.py', 's.dsl', '--profile', 'out', '--profile-sample', '--profile-alloc']):
+            args = parse_arguments()
+        assert (args.profile, args.profile_sample, args.profile_alloc) == ('out', 5.0, True)
+        with patch('sys.argv', ['main.py', 's.dsl', '--profile-sample', '2']):
+            assert parse_arguments().profile_sample == 2.0
+
+    def test_priors_argument(self):
+        """测试 --priors 指定意图先验文件"""
+        with patch('sys.argv', ['main.py', 's.dsl', '--priors', 'priors.json']):
+            assert parse_arguments().priors == 'priors.json'
+        with patch('sys.argv', ['main.py', 's.dsl']):
+            assert parse_arguments().priors is None
\ No newline at end of file
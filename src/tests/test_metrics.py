@@ -0,0 +1,116 @@
+"""
+运行时指标测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import json
+import urllib.request
+import pytest
+from unittest.mock import patch, MagicMock
+from metrics import METRICS, NULL_SPAN, Histogram, JsonDumper, Metrics, MetricsServer
+from dsl_engine import DSLEngine
+
+
+class TestMetrics:
+    def setup_method(self):
+        self.metrics = Metrics(enabled=True)
+
+    def test_disabled_is_noop(self):
+        """测试关闭时返回空区间且不记录任何数据"""
+        metrics = Metrics()
+        assert metrics.span('parse') is NULL_SPAN
+        with metrics.span('parse') as span:
+            span.set(result='ok')
+        metrics.inc('requests_total')
+        metrics.observe('parse', 0.1)
+        assert metrics.snapshot()['histograms'] == []
+        assert metrics.snapshot()['counters'] == []
+
+    def test_span_records_histogram(self):
+        """测试计时区间按名称和标签聚合"""
+        for _ in range(3):
+            with self.metrics.span('parse', backend='ply'):
+                pass
+        with self.metrics.span('classify') as span:
+            span.set(result='fallback')
+        assert self.metrics.histogram('parse', backend='ply').count == 3
+        assert self.metrics.histogram('classify', result='fallback').count == 1
+
+    def test_span_labels_exceptions(self):
+        """测试区间内抛出异常时记录 error 标签"""
+        with pytest.raises(KeyError):
+            with self.metrics.span('dispatch'):
+                raise KeyError('x')
+        assert self.metrics.histogram('dispatch', error='KeyError').count == 1
+
+    def test_histogram_quantile(self):
+        """测试按分桶估计分位数"""
+        histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.observe(value)
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.99) == 10.0
+        assert histogram.counts == [2, 1, 1, 0]
+
+    def test_prometheus_format(self):
+        """测试 Prometheus 文本格式：累计分桶、sum、count 与计数器"""
+        self.metrics.observe('parse', 0.002, backend='ply')
+        self.metrics.inc('intent_fallback_total', reason='api_error')
+        self.metrics.inc('intent_fallback_total', reason='api_error')
+        text = self.metrics.render_prometheus()
+        assert '# TYPE dsl_agent_parse_seconds histogram' in text
+        assert 'dsl_agent_parse_seconds_bucket{backend="ply",le="0.005"} 1' in text
+        assert 'dsl_agent_parse_seconds_bucket{backend="ply",le="0.001"} 0' in text
+        assert 'dsl_agent_parse_seconds_count{backend="ply"} 1' in text
+        assert 'dsl_agent_intent_fallback_total{reason="api_error"} 2' in text
+
+    def test_json_dump(self, tmp_path):
+        """测试JSON快照写出"""
+        self.metrics.observe('lex', 0.001)
+        path = str(tmp_path / 'metrics.json')
+        JsonDumper(path, metrics=self.metrics).dump()
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        assert snapshot['histograms'][0]['name'] == 'lex_seconds'
+
+    def test_http_endpoint(self):
+        """测试 /metrics 端点"""
+        self.metrics.inc('requests_total')
+        server = MetricsServer(metrics=self.metrics).start()
+        try:
+            with urllib.request.urlopen(server.url, timeout=5) as response:
+                body = response.read().decode('utf-8')
+        finally:
+            server.stop()
+        assert 'dsl_agent_requests_total 1' in body
+
+
+class TestEngineInstrumentation:
+    def setup_method(self):
+        METRICS.reset()
+        METRICS.enable()
+
+    def teardown_method(self):
+        METRICS.disable()
+        METRICS.reset()
+
+    @patch('dsl_engine.LLMClient')
+    def test_engine_spans(self, mock_llm):
+        """测试解析、分派和语句执行被计时"""
+        engine = DSLEngine(script_content='step a\n    reply "hi"\n', parser_backend='ply')
+        engine.process('a')
+        assert METRICS.histogram('parse', backend='ply').count == 1
+        assert METRICS.histogram('dispatch').count == 1
+        assert METRICS.histogram('statement', type='Reply').count == 1
+
+    def test_classify_fallback_reason(self):
+        """测试意图识别回退时记录原因"""
+        from llm_client import LLMClient
+        client = LLMClient(api_key='test_api_key')
+        client.client = MagicMock()
+        client.client.chat.completions.create.side_effect = Exception("API Error")
+        assert client.recognize_intent('你好', ['greeting'], []) == 'unknown'
+        assert METRICS.counter('intent_fallback_total', reason='api_error') == 1
+        assert METRICS.histogram('classify', result='fallback').count == 1
@@ -0,0 +1,108 @@
+"""
+输入规范化测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from unittest.mock import patch
+from normalizer import Normalizer, TRADITIONAL_TO_SIMPLIFIED, _TRADITIONAL_PAIRS
+from event_log import EventLog
+from analytics import analyze
+from dsl_engine import DSLEngine
+
+
+class TestNormalizer:
+    def setup_method(self):
+        self.normalize = Normalizer(fold_traditional=False)
+
+    def test_variants_share_one_form(self):
+        """测试只有标点、空白、全角半角和大小写不同的输入得到相同结果"""
+        for text in ('退货', '退货！', ' 退 货 ', '退货。。。', '退货~', '退货～', '“退货”', '退货😊', '退货​'):
+            assert self.normalize(text) == '退货', text
+        assert self.normalize('ＶＩＰ会员') == self.normalize('vip 会员') == 'vip会员'
+        assert self.normalize('订单１２３４５６７８') == '订单12345678'
+        assert self.normalize('Hello, World!') == 'helloworld'
+
+    def test_math_and_currency_symbols_are_kept(self):
+        """测试数学符号和货币符号保留"""
+        assert self.normalize('+86 138') == '+86138'
+        assert self.normalize('¥100元') == '¥100元'
+
+    def test_punctuation_only_input(self):
+        """测试只有标点的输入不规范化为空串"""
+        assert self.normalize(' ？？ ') == '??'
+        assert self.normalize('!') == '!'
+
+    def test_traditional_folding(self):
+        """测试繁简转换只在开启时进行"""
+        assert self.normalize('我要退貨') == '我要退貨'
+        assert Normalizer(fold_traditional=True)('我要退貨，轉人工！') == '我要退货转人工'
+        with patch.dict('os.environ', {'DSL_AGENT_FOLD_TRADITIONAL': 'true'}):
+            assert Normalizer()('謝謝') == '谢谢'
+
+    def test_traditional_table(self):
+        """测试繁简对照表每项一对一且没有重复"""
+        pairs = _TRADITIONAL_PAIRS.split()
+        assert all(len(pair) == 2 and pair[0] != pair[1] for pair in pairs)
+        assert len(TRADITIONAL_TO_SIMPLIFIED) == len(pairs)
+
+    def test_idempotent(self):
+        """测试规范化结果再次规范化不变（缓存快照可以直接用于预热）"""
+        fold = Normalizer(fold_traditional=True)
+        for text in ('我要退貨！', ' ＶＩＰ ', 'Straße', '？？', '订单 12345'):
+            assert fold(fold(text)) == fold(text)
+
+
+SCRIPT = '''
+step welcome
+    reply "您好"
+    wait "refund" "human"
+
+step refund keywords "退货"
+    reply "好的"
+
+step human keywords "转人工" "VIP"
+    reply "正在转接"
+'''
+
+
+class TestNormalizedRouting:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=SCRIPT)
+        self.llm = self.engine.llm_client
+
+    def teardown_method(self):
+        self.engine.close()
+
+    def _feed(self, text):
+        session = self.engine.new_session()
+        session.begin()
+        with patch.object(self.engine, '_record_turn'):
+            return session.feed(text)
+
+    def test_keywords_match_normalized_input(self):
+        """测试关键词与规范化后的输入匹配"""
+        assert self._feed('转 人工！！') == '正在转接'
+        assert self._feed('ｖｉｐ专线') == '正在转接'
+        self.llm.recognize_intent.assert_not_called()
+
+    def test_cache_hits_input_variants(self):
+        """测试写法不同的输入命中同一个缓存条目，LLM收到规范化的输入作为缓存键"""
+        self.engine.intent_cache.put('welcome:4', '我想要个说法', 'refund')
+        assert self._feed('我想要个说法！') == '好的'
+        assert self._feed(' 我想要 个说法？') == '好的'
+        self.llm.recognize_intent.return_value = 'human'
+        self._feed('随便问问。')
+        assert self.llm.recognize_intent.call_args.kwargs['normalized'] == '随便问问'
+
+    def test_warmup_merges_variants(self, tmp_path):
+        """测试预热列表按规范化的输入合并计数"""
+        log = EventLog(str(tmp_path))
+        for text, intent in (('退货!', 'refund'), ('退货', 'refund'), (' 退货 ', 'human'), ('人工', 'human')):
+            log.append('turn', 's', 'welcome', 4, text, intent, 'llm', 0.2, 0.01)
+        log.close()
+        _, _, warmup = analyze(str(tmp_path), normalize=self.engine.normalizer)
+        assert warmup[0] == {'site': 'welcome:4', 'input': '退货', 'intent': 'refund', 'count': 3,
+                             'share': 2 / 3}
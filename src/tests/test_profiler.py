@@ -0,0 +1,188 @@
+"""
+性能剖析测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import signal
+import time
+import urllib.error
+import urllib.request
+import pytest
+from unittest.mock import patch
+from dsl_engine import DSLEngine
+from metrics import MetricsServer
+from profiler import PROFILER, Profiler, SamplingProfiler, install_signal_toggle
+
+SCRIPT = '''step welcome
+    reply "您好" + $user_input
+    log "进入欢迎"
+    wait "refund"
+
+step refund
+    reply "退货"
+'''
+
+
+class TestProfiler:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=SCRIPT)
+        PROFILER.reset()
+        PROFILER.start()
+
+    def teardown_method(self):
+        PROFILER.stop()
+        PROFILER.reset()
+
+    def test_session_statements_attributed(self):
+        """测试会话执行的语句按 step 和行号归属"""
+        session = self.engine.new_session()
+        with patch.object(self.engine, '_write_log'):
+            session.begin()
+        self.engine.llm_client.recognize_intent.return_value = 'refund'
+        session.feed('你好')
+
+        assert set(PROFILER.stats) == {('welcome', 'reply@L2'), ('welcome', 'log@L3'),
+                                       ('refund', 'reply@L7')}
+        assert PROFILER.stats[('welcome', 'reply@L2')][0] == 1
+        # welcome 的 wait 是最后一条语句，跳转前其帧已丢弃，refund 位于栈底
+        assert 'refund;reply@L7 ' in PROFILER.collapsed()
+
+    def test_process_statements_attributed(self):
+        """测试 process 执行的语句被记录，wait 不计入"""
+        self.engine.process('refund', 'x')
+        assert list(PROFILER.stats) == [('refund', 'reply@L7')]
+        assert PROFILER.collapsed().startswith('refund;reply@L7 ')
+
+    def test_step_table_sorted_by_wall_time(self):
+        """测试耗时表按 step 墙钟时间降序"""
+        profiler = Profiler()
+        profiler.stats = {('a', 'reply@L1'): [1, 0.001, 0.001, 0], ('b', 'log@L5'): [2, 0.5, 0.1, 2048]}
+        totals = profiler.step_totals()
+        assert [row[0] for row in totals] == ['b', 'a']
+        table = profiler.format_table()
+        assert table.index('b') < table.index('a ')
+        assert 'log@L5' in table
+
+    def test_allocations(self):
+        """测试开启分配统计时记录分配字节"""
+        PROFILER.stop()
+        PROFILER.start(allocations=True)
+        profiler_sample = PROFILER.begin('s', {'type': 'Reply', 'lineno': 1})
+        data = [str(i) for i in range(1000)]
+        PROFILER.end(profiler_sample, 's', {'type': 'Reply', 'lineno': 1})
+        assert PROFILER.stats[('s', 'reply@L1')][3] > 0
+        del data
+
+    def test_overlapping_allocations_skipped(self):
+        """测试语句之间有重叠（并发会话）时不记入分配字节"""
+        PROFILER.stop()
+        PROFILER.start(allocations=True)
+        first = PROFILER.begin('a', {'type': 'Reply', 'lineno': 1})
+        second = PROFILER.begin('b', {'type': 'Reply', 'lineno': 2})
+        data = [str(i) for i in range(1000)]
+        PROFILER.end(second, 'b', {'type': 'Reply', 'lineno': 2})
+        PROFILER.end(first, 'a', {'type': 'Reply', 'lineno': 1})
+        assert PROFILER.stats[('a', 'reply@L1')][3] == 0
+        assert PROFILER.stats[('b', 'reply@L2')][3] == 0
+        assert PROFILER.skipped_allocations == 2
+        assert '未计入分配' in PROFILER.format_table()
+        # 重叠结束后恢复统计
+        sample = PROFILER.begin('a', {'type': 'Reply', 'lineno': 1})
+        data = [str(i) for i in range(1000)]
+        PROFILER.end(sample, 'a', {'type': 'Reply', 'lineno': 1})
+        assert PROFILER.stats[('a', 'reply@L1')][3] > 0
+        del data
+
+    def test_sampling_with_profiler(self, tmp_path):
+        """测试 start(sample_interval) 同时启动采样剖析器，stop 时停止并写出采样结果"""
+        PROFILER.stop()
+        PROFILER.start(sample_interval=0.001)
+        assert PROFILER.sampler.running
+        time.sleep(0.05)
+        PROFILER.stop()
+        assert not PROFILER.sampler.running
+        assert PROFILER.sampled()
+        paths = PROFILER.write(str(tmp_path / 'prof'))
+        assert paths[-1].endswith('.sampled.collapsed') and os.path.exists(paths[-1])
+        PROFILER.reset()
+        assert PROFILER.sampled() == ''
+
+    def test_write_files(self, tmp_path):
+        """测试写出折叠栈和耗时表文件"""
+        self.engine.process('refund', 'x')
+        collapsed, table = PROFILER.write(str(tmp_path / 'prof'))
+        assert open(collapsed, encoding='utf-8').read().startswith('refund;reply@L7')
+        assert 'refund' in open(table, encoding='utf-8').read()
+
+    def test_disabled_records_nothing(self):
+        """测试关闭时不记录"""
+        PROFILER.stop()
+        self.engine.process('refund', 'x')
+        assert PROFILER.stats == {}
+
+
+class TestRuntimeToggle:
+    def teardown_method(self):
+        PROFILER.stop()
+        PROFILER.reset()
+
+    def test_http_toggle(self):
+        """测试通过指标服务器开关剖析"""
+        server = MetricsServer().start()
+        base = server.url.rsplit('/', 1)[0]
+        try:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(base + '/profile/start', timeout=5)
+            assert error.value.code == 405
+            assert not PROFILER.enabled
+            urllib.request.urlopen(base + '/profile/start?sample=1', data=b'', timeout=5).read()
+            assert PROFILER.enabled and PROFILER.sampler.running
+            time.sleep(0.02)
+            body = urllib.request.urlopen(base + '/profile/stop', data=b'', timeout=5).read().decode('utf-8')
+            assert not PROFILER.enabled and not PROFILER.sampler.running
+            assert '墙钟' in body
+            assert urllib.request.urlopen(base + '/profile/sampled', timeout=5).read()
+        finally:
+            server.stop()
+
+    @pytest.mark.skipif(not hasattr(signal, 'SIGUSR2'), reason='需要 SIGUSR2')
+    def test_signal_toggle(self, tmp_path):
+        """测试 SIGUSR2 切换剖析并在关闭时写出报告"""
+        prefix = str(tmp_path / 'sig')
+        previous = signal.getsignal(signal.SIGUSR2)
+        try:
+            install_signal_toggle(prefix, sample_interval=0.001)
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert PROFILER.enabled and PROFILER.sampler.running
+            time.sleep(0.02)
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert not PROFILER.enabled
+            assert os.path.exists(prefix + '.collapsed')
+            assert os.path.exists(prefix + '.sampled.collapsed')
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
+
+
+class TestSamplingProfiler:
+    def test_samples_busy_thread(self):
+        """测试采样剖析器采集到其他线程的调用栈"""
+        import threading
+        stop = threading.Event()
+
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_loop)
+        worker.start()
+        try:
+            with SamplingProfiler(interval=0.001, thread_ids={worker.ident}) as sampler:
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            worker.join()
+        assert sampler.samples > 0
+        assert 'busy_loop' in sampler.collapsed()
@@ -0,0 +1,140 @@
+"""
+近似意图缓存测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import json
+from unittest.mock import patch
+from event_log import EventLog, read_events
+from intent_cache import IntentCache
+from metrics import METRICS
+from semantic_cache import SemanticCache, text_vector, evaluate, main
+from dsl_engine import DSLEngine
+
+INTENTS = ('track_order', 'refund', 'human')
+
+
+class TestSemanticCache:
+    def setup_method(self):
+        METRICS.reset()
+        METRICS.enable()
+
+    def teardown_method(self):
+        METRICS.disable()
+        METRICS.reset()
+
+    def test_vector(self):
+        """测试向量为单位向量，相近的输入相似度高，无关的输入相似度低"""
+        vector = text_vector('帮我查一下物流')
+        assert abs(float(vector @ vector) - 1.0) < 1e-6
+        assert float(vector @ text_vector('帮我查下物流')) > 0.8
+        assert float(vector @ text_vector('转人工')) < 0.3
+        assert text_vector('') is None
+
+    def test_similar_input_hits(self):
+        """测试相近的输入命中，差一个字、意思不同的短输入不命中，并统计命中与未命中次数"""
+        cache = SemanticCache(size=10, threshold=0.7)
+        cache.put(INTENTS, '帮我查一下物流', 'track_order')
+        cache.put(INTENTS, '我要退货', 'refund')
+        intent, score = cache.get(INTENTS, '帮我查下物流')
+        assert intent == 'track_order' and score > 0.7
+        assert cache.get(INTENTS, '我要退款')[0] is None
+        assert METRICS.counter('semantic_cache_total', result='hit') == 1
+        assert METRICS.counter('semantic_cache_total', result='miss') == 1
+
+    def test_scope_is_candidate_set(self):
+        """测试只与候选意图集合相同的条目比较"""
+        cache = SemanticCache(size=10, threshold=0.7)
+        cache.put(INTENTS, '帮我查一下物流', 'track_order')
+        assert cache.get(('track_order', 'human'), '帮我查下物流')[0] is None
+        assert cache.get(INTENTS, '帮我查下物流')[0] == 'track_order'
+
+    def test_oldest_is_overwritten(self):
+        """测试写满后覆盖最早的条目，几乎相同的输入只更新意图"""
+        cache = SemanticCache(size=2, threshold=0.7)
+        cache.put(INTENTS, '帮我查一下物流', 'track_order')
+        cache.put(INTENTS, '帮我查一下物流', 'human')
+        assert len(cache) == 1
+        assert cache.get(INTENTS, '帮我查一下物流')[0] == 'human'
+        cache.put(INTENTS, '我要退货', 'refund')
+        cache.put(INTENTS, '转人工客服', 'human')
+        assert len(cache) == 2
+        assert cache.get(INTENTS, '帮我查一下物流')[0] is None
+        assert cache.get(INTENTS, '我要退货')[0] == 'refund'
+
+    def test_disabled(self):
+        """测试容量为0时不缓存"""
+        cache = SemanticCache(size=0)
+        cache.put(INTENTS, '我要退货', 'refund')
+        assert not cache.enabled
+        assert cache.get(INTENTS, '我要退货')[0] is None
+
+    def test_intent_cache_second_tier(self):
+        """测试意图缓存只在设置环境变量时启用近似缓存，写入时给出候选意图才写入近似缓存"""
+        assert IntentCache(size=10).semantic is None
+        with patch.dict('os.environ', {'DSL_AGENT_SEMANTIC_CACHE': 'true', 'DSL_AGENT_SEMANTIC_THRESHOLD': '0.8'}):
+            cache = IntentCache(size=10)
+        assert cache.semantic.threshold == 0.8
+        cache.put('a:1', '帮我查一下物流', 'track_order')
+        assert cache.similar('帮我查下物流', INTENTS) is None
+        cache.put('a:1', '帮我查一下物流', 'track_order', list(INTENTS))
+        assert cache.similar('帮我查下物流', INTENTS) == 'track_order'
+
+    def test_evaluate(self):
+        """测试离线评估：精确命中单独统计，阈值越高命中越少"""
+        samples = [('a:1', '帮我查一下物流', 'track_order'), ('a:1', '帮我查一下物流', 'track_order'),
+                   ('a:1', '帮我查下物流', 'track_order'), ('a:1', '我要退货', 'refund'),
+                   ('a:1', '我要退款', 'human')]
+        low, high = evaluate(samples, [0.6, 0.9])
+        assert low == {'threshold': 0.6, 'turns': 5, 'exact': 1, 'hits': 2, 'hit_rate': 0.5, 'accuracy': 0.5,
+                       'llm_calls': 2}
+        assert high['hits'] == 0 and high['llm_calls'] == 4
+
+    def test_main_reads_event_log(self, tmp_path, capsys):
+        """测试离线评估从事件日志读取经LLM识别和命中精确缓存的轮次"""
+        log = EventLog(str(tmp_path))
+        for text, source in (('帮我查一下物流', 'llm'), ('帮我查一下物流', 'cache'), ('帮我查下物流', 'llm'),
+                             ('帮我查查物流', 'semantic')):
+            log.append('turn', 's', 'welcome', 4, text, 'track_order', source, 0.2, 0.01)
+        log.close()
+        assert main([str(tmp_path), '--threshold', '0.7', '--json']) == 0
+        result, = json.loads(capsys.readouterr().out)
+        assert (result['turns'], result['exact'], result['hits']) == (3, 1, 1)
+
+
+SCRIPT = '''
+step welcome
+    reply "您好"
+    wait "track_order" "human"
+
+step track_order
+    reply "正在查询"
+
+step human
+    reply "正在转接"
+'''
+
+
+class TestEngineSemanticCache:
+    def test_similar_input_skips_llm(self, tmp_path):
+        """测试LLM识别过的输入写入近似缓存后，相近的输入不调用LLM，turn 事件的路由来源为 semantic"""
+        events = tmp_path / 'events'
+        with patch.dict('os.environ', {'DSL_AGENT_SEMANTIC_CACHE': 'true', 'DSL_AGENT_EVENT_DIR': str(events)}):
+            with patch('dsl_engine.LLMClient'):
+                engine = DSLEngine(script_content=SCRIPT)
+            llm = engine.llm_client
+
+            def recognize(user_input, intents, responses, site=None, normalized=None, **kwargs):
+                engine.intent_cache.put(site, normalized, 'track_order', intents)
+                return 'track_order'
+
+            llm.recognize_intent.side_effect = recognize
+            for text in ('帮我查一下物流！', '帮我查下物流'):
+                session = engine.new_session()
+                session.begin()
+                assert session.feed(text) == '正在查询'
+            assert llm.recognize_intent.call_count == 1
+        engine.close()
+        assert [e.source for e in read_events(str(events), kinds=['turn'])] == ['llm', 'semantic']
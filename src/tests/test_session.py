@@ -0,0 +1,506 @@
+"""
+对话会话测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from dsl_engine import DSLEngine
+
+SCRIPT = '''
+step welcome
+    reply "您好！" + "欢迎光临"
+    wait "refund" "human"
+    reply "回到欢迎步骤"
+
+step refund
+    reply "退货原因：" + $user_input
+    log "用户申请退货"
+    wait "welcome" "done"
+
+step human
+    reply "正在转接人工"
+
+step done
+    reply "再见"
+'''
+
+
+class TestDialogSession:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=SCRIPT)
+        self.llm = self.engine.llm_client
+        self.session = self.engine.new_session()
+
+    def test_begin_runs_until_wait(self):
+        """测试会话从第一个step执行到 wait 后停下"""
+        assert self.session.begin() == '您好！欢迎光临'
+        assert self.session.waiting
+        assert self.session.get_intents() == ['refund', 'human']
+        assert self.session.current_step == 'welcome'
+
+    def test_feed_jumps_to_recognized_step(self):
+        """测试提交输入后按识别的意图跳转，并使用本轮输入渲染回复"""
+        self.session.begin()
+        self.llm.recognize_intent.return_value = 'refund'
+        with patch.object(self.engine, '_write_log') as write_log:
+            assert self.session.feed('衣服太小') == '退货原因：衣服太小'
+        write_log.assert_called_once_with('用户申请退货', 'refund', 9, self.session.session_id)
+        self.llm.recognize_intent.assert_called_once_with('衣服太小', ('refund', 'human'), [],
+                                                        context=self.session.context, keywords=None,
+                                                        site='welcome:4', normalized='衣服太小')
+        assert self.session.get_variables()['input_history'] == ['衣服太小']
+
+    def test_unknown_intent_falls_back_to_first(self):
+        """测试无法识别的意图跳转到第一个候选"""
+        self.session.begin()
+        self.llm.recognize_intent.return_value = 'unknown'
+        with patch.object(self.engine, '_write_log'):
+            self.session.feed('随便')
+        assert self.session.current_step == 'refund'
+
+    def test_remaining_statements_run_after_child_step(self):
+        """测试跳转的step结束后继续执行 wait 之后的语句（与 process 的递归语义一致）"""
+        self.session.begin()
+        self.llm.recognize_intent.return_value = 'human'
+        assert self.session.feed('转人工') == '正在转接人工\n回到欢迎步骤'
+        assert self.session.finished
+        assert not self.session.waiting
+
+    def test_frame_stack_stays_bounded(self):
+        """测试长对话中已执行完的帧被丢弃"""
+        self.session.begin()
+        self.llm.recognize_intent.side_effect = ['refund', 'welcome'] * 50
+        with patch.object(self.engine, '_write_log'):
+            for _ in range(100):
+                self.session.feed('输入')
+        # welcome 的 wait 之后还有语句，每次回到 welcome 会留下一帧；refund 的帧在跳转前被丢弃
+        assert len(self.session._frames) <= 51
+        assert self.session.turns == 100
+
+    def test_sessions_are_isolated(self):
+        """测试多个会话的变量互不影响"""
+        other = self.engine.new_session()
+        self.session.begin()
+        other.begin()
+        self.llm.recognize_intent.return_value = 'refund'
+        with patch.object(self.engine, '_write_log'):
+            self.session.feed('第一个')
+            assert other.feed('第二个') == '退货原因：第二个'
+        assert self.session.get_variables()['input_history'] == ['第一个']
+
+    def test_exit_and_empty_input(self):
+        """测试空输入继续等待，退出词结束会话"""
+        self.session.begin()
+        assert self.session.feed('   ') == ''
+        assert self.session.waiting
+        assert self.session.feed('bye') == '感谢使用，再见！'
+        assert self.session.finished
+        with pytest.raises(RuntimeError):
+            self.session.feed('还在吗')
+
+    def test_begin_at_unknown_step(self):
+        """测试从不存在的step开始时返回提示"""
+        assert self.session.begin('missing').startswith('未知步骤: missing')
+        assert self.session.finished
+
+
+class TestStreamingSession:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=SCRIPT)
+        self.llm = self.engine.llm_client
+        self.session = self.engine.new_session()
+
+    def test_reply_yielded_before_later_statements(self):
+        """测试流式接口先产出回复，之后的 log 语句在取下一条时才执行"""
+        assert list(self.session.stream_begin()) == ['您好！欢迎光临']
+        self.llm.recognize_intent.return_value = 'refund'
+        with patch.object(self.engine, '_write_log') as write_log:
+            replies = self.session.stream_feed('衣服太小')
+            assert next(replies) == '退货原因：衣服太小'
+            write_log.assert_not_called()
+            assert not self.session.waiting
+            assert list(replies) == []
+            write_log.assert_called_once_with('用户申请退货', 'refund', 9, self.session.session_id)
+        assert self.session.get_intents() == ['welcome', 'done']
+        assert 0 < self.session.last_timings['first_reply'] <= (
+            self.session.last_timings['classify'] + self.session.last_timings['execute'])
+
+    def test_multiple_replies_streamed_in_order(self):
+        """测试跳转的step和 wait 之后的语句依次产出"""
+        self.session.begin()
+        self.llm.recognize_intent.return_value = 'human'
+        assert list(self.session.stream_feed('转人工')) == ['正在转接人工', '回到欢迎步骤']
+        assert self.session.finished
+
+    def test_async_stream(self):
+        """测试异步迭代器接口与同步接口结果一致"""
+        self.llm.recognize_intent.return_value = 'refund'
+
+        async def run():
+            opening = [reply async for reply in self.session.astream_begin()]
+            with patch.object(self.engine, '_write_log'):
+                turn = [reply async for reply in self.session.astream_feed('衣服太小')]
+            farewell = [reply async for reply in self.session.astream_feed('bye')]
+            return opening, turn, farewell
+
+        assert asyncio.run(run()) == (['您好！欢迎光临'], ['退货原因：衣服太小'], ['感谢使用，再见！'])
+        assert self.session.finished
+
+
+ROUTING_SCRIPT = '''
+step menu
+    reply "请选择：1 退货 2 人工"
+    wait "refund" "human"
+        when "1" "退货" goto refund
+        when prefix "人工" "转人工" goto human
+        when regex "^[0-9]{8}$" goto order
+        when "3" goto missing
+
+step refund
+    if $user_input == "1"
+        reply "按菜单进入退货"
+    else
+        reply "退货：" + $user_input
+    end
+    wait "menu"
+
+step order
+    match $user_input
+        case prefix "2024" reply "今年的订单"
+        case regex "^1" reply "以1开头"
+        else reply "其他订单"
+    end
+    reply "查询完成"
+
+step human
+    reply "正在转接人工"
+'''
+
+
+class TestRuleRouting:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=ROUTING_SCRIPT)
+        self.llm = self.engine.llm_client
+        self.session = self.engine.new_session()
+        self.session.begin()
+
+    def test_when_rules_skip_llm(self):
+        """测试命中 when 规则的输入不调用LLM，直接跳转并选择 if 分支"""
+        assert self.session.feed('1') == '按菜单进入退货'
+        self.llm.recognize_intent.assert_not_called()
+
+    def test_prefix_and_regex_rules(self):
+        """测试前缀与正则规则，以及 match 的分支选择"""
+        assert self.session.feed('人工服务') == '正在转接人工'
+        session = self.engine.new_session()
+        session.begin()
+        assert session.feed('20240101') == '今年的订单\n查询完成'
+        session = self.engine.new_session()
+        session.begin()
+        assert session.feed('12345678') == '以1开头\n查询完成'
+        self.llm.recognize_intent.assert_not_called()
+
+    def test_unmatched_or_missing_target_uses_llm(self):
+        """测试不命中规则或目标step不存在时交给LLM识别"""
+        self.llm.recognize_intent.return_value = 'refund'
+        assert self.session.feed('3') == '退货：3'
+        self.llm.recognize_intent.assert_called_once()
+        self.session.feed('随便说说')
+        assert self.llm.recognize_intent.call_count == 2
+
+    def test_blocking_process_uses_rules(self):
+        """测试阻塞式 process 在 wait 处同样先按规则路由"""
+        with patch('builtins.input', side_effect=['退货', 'bye']), patch('builtins.print'):
+            with pytest.raises(SystemExit):
+                self.engine.process('menu')
+        self.llm.recognize_intent.assert_not_called()
+        assert self.engine.get_current_step() == 'refund'
+
+    def test_branch_replies_in_blocking_process(self):
+        """测试 process 中 match 选中的分支就地执行，之后继续执行后面的语句"""
+        assert self.engine.process('order', '2024-1') == '今年的订单\n查询完成'
+        assert self.engine.process('order', 'x') == '其他订单\n查询完成'
+
+
+KEYWORD_SCRIPT = '''
+step menu
+    reply "请问需要什么帮助"
+    wait "refund" "human"
+
+step refund keywords "退货" "退款"
+    reply "退货：" + $user_input
+
+step human keywords "人工" "投诉"
+    reply "正在转接人工"
+'''
+
+
+class TestKeywordRouting:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=KEYWORD_SCRIPT)
+        self.llm = self.engine.llm_client
+        self.session = self.engine.new_session()
+        self.session.begin()
+
+    def test_single_intent_hit_skips_llm(self):
+        """测试只命中一个意图的关键词时直接跳转，不调用LLM"""
+        assert self.session.feed('我要退款') == '退货：我要退款'
+        self.llm.recognize_intent.assert_not_called()
+
+    def test_ambiguous_input_passes_matcher_to_llm(self):
+        """测试命中多个意图时交给LLM，并传入关键词匹配器供API失败时回退"""
+        self.llm.recognize_intent.return_value = 'human'
+        assert self.session.feed('退货不成功要投诉') == '正在转接人工'
+        program = self.engine._get_program()
+        wait = program.get_step('menu')['children'][1]
+        keywords = self.llm.recognize_intent.call_args.kwargs['keywords']
+        assert keywords is program.keyword_matcher(wait)
+        assert keywords.best('退货退款投诉') == 'refund'
+
+
+EXTRACT_SCRIPT = '''
+step ask
+    reply "请提供订单号"
+    wait "order"
+
+step order
+    extract $order_id order_id
+    if $order_id == ""
+        reply "没有识别到订单号"
+    else
+        reply "已为您提交订单" + $order_id + "的退货申请"
+    end
+'''
+
+
+class TestExtract:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=EXTRACT_SCRIPT)
+        self.llm = self.engine.llm_client
+        self.llm.recognize_intent.return_value = 'order'
+        self.session = self.engine.new_session()
+        self.session.begin()
+
+    def test_local_extractor_binds_variable(self):
+        """测试本地提取器命中时绑定变量，不调用LLM提取"""
+        assert self.session.feed('订单号是 20240101001') == '已为您提交订单20240101001的退货申请'
+        assert self.session.get_variables()['order_id'] == '20240101001'
+        self.llm.extract_slot.assert_not_called()
+
+    def test_llm_fallback_when_local_fails(self):
+        """测试本地提取失败时调用LLM提取，LLM也失败时变量为空"""
+        self.llm.extract_slot.return_value = '20240101001'
+        assert self.session.feed('订单号是二零二四零一零一零零一') == '已为您提交订单20240101001的退货申请'
+        self.llm.extract_slot.assert_called_once()
+        session = self.engine.new_session()
+        session.begin()
+        self.llm.extract_slot.return_value = None
+        assert session.feed('不记得了') == '没有识别到订单号'
+
+    def test_async_llm_extract_off_event_loop(self):
+        """测试异步接口的LLM提取在线程池中执行，不阻塞事件循环"""
+        threads = []
+
+        def extract_slot(text, extractor):
+            threads.append(threading.get_ident())
+            time.sleep(0.05)
+            return '20240101001'
+
+        self.llm.extract_slot.side_effect = extract_slot
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            replies = [reply async for reply in self.session.astream_feed('订单号是二零二四零一零一零零一')]
+            task.cancel()
+            return replies, ticks
+
+        replies, ticks = asyncio.run(run())
+        assert replies == ['已为您提交订单20240101001的退货申请']
+        assert threads and threads[0] != threading.get_ident()
+        assert ticks >= 3
+
+    def test_blocking_process(self):
+        """测试阻塞式 process 中的 extract"""
+        assert self.engine.process('order', '单号 88888888') == '已为您提交订单88888888的退货申请'
+        assert self.engine.get_variables()['order_id'] == '88888888'
+
+
+CALL_SCRIPT = '''
+step ask
+    reply "请提供订单号"
+    wait "order"
+
+step order
+    extract $order_id order_id
+    call status = get_order_status($order_id)
+    if $status == "error"
+        reply "查询失败，请稍后再试"
+    else
+        reply "订单" + $order_id + "：" + $status
+    end
+    call notify($order_id)
+'''
+
+
+class TestCall:
+    def setup_method(self):
+        with patch('dsl_engine.LLMClient'):
+            self.engine = DSLEngine(script_content=CALL_SCRIPT)
+        self.llm = self.engine.llm_client
+        self.llm.recognize_intent.return_value = 'order'
+        self.notified = []
+        self.engine.register_function('get_order_status', lambda order_id: '已发货')
+        self.engine.register_function('notify', self.notified.append)
+        self.session = self.engine.new_session()
+        self.session.begin()
+
+    def teardown_method(self):
+        self.engine.functions.shutdown()
+
+    def test_call_binds_result(self):
+        """测试 call 的结果赋给目标变量，没有目标变量的调用同样执行"""
+        assert self.session.feed('订单 20240101001') == '订单20240101001：已发货'
+        assert self.session.get_variables()['status'] == '已发货'
+        assert self.notified == ['20240101001']
+
+    def test_timeout_binds_error(self):
+        """测试函数超时后变量为 "error"，脚本按失败分支继续执行"""
+        self.engine.register_function('get_order_status', lambda order_id: time.sleep(1), timeout=0.05)
+        with patch.object(self.engine, 'log') as log:
+            assert self.session.feed('订单 20240101001') == '查询失败，请稍后再试'
+        log.error.assert_called_once()
+        assert self.notified == ['20240101001']
+
+    def test_async_stream_awaits_call(self):
+        """测试异步接口 await 函数结果，等待期间事件循环上的其他会话继续执行"""
+        self.engine.register_function('get_order_status', lambda order_id: time.sleep(0.1) or '已签收')
+        other = self.engine.new_session()
+
+        async def run():
+            ticks = []
+
+            async def ticker():
+                async for reply in other.astream_begin():
+                    ticks.append(reply)
+
+            replies, _ = await asyncio.gather(self._collect(self.session.astream_feed('订单 20240101001')),
+                                              ticker())
+            return replies, ticks
+
+        assert asyncio.run(run()) == (['订单20240101001：已签收'], ['请提供订单号'])
+
+    @staticmethod
+    async def _collect(replies):
+        return [reply async for reply in replies]
+
+    def test_blocking_process(self):
+        """测试阻塞式 process 中的 call"""
+        assert self.engine.process('order', '单号 88888888') == '订单88888888：已发货'
+        assert self.engine.get_variables()['status'] == '已发货'
+
+
+EFFECTS_SCRIPT = '''
+step ask
+    reply "请提供订单号"
+    wait "order"
+
+step order
+    call status = get_status($user_input)
+    call eta = get_eta($user_input)
+    log "查询订单" + $user_input
+    reply "正在查询"
+    reply $status + "，" + $eta
+'''
+
+
+class TestEffectScheduling:
+    def _engine(self, defer='true', window=1.0):
+        with patch('dsl_engine.LLMClient'), patch.dict('os.environ', {'DSL_AGENT_DEFER_EFFECTS': defer}):
+            engine = DSLEngine(script_content=EFFECTS_SCRIPT)
+        engine.llm_client.recognize_intent.return_value = 'order'
+        eta_started = threading.Event()
+
+        def get_eta(order):
+            eta_started.set()
+            return '明天送达'
+
+        # 只有两个调用并发执行时 get_status 才能在等待窗口内看到 get_eta 开始
+        engine.register_function('get_status', lambda order: '已发货' if eta_started.wait(window) else '顺序执行')
+        engine.register_function('get_eta', get_eta)
+        self.engines.append(engine)
+        return engine
+
+    def setup_method(self):
+        self.engines = []
+
+    def teardown_method(self):
+        for engine in self.engines:
+            engine.functions.shutdown()
+
+    def test_independent_calls_run_concurrently(self):
+        """测试互不依赖的 call 并发执行，结果在读取之前汇合"""
+        session = self._engine().new_session()
+        session.begin()
+        with patch.object(session.engine, '_write_log'):
+            assert session.feed('A1234567') == '正在查询\n已发货，明天送达'
+        assert session.get_variables()['status'] == '已发货'
+
+    def test_log_written_after_replies(self):
+        """测试 log 在本轮的回复产出之后才写入，写入的内容按执行到 log 时的变量求值"""
+        session = self._engine().new_session()
+        session.begin()
+        with patch.object(session.engine, '_write_log') as write_log:
+            replies = session.stream_feed('A1234567')
+            assert next(replies) == '正在查询'
+            assert next(replies) == '已发货，明天送达'
+            write_log.assert_not_called()
+            assert list(replies) == []
+        write_log.assert_called_once_with('查询订单A1234567', 'order', 9, session.session_id)
+
+    def test_async_calls_run_concurrently(self):
+        """测试异步接口中的调用同样并发执行"""
+        session = self._engine().new_session()
+
+        async def run():
+            opening = [reply async for reply in session.astream_begin()]
+            with patch.object(session.engine, '_write_log'):
+                turn = [reply async for reply in session.astream_feed('A1234567')]
+            return opening, turn
+
+        assert asyncio.run(run()) == (['请提供订单号'], ['正在查询', '已发货，明天送达'])
+
+    def test_sequential_when_disabled(self):
+        """测试关闭 DSL_AGENT_DEFER_EFFECTS 后按语句顺序执行"""
+        session = self._engine('false', window=0.05).new_session()
+        session.begin()
+        with patch.object(session.engine, '_write_log') as write_log:
+            replies = session.stream_feed('A1234567')
+            assert next(replies) == '正在查询'
+            write_log.assert_called_once_with('查询订单A1234567', 'order', 9, session.session_id)
+            assert list(replies) == ['顺序执行，明天送达']
+
+    def test_blocking_process(self):
+        """测试阻塞式 process 中的调用同样并发执行，日志在 step 结束前写入"""
+        engine = self._engine()
+        with patch.object(engine, '_write_log') as write_log:
+            assert engine.process('order', 'A1234567') == '正在查询\n已发货，明天送达'
+        write_log.assert_called_once_with('查询订单A1234567', 'order', 9)
@@ -0,0 +1,87 @@
+"""
+流式解析器测试用例
+"""
+import io
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from parser import Parser
+from stream_parser import StreamParser, iter_step_sources
+
+
+SCRIPT = '''# 前导注释
+step greeting
+    reply "您好！" + $user_input   # 注释里的 step 不算边界
+    log "包含 step 的字符串"
+    wait "return_request" "unknown"
+
+step return_request
+    reply "请提供订单号"
+    reply $step + "多行
+字符串 step"
+    wait "greeting"
+'''
+
+
+class TestStreamParser:
+    def setup_method(self):
+        self.parser = StreamParser()
+
+    def test_split_steps(self):
+        """测试按step切分源码并保留起始行号"""
+        sources = list(iter_step_sources(io.StringIO(SCRIPT)))
+        assert [lineno for _, lineno in sources] == [2, 7]
+        assert sources[0][0].startswith('step greeting')
+        assert sources[1][0].startswith('step return_request')
+
+    def test_matches_full_parse_with_small_chunks(self):
+        """测试各种分块大小（包括切断多字节字符）下结果与完整解析一致"""
+        expected = Parser().parse(SCRIPT)
+        data = SCRIPT.encode('utf-8')
+        for chunk_size in (1, 3, 7, 64, 1 << 16):
+            assert self.parser.parse(io.BytesIO(data), chunk_size) == expected
+            assert self.parser.parse(data, chunk_size) == expected
+
+    def test_parse_file_with_mmap(self, tmp_path):
+        """测试通过文件路径（内存映射）流式解析"""
+        script_file = tmp_path / 'script.dsl'
+        script_file.write_text(SCRIPT, encoding='utf-8')
+        assert self.parser.parse(str(script_file), chunk_size=5) == Parser().parse(SCRIPT)
+
+    def test_iter_steps_is_lazy(self):
+        """测试逐个产出step节点"""
+        steps = self.parser.iter_steps(io.StringIO(SCRIPT))
+        first = next(steps)
+        assert first['type'] == 'Step'
+        assert first['value'] == 'greeting'
+
+    def test_syntax_error(self):
+        """测试有语法错误的step被计数，整体解析返回None"""
+        broken = SCRIPT.replace('    reply "请提供订单号"\n', '    reply\n')
+        steps = list(self.parser.iter_steps(io.StringIO(broken)))
+        assert [s['value'] for s in steps] == ['greeting']
+        assert self.parser.error_count == 1
+        assert self.parser.parse(io.StringIO(broken)) is None
+
+    def test_crlf_matches_full_parse(self):
+        """测试 \\r\\n 和 \\r 换行（包括被分块切开时）与统一换行符后的完整解析结果相同"""
+        expected = Parser().parse(SCRIPT)
+        for newline in ('\r\n', '\r'):
+            data = SCRIPT.replace('\n', newline).encode('utf-8')
+            for chunk_size in (1, 2, 5, 1 << 16):
+                assert self.parser.parse(data, chunk_size) == expected
+                assert self.parser.parse(io.BytesIO(data), chunk_size) == expected
+
+    def test_lines_after_multiline_string(self):
+        """测试多行字符串之后的语句和step行号按实际行计算"""
+        script = 'step a\n    reply "第一行\n第二行\n第三行"\n    reply "x"\n\nstep b\n    reply "y"\n'
+        expected = Parser().parse(script)
+        assert self.parser.parse(script.encode('utf-8'), 4) == expected
+        first, second = expected['children']
+        assert [node['lineno'] for node in first['children']] == [2, 5]
+        assert (second['lineno'], second['children'][0]['lineno']) == (7, 8)
+
+    def test_empty_source(self):
+        """测试空脚本"""
+        assert self.parser.parse(io.StringIO('# 只有注释\n')) is None
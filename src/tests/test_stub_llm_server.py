@@ -0,0 +1,116 @@
+"""
+LLM替身服务器测试用例
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import http.client
+import json
+import random
+import pytest
+from unittest.mock import patch
+from llm_client import LLMClient
+from stub_llm_server import StubLLM, StubLLMServer, parse_latency
+
+
+def build_prompt(text, intents):
+    return f"可用意图：{', '.join(intents)}\n用户输入：{text}\n"
+
+
+def post(server, body):
+    host, port = server.httpd.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        conn.request('POST', '/v1/chat/completions', json.dumps(body),
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+class TestStubLLM:
+    def test_keyword_rules(self):
+        """测试按关键词规则返回意图，只在可用意图中匹配"""
+        stub = StubLLM(rules={'refund': ['退货', '退款'], 'human': ['人工']})
+        assert stub.classify(build_prompt('我要退货', ['greeting', 'refund'])) == 'refund'
+        assert stub.classify(build_prompt('我要退货', ['greeting', 'human'])) in ('greeting', 'human')
+
+    def test_hash_mode_is_deterministic(self):
+        """测试散列模式对同一输入总是返回相同意图"""
+        stub = StubLLM(mode='hash')
+        prompt = build_prompt('随便说点什么', ['a', 'b', 'c'])
+        assert len({stub.classify(prompt) for _ in range(10)}) == 1
+
+    def test_first_mode_and_missing_intents(self):
+        """测试 first 模式与提示词中没有意图列表的情况"""
+        assert StubLLM(mode='first').classify(build_prompt('x', ['a', 'b'])) == 'a'
+        assert StubLLM().classify('没有意图列表的提示词') == 'unknown'
+
+    def test_latency_distributions(self):
+        """测试延迟分布解析"""
+        rng = random.Random(0)
+        assert parse_latency(None)(rng) == 0.0
+        assert parse_latency('fixed:0.5')(rng) == 0.5
+        assert 0.1 <= parse_latency('uniform:0.1:0.2')(rng) <= 0.2
+        assert parse_latency('lognormal:0.2:0.5')(rng) > 0
+        with pytest.raises(ValueError):
+            parse_latency('gamma:1')
+
+    def test_same_seed_same_draws(self):
+        """测试相同种子产生相同的延迟与错误序列"""
+        stubs = [StubLLM(latency='exp:0.1', error_rate=0.3, seed=7) for _ in range(2)]
+        draws = [[stub.draw() for _ in range(20)] for stub in stubs]
+        assert draws[0] == draws[1]
+        assert any(failed for _, failed in draws[0])
+
+
+class TestStubLLMServer:
+    def setup_method(self):
+        self.server = StubLLMServer(rules={'refund': ['退货']}).start()
+
+    def teardown_method(self):
+        self.server.stop()
+
+    def test_completion_response_format(self):
+        """测试响应符合 chat.completion 格式"""
+        status, body = post(self.server, {
+            'model': 'm', 'messages': [{'role': 'user', 'content': build_prompt('我要退货', ['greeting', 'refund'])}]})
+        assert status == 200
+        assert body['choices'][0]['message']['content'] == 'refund'
+        assert body['usage']['total_tokens'] > 0
+
+    def test_llm_client_over_http(self):
+        """测试真实的 LLMClient 通过网络访问替身服务器"""
+        with patch.dict('os.environ', {'DSL_AGENT_BASE_URL': self.server.base_url}):
+            client = LLMClient(api_key='test_api_key')
+        assert client.recognize_intent('我要退货', ['greeting', 'refund'], []) == 'refund'
+        assert self.server.stats['requests'] == 1
+
+    def test_unknown_path(self):
+        """测试未知路径返回404"""
+        host, port = self.server.httpd.server_address[:2]
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        conn.request('POST', '/v1/embeddings', '{}')
+        assert conn.getresponse().status == 404
+        conn.close()
+
+
+class TestStubLLMServerFaults:
+    def test_injected_errors(self):
+        """测试错误率为1时所有请求返回500"""
+        with StubLLMServer(error_rate=1.0) as server:
+            status, body = post(server, {'messages': [{'role': 'user', 'content': 'x'}]})
+        assert status == 500
+        assert body['error']['type'] == 'server_error'
+        assert server.stats['errors'] == 1
+
+    def test_rate_limit(self):
+        """测试超过限流时返回429"""
+        with StubLLMServer(rate_limit=0.001, burst=1) as server:
+            first, _ = post(server, {'messages': [{'role': 'user', 'content': 'x'}]})
+            second, body = post(server, {'messages': [{'role': 'user', 'content': 'x'}]})
+        assert first == 200
+        assert second == 429
+        assert server.stats['rate_limited'] == 1
@@ -15,7 +15,7 @@ class MockLLMClient:
             "farewell": "farewell"
         }
     
-    def recognize_intent(self, user_input, available_intents, latest_responses=None):
+    def recognize_intent(self, user_input, available_intents, latest_responses=None, context=None):
         if self.debug:
             print(f"[MOCK] 识别意图: '{user_input}' -> 可用意图: {available_intents}")
         